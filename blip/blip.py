@@ -241,28 +241,68 @@ class WAS_BLIP_Analyze_Image:
             }
         }
     
-    def blip_caption_image(self, image_path, mode, question, blip_model=None):
-            
-        def transformImage(input_image, image_size, device):
-            raw_image = input_image.convert('RGB')   
-            raw_image = raw_image.resize((image_size, image_size))
-            transform = transforms.Compose([
-                transforms.Resize(raw_image.size, interpolation=InterpolationMode.BICUBIC),
-                transforms.ToTensor(),
-                transforms.Normalize((0.48145466, 0.4578275, 0.40821073), (0.26862954, 0.26130258, 0.27577711))
-            ]) 
-            image = transform(raw_image).unsqueeze(0).to(device)   
-            return image.view(1, -1, image_size, image_size)  # Change the shape of the output tensor       
-        
+    IMAGE_SIZE = 384
+    QUESTION_BATCH_SIZE = 16
+
+    @staticmethod
+    def load_image_tensor(image_path, image_size, device):
         from torchvision import transforms
         from torchvision.transforms.functional import InterpolationMode
-        
+
+        with Image.open(image_path) as input_image:
+            raw_image = input_image.convert('RGB')
+        raw_image = raw_image.resize((image_size, image_size))
+        transform = transforms.Compose([
+            transforms.Resize(raw_image.size, interpolation=InterpolationMode.BICUBIC),
+            transforms.ToTensor(),
+            transforms.Normalize((0.48145466, 0.4578275, 0.40821073), (0.26862954, 0.26130258, 0.27577711))
+        ])
+        image = transform(raw_image).unsqueeze(0).to(device)
+        return image.view(1, -1, image_size, image_size)  # Change the shape of the output tensor
+
+    def blip_answer_questions(self, image_paths, questions, blip_model, question_batch_size=QUESTION_BATCH_SIZE):
+        """Answer every question for every image with an interrogate-mode model.
+
+        Each image is decoded once and all images go through the vision encoder
+        in one batch; the questions are then answered against those features
+        question_batch_size at a time. Returns one list of answers per image,
+        in question order, or None for an image that could not be loaded.
+        """
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        model = blip_model[0].to(device)
+        tensors = []
+        for image_path in image_paths:
+            try:
+                tensors.append(self.load_image_tensor(image_path, self.IMAGE_SIZE, device))
+            except Exception as e:
+                cstr(f"Failed to load image {image_path}: {e}").error.print()
+                tensors.append(None)
+        loaded = [tensor for tensor in tensors if tensor is not None]
+        if not loaded:
+            return [None] * len(image_paths)
+
+        results = []
+        with torch.no_grad():
+            image_embeds = model.encode_image(torch.cat(loaded, dim=0))
+            row = 0
+            for tensor in tensors:
+                if tensor is None:
+                    results.append(None)
+                    continue
+                embeds = image_embeds[row:row + 1]
+                row += 1
+                answers = []
+                for start in range(0, len(questions), question_batch_size):
+                    answers.extend(model.answer_questions(embeds, questions[start:start + question_batch_size]))
+                results.append(answers)
+        return results
+
+    def blip_caption_image(self, image_path, mode, question, blip_model=None):
         device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         
         conf = getSuiteConfig()
-        image = Image.open(image_path)
-        size = 384
-        tensor = transformImage(image, size, device)
+        size = self.IMAGE_SIZE
+        tensor = self.load_image_tensor(image_path, size, device)
             
         if blip_model:
             mode = blip_model[1]
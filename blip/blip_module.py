@@ -359,6 +359,44 @@ class BLIP_VQA(nn.Module):
  
                 
                 
+    def encode_image(self, image):
+        """Run the vision encoder once; the result can be reused for any number of questions."""
+        return self.visual_encoder(image)
+
+    def answer_questions(self, image_embeds, questions, num_beams=3, max_length=10, min_length=1):
+        """Generate answers to several questions about one image in a single batch.
+
+        image_embeds is one row of encode_image() output (shape [1, patches, width]);
+        it is broadcast across the questions rather than re-encoded per question.
+        """
+        question = self.tokenizer(questions, padding='longest', truncation=True, max_length=35,
+                                  return_tensors="pt").to(image_embeds.device)
+        question.input_ids[:,0] = self.tokenizer.enc_token_id
+        batch_size = question.input_ids.size(0)
+        image_embeds = image_embeds.expand(batch_size, -1, -1)
+        image_atts = torch.ones(image_embeds.size()[:-1],dtype=torch.long).to(image_embeds.device)
+
+        question_output = self.text_encoder(question.input_ids,
+                                            attention_mask = question.attention_mask,
+                                            encoder_hidden_states = image_embeds,
+                                            encoder_attention_mask = image_atts,
+                                            return_dict = True)
+        question_states = question_output.last_hidden_state.repeat_interleave(num_beams,dim=0)
+        # Questions are padded to the longest in the batch; keep the decoder off the [PAD] states
+        # so each answer matches what the question gets when asked on its own.
+        question_atts = question.attention_mask.repeat_interleave(num_beams,dim=0)
+        model_kwargs = {"encoder_hidden_states": question_states, "encoder_attention_mask":question_atts}
+
+        bos_ids = torch.full((batch_size,1),fill_value=self.tokenizer.bos_token_id,device=image_embeds.device)
+        outputs = self.text_decoder.generate(input_ids=bos_ids,
+                                             max_length=max_length,
+                                             min_length=min_length,
+                                             num_beams=num_beams,
+                                             eos_token_id=self.tokenizer.sep_token_id,
+                                             pad_token_id=self.tokenizer.pad_token_id,
+                                             **model_kwargs)
+        return [self.tokenizer.decode(output, skip_special_tokens=True) for output in outputs]
+
     def rank_answer(self, question_states, question_atts, answer_ids, answer_atts, k):
         
         num_ques = question_states.size(0)
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import json
 import os
 import re
-from dataclasses import dataclass
+import time
+from dataclasses import asdict, dataclass
 from typing import Any, Optional
 
 from utils.globals import HfHubSortDirection, HfHubSortOption, HfHubVisualMediaTask
@@ -14,6 +16,14 @@ logger = get_logger("image_to_prompt.model_download")
 os.environ.setdefault("HF_HUB_DISABLE_SYMLINKS_WARNING", "1")
 os.environ.setdefault("HF_HUB_DISABLE_PROGRESS_BARS", "1")
 
+# Respects SD_RUNNER_CACHE_DIR so tests can redirect it (mirrors the word corpus cache).
+_DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "configs")
+
+
+def _resolve_cache_path() -> str:
+    return os.path.join(os.environ.get("SD_RUNNER_CACHE_DIR") or _DEFAULT_CACHE_DIR, "hf_hub_search_cache.json")
+
+
 def ensure_hf_file(repo_id: str, filename: str, cache_dir: str | None = None) -> str:
     """Download one file from Hugging Face Hub if missing and return its path.
 
@@ -86,16 +96,46 @@ class HfHubApiBackend:
     """Hugging Face Hub API backend for model search + download."""
 
     VISUAL_MEDIA_TASKS = HfHubVisualMediaTask.api_values()
+    CACHE_TTL_SECONDS = 6 * 60 * 60
+    MAX_CACHED_SEARCHES = 50
+    CACHE_VERSION = 1
+
+    def __init__(
+        self,
+        api: Any = None,
+        *,
+        cache_path: str | None = None,
+        ttl_seconds: float | None = None,
+        hub_version: str | None = None,
+    ):
+        """``api`` replaces the ``HfApi`` client (tests pass a stub); ``hub_version``
+        keys the stored kwargs probe and defaults to the installed library version."""
+        if api is None:
+            try:
+                from huggingface_hub import HfApi
+            except Exception as e:
+                raise RuntimeError(
+                    "huggingface_hub is required for HF Hub search. "
+                    "Install with: pip install huggingface_hub"
+                ) from e
+            api = HfApi()
+        self._api = api
+        self._hub_version = hub_version or self._installed_hub_version()
+        self._cache_path = cache_path or _resolve_cache_path()
+        self._ttl_seconds = self.CACHE_TTL_SECONDS if ttl_seconds is None else float(ttl_seconds)
+        self._cache: dict[str, Any] | None = None
+        # Set by search_models: when the returned results were fetched, and whether
+        # they were served from the cache because the hub could not be reached.
+        self.last_search_cached_at: float | None = None
+        self.last_search_offline = False
 
-    def __init__(self):
+    @staticmethod
+    def _installed_hub_version() -> str:
         try:
-            from huggingface_hub import HfApi
-        except Exception as e:
-            raise RuntimeError(
-                "huggingface_hub is required for HF Hub search. "
-                "Install with: pip install huggingface_hub"
-            ) from e
-        self._api = HfApi()
+            import huggingface_hub
+            return str(getattr(huggingface_hub, "__version__", "unknown"))
+        except Exception:
+            return "unknown"
 
     @staticmethod
     def _safe_list(v: Any) -> list[str]:
@@ -131,27 +171,46 @@ class HfHubApiBackend:
         except Exception:
             return task_value
 
-    def _list_models_compat(self, kwargs: dict[str, Any]):
-        """Call list_models with graceful fallback for older hub versions."""
+    @staticmethod
+    def _strip_kwarg(call_kwargs: dict[str, Any], bad_kw: str) -> bool:
+        if bad_kw in call_kwargs:
+            call_kwargs.pop(bad_kw, None)
+            return True
+        # Sometimes old versions fail on nested args (e.g. filter object shape).
+        if bad_kw == "task":
+            call_kwargs.pop("task", None)
+            call_kwargs.pop("filter", None)
+            return True
+        return False
+
+    def _list_models_compat(self, kwargs: dict[str, Any]) -> list[Any]:
+        """Call list_models with graceful fallback for older hub versions.
+
+        Kwargs found unsupported are remembered per hub version, so the TypeError
+        probe only runs once for each installed library version.
+        """
+        capabilities = self._load_cache()["capabilities"]
+        known_unsupported = capabilities.get(self._hub_version)
+        unsupported = list(known_unsupported or [])
         call_kwargs = dict(kwargs)
+        for bad_kw in unsupported:
+            self._strip_kwarg(call_kwargs, bad_kw)
         # Keep retrying by removing unsupported args reported by TypeError.
         for _ in range(8):
             try:
-                return self._api.list_models(**call_kwargs)
+                # Materialize here: list_models is lazy and network errors surface while iterating.
+                models = list(self._api.list_models(**call_kwargs))
+                break
             except TypeError as e:
                 bad_kw = self._extract_unexpected_kwarg(e)
-                if not bad_kw:
+                if not bad_kw or not self._strip_kwarg(call_kwargs, bad_kw):
                     raise
-                if bad_kw in call_kwargs:
-                    call_kwargs.pop(bad_kw, None)
-                    continue
-                # Sometimes old versions fail on nested args (e.g. filter object shape).
-                if bad_kw == "task":
-                    call_kwargs.pop("task", None)
-                    call_kwargs.pop("filter", None)
-                    continue
-                raise
-        return self._api.list_models(**call_kwargs)
+                unsupported.append(bad_kw)
+        else:
+            models = list(self._api.list_models(**call_kwargs))
+        if known_unsupported is None or len(unsupported) != len(known_unsupported):
+            capabilities[self._hub_version] = unsupported
+        return models
 
     def search_models(
         self,
@@ -163,8 +222,14 @@ class HfHubApiBackend:
         sort: str | HfHubSortOption = HfHubSortOption.DOWNLOADS,
         direction: int | HfHubSortDirection = HfHubSortDirection.DESCENDING,
         include_gated: bool = True,
+        refresh: bool = False,
     ) -> list[HfModelSearchResult]:
-        """Search models on HF Hub with metadata useful for UI filtering."""
+        """Search models on HF Hub with metadata useful for UI filtering.
+
+        Results are cached per query, task, sort and direction for
+        ``CACHE_TTL_SECONDS``; ``refresh`` skips the cache. If the hub cannot be
+        reached, the last cached results for the search are returned instead.
+        """
         sort_value = sort.value if isinstance(sort, HfHubSortOption) else str(sort)
         direction_value = direction.value if isinstance(direction, HfHubSortDirection) else int(direction)
         if isinstance(task, HfHubVisualMediaTask):
@@ -172,56 +237,137 @@ class HfHubApiBackend:
         else:
             task_value = str(task or "")
 
-        logger.info(
-            "Searching HF models: query=%s task=%s limit=%s sort=%s direction=%s",
-            query, task_value, limit, sort_value, direction_value,
-        )
-        list_models_kwargs: dict[str, Any] = {
-            "search": (query or None),
-            "sort": sort_value,
-            "direction": direction_value,
-            "full": True,
-            "limit": limit,
-        }
-        if task_value:
-            # Prefer modern ModelFilter path, fallback handled in _list_models_compat.
-            list_models_kwargs["filter"] = self._build_task_filter(task_value)
-        model_iter = self._list_models_compat(list_models_kwargs)
+        key = self._cache_key(query, task_value, sort_value, direction_value)
+        entry = None if refresh else self._cached_entry(key, limit)
+        if entry is not None:
+            logger.debug("Using cached HF search results for %s", key)
+            self.last_search_offline = False
+        else:
+            logger.info(
+                "Searching HF models: query=%s task=%s limit=%s sort=%s direction=%s",
+                query, task_value, limit, sort_value, direction_value,
+            )
+            list_models_kwargs: dict[str, Any] = {
+                "search": (query or None),
+                "sort": sort_value,
+                "direction": direction_value,
+                "full": True,
+                "limit": limit,
+            }
+            if task_value:
+                # Prefer modern ModelFilter path, fallback handled in _list_models_compat.
+                list_models_kwargs["filter"] = self._build_task_filter(task_value)
+            try:
+                models = self._list_models_compat(list_models_kwargs)
+            except TypeError:
+                raise
+            except Exception as e:
+                entry = self._load_cache()["searches"].get(key)
+                if entry is None:
+                    raise
+                logger.warning(f"HF Hub search failed, serving cached results from {entry['fetched_at']}: {e}")
+                self.last_search_offline = True
+            else:
+                entry = {
+                    "fetched_at": time.time(),
+                    "limit": limit,
+                    "results": [asdict(self._to_result(m)) for m in models],
+                }
+                self._store_entry(key, entry)
+                self.last_search_offline = False
+        self.last_search_cached_at = entry["fetched_at"]
 
         results: list[HfModelSearchResult] = []
-        for m in model_iter:
-            gated = bool(getattr(m, "gated", False))
-            if gated and not include_gated:
+        for row in entry["results"][:limit]:
+            result = HfModelSearchResult(**row)
+            if result.gated and not include_gated:
                 continue
-            tags = self._safe_list(getattr(m, "tags", []))
-            pipeline_tag = getattr(m, "pipeline_tag", "") or ""
             # If server-side task filtering is unavailable in current hub version,
             # keep a client-side fallback.
-            if task_value and pipeline_tag != task_value and task_value not in tags:
+            if task_value and result.task != task_value and task_value not in result.tags:
                 continue
-            if visual_only and not task_value and pipeline_tag not in self.VISUAL_MEDIA_TASKS:
+            if visual_only and not task_value and result.task not in self.VISUAL_MEDIA_TASKS:
                 continue
-            license_tag = ""
-            for t in tags:
-                if str(t).startswith("license:"):
-                    license_tag = str(t).split(":", 1)[1]
-                    break
-            results.append(
-                HfModelSearchResult(
-                    repo_id=str(getattr(m, "id", "")),
-                    task=str(pipeline_tag),
-                    downloads=self._to_int(getattr(m, "downloads", 0)),
-                    likes=self._to_int(getattr(m, "likes", 0)),
-                    license=license_tag or "unknown",
-                    gated=gated,
-                    private=bool(getattr(m, "private", False)),
-                    tags=tags,
-                    created_at=str(getattr(m, "created_at", "") or ""),
-                    last_modified=str(getattr(m, "last_modified", "") or ""),
-                )
-            )
+            results.append(result)
         return results
 
+    def _to_result(self, m: Any) -> HfModelSearchResult:
+        tags = self._safe_list(getattr(m, "tags", []))
+        license_tag = ""
+        for t in tags:
+            if str(t).startswith("license:"):
+                license_tag = str(t).split(":", 1)[1]
+                break
+        return HfModelSearchResult(
+            repo_id=str(getattr(m, "id", "")),
+            task=str(getattr(m, "pipeline_tag", "") or ""),
+            downloads=self._to_int(getattr(m, "downloads", 0)),
+            likes=self._to_int(getattr(m, "likes", 0)),
+            license=license_tag or "unknown",
+            gated=bool(getattr(m, "gated", False)),
+            private=bool(getattr(m, "private", False)),
+            tags=tags,
+            created_at=str(getattr(m, "created_at", "") or ""),
+            last_modified=str(getattr(m, "last_modified", "") or ""),
+        )
+
+    # ------------------------------------------------------------------
+    # Search cache
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _cache_key(query: str, task_value: str, sort_value: str, direction_value: int) -> str:
+        return json.dumps([" ".join((query or "").lower().split()), task_value, sort_value, direction_value])
+
+    def _cached_entry(self, key: str, limit: int) -> dict[str, Any] | None:
+        """Return a fresh cached search that fetched at least ``limit`` models."""
+        entry = self._load_cache()["searches"].get(key)
+        if entry is None or entry["limit"] < limit:
+            return None
+        if time.time() - entry["fetched_at"] > self._ttl_seconds:
+            return None
+        return entry
+
+    def _store_entry(self, key: str, entry: dict[str, Any]) -> None:
+        searches = self._load_cache()["searches"]
+        searches.pop(key, None)
+        searches[key] = entry
+        while len(searches) > self.MAX_CACHED_SEARCHES:
+            oldest = min(searches, key=lambda k: searches[k]["fetched_at"])
+            del searches[oldest]
+        self._save_cache()
+
+    def clear_cache(self) -> None:
+        """Drop cached searches; the stored kwargs probe is kept."""
+        self._load_cache()["searches"].clear()
+        self._save_cache()
+
+    def _load_cache(self) -> dict[str, Any]:
+        if self._cache is not None:
+            return self._cache
+        self._cache = {"version": self.CACHE_VERSION, "capabilities": {}, "searches": {}}
+        try:
+            with open(self._cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict) and data.get("version") == self.CACHE_VERSION:
+                self._cache["capabilities"] = dict(data.get("capabilities") or {})
+                self._cache["searches"] = dict(data.get("searches") or {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable HF search cache {self._cache_path}: {e}")
+        return self._cache
+
+    def _save_cache(self) -> None:
+        tmp_path = self._cache_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self._cache_path) or ".", exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._cache, f)
+            os.replace(tmp_path, self._cache_path)
+        except OSError as e:
+            logger.warning(f"Failed to write HF search cache {self._cache_path}: {e}")
+
     @staticmethod
     def download_file(repo_id: str, filename: str, cache_dir: str | None = None) -> str:
         """Download one file from a model repo (wrapper preserving old behavior)."""
@@ -1,7 +1,12 @@
 import glob
 import json
 import os
+import struct
 import sys
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
 
 from PIL import Image
 from PIL.PngImagePlugin import PngInfo
@@ -21,6 +26,82 @@ except Exception as e:
     print("Failed to import SD Prompt Reader!")
 
 
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_TEXT_CHUNK_TYPES = (b"tEXt", b"zTXt", b"iTXt")
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF)
+
+
+def _png_text_chunk(key: str, value: str) -> bytes:
+    """Build a tEXt chunk, or an uncompressed iTXt chunk if the value is not Latin-1."""
+    keyword = key.encode("latin-1")
+    if not 1 <= len(keyword) <= 79:
+        raise ValueError(f"Invalid PNG text keyword: {key!r}")
+    try:
+        return _png_chunk(b"tEXt", keyword + b"\0" + value.encode("latin-1"))
+    except UnicodeEncodeError:
+        # keyword, compression flag, compression method, empty language tag and translated keyword
+        return _png_chunk(b"iTXt", keyword + b"\0\0\0\0\0" + value.encode("utf-8"))
+
+
+def write_png_text_chunks(image_path: str, text_items: dict) -> None:
+    """Insert or replace PNG text chunks without decoding the image.
+
+    Existing tEXt/zTXt/iTXt chunks with the same keywords are dropped and the
+    new chunks are written just before the first IDAT chunk, where PIL and
+    other readers expect them. All other chunks, including the image data,
+    are copied byte for byte. The file is replaced atomically.
+    """
+    new_chunks = b"".join(_png_text_chunk(str(k), str(v)) for k, v in text_items.items())
+    keywords = {str(k).encode("latin-1") for k in text_items}
+    directory = os.path.dirname(os.path.abspath(image_path))
+    fd, temp_path = tempfile.mkstemp(suffix=".png", dir=directory)
+    try:
+        with open(image_path, "rb") as src, os.fdopen(fd, "wb") as dst:
+            if src.read(8) != PNG_SIGNATURE:
+                raise ValueError(f"Not a PNG file: {image_path}")
+            dst.write(PNG_SIGNATURE)
+            inserted = False
+            while True:
+                header = src.read(8)
+                if len(header) < 8:
+                    raise ValueError(f"Truncated PNG file: {image_path}")
+                length, chunk_type = struct.unpack(">I4s", header)
+                if chunk_type in PNG_TEXT_CHUNK_TYPES:
+                    body = src.read(length + 4)
+                    if body.split(b"\0", 1)[0] in keywords:
+                        continue
+                    dst.write(header)
+                    dst.write(body)
+                    continue
+                if chunk_type == b"IDAT" and not inserted:
+                    dst.write(new_chunks)
+                    inserted = True
+                dst.write(header)
+                remaining = length + 4
+                while remaining > 0:
+                    block = src.read(min(remaining, 1 << 20))
+                    if not block:
+                        raise ValueError(f"Truncated PNG file: {image_path}")
+                    dst.write(block)
+                    remaining -= len(block)
+                if chunk_type == b"IEND":
+                    break
+            if not inserted:
+                raise ValueError(f"No image data in PNG file: {image_path}")
+        # mkstemp creates the file owner-only; keep the original permissions
+        os.chmod(temp_path, os.stat(image_path).st_mode & 0o7777)
+        os.replace(temp_path, image_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
 class ImageDataExtractor:
     EXTENSIONS = Utils.IMAGE_EXTENSIONS
     CLASS_TYPE = "class_type"
@@ -30,6 +111,11 @@ class ImageDataExtractor:
     RELATED_IMAGE_KEY = "related_image"
     ORIGINAL_POSITIVE_TAGS_KEY = "SDR_OriginalPositiveTags"
     ORIGINAL_NEGATIVE_TAGS_KEY = "SDR_OriginalNegativeTags"
+    SIZE_CACHE_MAX_ENTRIES = 8192
+
+    # Shared by all instances: (path, size, mtime_ns) -> (width, height)
+    _size_cache: OrderedDict = OrderedDict()
+    _size_cache_lock = threading.Lock()
 
     def __init__(self):
         pass
@@ -39,10 +125,30 @@ class ImageDataExtractor:
         return width > 768 and height > 768
 
     def get_image_size(self, image_path):
-        image = Image.open(image_path)
-        width, height = image.size
-        image.close()
-        return (width, height)
+        """Return (width, height), cached until the file changes.
+
+        Image.open only parses the header, so no pixel data is decoded.
+        """
+        stat = os.stat(image_path)
+        key = (os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns)
+        cls = ImageDataExtractor
+        with cls._size_cache_lock:
+            size = cls._size_cache.get(key)
+            if size is not None:
+                cls._size_cache.move_to_end(key)
+                return size
+        with Image.open(image_path) as image:
+            size = image.size
+        with cls._size_cache_lock:
+            cls._size_cache[key] = size
+            while len(cls._size_cache) > cls.SIZE_CACHE_MAX_ENTRIES:
+                cls._size_cache.popitem(last=False)
+        return size
+
+    @classmethod
+    def clear_image_size_cache(cls):
+        with cls._size_cache_lock:
+            cls._size_cache.clear()
 
     def equals_resolution(self, image_path, ex_width=512, ex_height=512):
         width, height = self.get_image_size(image_path)
@@ -269,43 +375,65 @@ class ImageDataExtractor:
 
         print(f"Copied {count} images without exif.")
 
-    def add_related_image_path(self, image_path, related_image_path=""):
+    def add_text_metadata(self, image_path, text_items: dict):
+        """Write all text metadata items to the image in a single pass.
+
+        PNG files are updated in place at the chunk level without re-encoding
+        the image. Other formats fall back to a PIL re-save.
+        """
+        if not text_items:
+            return
+        with open(image_path, "rb") as f:
+            is_png = f.read(8) == PNG_SIGNATURE
+        if is_png:
+            write_png_text_chunks(image_path, text_items)
+            return
         image = Image.open(image_path)
         png_info = PngInfo()
         for k, v in image.info.items():
             png_info.add_text(str(k), str(v))
-        png_info.add_text(ImageDataExtractor.RELATED_IMAGE_KEY, str(related_image_path))
+        for k, v in text_items.items():
+            png_info.add_text(str(k), str(v))
         image.save(image_path, pnginfo=png_info)
         image.close()
+
+    def add_generation_metadata(self, image_path: str, related_image_path: str = None,
+                                original_positive_tags: str = None, original_negative_tags: str = None):
+        """Add the related image path and original prompt decomposition in one write."""
+        text_items = {}
+        if related_image_path is not None:
+            text_items[ImageDataExtractor.RELATED_IMAGE_KEY] = str(related_image_path)
+        if original_positive_tags is not None:
+            text_items[ImageDataExtractor.ORIGINAL_POSITIVE_TAGS_KEY] = str(original_positive_tags)
+        if original_negative_tags is not None:
+            text_items[ImageDataExtractor.ORIGINAL_NEGATIVE_TAGS_KEY] = str(original_negative_tags)
+        try:
+            self.add_text_metadata(image_path, text_items)
+            if config.debug and text_items:
+                print(f"Added generation metadata to EXIF: {image_path}")
+        except Exception as e:
+            print(f"Failed to add generation metadata to EXIF for {image_path}: {e}")
+
+    def add_related_image_path(self, image_path, related_image_path=""):
+        self.add_text_metadata(image_path, {ImageDataExtractor.RELATED_IMAGE_KEY: str(related_image_path)})
         if config.debug:
             print("Added related image path: " + related_image_path)
 
     def add_prompt_decomposition_to_exif(self, image_path: str, original_positive_tags: str = None, original_negative_tags: str = None):
         """Add original prompt decomposition to EXIF data of the generated image."""
         try:
-            image = Image.open(image_path)
-            png_info = PngInfo()
-            
-            # Copy existing EXIF data
-            for k, v in image.info.items():
-                png_info.add_text(str(k), str(v))
-            
-            # Add original prompt decomposition
+            text_items = {}
             if original_positive_tags is not None:
-                png_info.add_text(ImageDataExtractor.ORIGINAL_POSITIVE_TAGS_KEY, str(original_positive_tags))
+                text_items[ImageDataExtractor.ORIGINAL_POSITIVE_TAGS_KEY] = str(original_positive_tags)
             if original_negative_tags is not None:
-                png_info.add_text(ImageDataExtractor.ORIGINAL_NEGATIVE_TAGS_KEY, str(original_negative_tags))
-            
-            # Save with updated EXIF data
-            image.save(image_path, pnginfo=png_info)
-            image.close()
+                text_items[ImageDataExtractor.ORIGINAL_NEGATIVE_TAGS_KEY] = str(original_negative_tags)
+            self.add_text_metadata(image_path, text_items)
             
             if config.debug:
                 print(f"Added original prompt decomposition to EXIF: {image_path}")
         except Exception as e:
             print(f"Failed to add prompt decomposition to EXIF for {image_path}: {e}")
 
-
 def main():
     image_data_extractor = ImageDataExtractor()
 
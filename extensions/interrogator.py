@@ -1,7 +1,9 @@
 from collections import defaultdict
 from enum import Enum
 import glob
-import pyjson5
+import hashlib
+from itertools import islice
+import json
 import os
 import time
 
@@ -61,6 +63,8 @@ class ImageData:
 class Interrogator:
     IMG_TEMPS_DIR = config.img_temps_dir
     DEFAULT_ANSWER_TYPE = AnswerType.YES_NO
+    IMAGE_BATCH_SIZE = 8
+    CHECKPOINT_FILENAME = ".interrogator_session.json"
     allowed_extensions = Utils.IMAGE_EXTENSIONS
 
     def __init__(self, directory="."):
@@ -69,32 +73,77 @@ class Interrogator:
         self.blip_model = WAS_BLIP_Model_Loader().blip_model(self.mode)[0]
         self.analyze_image = WAS_BLIP_Analyze_Image()
         self.questions = {}
-        self.image_data = defaultdict(list)
+        # state -> {path: ImageData}; dicts keep gather order and make moving an image between states O(1)
+        self.image_data = defaultdict(dict)
         self.overridden_answer_types = {}
+        self.checkpoint_path = os.path.join(directory, Interrogator.CHECKPOINT_FILENAME)
 
-    def gather_images(self, state=State.UNSEEN):
+    def gather_images(self, state=State.UNSEEN, resume=True):
+        """Collect the directory's images into the given state.
+
+        With resume, images recorded in the session checkpoint get back the state
+        and answers they had when the previous sort stopped. Set the questions
+        and answer type overrides first: a checkpoint saved for different ones
+        is discarded.
+        """
+        checkpoint = self.load_checkpoint() if resume else {}
         for ext in Interrogator.allowed_extensions:
             for file_path in sorted(glob.glob(os.path.join(self.directory, "*" + ext))):
-                self.image_data[state].append(ImageData(file_path))
+                image_data = ImageData(file_path)
+                saved = checkpoint.get(os.path.basename(file_path))
+                if saved is not None:
+                    image_data.state = saved[0]
+                    image_data.categories = saved[1]
+                else:
+                    image_data.state = state
+                self.image_data[image_data.state][file_path] = image_data
+        if checkpoint:
+            print(f"Resumed {len(checkpoint)} images from {self.checkpoint_path}")
 
     def override_answer_types(self, answer_type, categories):
         for category in categories:
             self.overridden_answer_types[category] = answer_type
 
     def interrogate(self, image_data):
-        for category, question in self.questions.items():
-            answer = self.analyze_image.blip_caption_image(image_data.path, self.mode, question, blip_model=self.blip_model)
-            print(f"Question: \"{question}\" - Answer \"{answer[0]}\"")
-            answer_type = self.overridden_answer_types[category] if category in self.overridden_answer_types else Interrogator.DEFAULT_ANSWER_TYPE
-            routing_func = ImageData.get_lambda_for_category(category, answer_type=answer_type)
-            routing_func(image_data, answer[0])
+        self.interrogate_images([image_data])
+
+    def interrogate_images(self, image_data_list):
+        """Answer all questions for the images, IMAGE_BATCH_SIZE images per vision encoder pass.
+
+        Each image is read and encoded once no matter how many questions there are.
+        """
+        categories = list(self.questions.keys())
+        questions = list(self.questions.values())
+        if not questions:
+            return
+        for start in range(0, len(image_data_list), Interrogator.IMAGE_BATCH_SIZE):
+            batch = image_data_list[start:start + Interrogator.IMAGE_BATCH_SIZE]
+            try:
+                all_answers = self.analyze_image.blip_answer_questions(
+                    [image_data.path for image_data in batch], questions, self.blip_model)
+            except Exception as e:
+                print(e)
+                continue
+            for image_data, answers in zip(batch, all_answers):
+                if answers is None:
+                    continue
+                print(image_data.path)
+                try:
+                    for category, question, answer in zip(categories, questions, answers):
+                        print(f"Question: \"{question}\" - Answer \"{answer}\"")
+                        answer_type = self.overridden_answer_types[category] if category in self.overridden_answer_types else Interrogator.DEFAULT_ANSWER_TYPE
+                        routing_func = ImageData.get_lambda_for_category(category, answer_type=answer_type)
+                        routing_func(image_data, answer)
+                except Exception as e:
+                    print(e)
 
     def update_state(self, old_state=State.REVIEW_BASED_ON_INITIAL_QUESTIONS, new_state=State.SEEN_AFTER_INITIAL_QUESTIONS):
-        old_state_list = self.image_data[old_state]
-        for image_data in old_state_list:
+        old_state_images = self.image_data[old_state]
+        for image_data in old_state_images.values():
             image_data.state = new_state
-        self.image_data[new_state].extend(old_state_list)
-        old_state_list.clear()
+        self.image_data[new_state].update(old_state_images)
+        old_state_images.clear()
+        self.save_checkpoint()
 
     def state_has_images_remaining(self, state=State.UNSEEN):
         if state not in self.image_data:
@@ -102,37 +151,28 @@ class Interrogator:
         return len(self.image_data[state]) > 0
 
     def interrogate_batch(self, max=100, state=State.UNSEEN, new_state=State.REVIEW_BASED_ON_INITIAL_QUESTIONS):
-        count = 0
-        to_remove = []
         state_image_data = self.image_data[state]
         new_state_image_data = self.image_data[new_state]
-        for i in range(len(state_image_data)):
-            image_data = state_image_data[i]
-            try:
-                self.interrogate(image_data)
-            except Exception as e:
-                print(e)
+        batch = list(islice(state_image_data.values(), max))
+        self.interrogate_images(batch)
+        for image_data in batch:
+            del state_image_data[image_data.path]
             image_data.state = new_state
-            to_remove.append(image_data)
-            new_state_image_data.append(image_data)
-            count += 1
-            if count >= max:
-                break
-        for image_data in to_remove:
-            state_image_data.remove(image_data)
+            new_state_image_data[image_data.path] = image_data
+        self.save_checkpoint()
 
     def interrogate_all(self):
-        for image_data in self.image_data:
-            self.interrogate(image_data)
+        for image_data_dict in list(self.image_data.values()):
+            self.interrogate_images(list(image_data_dict.values()))
 
     def add_question(self, question, routing_func):
         self.questions[question] = routing_func
 
     def report(self, full=False):
-        for state, image_data_list in self.image_data.items():
-            print(f"State: {state} - Count: {len(image_data_list)}")
+        for state, image_data_dict in self.image_data.items():
+            print(f"State: {state} - Count: {len(image_data_dict)}")
             if full:
-                for image_data in image_data_list:
+                for image_data in image_data_dict.values():
                     print(image_data.path)
                     print(image_data.categories)
 
@@ -145,7 +185,7 @@ class Interrogator:
     def get_images_for_category_values(self, categories={}, state=State.REVIEW_BASED_ON_INITIAL_QUESTIONS):
         matching_images = []
         state_image_data = self.image_data[state]
-        for image_data in state_image_data:
+        for image_data in state_image_data.values():
             all_categories_match = True
             for category, value in categories.items():
                 if category not in image_data.categories or image_data.categories[category] != value:
@@ -158,7 +198,7 @@ class Interrogator:
     def get_images_for_category_values_any_true(self, categories=[], state=State.REVIEW_BASED_ON_INITIAL_QUESTIONS):
         matching_images = []
         state_image_data = self.image_data[state]
-        for image_data in state_image_data:
+        for image_data in state_image_data.values():
             for category in categories:
                 if category in image_data.categories and image_data.categories[category]:
                     print(image_data.path)
@@ -167,6 +207,31 @@ class Interrogator:
                     break
         return matching_images
 
+    def route_reviewed_images(self, folder_category_mappings, state=State.REVIEW_BASED_ON_MAIN_QUESTIONS, new_state=State.SEEN_AFTER_MAIN_QUESTIONS):
+        """Move answered images to the first folder whose categories they match, then mark them seen."""
+        moved = set()
+        for folder, categories in folder_category_mappings.items():
+            images = [image for image in self.get_images_yes_for_categories(categories, state=state) if image not in moved]
+            self.move_images(images, folder, state=state)
+            moved.update(images)
+        self.update_state(old_state=state, new_state=new_state)
+
+    def sort_by_main_questions(self, folder_category_mappings, max=10, delay_seconds=10):
+        """Interrogate and route every image waiting for the main questions.
+
+        Images restored from an interrupted session after being answered but
+        before being routed are routed first. The checkpoint is cleared once
+        every image has been sorted.
+        """
+        if self.image_data[State.REVIEW_BASED_ON_MAIN_QUESTIONS]:
+            self.route_reviewed_images(folder_category_mappings)
+        while self.image_data[State.SEEN_AFTER_INITIAL_QUESTIONS]:
+            self.interrogate_batch(max=max, state=State.SEEN_AFTER_INITIAL_QUESTIONS, new_state=State.REVIEW_BASED_ON_MAIN_QUESTIONS)
+            self.route_reviewed_images(folder_category_mappings)
+            self.report()
+            time.sleep(delay_seconds)
+        self.clear_checkpoint()
+
     def move_images(self, images, relative_dir, state=State.REVIEW_BASED_ON_INITIAL_QUESTIONS, remove_from_image_data=False):
         for image in images:
             base_dir = os.path.join(Interrogator.IMG_TEMPS_DIR, relative_dir)
@@ -176,14 +241,59 @@ class Interrogator:
             print(f"Moved image file {basename} to {relative_dir}")
         if remove_from_image_data:
             state_image_data = self.image_data[state]
-            for i in range(len(state_image_data) - 1, -1, -1):
-                image_data = state_image_data[i]
-                if image_data.path in images:
-                    del state_image_data[i]
+            for image in images:
+                state_image_data.pop(image, None)
+        self.save_checkpoint()
+
+    def questions_hash(self):
+        answer_types = {category: answer_type.name for category, answer_type in self.overridden_answer_types.items()}
+        payload = json.dumps({"questions": self.questions, "answer_types": answer_types}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def load_checkpoint(self):
+        """Return {basename: (state, categories)} from the session checkpoint, if any.
+
+        A checkpoint whose answers came from other questions is ignored.
+        """
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("questions_hash") != self.questions_hash():
+                print(f"Ignoring interrogator checkpoint {self.checkpoint_path}: the questions have changed")
+                return {}
+            return {name: (State[entry["state"]], entry["categories"]) for name, entry in data["images"].items()}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Ignoring unreadable interrogator checkpoint {self.checkpoint_path}: {e}")
+            return {}
+
+    def save_checkpoint(self):
+        images = {}
+        for state, image_data_dict in self.image_data.items():
+            if state == State.UNSEEN:
+                continue
+            for image_data in image_data_dict.values():
+                if os.path.exists(image_data.path):
+                    images[os.path.basename(image_data.path)] = {"state": state.name, "categories": image_data.categories}
+        temp_path = self.checkpoint_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"questions_hash": self.questions_hash(), "images": images}, f)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def clear_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
 
 
 def main():
+    import pyjson5  # Only needed to read the question files
+
     interrogator = Interrogator(config.interrogator_interrogation_dir)
+    # Main questions are set before gathering so a resumed checkpoint is checked against them
+    main_questions = pyjson5.load(open(config.interrogator_questions_file, "r"))
+    interrogator.questions = main_questions
+    folder_category_mappings = pyjson5.load(open(config.interrogator_folder_category_mappings_file, "r"))
     interrogator.gather_images()
     interrogator.report()
 
@@ -205,15 +315,8 @@ def main():
 
     # Main questions
 
-    interrogator.questions = pyjson5.load(open(config.interrogator_questions_file, "r"))
-    folder_category_mappings = pyjson5.load(open(config.interrogator_folder_category_mappings_file, "r"))
-    while interrogator.state_has_images_remaining(State.SEEN_AFTER_INITIAL_QUESTIONS):
-        interrogator.interrogate_batch(max=10, state=State.SEEN_AFTER_INITIAL_QUESTIONS, new_state=State.REVIEW_BASED_ON_MAIN_QUESTIONS)
-        for folder, categories in folder_category_mappings.items():
-            interrogator.move_images(interrogator.get_images_yes_for_categories(categories, state=State.REVIEW_BASED_ON_MAIN_QUESTIONS), folder, state=State.REVIEW_BASED_ON_MAIN_QUESTIONS)
-        interrogator.update_state(old_state=State.REVIEW_BASED_ON_MAIN_QUESTIONS, new_state=State.SEEN_AFTER_MAIN_QUESTIONS)
-        interrogator.report()
-        time.sleep(10)
+    interrogator.questions = main_questions
+    interrogator.sort_by_main_questions(folder_category_mappings, max=10)
 
 
 if __name__ == "__main__":
@@ -1,14 +1,18 @@
 """General LLM interface using Ollama."""
 
 from dataclasses import dataclass
+import http.client
 import json
 import random
+import socket
 import threading
 import time
-from typing import Optional, List
-from urllib import request
+from typing import Iterator, Optional, List
+from urllib.parse import urlsplit
+import weakref
 
 # from utils.logging_setup import get_logger
+from utils import similarity
 from utils.utils import Utils
 
 # logger = get_logger(__name__)
@@ -70,10 +74,11 @@ class LLMResult:
             json_obj = json.loads(json_str)
             assert(isinstance(json_obj, dict))
             if attr_name not in json_obj:
-                for key in json_obj.keys():
-                    if Utils.is_similar_strings(attr_name, key):
-                        self.response = json_obj[key]
-                        return self
+                keys = list(json_obj.keys())
+                similar = similarity.find_similar(attr_name, keys)
+                if similar:
+                    self.response = json_obj[keys[similar[0]]]
+                    return self
             self.response = json_obj[attr_name]
             return self
         except Exception as e:
@@ -81,29 +86,86 @@ class LLMResult:
             return None
 
 
+@dataclass
+class LLMStreamStats:
+    """Timing of a streamed LLM response, measured on the client."""
+    time_to_first_token: Optional[float]  # seconds from request to first token, None if no tokens
+    token_count: int
+    elapsed: float  # seconds from request to end of stream
+    stop_reason: str  # "done", "stop", "length" or "cancelled"
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Generation rate after the first token arrived."""
+        if self.time_to_first_token is None or self.token_count < 2:
+            return 0.0
+        generation_time = self.elapsed - self.time_to_first_token
+        return (self.token_count - 1) / generation_time if generation_time > 0 else 0.0
+
+
+class _StreamWatchdog:
+    """Single background thread that cancels streams whose run context asks to skip.
+
+    Reads on a streaming connection block, so skip requests are noticed here
+    and the stream is unblocked by closing its socket.
+    """
+    _streams = weakref.WeakSet()
+    _lock = threading.Lock()
+    _thread = None
+
+    @classmethod
+    def watch(cls, llm: "LLM") -> None:
+        with cls._lock:
+            cls._streams.add(llm)
+            if cls._thread is None or not cls._thread.is_alive():
+                cls._thread = threading.Thread(target=cls._run, daemon=True, name="LLMStreamWatchdog")
+                cls._thread.start()
+
+    @classmethod
+    def unwatch(cls, llm: "LLM") -> None:
+        with cls._lock:
+            cls._streams.discard(llm)
+
+    @classmethod
+    def _run(cls) -> None:
+        while True:
+            time.sleep(LLM.CHECK_INTERVAL)
+            with cls._lock:
+                streams = list(cls._streams)
+            for llm in streams:
+                try:
+                    if llm.run_context is not None and llm.run_context.should_skip():
+                        print("Cancelling LLM generation due to skip request")
+                        llm.cancel_generation()
+                except Exception as e:
+                    print(f"ERROR: LLM stream watchdog failed: {e}")
+
+
 class LLM:
     """
     Interface for interacting with the Ollama LLM API.
-    
-    TODO: Consider implementing redundancy elimination during response generation.
-    This would require:
-    1. Setting up streaming responses from the LLM
-    2. Checking each chunk as it arrives
-    3. Short-circuiting response generation if redundancy is detected
-    4. This would save both processing time and API costs
+
+    Responses are streamed over a persistent HTTP connection, which is reused
+    across requests while the server keeps it alive. Tokens can be consumed as
+    they arrive with stream_response(), and a stream can be cut short by a
+    stop string, a token limit or cancellation.
     """
     ENDPOINT = "http://localhost:11434/api/generate"
     DEFAULT_TIMEOUT = 180
     DEFAULT_SYSTEM_PROMPT_DROP_RATE = 0.9  # 90% chance to drop system prompt
     CHECK_INTERVAL = 0.1  # How often to check for cancellation
 
-    def __init__(self, model_name="deepseek-r1:14b", run_context=None):
+    def __init__(self, model_name="deepseek-r1:14b", run_context=None, endpoint=None):
         self.model_name = model_name
         self.run_context = run_context
+        self.endpoint = endpoint or LLM.ENDPOINT
         self._cancelled = False
+        self._cancel_event = None
         self._result = None
-        self._exception = None
-        self._thread = None
+        self._connection = None
+        self._connection_timeout = None
+        self._request_lock = threading.Lock()
+        self.last_stream_stats: Optional[LLMStreamStats] = None
         self.failure_count = 0  # Track consecutive LLM failures
         print(f"Using LLM model: {self.model_name}")
 
@@ -127,49 +189,210 @@ class LLM:
             return self.generate_json_get_value(query, json_key, timeout=timeout, context=context, system_prompt=system_prompt, system_prompt_drop_rate=system_prompt_drop_rate)
         return self.generate_response_async(query, timeout=timeout, context=context, system_prompt=system_prompt, system_prompt_drop_rate=system_prompt_drop_rate)
 
-    def generate_response(self, query, timeout=DEFAULT_TIMEOUT, context=None, system_prompt=None, system_prompt_drop_rate=DEFAULT_SYSTEM_PROMPT_DROP_RATE):
-        """Generate a response from the LLM."""
-        print(f"LLM.generate_response called with query length: {len(query)}")
-        query = self._sanitize_query(query)
-        timeout = self._get_timeout(timeout)
-        print(f"Asking LLM {self.model_name}:\n{query}")
+    def _build_request_data(self, query, context=None, system_prompt=None, system_prompt_drop_rate=DEFAULT_SYSTEM_PROMPT_DROP_RATE,
+                            stop=None, max_tokens=None):
         data = {
             "model": self.model_name,
             "prompt": query,
-            "stream": False,
-            # "options": { # TODO enable more options for LLM queries
-            #     "temperature": 0.7,
-            #     "top_p": 0.9,
-            #     "num_predict": 1024,
-            #     "stop": ["</s>", "EOL"],
-            #     "num_ctx": 4096,
-            #     "timeout": timeout * 1000  # Convert to milliseconds
-            # }
+            "stream": True,
         }
-        
+        options = {}
+        if stop:
+            options["stop"] = list(stop)
+        if max_tokens is not None:
+            options["num_predict"] = int(max_tokens)
+        if options:
+            data["options"] = options
+
         if context is not None:
             data["context"] = context
             print(f"Adding context to LLM request, length: {len(context)}")
-            
+
         # Randomly decide whether to include system prompt
         if system_prompt is not None and random.random() > system_prompt_drop_rate:
             data["system"] = system_prompt
             print("Including system prompt in LLM request")
         elif system_prompt is not None:
             print("Dropping system prompt from LLM request")
-            
-        req = request.Request(
-            LLM.ENDPOINT,
-            headers={"Content-Type": "application/json"},
-            data=json.dumps(data).encode("utf-8"),
-        )
+        return data
+
+    def _get_connection(self, timeout) -> http.client.HTTPConnection:
+        if self._connection is not None and self._connection_timeout == timeout:
+            return self._connection
+        self._close_connection()
+        parts = urlsplit(self.endpoint)
+        connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._connection = connection_class(parts.hostname, parts.port, timeout=timeout)
+        self._connection_timeout = timeout
+        return self._connection
+
+    def _close_connection(self) -> None:
+        connection = self._connection
+        self._connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _open_stream(self, data, timeout) -> http.client.HTTPResponse:
+        """POST the request, reconnecting once if the kept-alive connection went stale."""
+        parts = urlsplit(self.endpoint)
+        path = parts.path or "/"
+        body = json.dumps(data).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        for attempt in range(2):
+            reused = self._connection is not None
+            connection = self._get_connection(timeout)
+            try:
+                connection.request("POST", path, body=body, headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError, http.client.CannotSendRequest):
+                self._close_connection()
+                if reused and attempt == 0:
+                    continue
+                raise
+            if response.status != 200:
+                error_text = response.read().decode("utf-8", errors="replace")
+                raise LLMResponseException(f"LLM request failed with HTTP {response.status}: {error_text}")
+            return response
+        raise LLMResponseException("Failed to connect to LLM")
+
+    def _should_cancel(self) -> bool:
+        if self._cancelled:
+            return True
+        return self._cancel_event is not None and self._cancel_event.is_set()
+
+    def stream_response(self, query, timeout=DEFAULT_TIMEOUT, context=None, system_prompt=None,
+                        system_prompt_drop_rate=DEFAULT_SYSTEM_PROMPT_DROP_RATE,
+                        stop: Optional[List[str]] = None, max_tokens: Optional[int] = None,
+                        cancel_event: Optional[threading.Event] = None) -> Iterator[str]:
+        """Yield response text as it is generated.
+
+        Generation ends early at the first of the *stop* strings (not included
+        in the output), after *max_tokens* tokens, or when cancelled through
+        *cancel_event*, cancel_generation() or the run context. When the
+        stream ends, last_stream_stats and the result of generate_response are
+        available on this instance.
+        """
+        query = self._sanitize_query(query)
+        timeout = self._get_timeout(timeout)
+        data = self._build_request_data(query, context, system_prompt, system_prompt_drop_rate, stop, max_tokens)
+        stop = [s for s in (stop or []) if s]
+        hold_back = max((len(s) for s in stop), default=1) - 1
+
+        with self._request_lock:
+            self._cancelled = False
+            self._cancel_event = cancel_event
+            self._result = None
+            self.last_stream_stats = None
+            if self.run_context is not None:
+                _StreamWatchdog.watch(self)
+            start_time = time.monotonic()
+            first_token_time = None
+            token_count = 0
+            text = ""
+            emitted = 0
+            final_chunk = {}
+            stop_reason = "done"
+            reusable = False
+            try:
+                print(f"Asking LLM {self.model_name}:\n{query}")
+                response = self._open_stream(data, timeout)
+                while True:
+                    if self._should_cancel():
+                        stop_reason = "cancelled"
+                        break
+                    try:
+                        line = response.readline()
+                    except (OSError, ValueError, AttributeError):
+                        # The socket was closed by cancel_generation
+                        if self._should_cancel():
+                            stop_reason = "cancelled"
+                            break
+                        raise
+                    if not line:
+                        if self._should_cancel():
+                            stop_reason = "cancelled"
+                            break
+                        raise LLMResponseException("LLM stream ended before completion")
+                    line = line.strip()
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise LLMResponseException(f"LLM error: {chunk['error']}")
+                    token = chunk.get("response", "")
+                    if token:
+                        if first_token_time is None:
+                            first_token_time = time.monotonic()
+                        token_count += 1
+                        text += token
+                        stop_index = -1
+                        for s in stop:
+                            index = text.find(s, max(0, emitted - hold_back))
+                            if index != -1 and (stop_index == -1 or index < stop_index):
+                                stop_index = index
+                        if stop_index != -1:
+                            text = text[:stop_index]
+                            stop_reason = "stop"
+                        safe_end = len(text) if stop_reason == "stop" else len(text) - hold_back
+                        if safe_end > emitted:
+                            yield text[emitted:safe_end]
+                            emitted = safe_end
+                        if stop_reason == "stop":
+                            break
+                    if chunk.get("done", False):
+                        final_chunk = chunk
+                        reusable = True
+                        break
+                    if max_tokens is not None and token_count >= max_tokens:
+                        stop_reason = "length"
+                        break
+                if stop_reason in ("done", "length") and len(text) > emitted:
+                    yield text[emitted:]
+                    emitted = len(text)
+                if reusable:
+                    # Drain the chunked terminator so the connection can be reused
+                    response.read()
+            finally:
+                if not reusable:
+                    self._close_connection()
+                if self.run_context is not None:
+                    _StreamWatchdog.unwatch(self)
+                elapsed = time.monotonic() - start_time
+                self.last_stream_stats = LLMStreamStats(
+                    time_to_first_token=None if first_token_time is None else first_token_time - start_time,
+                    token_count=token_count,
+                    elapsed=elapsed,
+                    stop_reason=stop_reason,
+                )
+                result = LLMResult.from_json(final_chunk, context_provided=context is not None)
+                result.response = text
+                result.done = stop_reason != "cancelled"
+                if stop_reason != "done":
+                    result.done_reason = stop_reason
+                self._result = result if stop_reason != "cancelled" else None
+                self._cancel_event = None
+
+    def generate_response(self, query, timeout=DEFAULT_TIMEOUT, context=None, system_prompt=None,
+                          system_prompt_drop_rate=DEFAULT_SYSTEM_PROMPT_DROP_RATE,
+                          stop=None, max_tokens=None, cancel_event=None) -> Optional[LLMResult]:
+        """Generate a complete response from the LLM. Returns None if cancelled."""
+        print(f"LLM.generate_response called with query length: {len(query)}")
         try:
-            print("Making LLM request...")
-            response = request.urlopen(req, timeout=timeout).read().decode("utf-8")
-            resp_json = json.loads(response)
-            result = LLMResult.from_json(resp_json, context_provided=context is not None)
+            for _token in self.stream_response(query, timeout=timeout, context=context, system_prompt=system_prompt,
+                                               system_prompt_drop_rate=system_prompt_drop_rate,
+                                               stop=stop, max_tokens=max_tokens, cancel_event=cancel_event):
+                pass
+            result = self._result
+            if result is None:
+                print("LLM generation cancelled before completion")
+                return None
             result.response = self._clean_response_for_models(result.response)
-            print(f"LLM response received, length: {len(result.response)}")
+            stats = self.last_stream_stats
+            print(f"LLM response received, length: {len(result.response)}, "
+                  f"first token after {stats.time_to_first_token or 0:.2f}s, {stats.tokens_per_second:.1f} tokens/s")
             if result.validate():
                 # Reset LLM failure count on success
                 self.reset_failure_count()
@@ -182,57 +405,13 @@ class LLM:
             raise LLMResponseException(f"Failed to generate LLM response: {e}")
 
     def generate_response_async(self, query, timeout=DEFAULT_TIMEOUT, context=None, system_prompt=None, system_prompt_drop_rate=DEFAULT_SYSTEM_PROMPT_DROP_RATE):
-        """Generate a response from the LLM in a separate thread with cancellation support."""
-        print(f"LLM.generate_response_async called with query length: {len(query)}")
-        self._cancelled = False
-        self._result = None
-        self._exception = None
-        self._thread = None
+        """Generate a response with cancellation support. Returns None if cancelled.
 
-        def run_generation():
-            try:
-                print("Starting LLM generation in thread")
-                result = self.generate_response(query, timeout, context, system_prompt, system_prompt_drop_rate)
-                if not self._cancelled:
-                    self._result = result
-                    print("LLM generation completed successfully")
-                else:
-                    print("LLM generation cancelled before completion")
-            except Exception as e:
-                self._exception = e
-                print(f"ERROR: Exception in LLM generation thread: {e}")
-
-        # Start the generation in a separate thread
-        self._thread = threading.Thread(target=run_generation)
-        self._thread.daemon = True  # Make it a daemon thread so it won't prevent program exit
-        self._thread.start()
-        print("LLM generation thread started")
-
-        # Wait for completion or cancellation
-        try:
-            while self._thread and self._thread.is_alive():
-                if self.run_context and self.run_context.should_skip():
-                    print("Cancelling LLM generation due to skip request")
-                    self._cancelled = True
-                    # Give the thread a moment to clean up
-                    self._thread.join(timeout=1.0)
-                    if self._thread.is_alive():
-                        print("ERROR: Thread did not terminate gracefully, forcing cleanup")
-                    self._thread = None  # Force cleanup even if thread is still alive
-                    return None
-                time.sleep(self.CHECK_INTERVAL)
-        except Exception as e:
-            self._exception = e
-            print(f"ERROR: Exception while monitoring LLM thread: {e}")
-        finally:
-            self._thread = None  # Clean up thread reference when done
-
-        # Handle the result
-        if self._exception:
-            print(f"ERROR: Failed to generate LLM response: {self._exception}")
-            raise LLMResponseException(f"Failed to generate LLM response: {self._exception}")
-        
-        return self._result
+        Streaming makes a worker thread unnecessary: cancellation is checked
+        between tokens and a blocked read is interrupted by cancel_generation.
+        """
+        return self.generate_response(query, timeout=timeout, context=context, system_prompt=system_prompt,
+                                      system_prompt_drop_rate=system_prompt_drop_rate)
 
     def generate_json_get_value(self, query, json_key, timeout=DEFAULT_TIMEOUT, context=None, system_prompt=None, system_prompt_drop_rate=DEFAULT_SYSTEM_PROMPT_DROP_RATE):
         """Generate a response and extract a specific JSON value."""
@@ -301,19 +480,27 @@ class LLM:
         return timeout
 
     def cancel_generation(self):
-        """Cancel any ongoing LLM generation."""
-        print("Cancelling LLM generation")
-        if self._thread and self._thread.is_alive():
-            self._cancelled = True
-            self._thread.join(timeout=1.0)
-            if self._thread.is_alive():
-                print("ERROR: Thread did not terminate gracefully, forcing cleanup")
-            self._thread = None  # Force cleanup even if thread is still alive
+        """Cancel any ongoing LLM generation. Safe to call from another thread."""
+        self._cancelled = True
+        connection = self._connection
+        if connection is not None and connection.sock is not None:
+            print("Cancelling LLM generation")
+            try:
+                # Unblocks a read waiting on the server; the stream then closes the connection
+                connection.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def close(self):
+        """Close the kept-alive connection."""
+        self._close_connection()
 
     def __del__(self):
         """Ensure cleanup on object destruction."""
-        self.cancel_generation()
-
+        try:
+            self._close_connection()
+        except Exception:
+            pass
 
 if __name__ == "__main__":
     llm = LLM()
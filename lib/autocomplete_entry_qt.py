@@ -4,7 +4,11 @@ Autocomplete QLineEdit for PySide6.
 Provides a text entry with a dropdown completion list that supports custom
 matching and selection functions.  This enables multi-tag autocomplete (e.g.
 comma- or plus-separated values) when the caller supplies appropriate 
-*matches_function* and *set_function* callbacks.
+*query_function* (or *matches_function*) and *set_function* callbacks.
+
+Completions are looked up through a :class:`lib.completion_index.CompletionIndex`
+built once per :meth:`AutocompleteEntry.set_autocomplete_list` call, and
+keystrokes are debounced, so large completion lists do not slow down typing.
 
 Modified from source: https://gist.github.com/uroshekic/11078820
 """
@@ -16,6 +20,8 @@ from PySide6.QtCore import Qt, QPoint, QTimer
 from PySide6.QtGui import QFocusEvent
 
 from lib.aware_entry_qt import AwareEntry
+from lib.completion_index import CompletionIndex
+from lib.debounce_qt import QtDebouncer
 
 
 def default_matches(field_value: str, ac_list_entry: str) -> bool:
@@ -38,16 +44,26 @@ class AutocompleteEntry(AwareEntry):
     listbox_length : int
         Maximum number of visible rows in the popup (default ``8``).
     matches_function : callable | None
-        ``(field_value, ac_list_entry) -> bool``.  Called for each item
-        in *autocomplete_list* to decide whether it matches the current
-        text.  Defaults to case-insensitive substring matching.  For
-        multi-tag fields the caller can split on a separator and match
-        only the rightmost segment.
+        ``(field_value, ac_list_entry) -> bool``.  Legacy matcher called
+        for each item in *autocomplete_list*.  When given without a
+        *query_function* the completion index is bypassed and every item
+        is tested on each keystroke.
     set_function : callable | None
         ``(current_value, new_value) -> str``.  Controls how a selected
         completion is merged into the current text.  Defaults to
         replacing the entire text.  For multi-tag fields the caller can
         append the new value after the last separator instead.
+    query_function : callable | None
+        ``(field_value) -> str``.  Extracts the term looked up in the
+        completion index.  Defaults to the whole text.  For multi-tag
+        fields the caller can return only the rightmost segment.
+    weights : dict[str, float] | None
+        Optional ranking weights (e.g. prompt tag frequencies).  Higher
+        weights are listed first among equally good matches.
+    max_results : int
+        Maximum number of completions shown (default ``100``).
+    debounce_seconds : float
+        Quiet period after a keystroke before the popup is refreshed.
     """
 
     def __init__(
@@ -58,12 +74,23 @@ class AutocompleteEntry(AwareEntry):
         listbox_length: int = 8,
         matches_function=None,
         set_function=None,
+        query_function=None,
+        weights: dict[str, float] | None = None,
+        max_results: int = 100,
+        debounce_seconds: float = 0.05,
     ):
         super().__init__(parent)
         self.autocomplete_list: list[str] = autocomplete_list or []
         self.listbox_length = listbox_length
         self.matches_function = matches_function or default_matches
         self.set_function = set_function or (lambda _cur, new: new)
+        self.query_function = query_function or (lambda value: value)
+        self.max_results = max_results
+        # A custom matcher without a query function cannot be served by the index.
+        self._use_index = matches_function is None or query_function is not None
+        self._weights = weights
+        self._index = CompletionIndex(self.autocomplete_list, weights)
+        self._debouncer = QtDebouncer(self, debounce_seconds, self._update_popup)
 
         self._popup: _CompletionPopup | None = None
         self._popup_visible = False
@@ -78,14 +105,21 @@ class AutocompleteEntry(AwareEntry):
     # Public helpers
     # ------------------------------------------------------------------
 
-    def set_autocomplete_list(self, items: list[str]) -> None:
-        """Replace the completion list at runtime."""
+    def set_autocomplete_list(self, items: list[str], weights: dict[str, float] | None = None) -> None:
+        """Replace the completion list at runtime and rebuild the index.
+
+        If *weights* is ``None`` the previously supplied weights are kept.
+        """
         self.autocomplete_list = items
+        if weights is not None:
+            self._weights = weights
+        self._index.build(items, self._weights)
         if self._popup_visible:
             self._refresh_popup()
 
     def close_listbox(self) -> None:
         """Programmatically dismiss the completion popup."""
+        self._debouncer.cancel()
         if self._popup is not None:
             self._popup.close()
             self._popup.deleteLater()
@@ -101,6 +135,8 @@ class AutocompleteEntry(AwareEntry):
 
     def _matching_words(self) -> list[str]:
         text = self.text()
+        if self._use_index:
+            return self._index.query(self.query_function(text), self.max_results)
         return [w for w in self.autocomplete_list if self.matches_function(text, w)]
 
     def _on_text_changed(self, text: str) -> None:
@@ -109,6 +145,12 @@ class AutocompleteEntry(AwareEntry):
         if not text:
             self.close_listbox()
             return
+        self._debouncer.schedule()
+
+    def _update_popup(self) -> None:
+        if not self.text():
+            self.close_listbox()
+            return
         words = self._matching_words()
         if words:
             self._show_popup(words)
@@ -0,0 +1,144 @@
+"""
+Ranked completion lookup for autocomplete fields.
+
+:class:`CompletionIndex` is built once from a list of completions and then
+answers each keystroke without scanning the whole list:
+
+- Prefix matches come from a sorted array of lowercased keys searched with
+  ``bisect``.  This is a flattened prefix trie: every prefix maps to one
+  contiguous range of the array, without a node object per character.
+  Ranked results are memoized per prefix.
+- Substring matches (optional) come from a character n-gram index.  The
+  rarest n-gram of the query picks the candidates, which are then checked
+  with ``in``.  Queries shorter than the n-gram size scan the lowercased keys.
+
+Results are ranked prefix matches first, then by weight (e.g. prompt tag
+frequency) descending, then by original list order.
+"""
+
+from bisect import bisect_left
+import heapq
+from typing import Iterable, Optional
+
+
+class CompletionIndex:
+    """Case-insensitive prefix and substring index over a list of strings.
+
+    Parameters
+    ----------
+    items : Iterable[str]
+        Completions to index.  Duplicates are dropped, keeping the first.
+    weights : dict[str, float] | None
+        Optional ranking weights keyed by completion.  Keys are matched
+        case-insensitively; missing completions weigh ``0``.
+    substring : bool
+        Also match the query anywhere inside a completion (default ``True``),
+        mirroring the behaviour of :func:`lib.autocomplete_entry_qt.default_matches`.
+    ngram_size : int
+        Length of the character n-grams used for substring lookups.
+    """
+
+    MEMO_MAX_ENTRIES = 256
+
+    def __init__(
+        self,
+        items: Iterable[str] = (),
+        weights: Optional[dict[str, float]] = None,
+        *,
+        substring: bool = True,
+        ngram_size: int = 3,
+    ):
+        self.substring = substring
+        self.ngram_size = max(1, int(ngram_size))
+        self.build(items, weights)
+
+    def build(self, items: Iterable[str], weights: Optional[dict[str, float]] = None) -> None:
+        """(Re)build the index from *items*, ranked by optional *weights*."""
+        lowered_weights = {}
+        if weights:
+            for key, weight in weights.items():
+                lowered = str(key).lower()
+                lowered_weights[lowered] = max(lowered_weights.get(lowered, 0), weight)
+
+        self._items: list[str] = []
+        self._lowered: list[str] = []
+        seen = set()
+        for item in items:
+            item = str(item)
+            if item in seen:
+                continue
+            seen.add(item)
+            self._items.append(item)
+            self._lowered.append(item.lower())
+
+        # Rank key per item id: higher weight first, then original order.
+        self._rank = [(-lowered_weights.get(lowered, 0), i) for i, lowered in enumerate(self._lowered)]
+
+        self._sorted_ids = sorted(range(len(self._items)), key=lambda i: (self._lowered[i], i))
+        self._sorted_keys = [self._lowered[i] for i in self._sorted_ids]
+
+        self._ngrams: dict[str, list[int]] = {}
+        if self.substring:
+            n = self.ngram_size
+            for i, lowered in enumerate(self._lowered):
+                for gram in {lowered[j:j + n] for j in range(len(lowered) - n + 1)}:
+                    self._ngrams.setdefault(gram, []).append(i)
+
+        self._memo: dict[tuple[str, Optional[int]], list[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def query(self, text: str, limit: Optional[int] = None) -> list[str]:
+        """Return up to *limit* completions matching *text*, best first."""
+        term = (text or "").lower()
+        if not term:
+            return []
+        memo_key = (term, limit)
+        cached = self._memo.get(memo_key)
+        if cached is not None:
+            return list(cached)
+
+        prefix_ids = self._prefix_ids(term)
+        results = self._top(prefix_ids, limit)
+        if self.substring and (limit is None or len(results) < limit):
+            prefix_set = set(prefix_ids)
+            others = [i for i in self._substring_ids(term) if i not in prefix_set]
+            remaining = None if limit is None else limit - len(results)
+            results.extend(self._top(others, remaining))
+
+        words = [self._items[i] for i in results]
+        if len(self._memo) >= CompletionIndex.MEMO_MAX_ENTRIES:
+            self._memo.clear()
+        self._memo[memo_key] = words
+        return list(words)
+
+    def _top(self, ids: list[int], limit: Optional[int]) -> list[int]:
+        rank = self._rank
+        if limit is None or limit >= len(ids):
+            return sorted(ids, key=rank.__getitem__)
+        return heapq.nsmallest(limit, ids, key=rank.__getitem__)
+
+    def _prefix_ids(self, term: str) -> list[int]:
+        start = bisect_left(self._sorted_keys, term)
+        # Every key sharing the prefix sorts before term + the highest code point.
+        end = bisect_left(self._sorted_keys, term + "\U0010ffff", start)
+        return self._sorted_ids[start:end]
+
+    def _substring_ids(self, term: str) -> list[int]:
+        lowered = self._lowered
+        n = self.ngram_size
+        if len(term) < n:
+            return [i for i, key in enumerate(lowered) if term in key]
+        postings = None
+        for j in range(len(term) - n + 1):
+            posting = self._ngrams.get(term[j:j + n])
+            if posting is None:
+                return []
+            if postings is None or len(posting) < len(postings):
+                postings = posting
+        return [i for i in postings if term in lowered[i]]
@@ -75,6 +75,7 @@ import argparse
 import mmap
 import re
 import json
+import struct
 import pprint
 import collections
 
@@ -84,6 +85,12 @@ import collections
 #
 FAIL, BOLD, ENDC = '\033[91m', '\033[1m', '\033[0m'
 
+# .safetensors FILES START WITH A LITTLE-ENDIAN u64 LENGTH, THEN A JSON HEADER OF THAT LENGTH
+# HOLDING ALL METADATA (INCLUDING TAGS) BEFORE THE TENSOR DATA
+SAFETENSORS_HEADER_PREFIX   = 8
+SAFETENSORS_MAX_HEADER_SIZE = 100 * 1024 * 1024     # LIMIT SET BY THE FORMAT
+TAG_FREQUENCY_KEYS          = ("ss_tag_frequency", "tag_frequency")
+
 
 #
 # SEARCH FOR ANY TAG DATA IN LoRA
@@ -193,44 +200,52 @@ def search_lora_for_tags_B(lora_name, start_markers):
 def search_lora_for_tags_C(lora_name, start_markers, search_from):
     # SEARCHING FILE AS MEMORY-EFFICIENT DATA BYTE ARRAY
     with open(lora_name, "rb") as f_in, mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as s:
-        for s_m in start_markers:
-            # GET START OF TAG DATA
-            data_nr_startat = s.find(s_m, search_from)
+        return search_data_for_tags_C(s, start_markers, search_from, len(s))
+
+
+#
+# AS search_lora_for_tags_C BUT ON AN ALREADY OPEN BYTE ARRAY (mmap OR bytes),
+# NEVER LOOKING PAST search_to SO THE SEARCH STAYS WITHIN THE HEADER
+#
+def search_data_for_tags_C(s, start_markers, search_from, search_to):
+    for s_m in start_markers:
+        # GET START OF TAG DATA
+        data_nr_startat = s.find(s_m, search_from, search_to)
+        if data_nr_startat != -1:
+            # POSITION POINTS TO START OF START MARKER SO MOVE IT TO JUST AFTER START MARKER
+            data_nr_startat += len(s_m)
+
+            # FIND REAL START OF NONSENSE, BEGIN SEARCH AFTER KNOWN NR START POSITION
+            data_nr_startat = s.find(b'{', data_nr_startat, search_to)
             if data_nr_startat != -1:
-                # POSITION POINTS TO START OF START MARKER SO MOVE IT TO JUST AFTER START MARKER
-                data_nr_startat += len(s_m)
-
-                # FIND REAL START OF NONSENSE, BEGIN SEARCH AFTER KNOWN NR START POSITION
-                data_nr_startat = s.find(b'{', data_nr_startat)
-                if data_nr_startat != -1:
-                    # POSITION POINTS TO FIRST OPEN CURLY-BRACKET, A SINGLE CHARACTER AROUND NONSENSE PRECEDING DATA,
-                    # SO START SEARCH PAST IT
-                    data_nr_startat += 1
-
-                    # SKIP NONSENSE TO FIND REAL START OF DATA, BEGIN SEARCH AFTER KNOWN NR START POSITION
-                    data_startat = s.find(b'{', data_nr_startat)
-                    if data_startat != -1:
-                        # POSITION POINTS TO SECOND OPEN CURLY-BRACKET AT START OF DATA,
-                        # PRESERVING CURLY-BRACKETS AROUND DATA
+                # POSITION POINTS TO FIRST OPEN CURLY-BRACKET, A SINGLE CHARACTER AROUND NONSENSE PRECEDING DATA,
+                # SO START SEARCH PAST IT
+                data_nr_startat += 1
+
+                # SKIP NONSENSE TO FIND REAL START OF DATA, BEGIN SEARCH AFTER KNOWN NR START POSITION
+                data_startat = s.find(b'{', data_nr_startat, search_to)
+                if data_startat != -1:
+                    # POSITION POINTS TO SECOND OPEN CURLY-BRACKET AT START OF DATA,
+                    # PRESERVING CURLY-BRACKETS AROUND DATA
 
-                        # GET END OF TAG DATA, BEGIN SEARCH AFTER KNOWN START POSITION
-                        data_endat = s.find(b'}', data_startat)
-                        if data_endat != -1:
-                            # CALC LENGTH OF TAGS DATA
-                            #print(f"FORMAT:A; tags @ {BOLD}{data_startat}{ENDC} to {BOLD}{data_endat}{ENDC}")
+                    # GET END OF TAG DATA, BEGIN SEARCH AFTER KNOWN START POSITION
+                    data_endat = s.find(b'}', data_startat, search_to)
+                    if data_endat != -1:
+                        # CALC LENGTH OF TAGS DATA
+                        #print(f"FORMAT:A; tags @ {BOLD}{data_startat}{ENDC} to {BOLD}{data_endat}{ENDC}")
 
-                            # POSITION POINTS TO END OF END MARKER SO MOVE IT TO JUST AFTER SINGLE-CHARACTER END MARKER,
-                            # PRESERVING CURLY-BRACKETS AROUND DATA
-                            data_len = (data_endat + 1) - data_startat
-                            if data_len > 0:
-                                return data_startat,data_len
+                        # POSITION POINTS TO END OF END MARKER SO MOVE IT TO JUST AFTER SINGLE-CHARACTER END MARKER,
+                        # PRESERVING CURLY-BRACKETS AROUND DATA
+                        data_len = (data_endat + 1) - data_startat
+                        if data_len > 0:
+                            return data_startat,data_len
 
-            # NOT FOUND, TRY NEXT MARKER
+        # NOT FOUND, TRY NEXT MARKER
 
-        # EXHAUSTED ALL markers_startend AND DATA NOT FOUND
-        print(f"{FAIL}TAGS UNREADABLE USING FORMAT:C{ENDC}; \
-                 LoRA not encoded using FORMAT:C!")
-        return None,0
+    # EXHAUSTED ALL markers_startend AND DATA NOT FOUND
+    print(f"{FAIL}TAGS UNREADABLE USING FORMAT:C{ENDC}; \
+             LoRA not encoded using FORMAT:C!")
+    return None,0
 
 
 #
@@ -402,6 +417,76 @@ def parse_trigger_data(trigger_data):
     #
 
 
+#
+# READ THE METADATA OF A LoRA FROM ITS .safetensors HEADER ALONE
+#
+# RETURNS;
+# ON ERROR,   NONE (NOT A READABLE .safetensors HEADER)
+# ON SUCCESS, DICTIONARY OF METADATA, EMPTY IF THERE IS NONE
+#
+def read_safetensors_metadata(lora_name):
+    with open(lora_name, "rb") as f_in:
+        prefix = f_in.read(SAFETENSORS_HEADER_PREFIX)
+        if len(prefix) != SAFETENSORS_HEADER_PREFIX:
+            return None
+        header_len = struct.unpack("<Q", prefix)[0]
+        if header_len == 0 or header_len > SAFETENSORS_MAX_HEADER_SIZE:
+            return None
+        header = f_in.read(header_len)
+    if len(header) != header_len:
+        return None
+    try:
+        parsed_header = json.loads(header)
+    except ValueError:
+        return None
+    if not isinstance(parsed_header, dict):
+        return None
+    metadata = parsed_header.get("__metadata__") or {}
+    return metadata if isinstance(metadata, dict) else {}
+
+
+#
+# TAGS & TRIGGERS FROM THE .safetensors HEADER; NO BYTE SEARCHING
+#
+# tag_frequency METADATA IS A JSON STRING OF {"<dataset dir>": {"<trigger>": <number>, ...}, ...}
+# SO THE FIRST DATASET'S TAGS ARE USED, OR ALL OF THEM '--combine'D
+#
+# RETURNS;
+# (False, NONE)                  HEADER UNREADABLE, CALLER MAY FALL BACK TO SEARCHING BYTES
+# (True,  NONE)                  HEADER READ BUT HOLDS NO TAGS
+# (True,  dictionary of triggers) ON SUCCESS
+#
+def read_triggers_from_header(lora_name, combine=True):
+    metadata = read_safetensors_metadata(lora_name)
+    if metadata is None:
+        return False, None
+
+    for key in TAG_FREQUENCY_KEYS:
+        tag_frequency = metadata.get(key)
+        if not tag_frequency:
+            continue
+        if isinstance(tag_frequency, str):
+            try:
+                tag_frequency = json.loads(tag_frequency)
+            except ValueError:
+                # OLDER TRAINERS ESCAPED THIS BADLY; TRY THE USUAL REPAIRS
+                tag_frequency = parse_trigger_data(tag_frequency.encode("utf-8"))
+        if not isinstance(tag_frequency, dict):
+            continue
+
+        combined_trigger_dict = None
+        for trigger_dict in tag_frequency.values():
+            if not isinstance(trigger_dict, dict) or not trigger_dict:
+                continue
+            if not combine:
+                return True, trigger_dict
+            combined_trigger_dict = trigger_dict if not combined_trigger_dict else (combined_trigger_dict | trigger_dict)
+        if combined_trigger_dict:
+            return True, combined_trigger_dict
+
+    return True, None
+
+
 #
 # TEASE TAGS & TRIGGERS FROM .safetensors OF LoRA FILE TO CREATE A DICTIONARY
 #
@@ -419,8 +504,27 @@ def parse_trigger_data(trigger_data):
 # ON SUCCESS, dictionaty of tags & triggers
 #
 def read_triggers_from_lora(lora_name, args):
+    # TRY THE .safetensors HEADER FIRST; ONE SMALL READ, NO SCANNING
+    header_read, triggers = read_triggers_from_header(lora_name, args.combine)
+    if header_read:
+        if not triggers:
+            print(f"{FAIL}NO TAGS STORED IN LoRA{ENDC}; \
+                     LoRA contains {BOLD}NO TAGS{ENDC} so {BOLD}NO TRIGGER-WORDS{ENDC} & {BOLD}NO TRIGGER-PHRASES{ENDC}!")
+        return triggers
+
+    # HEADER UNREADABLE; FALL BACK TO SEARCHING THE BYTES, OPENED ONCE FOR EVERY STRATEGY
+    # AND BOUNDED TO WHERE THE HEADER WOULD BE RATHER THAN THE WHOLE (HUGE) FILE
+    with open(lora_name, "rb") as f_in, mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as s:
+        return read_triggers_from_data(s, min(len(s), SAFETENSORS_HEADER_PREFIX + SAFETENSORS_MAX_HEADER_SIZE), args)
+
+
+#
+# AS read_triggers_from_lora BUT BY SEARCHING THE RAW BYTES OF AN OPEN LoRA,
+# LOOKING NO FURTHER THAN search_to
+#
+def read_triggers_from_data(s, search_to, args):
     # DOES THE LoRA CONTAIN ANY REFERENCE TO TAGS?
-    if not search_lora_for_any_tags(lora_name):
+    if s.find(b"tag_", 0, search_to) == -1:
         # CANNOT FIND DATA IN ANY KNOWN FORMAT
         print(f"{FAIL}NO TAGS STORED IN LoRA{ENDC}; \
                  LoRA contains {BOLD}NO TAGS{ENDC} so {BOLD}NO TRIGGER-WORDS{ENDC} & {BOLD}NO TRIGGER-PHRASES{ENDC}!")
@@ -454,7 +558,7 @@ def read_triggers_from_lora(lora_name, args):
         #
 
         # READ FIRST SET OF TAGS FROM LoRA, STARTING SEARCH AT BEGINNING OF LoRA
-        tags_startat,tags_len = search_lora_for_tags_C(lora_name, markers_start, 0)
+        tags_startat,tags_len = search_data_for_tags_C(s, markers_start, 0, search_to)
         if not tags_startat or (tags_len == 0):
             # CANNOT FIND ANY DATA IN LoRA
             print(f"{FAIL}TRIGGER DATA MISSING{ENDC}; \
@@ -463,7 +567,7 @@ def read_triggers_from_lora(lora_name, args):
             return None
 
         # READ TRIGGER DATA
-        trigger_data = read_trigger_data_from_lora(format, lora_name, tags_startat, tags_len)
+        trigger_data = bytes(s[tags_startat:tags_startat + tags_len])
         if not trigger_data:
             # CANNOT FIND DATA IN ANY KNOWN FORMAT
             print(f"{FAIL}TRIGGER DATA UNREADABLE{ENDC}; \
@@ -489,13 +593,13 @@ def read_triggers_from_lora(lora_name, args):
         search_from           = 0
         while True:
             # READ SET OF TAGS FROM LoRA, STARTING SEARCH AT search_from
-            tags_startat,tags_len = search_lora_for_tags_C(lora_name, markers_start, search_from)
+            tags_startat,tags_len = search_data_for_tags_C(s, markers_start, search_from, search_to)
             if not tags_startat or (tags_len == 0):
                 #print(f"No TAG-FREQUENCY data in {BOLD}{lora_name}{ENDC} after pos({BOLD}{search_from}{ENDC})")
                 break
 
             # READ TRIGGER DATA
-            trigger_data = read_trigger_data_from_lora(format, lora_name, tags_startat, tags_len)
+            trigger_data = bytes(s[tags_startat:tags_startat + tags_len])
             if not trigger_data:
                 # CANNOT FIND DATA IN ANY KNOWN FORMAT
                 print(f"{FAIL}TRIGGER DATA UNREADABLE{ENDC}; \
@@ -25,8 +25,10 @@ __version_info__ = ('2025', '10', '04')
 
 import os
 import json
+import threading
 import time
-from typing import Optional, Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional, Dict, List, Tuple
 from dataclasses import dataclass
 
 # Module-level availability flag
@@ -63,32 +65,171 @@ class TriggerInfo:
     error_message: Optional[str] = None
 
 
+NO_TRIGGERS_MESSAGE = "No triggers found in LoRA"
+
+# Respects SD_RUNNER_CACHE_DIR like the other caches so tests can redirect it
+_DEFAULT_INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "configs")
+
+
+def _default_index_path() -> str:
+    return os.path.join(os.environ.get("SD_RUNNER_CACHE_DIR") or _DEFAULT_INDEX_DIR, "lora_trigger_index.json")
+
+
+def _lora_display_name(lora_path: str) -> str:
+    lora_name = os.path.basename(os.path.normpath(lora_path))
+    if lora_name.endswith('.safetensors'):
+        lora_name = lora_name[:-12]  # Remove .safetensors extension
+    return lora_name
+
+
+class LoRATriggerIndex:
+    """
+    Persistent index of extracted triggers, keyed by LoRA path.
+
+    Each entry records the file size and mtime it was extracted from, so an
+    entry is used only while the file is unchanged. Files that have no
+    triggers are indexed too, so they are not rescanned either.
+    """
+
+    VERSION = 1
+
+    def __init__(self, index_path: Optional[str] = None):
+        self.index_path = index_path or _default_index_path()
+        self._entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == LoRATriggerIndex.VERSION:
+                self._entries = data.get("entries", {})
+        except (OSError, ValueError, AttributeError):
+            self._entries = {}
+
+    @staticmethod
+    def _file_key(lora_path: str) -> Tuple[int, int]:
+        stat = os.stat(lora_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def get(self, lora_path: str) -> Optional[TriggerInfo]:
+        """Return the indexed TriggerInfo if the file is unchanged since it was indexed."""
+        normalized_path = os.path.normpath(lora_path)
+        with self._lock:
+            entry = self._entries.get(normalized_path)
+        if entry is None:
+            return None
+        try:
+            size, mtime_ns = LoRATriggerIndex._file_key(normalized_path)
+        except OSError:
+            return None
+        if entry.get("size") != size or entry.get("mtime_ns") != mtime_ns:
+            return None
+        return _trigger_info_from_triggers(_lora_display_name(normalized_path), entry.get("triggers"),
+                                           entry.get("last_updated", 0.0))
+
+    def put(self, lora_path: str, info: TriggerInfo) -> None:
+        """Index a successful extraction, or a confirmed absence of triggers."""
+        if not info.has_triggers and info.error_message != NO_TRIGGERS_MESSAGE:
+            return  # Errors may be transient, so try again next time
+        normalized_path = os.path.normpath(lora_path)
+        try:
+            size, mtime_ns = LoRATriggerIndex._file_key(normalized_path)
+        except OSError:
+            return
+        entry = {"size": size, "mtime_ns": mtime_ns, "triggers": info.triggers, "last_updated": info.last_updated}
+        with self._lock:
+            self._entries[normalized_path] = entry
+            self._dirty = True
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"version": LoRATriggerIndex.VERSION, "entries": dict(self._entries)}
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+            temp_path = self.index_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.index_path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Warning: Failed to save LoRA trigger index: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+        self.save()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _trigger_info_from_triggers(lora_name: str, triggers: Optional[Dict[str, int]],
+                                last_updated: Optional[float] = None) -> TriggerInfo:
+    if triggers:
+        # Sort triggers by frequency (descending)
+        sorted_triggers = sorted(triggers.items(), key=lambda x: x[1], reverse=True)
+        return TriggerInfo(
+            lora_name=lora_name,
+            triggers=triggers,
+            has_triggers=True,
+            trigger_count=len(triggers),
+            top_triggers=sorted_triggers[:10],  # Top 10 triggers
+            last_updated=last_updated or time.time(),
+            error_message=None
+        )
+    return TriggerInfo(
+        lora_name=lora_name,
+        triggers=None,
+        has_triggers=False,
+        trigger_count=0,
+        top_triggers=[],
+        last_updated=last_updated or time.time(),
+        error_message=NO_TRIGGERS_MESSAGE
+    )
+
+
 class LoRATriggerExtractor:
     """Main class for extracting and managing LoRA trigger information."""
-    
-    def __init__(self):
-        self._cache: Dict[str, TriggerInfo] = {}
-        self._cache_timestamp: Optional[float] = None
-        self._max_cache_age = 3600  # 1 hour
-    
+
+    DEFAULT_SCAN_WORKERS = 8
+
+    def __init__(self, index_path: Optional[str] = None):
+        self._index_path = index_path
+        self._index: Optional[LoRATriggerIndex] = None
+        self._index_lock = threading.Lock()
+
+    def _get_index(self) -> LoRATriggerIndex:
+        with self._index_lock:
+            if self._index is None:
+                self._index = LoRATriggerIndex(self._index_path)
+            return self._index
+
     def get_trigger_info(self, lora_path: str, force_refresh: bool = False) -> TriggerInfo:
         """
         Get trigger information for a LoRA file.
         
         Args:
             lora_path: Full path to the .safetensors file
-            force_refresh: Force refresh even if cached data exists
+            force_refresh: Force refresh even if indexed data exists
             
         Returns:
             TriggerInfo object containing trigger data
         """
+        trigger_info = self._get_trigger_info(lora_path, force_refresh)
+        self._get_index().save()
+        return trigger_info
+
+    def _get_trigger_info(self, lora_path: str, force_refresh: bool) -> TriggerInfo:
         # Check if safetriggers functionality is available
         if not SAFETRIGGERS_AVAILABLE:
-            lora_name = os.path.basename(os.path.normpath(lora_path))
-            if lora_name.endswith('.safetensors'):
-                lora_name = lora_name[:-12]
             return TriggerInfo(
-                lora_name=lora_name,
+                lora_name=_lora_display_name(lora_path),
                 triggers=None,
                 has_triggers=False,
                 trigger_count=0,
@@ -96,28 +237,63 @@ class LoRATriggerExtractor:
                 last_updated=time.time(),
                 error_message="Safetriggers functionality not available"
             )
-        
-        # Normalize path for caching
+
         normalized_path = os.path.normpath(lora_path)
-        
-        # Check cache first
-        if not force_refresh and normalized_path in self._cache:
-            cached_info = self._cache[normalized_path]
-            if not self._is_cache_stale(cached_info.last_updated):
+        index = self._get_index()
+
+        # Check the index first; entries are only returned for unchanged files
+        if not force_refresh:
+            cached_info = index.get(normalized_path)
+            if cached_info is not None:
                 return cached_info
-        
-        # Extract base name for display
-        lora_name = os.path.basename(normalized_path)
-        if lora_name.endswith('.safetensors'):
-            lora_name = lora_name[:-12]  # Remove .safetensors extension
-        
-        trigger_info = self._extract_triggers(normalized_path, lora_name)
-        
-        # Cache the result
-        self._cache[normalized_path] = trigger_info
-        
+
+        trigger_info = self._extract_triggers(normalized_path, _lora_display_name(normalized_path))
+        index.put(normalized_path, trigger_info)
         return trigger_info
-    
+
+    def scan_directory(self, directory: str, recursive: bool = False, force_refresh: bool = False,
+                       max_workers: int = DEFAULT_SCAN_WORKERS,
+                       progress_callback: Optional[Callable[[int, int, str], None]] = None) -> Dict[str, TriggerInfo]:
+        """
+        Get trigger information for every LoRA in a directory.
+
+        Unchanged files are served from the index; the rest are read in
+        parallel, which only costs a header read per file. The index is
+        saved once at the end.
+
+        Args:
+            directory: Directory containing .safetensors files
+            recursive: Include subdirectories
+            force_refresh: Re-read every file even if indexed data exists
+            max_workers: Number of files read concurrently
+            progress_callback: Called as (done, total, lora_path) after each file
+
+        Returns:
+            Dictionary of normalized LoRA path to TriggerInfo
+        """
+        lora_paths = []
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for file_name in sorted(files):
+                if file_name.endswith(".safetensors"):
+                    lora_paths.append(os.path.normpath(os.path.join(root, file_name)))
+            if not recursive:
+                break
+
+        results: Dict[str, TriggerInfo] = {}
+        total = len(lora_paths)
+        if total == 0:
+            return results
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, total))) as executor:
+            futures = {executor.submit(self._get_trigger_info, path, force_refresh): path for path in lora_paths}
+            for done, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                results[path] = future.result()
+                if progress_callback is not None:
+                    progress_callback(done, total, path)
+        self._get_index().save()
+        return {path: results[path] for path in lora_paths}
+
     def _extract_triggers(self, lora_path: str, lora_name: str) -> TriggerInfo:
         """Extract triggers from a LoRA file."""
         try:
@@ -135,31 +311,8 @@ class LoRATriggerExtractor:
             # Extract triggers using the safetriggers functionality
             triggers = read_triggers_from_lora(lora_path, args)
             
-            if triggers and len(triggers) > 0:
-                # Sort triggers by frequency (descending)
-                sorted_triggers = sorted(triggers.items(), key=lambda x: x[1], reverse=True)
-                top_triggers = sorted_triggers[:10]  # Top 10 triggers
-                
-                return TriggerInfo(
-                    lora_name=lora_name,
-                    triggers=triggers,
-                    has_triggers=True,
-                    trigger_count=len(triggers),
-                    top_triggers=top_triggers,
-                    last_updated=time.time(),
-                    error_message=None
-                )
-            else:
-                return TriggerInfo(
-                    lora_name=lora_name,
-                    triggers=None,
-                    has_triggers=False,
-                    trigger_count=0,
-                    top_triggers=[],
-                    last_updated=time.time(),
-                    error_message="No triggers found in LoRA"
-                )
-                
+            return _trigger_info_from_triggers(lora_name, triggers)
+
         except Exception as e:
             return TriggerInfo(
                 lora_name=lora_name,
@@ -172,13 +325,8 @@ class LoRATriggerExtractor:
             )
     
     def get_cached_trigger_info(self, lora_path: str) -> Optional[TriggerInfo]:
-        """Get cached trigger information if available."""
-        normalized_path = os.path.normpath(lora_path)
-        if normalized_path in self._cache:
-            cached_info = self._cache[normalized_path]
-            if not self._is_cache_stale(cached_info.last_updated):
-                return cached_info
-        return None
+        """Get indexed trigger information if available and the file is unchanged."""
+        return self._get_index().get(lora_path)
     
     def create_safetriggers_file(self, lora_path: str) -> bool:
         """
@@ -206,8 +354,8 @@ class LoRATriggerExtractor:
             
             args = MockArgs()
             
-            # Extract triggers
-            triggers = read_triggers_from_lora(lora_path, args)
+            # Reuse indexed triggers when the file is unchanged
+            triggers = self.get_trigger_info(lora_path).triggers
             
             if triggers and len(triggers) > 0:
                 # The process_triggers function will create the .safetriggers file
@@ -239,19 +387,13 @@ class LoRATriggerExtractor:
             return None
     
     def clear_cache(self):
-        """Clear the trigger cache."""
-        self._cache.clear()
-        self._cache_timestamp = None
-    
-    def _is_cache_stale(self, timestamp: float) -> bool:
-        """Check if cached data is stale."""
-        return (time.time() - timestamp) > self._max_cache_age
+        """Clear the trigger index."""
+        self._get_index().clear()
     
     def get_cache_stats(self) -> Dict[str, int]:
         """Get cache statistics."""
         return {
-            'cached_items': len(self._cache),
-            'cache_age_seconds': int(time.time() - self._cache_timestamp) if self._cache_timestamp else 0
+            'cached_items': len(self._get_index()),
         }
 
 
@@ -274,6 +416,13 @@ def read_existing_safetriggers(safetriggers_path: str) -> Optional[Dict[str, int
     return _trigger_extractor.read_existing_safetriggers(safetriggers_path)
 
 
+def scan_lora_directory(directory: str, recursive: bool = False, force_refresh: bool = False,
+                        progress_callback: Optional[Callable[[int, int, str], None]] = None) -> Dict[str, TriggerInfo]:
+    """Convenience function to get trigger information for a whole directory."""
+    return _trigger_extractor.scan_directory(directory, recursive=recursive, force_refresh=force_refresh,
+                                             progress_callback=progress_callback)
+
+
 def clear_trigger_cache():
     """Convenience function to clear the trigger cache."""
     _trigger_extractor.clear_cache()
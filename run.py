@@ -1,6 +1,7 @@
 import argparse
 import datetime
 from copy import deepcopy
+import threading
 import time
 import traceback
 from typing import Optional
@@ -22,6 +23,7 @@ from sd_runner.timed_schedules_manager import timed_schedules_manager, Scheduled
 from sd_runner.workflow_prompts.base import WorkflowPrompt
 from utils.config import config
 from utils.logging_setup import get_logger
+from utils.run_history import RunOutcome, config_from_run, run_history
 from utils.translations import I18N
 from utils.utils import Utils
 
@@ -51,6 +53,8 @@ class Run:
         self.last_config = None
         self.ui_callbacks = ui_callbacks
         self.progress_tracker = None  # Will be set upon execution
+        self.history_id = None  # Run history record, set upon execution
+        self.generators: list[BaseImageGenerator] = []  # Generators constructed by this run, set upon execution
 
     def print(self, *args):
         if config.debug:
@@ -124,7 +128,7 @@ class Run:
             self.print(f"Large config with maximum gens {config.maximum_gens()} - skipping loop.")
             return
 
-        self.last_config = deepcopy(gen.gen_config)
+        self.last_config = gen.gen_config.snapshot()
 
     def finalize_gen(
         self,
@@ -148,7 +152,10 @@ class Run:
         ip_adapters: list[IPAdapter],
     ) -> ComfyGen | SDWebuiGen:
         if SoftwareType[self.args.software_type].is_cloud():
-            return self._construct_cloud_gen(workflow, positive_prompt, negative_prompt)
+            gen = self._construct_cloud_gen(workflow, positive_prompt, negative_prompt)
+            gen.gen_config.history_id = self.history_id
+            self.generators.append(gen)
+            return gen
 
         models = Model.get_models(self.args.model_tags,
                                   default_tag=Model.get_default_model_tag(workflow),
@@ -189,6 +196,8 @@ class Run:
             gen = FooocusGen(gen_config, self.ui_callbacks)
         else:
             raise Exception(f"Unhandled software type: {self.args.software_type}")
+        gen_config.history_id = self.history_id
+        self.generators.append(gen)
         return gen
 
     def _construct_cloud_gen(
@@ -418,7 +427,49 @@ class Run:
         except ScheduledShutdownException as e:
             logger.error(f"Scheduled shutdown requested: {e}")
             raise e
-        
+
+        self.history_id = run_history.start_run(config_from_run(self.args))
+        self.generators = []
+        try:
+            self._execute()
+        except Exception as e:
+            outcome = RunOutcome.CANCELLED if isinstance(e, ScheduledShutdownException) else RunOutcome.FAILED
+            self._finish_history(outcome, error=str(e))
+            raise
+        self._finish_history()
+
+    def _finish_history(self, outcome: Optional[RunOutcome] = None, error: Optional[str] = None) -> None:
+        """Close the run history record once every generation this run scheduled is done.
+
+        _execute returns as soon as the generations are scheduled; they run on the
+        shared executor afterwards, so the finish time and outcome are recorded
+        from the callback of the last one to finish or be cancelled. Without an
+        explicit outcome, the run is CANCELLED if it was cancelled by then.
+        """
+        history_id = self.history_id
+        futures = [future for gen in self.generators for future in gen.futures]
+        lock = threading.Lock()
+        remaining = [len(futures) + 1]  # Held until every callback is registered
+
+        def on_done(_future=None) -> None:
+            with lock:
+                remaining[0] -= 1
+                if remaining[0] > 0:
+                    return
+            final_outcome = outcome
+            if final_outcome is None:
+                final_outcome = RunOutcome.CANCELLED if self.is_cancelled else RunOutcome.COMPLETED
+            final_error = error
+            failed = sum(1 for future in futures if not future.cancelled() and future.exception() is not None)
+            if final_error is None and failed:
+                final_error = f"{failed} of {len(futures)} generations failed"
+            run_history.finish_run(history_id, final_outcome, error=final_error)
+
+        for future in futures:
+            future.add_done_callback(on_done)
+        on_done()
+
+    def _execute(self) -> None:
         self.is_complete = False
         self.is_cancelled = False
         Model.load_all()
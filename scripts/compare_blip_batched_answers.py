@@ -0,0 +1,52 @@
+import argparse
+import os
+import sys
+
+
+# Ensure we are running from the project root for imports and relative paths
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(PROJECT_ROOT)
+sys.path.insert(0, PROJECT_ROOT)
+
+import pyjson5
+import torch
+
+from blip.blip import WAS_BLIP_Model_Loader, WAS_BLIP_Analyze_Image
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Check that batched BLIP interrogation gives the same answers as asking one question at a time."
+    )
+    parser.add_argument("images", nargs="+", help="Sample image paths")
+    parser.add_argument("--questions", required=True, help="Interrogator questions file ({category: question})")
+    parser.add_argument("--batch-size", type=int, default=WAS_BLIP_Analyze_Image.QUESTION_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = list(pyjson5.load(f).values())
+    blip_model = WAS_BLIP_Model_Loader().blip_model("interrogate")[0]
+    analyze_image = WAS_BLIP_Analyze_Image()
+    batched = analyze_image.blip_answer_questions(args.images, questions, blip_model, question_batch_size=args.batch_size)
+
+    mismatches = 0
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    model = blip_model[0].to(device)
+    for image_path, batched_answers in zip(args.images, batched):
+        if batched_answers is None:
+            print(f"Skipped unreadable image {image_path}")
+            continue
+        tensor = analyze_image.load_image_tensor(image_path, analyze_image.IMAGE_SIZE, device)
+        with torch.no_grad():
+            # The original path: full forward pass, one question at a time
+            single_answers = [model(tensor, question, train=False, inference='generate')[0] for question in questions]
+        for question, single, batch in zip(questions, single_answers, batched_answers):
+            if single != batch:
+                mismatches += 1
+                print(f"MISMATCH {image_path} | {question} | single=\"{single}\" batched=\"{batch}\"")
+    print(f"{mismatches} mismatched answers across {len(args.images)} images and {len(questions)} questions")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
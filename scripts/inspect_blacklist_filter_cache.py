@@ -1,8 +1,6 @@
 import argparse
 import datetime
-import hashlib
 import os
-import pickle
 import sys
 
 
@@ -11,8 +9,10 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 os.chdir(PROJECT_ROOT)
 sys.path.insert(0, PROJECT_ROOT)
 
+from sd_runner.blacklist_filter_cache import BlacklistFilterCache
 
-DEFAULT_CACHE_PATH = os.path.join("configs", "blacklist_filter_cache.pkl")
+
+DEFAULT_CACHE_PATH = os.path.join("configs", "blacklist_filter_cache.bin")
 
 
 def _human_bytes(num_bytes: int) -> str:
@@ -25,41 +25,22 @@ def _human_bytes(num_bytes: int) -> str:
     return f"{num_bytes} B"
 
 
-def _safe_len(value) -> int:
-    try:
-        return len(value)
-    except Exception:
-        return -1
-
-
 def _key_signature(key) -> str:
-    if isinstance(key, tuple):
-        key_len = len(key)
-        if key_len == 0:
-            return "tuple(len=0)"
-        first = str(key[0])[:60]
-        digest = hashlib.md5(str(key[: min(5, key_len)]).encode("utf-8")).hexdigest()[:10]
-        return f"tuple(len={key_len}, first='{first}', md5[:10]={digest})"
+    if isinstance(key, tuple) and len(key) == 3:
+        fingerprint, count, mode = key
+        return f"fingerprint={str(fingerprint)[:16]}, concepts={count}, mode={mode}"
     return f"{type(key).__name__}"
 
 
 def _entry_summary(raw_entry):
     """
-    SizeAwarePicklableCache stores entries as (value, stored_size).
+    BlacklistFilterCache stores entries as (FilterCacheEntry, stored_size). Only
+    filtered indices are stored, so the whitelist size is derived from the counts
+    (an upper bound in REMOVE_WORD_OR_PHRASE mode, where cleaned concepts may be dropped).
     """
-    if isinstance(raw_entry, tuple) and len(raw_entry) == 2 and isinstance(raw_entry[1], int):
-        value, stored_size = raw_entry
-    else:
-        value = raw_entry
-        stored_size = None
-
-    whitelist_count = -1
-    filtered_count = -1
-    if isinstance(value, tuple) and len(value) == 2:
-        whitelist_count = _safe_len(value[0])
-        filtered_count = _safe_len(value[1])
-
-    return whitelist_count, filtered_count, stored_size
+    entry, stored_size = raw_entry
+    whitelist_count = entry.count if entry.mode == "LOG_ONLY" else entry.count - entry.filtered_count
+    return whitelist_count, entry.filtered_count, stored_size
 
 
 def main() -> None:
@@ -69,7 +50,7 @@ def main() -> None:
     parser.add_argument(
         "--cache-path",
         default=DEFAULT_CACHE_PATH,
-        help=f"Path to cache pickle file (default: {DEFAULT_CACHE_PATH})",
+        help=f"Path to cache file (default: {DEFAULT_CACHE_PATH})",
     )
     parser.add_argument(
         "--show-top",
@@ -98,28 +79,18 @@ def main() -> None:
     print(f"Last modified : {modified_ts}")
 
     try:
-        with open(cache_path, "rb") as f:
-            cache_obj = pickle.load(f)
+        cache_obj = BlacklistFilterCache.load(cache_path)
     except Exception as e:
-        print(f"\nFailed to unpickle cache: {e}")
+        print(f"\nFailed to read cache: {e}")
         return
 
-    cache_data = getattr(cache_obj, "cache", None)
-    if cache_data is None:
-        print("\nUnpickled object does not have a 'cache' attribute.")
-        print(f"Object type: {type(cache_obj).__name__}")
-        return
+    cache_data = cache_obj.cache
 
     print("\n=== Cache Metadata ===")
     print(f"Object type       : {type(cache_obj).__name__}")
-    print(f"Version           : {getattr(cache_obj, 'version', 'unknown')}")
-    print(f"Max size          : {getattr(cache_obj, 'maxsize', 'unknown')}")
-    print(f"Large threshold   : {getattr(cache_obj, 'large_threshold', 'n/a')}")
-    print(f"Max large items   : {getattr(cache_obj, 'max_large_items', 'n/a')}")
-    print(f"Protected large   : {getattr(cache_obj, 'protected_large_items', 'n/a')}")
-    print(f"Large count       : {getattr(cache_obj, 'large_count', 'n/a')}")
-    print(f"Total size tracked: {getattr(cache_obj, 'total_size', 'n/a')}")
-    print(f"Version cache     : {getattr(cache_obj, 'version_cache', None)}")
+    print(f"Format version    : {cache_obj.version}")
+    print(f"Total size tracked: {cache_obj.total_size}")
+    print(f"Version cache     : {cache_obj.version_cache}")
     print(f"Entry count       : {len(cache_data)}")
 
     if len(cache_data) == 0:
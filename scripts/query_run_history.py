@@ -0,0 +1,149 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+
+
+# Ensure we are running from the project root for imports and relative paths
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(PROJECT_ROOT)
+sys.path.insert(0, PROJECT_ROOT)
+
+from utils.run_history import RunHistory, RunOutcome, run_history
+
+
+def _fmt_time(ts) -> str:
+    if ts is None:
+        return "-"
+    return datetime.datetime.fromtimestamp(ts).isoformat(sep=" ", timespec="seconds")
+
+
+def _fmt_duration(seconds) -> str:
+    if seconds is None:
+        return "-"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def _short(value, max_len: int) -> str:
+    s = str(value or "")
+    return s if len(s) <= max_len else s[:max_len - 1] + "…"
+
+
+def _filters(args) -> dict:
+    since = None
+    if args.days is not None:
+        since = datetime.datetime.now() - datetime.timedelta(days=args.days)
+    elif args.since:
+        since = datetime.datetime.fromisoformat(args.since)
+    return {
+        "workflow": args.workflow,
+        "model": args.model,
+        "lora": args.lora,
+        "outcome": RunOutcome(args.outcome) if args.outcome else None,
+        "since": since,
+        "until": datetime.datetime.fromisoformat(args.until) if args.until else None,
+        "text": args.text,
+    }
+
+
+def _list(args) -> None:
+    filters = _filters(args)
+    runs = run_history.query_runs(limit=args.limit, offset=args.offset, **filters)
+    if args.json:
+        for run in runs:
+            run["outcome"] = run["outcome"].value
+        print(json.dumps(runs, indent=2))
+        return
+    total = run_history.count_runs(**filters)
+    print(f"Runs {args.offset + 1 if runs else 0}-{args.offset + len(runs)} of {total}")
+    for run in runs:
+        print(
+            f"{run['id']:>6} | {_fmt_time(run['started_at'])} | {_fmt_duration(run['duration']):>8} | "
+            f"{run['outcome'].value:<9} | {run['kept']:>3}/{run['images']:<3} | "
+            f"{_short(run['workflow_type'], 24):<24} | {_short(run['model_tags'], 30):<30} | "
+            f"{_short(run['lora_tags'], 30)}"
+        )
+
+
+def _show(args) -> None:
+    run = run_history.get_run(args.run_id)
+    if run is None:
+        print(f"Run not found: {args.run_id}")
+        return
+    print(f"Run {run['id']}: {run['outcome'].value}")
+    print(f"Started  : {_fmt_time(run['started_at'])}")
+    print(f"Finished : {_fmt_time(run['finished_at'])} ({_fmt_duration(run['duration'])})")
+    if run["error"]:
+        print(f"Error    : {run['error']}")
+    print(f"Workflow : {run['workflow_type']}")
+    print(f"Models   : {run['model_tags']}")
+    print(f"LoRAs    : {run['lora_tags']}")
+    print("\n=== Images ===")
+    for image in run_history.run_images(run["id"]):
+        print(f"{'kept' if image['kept'] else 'gone'} | {image['path']}")
+    print("\n=== Config ===")
+    print(json.dumps(run["config"], indent=2))
+
+
+def _top(args) -> None:
+    if not args.no_refresh:
+        run_history.refresh_kept()
+    rows = run_history.top_combinations(by=args.by, limit=args.limit, **_filters(args))
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    for idx, row in enumerate(rows, start=1):
+        if args.by == "combo":
+            label = f"{row['model'] or '-'} + {row['lora'] or '-'}"
+        else:
+            label = row[args.by]
+        print(f"{idx:>3}. kept={row['kept']:>5} | images={row['images']:>5} | runs={row['runs']:>4} | {label}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Query the run history store: list runs, inspect one run, or rank model/LoRA usage."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    filter_parser = argparse.ArgumentParser(add_help=False)
+    filter_parser.add_argument("--workflow", help="Exact workflow type, e.g. SIMPLE_IMAGE_GEN_LORA")
+    filter_parser.add_argument("--model", help="Runs using this model tag")
+    filter_parser.add_argument("--lora", help="Runs using this LoRA tag")
+    filter_parser.add_argument("--outcome", choices=[outcome.value for outcome in RunOutcome])
+    filter_parser.add_argument("--days", type=int, help="Runs started in the last N days")
+    filter_parser.add_argument("--since", help="Runs started at or after this ISO date/time")
+    filter_parser.add_argument("--until", help="Runs started before this ISO date/time")
+    filter_parser.add_argument("--text", help="Substring of the workflow, tags or positive prompt")
+    filter_parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+
+    list_parser = subparsers.add_parser("list", parents=[filter_parser], help="List runs, newest first")
+    list_parser.add_argument("--limit", type=int, default=50)
+    list_parser.add_argument("--offset", type=int, default=0)
+    list_parser.set_defaults(func=_list)
+
+    show_parser = subparsers.add_parser("show", help="Show one run with its images and config")
+    show_parser.add_argument("run_id", type=int)
+    show_parser.set_defaults(func=_show)
+
+    top_parser = subparsers.add_parser("top", parents=[filter_parser],
+                                       help="Rank model/LoRA usage by kept images")
+    top_parser.add_argument("--by", choices=RunHistory.TOP_GROUPINGS, default="combo",
+                            help="Group by full model + LoRA combination, or by single model or LoRA tag")
+    top_parser.add_argument("--limit", type=int, default=10)
+    top_parser.add_argument("--no-refresh", action="store_true",
+                            help="Skip checking which image files still exist")
+    top_parser.set_defaults(func=_top)
+
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    finally:
+        run_history.close()
+
+
+if __name__ == "__main__":
+    main()
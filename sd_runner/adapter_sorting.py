@@ -1,4 +1,6 @@
-from typing import Callable, TypeVar, List, Any, Generic
+from collections import OrderedDict
+import os
+from typing import Callable, TypeVar, List, Any, Generic, Iterable, Optional
 
 T = TypeVar('T')
 
@@ -50,6 +52,94 @@ class LazyAdapterList(Generic[T]):
         return f"LazyAdapterList({len(self._paths)} items, {len(self._cache)} constructed)"
 
 
+class RecencyIndex:
+    """Most-recently-used file list with O(1) recency rank lookups.
+
+    Rank 0 is the most recent path. Paths are stored in an OrderedDict with the
+    most recent at the end, so touching or trimming a path is O(1). Ranks are
+    computed into a dict on the first lookup after a change, so sorting a large
+    directory costs one O(recents) pass, not one list scan per file.
+    """
+
+    def __init__(self, paths: Iterable[str] = (), maxsize: Optional[int] = None):
+        """
+        Args:
+            paths: Initial paths, most recent first
+            maxsize: Maximum number of paths kept, or None for no limit
+        """
+        self._order: OrderedDict[str, None] = OrderedDict()
+        for path in reversed(list(paths)):
+            self._order[path] = None
+            self._order.move_to_end(path)
+        self._ranks: Optional[dict[str, int]] = None
+        self.maxsize = maxsize
+        self._trim()
+
+    @staticmethod
+    def normalize(path: str) -> str:
+        try:
+            return os.path.abspath(path.strip())
+        except Exception:
+            return path.strip()
+
+    def _trim(self) -> None:
+        if self.maxsize is not None:
+            while len(self._order) > self.maxsize:
+                self._order.popitem(last=False)
+                self._ranks = None
+
+    def set_maxsize(self, maxsize: Optional[int]) -> None:
+        self.maxsize = maxsize
+        self._trim()
+
+    def add(self, path: str) -> None:
+        """Mark a path as the most recent."""
+        self._order[path] = None
+        self._order.move_to_end(path)
+        self._ranks = None
+        self._trim()
+
+    def remove(self, path: str) -> None:
+        """Remove a path. Raises ValueError if it is not present, like list.remove."""
+        try:
+            del self._order[path]
+        except KeyError:
+            raise ValueError(f"{path} not in recency index")
+        self._ranks = None
+
+    def clear(self) -> None:
+        self._order.clear()
+        self._ranks = None
+
+    def _get_ranks(self) -> dict[str, int]:
+        if self._ranks is None:
+            self._ranks = {path: rank for rank, path in enumerate(reversed(self._order))}
+        return self._ranks
+
+    def rank(self, path: str) -> int:
+        """Return the recency rank of an already normalized path, or -1 if not recent."""
+        return self._get_ranks().get(path, -1)
+
+    def rank_many(self, paths: Iterable[str]) -> list[int]:
+        """Return recency ranks for many paths (normalized here), -1 for non-recent paths."""
+        ranks = self._get_ranks()
+        normalize = RecencyIndex.normalize
+        return [ranks.get(normalize(path), -1) if path and path.strip() else -1 for path in paths]
+
+    def to_list(self) -> list[str]:
+        """Return the paths, most recent first."""
+        return list(reversed(self._order))
+
+    def __iter__(self):
+        return reversed(self._order)
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._order
+
+
 def _sort_adapters_by_recency(
     adapter_files: List[str],
     random_sort: bool,
@@ -65,7 +155,7 @@ def _sort_adapters_by_recency(
     Args:
         adapter_files: List of file paths to process
         random_sort: Whether to apply jitter to the sorting
-        app_actions: App actions object for recent file checking
+        app_actions: App actions object providing rank_recent_adapter_files
         adapter_factory: Function to create adapter objects from file paths
 
     Returns:
@@ -74,15 +164,17 @@ def _sort_adapters_by_recency(
     non_recent_paths = []
     recent_paths = []  # (path, recent_index, original_position)
 
+    if app_actions is not None and len(adapter_files) > 0:
+        # One batch lookup instead of one recent-list scan per file
+        recent_indices = app_actions.rank_recent_adapter_files(adapter_files)
+    else:
+        recent_indices = [-1] * len(adapter_files)
+
     # Order adapters by recency - most recent first, then non-recent items
-    for i, path in enumerate(adapter_files):
-        if app_actions is not None:
-            recent_index = app_actions.contains_recent_adapter_file(path)
-            if recent_index >= 0:
-                # Store with index for sorting (lower index = more recent) and original position for jitter
-                recent_paths.append((path, recent_index, i))
-            else:
-                non_recent_paths.append(path)
+    for i, (path, recent_index) in enumerate(zip(adapter_files, recent_indices)):
+        if recent_index >= 0:
+            # Store with index for sorting (lower index = more recent) and original position for jitter
+            recent_paths.append((path, recent_index, i))
         else:
             non_recent_paths.append(path)
 
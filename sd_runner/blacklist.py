@@ -8,9 +8,10 @@ import string
 from utils.globals import Globals, BlacklistMode, BlacklistPromptMode, ModelBlacklistMode, PromptMode
 from utils.encryptor import symmetric_encrypt_data_to_file, symmetric_decrypt_data_from_file
 from utils.logging_setup import get_logger
-from utils.pickleable_cache import SizeAwarePicklableCache, fingerprint_string_sequence
+from utils.pickleable_cache import fingerprint_string_sequence
 from utils.translations import I18N
 from utils.utils import Utils
+from sd_runner.blacklist_filter_cache import BlacklistFilterCache, FilterCacheEntry
 
 _ = I18N._
 
@@ -24,10 +25,12 @@ _DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "c
 def _resolve_blacklist_cache_file() -> str:
     override = os.environ.get("SD_RUNNER_CACHE_DIR")
     base = override if override else _DEFAULT_CACHE_DIR
-    return os.path.join(base, "blacklist_filter_cache.pkl")
+    return os.path.join(base, "blacklist_filter_cache.bin")
 
 
 BLACKLIST_CACHE_FILE = _resolve_blacklist_cache_file()
+# Pickled cache written by earlier versions; removed along with the cache file.
+LEGACY_BLACKLIST_CACHE_FILE = os.path.splitext(BLACKLIST_CACHE_FILE)[0] + ".pkl"
 
 
 def normalize_accents_for_regex(text: str, is_regex: bool = False) -> str:
@@ -379,7 +382,7 @@ class Blacklist:
     CACHE_AUTOSAVE_CONCEPT_THRESHOLD = 20000
     DEFAULT_BLACKLIST_FILE_LOC = os.path.join(os.path.dirname(__file__), "data", "blacklist_default.enc")
     _ui_callbacks = None  # Static variable to store UI callbacks
-    _filter_cache = SizeAwarePicklableCache.load_or_create(
+    _filter_cache = BlacklistFilterCache.load_or_create(
         BLACKLIST_CACHE_FILE, maxsize=CACHE_MAXSIZE,
         max_large_items=CACHE_MAX_LARGE_ITEMS, large_threshold=CACHE_LARGE_THRESHOLD,
         protected_large_items=CACHE_PROTECTED_LARGE_ITEMS)
@@ -494,19 +497,21 @@ class Blacklist:
         do_cache: bool = True,
         user_prompt: bool = True,
     ) -> tuple[list[str], dict[str, str]]:
-        key_version = getattr(Blacklist._filter_cache, "version", 1)
+        mode = Blacklist.get_blacklist_mode() if user_prompt else BlacklistMode.REMOVE_ENTIRE_TAG
         # Keep cache keys compact: tuple payloads are massive (millions of terms).
         cache_key = (
-            f"v{key_version}",
-            len(concepts_tuple),
             fingerprint_string_sequence(concepts_tuple),
+            len(concepts_tuple),
+            mode.value,
         )
+        blacklist_version = Blacklist.get_version()
 
-        # Check cache first
+        # Check cache first. Entries hold only the filtered indices, so the
+        # result is rebuilt from the concepts; an entry from an older blacklist is a miss.
         try:
-            cached_result = Blacklist._filter_cache.get(cache_key)
-            if cached_result is not None:
-                return cached_result
+            cached_entry = Blacklist._filter_cache.get(cache_key)
+            if cached_entry is not None and cached_entry.blacklist_version == blacklist_version:
+                return cached_entry.decode(concepts_tuple)
         except Exception as e:
             raise Exception(f"Error accessing blacklist cache: {e}", e)
         
@@ -523,10 +528,11 @@ class Blacklist:
                 pass  # Ignore any errors in UI callback
         
         # Convert tuple back to list for processing
-        mode = Blacklist.get_blacklist_mode() if user_prompt else BlacklistMode.REMOVE_ENTIRE_TAG
         concepts = list(concepts_tuple)
         whitelist = []
         filtered = {}
+        # (index, blacklist item, cleaned concept) per filtered concept, for the cache entry
+        hits = []
         
         # Call progress update at the beginning (0)
         do_update_progress(0)
@@ -545,6 +551,7 @@ class Blacklist:
                     break
             
             # Handle different modes
+            cleaned_concept = None
             if mode == BlacklistMode.REMOVE_WORD_OR_PHRASE and match_found:
                 # Try to remove the blacklisted content from the concept
                 cleaned_concept = blacklist_item.remove_blacklisted_content(concept_cased)
@@ -553,6 +560,8 @@ class Blacklist:
             elif not match_found or mode == BlacklistMode.LOG_ONLY:
                 # Default behavior: add to whitelist if no blacklist match found
                 whitelist.append(concept_cased)
+            if match_found:
+                hits.append((i, blacklist_item.string, cleaned_concept))
             
             # Call progress update every 5000 concepts
             if (i + 1) % 5000 == 0:
@@ -579,7 +588,8 @@ class Blacklist:
         # Cache the result
         if do_cache:
             try:
-                Blacklist._filter_cache.put(cache_key, result)
+                Blacklist._filter_cache.put(
+                    cache_key, FilterCacheEntry.build(concepts_count, mode, blacklist_version, hits))
                 # Persist expensive pre-filter results immediately so they survive
                 # unexpected restarts/crashes before periodic app cache flush.
                 if concepts_count >= Blacklist.CACHE_AUTOSAVE_CONCEPT_THRESHOLD:
@@ -666,6 +676,8 @@ class Blacklist:
                 logger.error(f"Invalid blacklist item type: {type(item)}")
         
         Blacklist.TAG_BLACKLIST = validated_blacklist
+        # Cached entries are checked against the version, so it must be recomputed
+        Blacklist._filter_cache.version_cache = None
         try:
             if clear_cache:
                 Blacklist._filter_cache.clear()
@@ -965,7 +977,7 @@ class Blacklist:
         filter results and version_cache never bleed across test boundaries, and
         save() writes to the temp dir rather than the real configs/ directory.
         """
-        Blacklist._filter_cache = SizeAwarePicklableCache(
+        Blacklist._filter_cache = BlacklistFilterCache(
             filename=_resolve_blacklist_cache_file(),
             maxsize=Blacklist.CACHE_MAXSIZE,
             large_threshold=Blacklist.CACHE_LARGE_THRESHOLD,
@@ -999,16 +1011,18 @@ class Blacklist:
     def clear_cache_file() -> None:
         """Clear the cache file and reload the cache."""
         try:
-            if os.path.exists(BLACKLIST_CACHE_FILE):
-                os.remove(BLACKLIST_CACHE_FILE)
-            Blacklist._filter_cache = SizeAwarePicklableCache.load_or_create(
+            Blacklist._filter_cache.clear()
+            for cache_file in (BLACKLIST_CACHE_FILE, LEGACY_BLACKLIST_CACHE_FILE):
+                if os.path.exists(cache_file):
+                    os.remove(cache_file)
+            Blacklist._filter_cache = BlacklistFilterCache.load_or_create(
                 BLACKLIST_CACHE_FILE, maxsize=Blacklist.CACHE_MAXSIZE,
                 max_large_items=Blacklist.CACHE_MAX_LARGE_ITEMS, large_threshold=Blacklist.CACHE_LARGE_THRESHOLD,
                 protected_large_items=Blacklist.CACHE_PROTECTED_LARGE_ITEMS)
         except Exception as e:
             logger.error(f"Error clearing cache file: {e}")
             # Fallback to creating a new cache
-            Blacklist._filter_cache = SizeAwarePicklableCache.load_or_create(
+            Blacklist._filter_cache = BlacklistFilterCache.load_or_create(
                 BLACKLIST_CACHE_FILE, maxsize=Blacklist.CACHE_MAXSIZE,
                 max_large_items=Blacklist.CACHE_MAX_LARGE_ITEMS, large_threshold=Blacklist.CACHE_LARGE_THRESHOLD,
                 protected_large_items=Blacklist.CACHE_PROTECTED_LARGE_ITEMS)
@@ -0,0 +1,301 @@
+"""
+Columnar, memory-mapped persistence for the blacklist filter cache.
+
+A filter result is fully determined by the source concept list, so an entry
+stores only which source indices were filtered, never the strings themselves.
+The caller supplies the source list again on a hit and the whitelist and
+filtered dict are rebuilt from it.
+
+File layout (integers little-endian u32)::
+
+    header   magic "SDBF", format version, index length
+    index    UTF-8 JSON: version_cache and one record per entry in LRU order
+             (key, blacklist version, blacklist items, counts, offset, length)
+    payloads one per entry, 4-byte aligned, each laid out in columns:
+             bitmap     ceil(count / 8) bytes, bit i set if concept i was filtered,
+                        padded to a multiple of 4
+             item ids   filtered_count u32 indices into the entry's item strings
+             cleaned    only in REMOVE_WORD_OR_PHRASE mode: filtered_count + 1
+                        u32 offsets, then the cleaned concepts as UTF-8
+
+Loading reads only the header and index; payloads stay in the mapping until
+an entry is decoded. An entry's size is its payload length, so size accounting
+is exact and costs nothing to compute.
+"""
+
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Optional, Sequence
+
+from utils.globals import BlacklistMode
+from utils.logging_setup import get_logger
+from utils.pickleable_cache import SizeAwarePicklableCache
+
+logger = get_logger("blacklist_filter_cache")
+
+_NONZERO_BYTE = re.compile(rb"[^\x00]")
+
+
+def _u32_array(data) -> array:
+    values = array("I")
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def _u32_bytes(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array("I", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _padded(length: int) -> int:
+    return (length + 3) & ~3
+
+
+class FilterCacheEntry:
+    """One cached filter result, stored as columns over the source indices."""
+
+    __slots__ = ("count", "mode", "blacklist_version", "items", "filtered_count", "has_cleaned", "payload")
+
+    def __init__(self, count: int, mode: str, blacklist_version: str, items: list[str],
+                 filtered_count: int, has_cleaned: bool, payload):
+        self.count = count
+        self.mode = mode
+        self.blacklist_version = blacklist_version
+        self.items = items
+        self.filtered_count = filtered_count
+        self.has_cleaned = has_cleaned
+        self.payload = payload
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.payload)
+
+    @classmethod
+    def build(cls, count: int, mode: BlacklistMode, blacklist_version: str,
+              hits: Sequence[tuple[int, str, Optional[str]]]) -> "FilterCacheEntry":
+        """Encode a filter result.
+
+        Args:
+            count: Length of the source concept list
+            mode: Blacklist mode the result was computed with
+            blacklist_version: Blacklist.get_version() at filter time
+            hits: (source index, blacklist item string, cleaned concept) for each
+                filtered concept in index order. The cleaned concept is only used
+                in REMOVE_WORD_OR_PHRASE mode; None or blank means it was dropped.
+        """
+        bitmap = bytearray(_padded((count + 7) // 8))
+        item_ids = array("I")
+        items = []
+        item_index = {}
+        for index, item_string, _cleaned in hits:
+            bitmap[index >> 3] |= 1 << (index & 7)
+            item_id = item_index.get(item_string)
+            if item_id is None:
+                item_id = item_index[item_string] = len(items)
+                items.append(item_string)
+            item_ids.append(item_id)
+        columns = [bytes(bitmap), _u32_bytes(item_ids)]
+
+        has_cleaned = mode == BlacklistMode.REMOVE_WORD_OR_PHRASE
+        if has_cleaned:
+            encoded = [(cleaned or "").encode("utf-8") for _index, _item, cleaned in hits]
+            offsets = array("I", [0])
+            for value in encoded:
+                offsets.append(offsets[-1] + len(value))
+            columns.append(_u32_bytes(offsets))
+            columns.extend(encoded)
+        return cls(count, mode.value, blacklist_version, items, len(hits), has_cleaned, b"".join(columns))
+
+    def filtered_indices(self) -> list[int]:
+        """Source indices of the filtered concepts, ascending."""
+        bitmap = self.payload[:(self.count + 7) // 8]
+        indices = []
+        for match in _NONZERO_BYTE.finditer(bitmap):
+            byte_index = match.start()
+            byte = bitmap[byte_index]
+            base = byte_index << 3
+            for bit in range(8):
+                if byte >> bit & 1:
+                    indices.append(base + bit)
+        return indices
+
+    def decode(self, concepts: Sequence[str]) -> tuple[list[str], dict[str, str]]:
+        """Rebuild (whitelist, filtered) for the source list this entry was built from."""
+        if len(concepts) != self.count:
+            raise ValueError(f"Filter cache entry is for {self.count} concepts, got {len(concepts)}")
+        indices = self.filtered_indices()
+        if len(indices) != self.filtered_count:
+            raise ValueError("Corrupt filter cache entry bitmap")
+        ids_start = _padded((self.count + 7) // 8)
+        ids_end = ids_start + 4 * self.filtered_count
+        item_ids = _u32_array(self.payload[ids_start:ids_end])
+        cleaned = None
+        if self.has_cleaned:
+            blob_start = ids_end + 4 * (self.filtered_count + 1)
+            offsets = _u32_array(self.payload[ids_end:blob_start])
+            blob = self.payload[blob_start:]
+            cleaned = [str(blob[offsets[i]:offsets[i + 1]], "utf-8") for i in range(self.filtered_count)]
+        keep_filtered = self.mode == BlacklistMode.LOG_ONLY.value
+
+        whitelist = []
+        filtered = {}
+        start = 0
+        for n, index in enumerate(indices):
+            whitelist.extend(concepts[start:index])
+            concept = concepts[index]
+            filtered[concept] = self.items[item_ids[n]]
+            if keep_filtered:
+                whitelist.append(concept)
+            elif cleaned is not None and cleaned[n].strip():
+                whitelist.append(cleaned[n])
+            start = index + 1
+        whitelist.extend(concepts[start:])
+        return whitelist, filtered
+
+
+class BlacklistFilterCache(SizeAwarePicklableCache):
+    """SizeAwarePicklableCache of FilterCacheEntry values saved in the columnar format.
+
+    Keys are (fingerprint, concept count, mode) tuples. Eviction follows the
+    parent's LRU and large-item rules, with each entry's size being its payload
+    length.
+    """
+
+    MAGIC = b"SDBF"
+    FORMAT_VERSION = 1
+    HEADER = struct.Struct("<4sII")
+
+    def __init__(self, maxsize=128, filename=None, large_threshold=1024*1024, max_large_items=1, protected_large_items=0):
+        super().__init__(maxsize, filename, large_threshold, max_large_items, protected_large_items)
+        self.version = BlacklistFilterCache.FORMAT_VERSION
+        self._mmap = None
+
+    def _calculate_size(self, value):
+        return value.nbytes
+
+    def clear(self):
+        super().clear()
+        # Cleared entries no longer reference the mapping; drop it now.
+        self._close_mapping()
+
+    def _close_mapping(self) -> None:
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # An entry is still referenced elsewhere; freed with it
+            self._mmap = None
+
+    def save(self, filename=None):
+        """Write all entries to *filename* (default: self.filename), then remap them."""
+        save_file = filename or self.filename
+        if not save_file:
+            raise ValueError("Missing filename for persistence")
+
+        with self._lock:
+            records = []
+            offset = 0
+            for key, (entry, _size) in self.cache.items():
+                records.append([list(key), entry.blacklist_version, entry.items, entry.count,
+                                entry.filtered_count, entry.has_cleaned, offset, entry.nbytes])
+                offset = _padded(offset + entry.nbytes)
+            index = json.dumps({"version_cache": self.version_cache, "entries": records}).encode("utf-8")
+            data_start = _padded(BlacklistFilterCache.HEADER.size + len(index))
+
+            target_dir = os.path.dirname(save_file) or "."
+            os.makedirs(target_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(prefix="blacklist_filter_cache_", suffix=".tmp", dir=target_dir)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(BlacklistFilterCache.HEADER.pack(
+                        BlacklistFilterCache.MAGIC, BlacklistFilterCache.FORMAT_VERSION, len(index)))
+                    f.write(index)
+                    position = BlacklistFilterCache.HEADER.size + len(index)
+                    for entry, _size in self.cache.values():
+                        f.write(b"\0" * (_padded(position) - position))
+                        f.write(entry.payload)
+                        position = _padded(position) + entry.nbytes
+                try:
+                    os.replace(temp_path, save_file)
+                except PermissionError:
+                    # Windows refuses to replace a mapped file: copy payloads out first.
+                    for entry, _size in self.cache.values():
+                        entry.payload = bytes(entry.payload)
+                    self._close_mapping()
+                    os.replace(temp_path, save_file)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+            if self.cache:
+                mapped = BlacklistFilterCache._map(save_file)
+                view = memoryview(mapped)
+                for record, (entry, _size) in zip(records, self.cache.values()):
+                    entry.payload = view[data_start + record[6]:data_start + record[6] + record[7]]
+                self._close_mapping()
+                self._mmap = mapped
+            else:
+                self._close_mapping()
+
+        if filename and filename != self.filename:
+            self.filename = filename
+
+    @staticmethod
+    def _map(filename: str) -> mmap.mmap:
+        with open(filename, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @classmethod
+    def load(cls, filename, maxsize=128, large_threshold=1024*1024, max_large_items=1, protected_large_items=0):
+        """Map a saved cache; entry payloads are not read until decoded."""
+        if not os.path.exists(filename):
+            raise FileNotFoundError(f"Cache file not found: {filename}")
+        mapped = cls._map(filename)
+        try:
+            magic, version, index_length = cls.HEADER.unpack_from(mapped, 0)
+            if magic != cls.MAGIC or version != cls.FORMAT_VERSION:
+                raise ValueError(f"Not a blacklist filter cache (version {cls.FORMAT_VERSION}): {filename}")
+            index_end = cls.HEADER.size + index_length
+            index = json.loads(mapped[cls.HEADER.size:index_end].decode("utf-8"))
+            data_start = _padded(index_end)
+
+            cache = cls(maxsize, filename, large_threshold, max_large_items, protected_large_items)
+            version_cache = index.get("version_cache")
+            cache.version_cache = tuple(version_cache) if version_cache else None
+            view = memoryview(mapped)
+            for key, blacklist_version, items, count, filtered_count, has_cleaned, offset, length in index["entries"]:
+                start = data_start + offset
+                if start + length > len(mapped):
+                    raise ValueError(f"Truncated blacklist filter cache: {filename}")
+                entry = FilterCacheEntry(count, key[2], blacklist_version, items, filtered_count,
+                                         has_cleaned, view[start:start + length])
+                cache.put(tuple(key), entry)
+        except Exception:
+            try:
+                mapped.close()
+            except BufferError:
+                pass  # Views from a partly built cache; freed with it
+            raise
+        cache._mmap = mapped
+        return cache
+
+    @classmethod
+    def load_or_create(cls, filename, maxsize=128, large_threshold=1024, max_large_items=1, protected_large_items=0):
+        """Load the cache, or create an empty one if the file is missing or unreadable."""
+        try:
+            return cls.load(filename, maxsize, large_threshold, max_large_items, protected_large_items)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+            logger.warning(f"Discarding unreadable blacklist filter cache {filename}: {e}")
+        return cls(maxsize, filename, large_threshold, max_large_items, protected_large_items)
@@ -1,11 +1,15 @@
+from collections import OrderedDict
 from dataclasses import dataclass, field
+import json
 import os
 from pathlib import Path
 import random
 import re
-from typing import Dict, Set
+import threading
+from typing import Callable, Dict, Optional, Sequence, Set
 
 from sd_runner.blacklist import Blacklist, BlacklistItem
+from sd_runner.word_corpus import ChainedCorpus, WordCorpus
 from utils.config import config
 from utils.globals import PromptMode, BlacklistPromptMode
 from utils.logging_setup import get_logger
@@ -241,6 +245,7 @@ class ConceptsFile:
         try:
             with open(filepath, 'w', encoding="utf-8") as f:
                 f.writelines(self.lines)
+            Concepts.clear_preview_cache()
         except Exception as e:
             logger.error(f"Failed to save concepts file: {filepath}")
             logger.error(f"Error: {str(e)}")
@@ -386,6 +391,10 @@ class Concepts:
     CONCEPTS_DIR = os.path.join(BASE_DIR, "concepts") if config.default_concepts_dir == "concepts" else config.concepts_dir
     URBAN_DICTIONARY_CORPUS_PATH = os.path.join(BASE_DIR, "concepts", "temp", "urban_dictionary_additions.txt")
     URBAN_DICTIONARY_CORPUS = []
+    PREVIEW_CACHE_MAXSIZE = 16
+    PREVIEW_CHUNK_SIZE = 5000
+    _preview_cache: OrderedDict = OrderedDict()
+    _preview_cache_lock = threading.Lock()
 
     @staticmethod
     def set_concepts_dir(path: str = "concepts") -> bool:
@@ -406,15 +415,35 @@ class Concepts:
         dictionary path if configured. It's safe to call multiple times.
         """
         if len(Concepts.ALL_WORDS_LIST) == 0:
-            Concepts.ALL_WORDS_LIST = Concepts.load(Concepts.ALL_WORDS_LIST_FILENAME)
-            logger.info(f"Loaded dictionary words list. Length: {len(Concepts.ALL_WORDS_LIST)}")
+            sources = [Concepts.ALL_WORDS_LIST_FILENAME]
             if config.override_dictionary_path is not None and config.override_dictionary_path.strip() != "":
                 if config.override_dictionary_append:
-                    Concepts.ALL_WORDS_LIST.extend(Concepts.load(config.override_dictionary_path))
-                    logger.info(f"Added override dictionary words list. Length: {len(Concepts.ALL_WORDS_LIST)}")
+                    sources.append(config.override_dictionary_path)
                 else:
-                    Concepts.ALL_WORDS_LIST = Concepts.load(config.override_dictionary_path)
-                    logger.info(f"Overwrote dictionary words list. Length: {len(Concepts.ALL_WORDS_LIST)}")
+                    sources = [config.override_dictionary_path]
+            Concepts.ALL_WORDS_LIST = Concepts.load_corpus(sources)
+            logger.info(f"Loaded dictionary words list from {sources}. Length: {len(Concepts.ALL_WORDS_LIST)}")
+
+    @staticmethod
+    def ensure_urban_dictionary_loaded() -> None:
+        """Load the urban dictionary corpus if it exists and is not loaded yet."""
+        if len(Concepts.URBAN_DICTIONARY_CORPUS) == 0 and os.path.isfile(Concepts.URBAN_DICTIONARY_CORPUS_PATH):
+            try:
+                Concepts.URBAN_DICTIONARY_CORPUS = Concepts.load_corpus([Concepts.URBAN_DICTIONARY_CORPUS_PATH])
+            except Exception as e:
+                logger.warning(f"Failed to load urban dictionary corpus: {e}")
+
+    @staticmethod
+    def load_corpus(filenames: list[str]) -> WordCorpus:
+        """Load concept files as one compiled, memory-mapped WordCorpus.
+
+        The compiled corpus is sorted (duplicates kept, so sampling weights
+        match the files) and is reused across processes until one of the
+        files changes.
+        """
+        paths = [Concepts._resolve_path(filename) for filename in filenames]
+        name = "+".join(os.path.splitext(os.path.basename(path))[0] for path in paths)
+        return WordCorpus.load_or_build(paths, Concepts.load, name=name)
 
     @staticmethod
     def sample_whitelisted(concepts: list[str] | dict[str, float], low: int, high: int, prompt_mode: PromptMode) -> list[str]:
@@ -476,6 +505,56 @@ class Concepts:
             
             return sample(whitelist, low, high)
 
+    @staticmethod
+    def sample_whitelisted_by_index(population: Sequence[str], low: int, high: int, prompt_mode: PromptMode) -> list[str]:
+        """Sample a large sequence uniformly while filtering out blacklisted items.
+
+        Like sample_whitelisted, but only the drawn items are checked against
+        the blacklist (blacklisted draws are replaced), so the population is
+        never copied or filtered as a whole.
+        """
+        if low == 0 and high == 0:
+            return []
+        total = len(population)
+        if total == 0:
+            if low > 0:
+                raise Exception("No concepts to sample")
+            return []
+        if high > total:
+            high = total - 1
+        k = high if low > high else random.randint(low, high)
+        if Blacklist.is_empty() or Blacklist.is_allowed_prompt_mode(prompt_mode):
+            return [population[i] for i in random.sample(range(total), k)]
+
+        whitelist = []
+        filtered_count = 0
+        drawn = set()
+        while len(whitelist) < k and len(drawn) < total:
+            batch = []
+            wanted = min(total - len(drawn), 2 * (k - len(whitelist)) + 8)
+            if len(drawn) > total // 2:
+                # Most of the population is drawn; pick from what is left directly
+                remaining = [i for i in range(total) if i not in drawn]
+                batch = random.sample(remaining, min(wanted, len(remaining)))
+                drawn.update(batch)
+            else:
+                while len(batch) < wanted:
+                    i = random.randrange(total)
+                    if i not in drawn:
+                        drawn.add(i)
+                        batch.append(i)
+            words = [population[i] for i in batch]
+            passed, filtered = Blacklist.filter_concepts(words, do_cache=False, user_prompt=False, prompt_mode=prompt_mode)
+            filtered_count += len(filtered)
+            whitelist.extend(passed[:k - len(whitelist)])
+
+        if len(whitelist) < low:
+            logger.warning(f"Warning: Not enough non-blacklisted items to satisfy range {low}-{high}. "
+                  f"Got {len(whitelist)} items after filtering out {filtered_count} blacklisted items.")
+            if len(whitelist) == 0:
+                raise Exception(f"No non-blacklisted items available. Filtered out {filtered_count} blacklisted items.")
+        return whitelist
+
     def __init__(self,
         prompt_mode: PromptMode,
         get_specific_locations: bool,
@@ -726,17 +805,11 @@ class Concepts:
     def get_random_words(self, concept_config: ConceptConfiguration, multiplier: float = 1.0) -> list[str]:
         low, high = concept_config.get_adjusted_range(multiplier)
         # Get initial whitelisted words and load extra words as needed
-        all_words = Concepts.ALL_WORDS_LIST.copy()
-        if len(Concepts.URBAN_DICTIONARY_CORPUS) == 0 and self.prompt_mode.is_nsfw():
-            try:
-                Concepts.URBAN_DICTIONARY_CORPUS = Concepts.load(Concepts.URBAN_DICTIONARY_CORPUS_PATH)
-            except Exception as e:
-                pass
-        if len(Concepts.URBAN_DICTIONARY_CORPUS) > 0:
-            all_words.extend(Concepts.URBAN_DICTIONARY_CORPUS)
-            # random_urban_dictionary_words = Concepts.sample_whitelisted(Concepts.URBAN_DICTIONARY_CORPUS, low, high, self.prompt_mode)
-            # random_words.extend(random_urban_dictionary_words)
-        random_words = Concepts.sample_whitelisted(all_words, low, high, self.prompt_mode)
+        if self.prompt_mode.is_nsfw():
+            Concepts.ensure_urban_dictionary_loaded()
+        # Sampled by index, so neither corpus is copied
+        all_words = ChainedCorpus(Concepts.ALL_WORDS_LIST, Concepts.URBAN_DICTIONARY_CORPUS)
+        random_words = Concepts.sample_whitelisted_by_index(all_words, low, high, self.prompt_mode)
         
         # Generate combinations and filter out blacklisted combinations
         random_word_strings = []
@@ -777,7 +850,7 @@ class Concepts:
             attempts += 1
             number_required = sum(blacklisted_combination_counts.values())
             # There may be duplication in this resampling but very unlikely for lists of tens of thousands of words
-            random_words = Concepts.sample_whitelisted(all_words, number_required, number_required, self.prompt_mode)
+            random_words = Concepts.sample_whitelisted_by_index(all_words, number_required, number_required, self.prompt_mode)
             new_chance_to_combine = 0.75 # we know these failures came from combinations, try to combine their replacements
             combine_words(random_words, blacklisted_combination_counts, new_chance_to_combine)
         return random_word_strings
@@ -831,18 +904,21 @@ class Concepts:
         return word
 
     @staticmethod
-    def load(filename: str) -> list[str]:
-        # Keeping this separate from the ConceptsFile class to minimize memory
-        # usage as this is called every time there's a prompt generation for every file.
-        l = []
+    def _resolve_path(filename: str) -> str:
         # Append .txt extension if not already present and not an absolute path
         if not filename.endswith('.txt') and not os.path.isabs(filename):
             filename = filename + '.txt'
         
         if os.path.isfile(filename):
-            filepath = str(filename)
-        else:
-            filepath = os.path.join(Concepts.CONCEPTS_DIR, filename)
+            return str(filename)
+        return os.path.join(Concepts.CONCEPTS_DIR, filename)
+
+    @staticmethod
+    def load(filename: str) -> list[str]:
+        # Keeping this separate from the ConceptsFile class to minimize memory
+        # usage as this is called every time there's a prompt generation for every file.
+        l = []
+        filepath = Concepts._resolve_path(filename)
         try:
             with open(filepath, encoding="utf-8") as f:
                 for line in f:
@@ -1088,19 +1164,79 @@ class Concepts:
         
         return imported, failed
 
+    @staticmethod
+    def clear_preview_cache() -> None:
+        """Drop all cached blacklist preview results."""
+        with Concepts._preview_cache_lock:
+            Concepts._preview_cache.clear()
+
+    @staticmethod
+    def _get_preview_cache_key(
+        blacklist_item: Optional[BlacklistItem],
+        category_states: dict[str, bool],
+    ) -> tuple:
+        item_key = json.dumps(blacklist_item.to_dict(), sort_keys=True) if blacklist_item else None
+        states_key = tuple(sorted((name, bool(enabled)) for name, enabled in category_states.items()))
+        return (
+            Blacklist.get_version(),
+            str(Blacklist.get_blacklist_prompt_mode()),
+            Concepts.CONCEPTS_DIR,
+            item_key,
+            states_key,
+        )
+
+    @staticmethod
+    def _load_concepts_for_preview(
+        category_states: dict[str, bool],
+        cancel_event: Optional[threading.Event] = None,
+    ) -> Optional[list[str]]:
+        """Load all concepts from the enabled categories, or None if cancelled."""
+        all_concepts = []
+        for filename in Concepts.get_concept_files(category_states):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            concepts = Concepts.load(filename)
+            if concepts:
+                all_concepts.extend(concepts)
+
+        is_nsfw = category_states.get("NSFW", False) or category_states.get("NSFL", False)
+
+        # Handle extended dictionary concepts when Dictionary is selected and NSFW/NSFL are enabled
+        if category_states.get("Dictionary", False) and is_nsfw:
+            
+            # Load urban dictionary corpus if not already loaded
+            Concepts.ensure_urban_dictionary_loaded()
+            
+            # Add urban dictionary concepts to the list
+            if len(Concepts.URBAN_DICTIONARY_CORPUS) > 0:
+                all_concepts.extend(Concepts.URBAN_DICTIONARY_CORPUS)
+
+        return all_concepts
+
     @staticmethod
     def get_filtered_concepts_for_preview(
         blacklist_item: BlacklistItem = None,
-        category_states: dict[str, bool] = None
-    ) -> list[str]:
+        category_states: dict[str, bool] = None,
+        cancel_event: Optional[threading.Event] = None,
+        partial_callback: Optional[Callable[[list[str]], None]] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> Optional[list[str]]:
         """Get concepts that would be filtered by blacklist items for preview purposes.
+
+        Safe to call from a worker thread. Concepts are filtered in chunks of
+        PREVIEW_CHUNK_SIZE so that callers can stream results and cancel between
+        chunks. Completed results are cached by blacklist version, item and
+        category states, so repeating a preview does not filter again.
         
         Args:
             blacklist_item: Specific blacklist item to check against, or None for all items
             category_states: Dictionary mapping category names to their enabled state
+            cancel_event: Optional event that aborts the preview when set
+            partial_callback: Optional callback receiving the filtered concepts of each chunk
+            progress_callback: Optional callback receiving (current_index, total)
             
         Returns:
-            List of concepts that would be filtered out
+            List of concepts that would be filtered out, or None if cancelled
         """
         # Use default category states if none provided
         if category_states is None:
@@ -1111,42 +1247,59 @@ class Concepts:
                 "Art Styles": True,
                 "Dictionary": True
             }
-        
-        # Get all concepts from enabled categories
-        all_concepts = []
-        for filename in Concepts.get_concept_files(category_states):
-            concepts = Concepts.load(filename)
-            if concepts:
-                all_concepts.extend(concepts)
 
-        is_nsfw = category_states.get("NSFW", False) or category_states.get("NSFL", False)
+        cache_key = Concepts._get_preview_cache_key(blacklist_item, category_states)
+        with Concepts._preview_cache_lock:
+            cached = Concepts._preview_cache.get(cache_key)
+            if cached is not None:
+                Concepts._preview_cache.move_to_end(cache_key)
+        if cached is not None:
+            if partial_callback is not None:
+                partial_callback(list(cached))
+            if progress_callback is not None:
+                progress_callback(len(cached), len(cached))
+            return list(cached)
+
+        all_concepts = Concepts._load_concepts_for_preview(category_states, cancel_event)
+        if all_concepts is None:
+            return None
 
-        # Handle extended dictionary concepts when Dictionary is selected and NSFW/NSFL are enabled
-        if category_states.get("Dictionary", False) and is_nsfw:
-            
-            # Load urban dictionary corpus if not already loaded
-            if len(Concepts.URBAN_DICTIONARY_CORPUS) == 0:
-                try:
-                    Concepts.URBAN_DICTIONARY_CORPUS = Concepts.load(Concepts.URBAN_DICTIONARY_CORPUS_PATH)
-                except Exception as e:
-                    pass
-            
-            # Add urban dictionary concepts to the list
-            if len(Concepts.URBAN_DICTIONARY_CORPUS) > 0:
-                all_concepts.extend(Concepts.URBAN_DICTIONARY_CORPUS)
-        
-        if blacklist_item:
-            # Filter for specific blacklist item
-            filtered_concepts = []
-            for concept in all_concepts:
-                if blacklist_item.matches_tag(concept):
-                    filtered_concepts.append(concept)
-            return filtered_concepts
-        else:
-            # Use the actual blacklist filtering logic
-            whitelist, filtered = Blacklist.filter_concepts(all_concepts, user_prompt=False,
-                                                            prompt_mode=PromptMode.NSFW if is_nsfw else PromptMode.SFW)
-            return list(filtered.keys())
+        is_nsfw = category_states.get("NSFW", False) or category_states.get("NSFL", False)
+        prompt_mode = PromptMode.NSFW if is_nsfw else PromptMode.SFW
+        total = len(all_concepts)
+        filtered_concepts = []
+        if progress_callback is not None:
+            progress_callback(0, total)
+
+        for start in range(0, total, Concepts.PREVIEW_CHUNK_SIZE):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            chunk = all_concepts[start:start + Concepts.PREVIEW_CHUNK_SIZE]
+            if blacklist_item:
+                # Filter for specific blacklist item
+                chunk_filtered = [concept for concept in chunk if blacklist_item.matches_tag(concept)]
+            else:
+                # Use the actual blacklist filtering logic. Chunks are not worth
+                # caching individually, the whole preview result is cached below.
+                whitelist, filtered = Blacklist.filter_concepts(chunk, do_cache=False, user_prompt=False,
+                                                                prompt_mode=prompt_mode)
+                chunk_filtered = list(filtered.keys())
+            filtered_concepts.extend(chunk_filtered)
+            if partial_callback is not None and chunk_filtered:
+                partial_callback(chunk_filtered)
+            if progress_callback is not None:
+                progress_callback(min(start + Concepts.PREVIEW_CHUNK_SIZE, total), total)
+
+        if not blacklist_item:
+            # Blacklist.filter_concepts returns a dict, so duplicates across chunks are collapsed
+            filtered_concepts = list(dict.fromkeys(filtered_concepts))
+
+        with Concepts._preview_cache_lock:
+            Concepts._preview_cache[cache_key] = filtered_concepts
+            Concepts._preview_cache.move_to_end(cache_key)
+            while len(Concepts._preview_cache) > Concepts.PREVIEW_CACHE_MAXSIZE:
+                Concepts._preview_cache.popitem(last=False)
+        return list(filtered_concepts)
 
 
 class HardConcepts:
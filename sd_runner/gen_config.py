@@ -1,3 +1,4 @@
+import copy
 import re
 import random
 
@@ -15,8 +16,46 @@ from utils.utils import Utils
 
 logger = get_logger("gen_config")
 
+def _as_tuple(items):
+    """Compare lists and snapshot tuples by value; leave other sequences as they are."""
+    return tuple(items) if isinstance(items, list) else items
+
+
+class _SnapshotSequence:
+    """A snapshot's read-only view of a sequence that has no value equality.
+
+    Lazy adapter lists compare by identity, so the deepcopy a snapshot used to
+    hold never equalled the live list (or another copy). The view shares the
+    list but compares by its own identity, keeping that behaviour.
+    """
+
+    __slots__ = ("_items",)
+
+    def __init__(self, items):
+        self._items = items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __iter__(self):
+        return iter(self._items)
+
+
+def _snapshot_value(items):
+    if isinstance(items, (list, tuple)):
+        return tuple(items)
+    if items is None or isinstance(items, _SnapshotSequence):
+        return items
+    return _SnapshotSequence(items)
+
+
 class GenConfig:
     REDO_PARAMETERS = config.redo_parameters
+    # Adapter and model lists that a snapshot shares by reference instead of cloning
+    SHARED_LIST_ATTRIBUTES = ("models", "vaes", "control_nets", "ip_adapters", "loras")
 
     def __init__(
         self,
@@ -61,6 +100,46 @@ class GenConfig:
         # Runtime-only context (not part of static run config)
         self.prompt_image_path = ""
         self.edit_suffix = getattr(run_config, 'edit_suffix', '') or ""
+        self.history_id = None  # Run history record that images generated from this config belong to
+        self._frozen = False
+
+    def __setattr__(self, name, value):
+        if self.__dict__.get("_frozen", False):
+            raise AttributeError(f"GenConfig snapshot is read-only (tried to set {name})")
+        super().__setattr__(name, value)
+
+    def snapshot(self) -> "GenConfig":
+        """Return a read-only copy of this config for later comparison.
+
+        Unlike deepcopy, model and adapter objects are shared, not cloned: the
+        lists are frozen into tuples of the same objects. Lazy adapter lists
+        (directory adapters) are shared behind a view that, like the deepcopy
+        did, never compares equal to the live list. Resolutions are copied
+        since they can be changed in place between runs. Otherwise the
+        snapshot compares and hashes like the config it was taken from.
+        """
+        return self.with_overrides()
+
+    def with_overrides(self, **overrides) -> "GenConfig":
+        """Return a read-only snapshot with some fields replaced, e.g. positive or seed."""
+        snapshot = copy.copy(self)
+        values = snapshot.__dict__
+        values["_frozen"] = False
+        for name in GenConfig.SHARED_LIST_ATTRIBUTES:
+            values[name] = _snapshot_value(values[name])
+        values["resolutions"] = tuple(
+            copy.copy(resolution) if resolution is not None else None
+            for resolution in self.resolutions
+        )
+        for name, value in overrides.items():
+            if name not in values:
+                raise AttributeError(f"Unknown GenConfig field: {name}")
+            values[name] = _snapshot_value(value) if name in GenConfig.SHARED_LIST_ATTRIBUTES or name == "resolutions" else value
+        values["_frozen"] = True
+        return snapshot
+
+    def is_snapshot(self) -> bool:
+        return self._frozen
 
     @property
     def active_edit_suffix(self) -> str:
@@ -274,27 +353,27 @@ class GenConfig:
             return (
                 self.workflow_id,
                 self.n_latents,
-                self.models,
-                self.vaes,
-                self.control_nets,
-                self.ip_adapters,
+                _as_tuple(self.models),
+                _as_tuple(self.vaes),
+                _as_tuple(self.control_nets),
+                _as_tuple(self.ip_adapters),
                 self.positive,
                 self.negative,
-                self.loras,
-                self.resolutions,
+                _as_tuple(self.loras),
+                _as_tuple(self.resolutions),
                 self.seed,
                 self.software_type,
             ) == (
                 other.workflow_id,
                 other.n_latents,
-                other.models,
-                other.vaes,
-                other.control_nets,
-                other.ip_adapters,
+                _as_tuple(other.models),
+                _as_tuple(other.vaes),
+                _as_tuple(other.control_nets),
+                _as_tuple(other.ip_adapters),
                 other.positive,
                 other.negative,
-                other.loras,
-                other.resolutions,
+                _as_tuple(other.loras),
+                _as_tuple(other.resolutions),
                 other.seed,
                 other.software_type,
             ) and (self.seed is not None and other.seed is not None
@@ -0,0 +1,118 @@
+"""
+Lazy planning of generation combinations.
+
+A generator run covers the cartesian product of the config's models, VAEs,
+LoRAs, resolutions, control nets and IP adapters, in the order configured by
+``gen_order``.  :class:`GenerationPlan` walks that product without building
+it: every combination has an index in ``range(plan.total)`` and is decoded on
+demand (mixed radix, last dimension fastest), so the plan can be sized up
+front, stopped, saved as a cursor and resumed at the same combination.
+"""
+
+from typing import Any, Iterator, Optional, Sequence
+
+
+class GenerationPlan:
+    """Indexable, resumable walk over the product of named dimensions.
+
+    ``cursor`` is the index of the combination currently being handed out
+    (or the next one, between iterations).  Saving it while combination N is
+    in progress and resuming from it will yield N again, so an interrupted
+    combination is never lost.
+    """
+
+    def __init__(self, dimensions: Sequence[tuple[str, Sequence[Any]]], start: int = 0):
+        self.names = [name for name, _values in dimensions]
+        self.values = [values for _name, values in dimensions]
+        self.sizes = [len(values) for values in self.values]
+        # strides[i] is the number of combinations per step of dimension i
+        self.strides = [1] * len(self.sizes)
+        for i in range(len(self.sizes) - 2, -1, -1):
+            self.strides[i] = self.strides[i + 1] * self.sizes[i + 1]
+        self.total = self.strides[0] * self.sizes[0] if self.sizes else 0
+        if not 0 <= start <= self.total:
+            raise ValueError(f"Start index {start} outside plan of {self.total} combinations")
+        self.cursor = start
+
+    @classmethod
+    def from_config(cls, gen_config, order: Sequence[str], start: int = 0) -> "GenerationPlan":
+        """Plan the combinations of a GenConfig in the given attribute order."""
+        return cls([(name, getattr(gen_config, name)) for name in order], start=start)
+
+    def __len__(self) -> int:
+        return self.total
+
+    @property
+    def remaining(self) -> int:
+        return self.total - self.cursor
+
+    def combination_at(self, index: int) -> dict[str, Any]:
+        """Return the combination at *index* as a dict of dimension name to value."""
+        if not 0 <= index < self.total:
+            raise IndexError(f"Combination {index} outside plan of {self.total}")
+        combination = {}
+        for name, values, stride, size in zip(self.names, self.values, self.strides, self.sizes):
+            combination[name] = values[(index // stride) % size]
+        return combination
+
+    def __iter__(self) -> Iterator[tuple[int, dict[str, Any]]]:
+        """Yield (index, combination) pairs from the cursor onwards.
+
+        The cursor moves past a combination only once the consumer asks for
+        the next one, and ``skip_rest`` may move it further in between.
+        """
+        while self.cursor < self.total:
+            index = self.cursor
+            yield index, self.combination_at(index)
+            if self.cursor == index:
+                self.cursor = index + 1
+
+    def skip_rest(self, name: Optional[str] = None) -> None:
+        """Skip the remaining values of dimension *name* (default: the last).
+
+        The cursor moves to the next combination where the dimension before
+        *name* changes, like a ``break`` out of the loop over *name*.
+        """
+        if self.cursor >= self.total:
+            return
+        position = len(self.names) - 1 if name is None else self.names.index(name)
+        block = self.strides[position] * self.sizes[position]
+        self.cursor = min(self.total, (self.cursor // block + 1) * block)
+
+    def iter_groups(self, *names: str) -> Iterator[list[tuple[int, dict[str, Any]]]]:
+        """Yield runs of consecutive combinations sharing the values of *names*.
+
+        With ``gen_order`` putting those dimensions outermost, each group holds
+        all the work for e.g. one model and resolution, which a backend can
+        submit as one batch.
+        """
+        group = []
+        group_key = None
+        for index, combination in self:
+            key = tuple(id(combination[name]) for name in names)
+            if group and key != group_key:
+                yield group
+                group = []
+            group_key = key
+            group.append((index, combination))
+        if group:
+            yield group
+
+    def state(self) -> dict:
+        """Return a JSON-serializable record of the plan position."""
+        return {"cursor": self.cursor, "total": self.total, "order": list(self.names), "sizes": list(self.sizes)}
+
+    @classmethod
+    def resume(cls, dimensions: Sequence[tuple[str, Sequence[Any]]], state: dict) -> "GenerationPlan":
+        """Rebuild a plan from *dimensions* at a saved cursor.
+
+        Raises ValueError if the dimensions no longer match the saved plan.
+        """
+        plan = cls(dimensions)
+        if state.get("order") != plan.names or state.get("sizes") != plan.sizes:
+            raise ValueError("Saved generation plan does not match the current configuration")
+        cursor = int(state.get("cursor", 0))
+        if not 0 <= cursor <= plan.total:
+            raise ValueError(f"Saved cursor {cursor} outside plan of {plan.total} combinations")
+        plan.cursor = cursor
+        return plan
@@ -12,6 +12,8 @@ from utils.globals import Globals, WorkflowType, SoftwareType
 
 from sd_runner.blacklist import Blacklist
 from sd_runner.gen_config import GenConfig
+from sd_runner.generators.encoded_inputs import encoded_inputs
+from sd_runner.generation_plan import GenerationPlan
 from sd_runner.image_converter import convert_image_if_needed, cleanup_converter, clear_converter_cache
 from sd_runner.models import Model
 from sd_runner.resolution import Resolution
@@ -19,6 +21,7 @@ from sd_runner.workflow_prompts.base import WorkflowPrompt
 from ui_qt.app_actions import AppActions
 from utils.config import config
 from utils.logging_setup import get_logger
+from utils.time_estimator import JobPlan, generation_timings
 from utils.utils import Utils
 
 logger = get_logger("base_image_generator")
@@ -26,6 +29,7 @@ logger = get_logger("base_image_generator")
 class BaseImageGenerator(ABC):
     ORDER = config.gen_order
     RANDOM_SKIP_CHANCE = config.dict["random_skip_chance"]
+    ENCODES_INPUT_IMAGES = False  # Backends sending adapter images inline as base64
 
     _executor = ThreadPoolExecutor(max_workers=config.max_executor_threads)  # Central executor
     _executor_lock = threading.Lock()  # For thread-safe counter updates
@@ -60,6 +64,8 @@ class BaseImageGenerator(ABC):
         self.latent_counter = 0
         self.captioner = None
         self.has_run_one_workflow = False
+        self.generation_plan: Optional[GenerationPlan] = None
+        self.futures: list[Future] = []  # Generations scheduled by this generator
         self._lock = threading.Lock()  # Instance-specific lock
 
     # Shared methods -----------------------------------------------------------
@@ -106,7 +112,12 @@ class BaseImageGenerator(ABC):
         if config.debug:
            print(out)
 
-    def run(self):
+    def run(self, resume_from: int = 0):
+        """Schedule every planned combination, starting at combination *resume_from*.
+
+        The plan is kept on ``self.generation_plan``; its cursor can be saved to
+        resume an interrupted run at the same combination.
+        """
         self.has_run_one_workflow = False
         self.gen_config.prepare()
         workflow_id = self.gen_config.workflow_id
@@ -115,59 +126,56 @@ class BaseImageGenerator(ABC):
         negative = self.gen_config.negative
         if workflow_id is None or workflow_id == "":
             raise Exception("Invalid workflow ID.")
-        for _1 in getattr(self.gen_config, BaseImageGenerator.ORDER[0]):
-            for _2 in getattr(self.gen_config, BaseImageGenerator.ORDER[1]):
-                for _3 in getattr(self.gen_config, BaseImageGenerator.ORDER[2]):
-                    for _4 in getattr(self.gen_config, BaseImageGenerator.ORDER[3]):
-                        for _5 in getattr(self.gen_config, BaseImageGenerator.ORDER[4]):
-                            for _6 in getattr(self.gen_config, BaseImageGenerator.ORDER[5]):
-                                args = [_1, _2, _3, _4, _5, _6]
-                                resolution = args[BaseImageGenerator.ORDER.index("resolutions")]
-                                control_net = args[BaseImageGenerator.ORDER.index("control_nets")]
-                                ip_adapter = args[BaseImageGenerator.ORDER.index("ip_adapters")]
-
-                                if self.random_skip():
-                                    self.gen_config.resolutions_skipped += 1
-                                    continue
-
-                                if resolution.should_be_randomly_skipped() or \
-                                        self.should_skip_resolution(workflow_id, resolution, control_net, ip_adapter):
-                                    self.gen_config.resolutions_skipped += 1
-                                    continue
-
-                                if not self.gen_config.register_run():
-                                    break
-
-                                model = args[BaseImageGenerator.ORDER.index("models")]
-                                vae = args[BaseImageGenerator.ORDER.index("vaes")]
-                                if vae is None:
-                                    vae = model.get_default_vae()
-                                    logger.debug(f"Set default VAE: {vae}")
-                                # Chroma and ZImageTurbo models must use their specific VAE, override if needed
-                                if model.is_chroma() or model.is_z_image_turbo():
-                                    vae = model.get_default_vae()
-                                    logger.debug(f"Overriding VAE for {model.architecture_type} model to default: {vae}")
-                                model.validate_vae(vae)
-                                lora = args[BaseImageGenerator.ORDER.index("loras")]
-                                positive_copy = str(positive)
-                                if ip_adapter:
-                                    positive_copy += ip_adapter.modifiers
-                                    positive_copy = ip_adapter.b_w_coloration_modifier(positive_copy)
-
-                                # Final blacklist validation before generation
-                                positive_copy = self.validate_prompt_against_blacklist(positive_copy)
-
-                                if self.gen_config.is_redo_prompt():
-                                    sw = SoftwareType[self.gen_config.software_type]
-                                    if sw != SoftwareType.ComfyUI:
-                                        raise Exception(f"Redo prompt is not supported for {sw.value}.")
-                                    self.redo_with_different_parameter(source_file=workflow_id, model=model, vae=vae, lora=lora, resolution=resolution,
-                                                                       n_latents=self.gen_config.n_latents, control_net=control_net, ip_adapter=ip_adapter)
-                                    self.has_run_one_workflow = True
-                                else:
-                                    if not self.run_workflow(workflow_id, prompt=None, resolution=resolution, model=model, vae=vae, n_latents=n_latents, positive=positive_copy,
-                                                             negative=negative, lora=lora, control_net=control_net, ip_adapter=ip_adapter):
-                                        self.gen_config.resolutions_skipped += 1
+        self.generation_plan = GenerationPlan.from_config(self.gen_config, BaseImageGenerator.ORDER, start=resume_from)
+        for _index, combination in self.generation_plan:
+            resolution = combination["resolutions"]
+            control_net = combination["control_nets"]
+            ip_adapter = combination["ip_adapters"]
+
+            if self.random_skip():
+                self.gen_config.resolutions_skipped += 1
+                continue
+
+            if resolution.should_be_randomly_skipped() or \
+                    self.should_skip_resolution(workflow_id, resolution, control_net, ip_adapter):
+                self.gen_config.resolutions_skipped += 1
+                continue
+
+            if not self.gen_config.register_run():
+                # Skip the rest of the innermost dimension, as the nested loops did
+                self.generation_plan.skip_rest()
+                continue
+
+            model = combination["models"]
+            vae = combination["vaes"]
+            if vae is None:
+                vae = model.get_default_vae()
+                logger.debug(f"Set default VAE: {vae}")
+            # Chroma and ZImageTurbo models must use their specific VAE, override if needed
+            if model.is_chroma() or model.is_z_image_turbo():
+                vae = model.get_default_vae()
+                logger.debug(f"Overriding VAE for {model.architecture_type} model to default: {vae}")
+            model.validate_vae(vae)
+            lora = combination["loras"]
+            positive_copy = str(positive)
+            if ip_adapter:
+                positive_copy += ip_adapter.modifiers
+                positive_copy = ip_adapter.b_w_coloration_modifier(positive_copy)
+
+            # Final blacklist validation before generation
+            positive_copy = self.validate_prompt_against_blacklist(positive_copy)
+
+            if self.gen_config.is_redo_prompt():
+                sw = SoftwareType[self.gen_config.software_type]
+                if sw != SoftwareType.ComfyUI:
+                    raise Exception(f"Redo prompt is not supported for {sw.value}.")
+                self.redo_with_different_parameter(source_file=workflow_id, model=model, vae=vae, lora=lora, resolution=resolution,
+                                                   n_latents=self.gen_config.n_latents, control_net=control_net, ip_adapter=ip_adapter)
+                self.has_run_one_workflow = True
+            else:
+                if not self.run_workflow(workflow_id, prompt=None, resolution=resolution, model=model, vae=vae, n_latents=n_latents, positive=positive_copy,
+                                         negative=negative, lora=lora, control_net=control_net, ip_adapter=ip_adapter):
+                    self.gen_config.resolutions_skipped += 1
         self.print_stats()
         return
 
@@ -201,6 +209,10 @@ class BaseImageGenerator(ABC):
         # Update kwargs with converted images
         kwargs['control_net'] = converted_control_net
         kwargs['ip_adapter'] = converted_ip_adapter
+        if self.ENCODES_INPUT_IMAGES:
+            # Encode on the side so the worker usually finds the payload ready
+            encoded_inputs.prefetch(getattr(adapter, "generation_path", None)
+                                    for adapter in (converted_control_net, converted_ip_adapter) if adapter)
 
         workflow_method = self.validate_workflow(workflow_id, **kwargs)
         self.schedule_generation(workflow_method, **kwargs)
@@ -230,7 +242,9 @@ class BaseImageGenerator(ABC):
                 self._wrap_task(task_fn),
                 *args, **kwargs
             )
-            return future
+        with self._lock:
+            self.futures.append(future)
+        return future
 
     def update_ui_pending(self):
         if self.ui_callbacks is not None:
@@ -239,11 +253,17 @@ class BaseImageGenerator(ABC):
     def _wrap_task(self, task_fn: callable) -> callable:
         """Add common error handling and logging"""
         def wrapped(*args, **kwargs):
+            timing_token = generation_timings.generation_started()
             try:
                 logger.debug(f"Starting {task_fn.__name__}")
                 start_time = time.time()
-                result = task_fn(*args, **kwargs)
+                try:
+                    result = task_fn(*args, **kwargs)
+                except Exception:
+                    generation_timings.generation_finished(timing_token)
+                    raise
                 logger.debug(f"Completed {task_fn.__name__} in {time.time()-start_time:.2f}s")
+                self._record_generation_time(timing_token, kwargs)
                 # Record recently used adapter files when a task completes
                 try:
                     control_net = kwargs.get("control_net")
@@ -258,6 +278,19 @@ class BaseImageGenerator(ABC):
                 raise
         return wrapped
 
+    def _record_generation_time(self, timing_token: int, kwargs: dict) -> None:
+        """Feed a completed generation's share of executor busy time to the queue time estimates."""
+        model = kwargs.get("model")
+        resolution = kwargs.get("resolution")
+        plan = None
+        if model is not None and isinstance(resolution, Resolution):
+            n_latents = kwargs.get("n_latents") or 1
+            plan = JobPlan.for_generation(self.gen_config, model, resolution, n_latents)
+        try:
+            generation_timings.generation_finished(timing_token, plan, plan.image_count() if plan else 0)
+        except Exception as e:
+            logger.debug(f"Failed to record generation timing: {e}")
+
     def _record_recent_adapters(self, control_net, ip_adapter, prompt_image_path: str = "") -> None:
         """Record adapters/source prompt used for a started generation."""
         if self.ui_callbacks is None:
@@ -334,12 +367,12 @@ class BaseImageGenerator(ABC):
         return control_net, ip_adapter
 
     @staticmethod
-    def rename_to_edit_suffix(save_path: str, related_image_path: str, edit_suffix: str) -> None:
+    def rename_to_edit_suffix(save_path: str, related_image_path: str, edit_suffix: str) -> str:
         """Rename a generated edit output to {source_stem}{edit_suffix}{ext}, resolving collisions.
 
         Collision detection consults the application's edit history before the
         filesystem, so a counter suffix is added even when a prior output has
-        been moved out of the directory.
+        been moved out of the directory. Returns the new path.
         """
         from utils.app_info_cache import app_info_cache
         stem = Path(related_image_path).stem
@@ -359,6 +392,7 @@ class BaseImageGenerator(ABC):
         os.rename(save_path, new_path)
         app_info_cache.record_edit_output(os.path.basename(new_path))
         logger.debug(f"Renamed edit output: {save_path} -> {new_path}")
+        return new_path
 
     # Abstract methods to be implemented per generator -------------------------
 
@@ -23,6 +23,7 @@ from urllib import error as urllib_error, request as urllib_request
 from sd_runner.generators.base import BaseImageGenerator
 from utils.config import config
 from utils.logging_setup import get_logger
+from utils.run_history import run_history
 
 logger = get_logger("cloud_gen_base")
 
@@ -64,12 +65,14 @@ class CloudGenBase(BaseImageGenerator, ABC):
     ) -> str:
         """Save raw image bytes and return the local path."""
         from utils.cloud_image_saver import save_image_bytes
-        return save_image_bytes(
+        path = save_image_bytes(
             data,
             save_dir=save_dir,
             prefix=self.BACKEND_NAME or "cloud",
             index=index,
         )
+        run_history.record_image(path, self.gen_config.history_id)
+        return path
 
     def _save_image_from_url(
         self,
@@ -80,13 +83,15 @@ class CloudGenBase(BaseImageGenerator, ABC):
     ) -> str:
         """Download an image URL and save it locally, returning the local path."""
         from utils.cloud_image_saver import save_image_from_url
-        return save_image_from_url(
+        path = save_image_from_url(
             url,
             save_dir=save_dir,
             prefix=self.BACKEND_NAME or "cloud",
             index=index,
             headers=headers,
         )
+        run_history.record_image(path, self.gen_config.history_id)
+        return path
 
     # ------------------------------------------------------------------
     # HTTP helpers
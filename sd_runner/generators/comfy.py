@@ -12,12 +12,14 @@ from sd_runner.gen_config import GenConfig
 from utils.globals import Globals, WorkflowType, ComfyNodeName
 
 from sd_runner.generators.base import BaseImageGenerator
+from sd_runner.generators.comfy_pool import ComfyNode, ComfyNodePool
 from sd_runner.models import Model, LoraBundle
 from sd_runner.prompter_configuration import PrompterConfiguration
 from sd_runner.workflow_prompts.base import WorkflowPrompt
 from sd_runner.workflow_prompts.comfy import WorkflowPromptComfy
 from utils.config import config
 from utils.logging_setup import get_logger
+from utils.run_history import run_history
 from utils.utils import Utils
 
 logger = get_logger("comfy_gen")
@@ -26,6 +28,7 @@ class ComfyGen(BaseImageGenerator):
     BASE_URL = config.comfyui_url.replace("http://", "").replace("https://", "")
     PROMPT_URL = BASE_URL + "/prompt"
     CLIENT_ID = str(uuid.uuid4())
+    NODE_POOL: Optional[ComfyNodePool] = ComfyNodePool.from_config(config)  # None: BASE_URL only
     _active_connections = []  # Track all active websocket connections
 
     def __init__(self, config=GenConfig(), ui_callbacks=None):
@@ -144,39 +147,61 @@ class ComfyGen(BaseImageGenerator):
         if config.debug:
             print(data.decode("utf-8"))
         images = None
-        connection_id = str(uuid.uuid4())  # Unique per connection so ComfyUI routes events correctly
         try:
-            ws = websocket.WebSocket()
-            ws.connect("ws://{}/ws?clientId={}".format(ComfyGen.BASE_URL, connection_id))
-            ComfyGen.add_connection(ws)
-            images = ComfyGen.get_images(
-                ws,
-                json.loads(data.decode('utf-8')),
-                self.gen_config.get_prompter_config(),
-                related_image_path=self.gen_config.prompt_image_path if self.gen_config.prompt_image_path else None,
-                client_id=connection_id,
-                edit_suffix=self.gen_config.active_edit_suffix,
-            )
-            try:
-                ws.close()
-            except Exception:
-                pass
-            ComfyGen.remove_connection(ws)
+            if ComfyGen.NODE_POOL is None:
+                images = self._run_on_node(data, ComfyGen.BASE_URL)
+            else:
+                images = ComfyGen.NODE_POOL.run(
+                    lambda node: self._run_on_node(data, node.url, download_images=not node.is_local, node=node),
+                    count_images=lambda output_images: sum(len(v) for v in (output_images or {}).values()),
+                )
         except error.URLError:
             raise Exception("Failed to connect to ComfyUI. Is ComfyUI running?")
         finally:
             with self._lock:
                 self.pending_counter -= 1
                 self.update_ui_pending()
+                if self.pending_counter == 0 and ComfyGen.NODE_POOL is not None:
+                    logger.info(ComfyGen.NODE_POOL.report())
             return images
 
+    def _run_on_node(self, data: bytes, base_url: str, download_images: bool = False, node: Optional[ComfyNode] = None):
+        """Run the workflow JSON *data* on the ComfyUI node at *base_url* (host:port).
+
+        With a pool *node*, input images are uploaded to it first if it is remote.
+        """
+        workflow = json.loads(data.decode('utf-8'))
+        if node is not None:
+            workflow = ComfyGen.NODE_POOL.prepare_workflow(node, workflow)
+        connection_id = str(uuid.uuid4())  # Unique per connection so ComfyUI routes events correctly
+        ws = websocket.WebSocket()
+        ws.connect("ws://{}/ws?clientId={}".format(base_url, connection_id))
+        ComfyGen.add_connection(ws)
+        images = ComfyGen.get_images(
+            ws,
+            workflow,
+            self.gen_config.get_prompter_config(),
+            related_image_path=self.gen_config.prompt_image_path if self.gen_config.prompt_image_path else None,
+            client_id=connection_id,
+            edit_suffix=self.gen_config.active_edit_suffix,
+            base_url=base_url,
+            download_images=download_images,
+            history_id=self.gen_config.history_id,
+        )
+        try:
+            ws.close()
+        except Exception:
+            pass
+        ComfyGen.remove_connection(ws)
+        return images
+
     @staticmethod
-    def _queue_prompt(prompt, client_id: str):
+    def _queue_prompt(prompt, client_id: str, base_url: Optional[str] = None):
         body = dict(prompt)  # already {"prompt": {...workflow...}}; avoid mutating the original
         body["client_id"] = client_id
         data = json.dumps(body).encode('utf-8')
         req = request.Request(
-            "http://{}/prompt".format(ComfyGen.BASE_URL),
+            "http://{}/prompt".format(base_url or ComfyGen.BASE_URL),
             data=data,
             method='POST',
             headers={'Content-Type': 'application/json'}
@@ -184,14 +209,14 @@ class ComfyGen(BaseImageGenerator):
         return json.loads(request.urlopen(req).read())
 
     @staticmethod
-    def get_history(prompt_id):
+    def get_history(prompt_id, base_url: Optional[str] = None):
         max_retries = 5
         retry_delay = 1  # seconds
         
         for attempt in range(max_retries):
             try:
                 logger.debug(f"Getting history for prompt (attempt {attempt + 1}/{max_retries})...")
-                with request.urlopen("http://{}/history/{}".format(ComfyGen.BASE_URL, prompt_id)) as response:
+                with request.urlopen("http://{}/history/{}".format(base_url or ComfyGen.BASE_URL, prompt_id)) as response:
                     history = json.loads(response.read())
                     if prompt_id in history:
                         return history
@@ -224,9 +249,18 @@ class ComfyGen(BaseImageGenerator):
         related_image_path: Optional[str] = None,
         client_id: Optional[str] = None,
         edit_suffix: str = "",
+        base_url: Optional[str] = None,
+        download_images: bool = False,
+        history_id: Optional[int] = None,
     ):
+        """Queue *prompt* on the node at *base_url* (default BASE_URL) and collect its images.
+
+        With *download_images*, output images are written to the local ComfyUI
+        output directory, for nodes that save them on another machine. Output
+        images are recorded under the run history record *history_id*.
+        """
         logger.debug("Queueing prompt to ComfyUI...")
-        prompt_id = ComfyGen._queue_prompt(prompt, client_id or ComfyGen.CLIENT_ID)['prompt_id']
+        prompt_id = ComfyGen._queue_prompt(prompt, client_id or ComfyGen.CLIENT_ID, base_url)['prompt_id']
         logger.debug(f"Got prompt ID: {prompt_id}")
         output_images = {}
         current_node = None
@@ -285,7 +319,7 @@ class ComfyGen(BaseImageGenerator):
                 raise websocket_error
 
             logger.debug("Getting history for prompt...")
-            history = ComfyGen.get_history(prompt_id)[prompt_id]
+            history = ComfyGen.get_history(prompt_id, base_url)[prompt_id]
             
             # Process images and add EXIF data with original prompt decomposition
             for node_id in history['outputs']:
@@ -294,20 +328,28 @@ class ComfyGen(BaseImageGenerator):
                 if 'images' in node_output:
                     for image in node_output['images']:
                         logger.debug(f"Getting image: {image['filename']}")
-                        image_data = ComfyGen.get_image(image['filename'], image['subfolder'], image['type'])
+                        image_data = ComfyGen.get_image(image['filename'], image['subfolder'], image['type'], base_url)
                         images_output.append(image_data)
 
+                        # Construct the expected file path where ComfyUI saves the image
+                        save_path = os.path.join(config.get_comfyui_save_path(), image['subfolder'], image["filename"])
+                        if download_images and image['type'] == 'output':
+                            # A remote node saved it on its own machine
+                            save_path = ComfyGen.save_downloaded_image(image_data, save_path)
+
                         # TODO - this path is not working because the connection is typically hitting a 404,
                         # probably because ComfyUI is either not ready when we request or it closes it for some reason.
                         # Save image with EXIF data containing original prompt decomposition
                         if prompter_config is not None:
-                            # Construct the expected file path where ComfyUI saves the image
-                            save_path = os.path.join(config.get_comfyui_save_path(), image["filename"])
-                            if related_image_path is not None:
-                                Globals.get_image_data_extractor().add_related_image_path(save_path, related_image_path)
-                            Globals.get_image_data_extractor().add_prompt_decomposition_to_exif(save_path, prompter_config.original_positive_tags, original_negative_tags=None)
+                            Globals.get_image_data_extractor().add_generation_metadata(
+                                save_path,
+                                related_image_path=related_image_path,
+                                original_positive_tags=prompter_config.original_positive_tags,
+                            )
                             if edit_suffix and related_image_path:
-                                BaseImageGenerator.rename_to_edit_suffix(save_path, related_image_path, edit_suffix)
+                                save_path = BaseImageGenerator.rename_to_edit_suffix(save_path, related_image_path, edit_suffix)
+                        if image['type'] == 'output':
+                            run_history.record_image(save_path, history_id)
                 output_images[node_id] = images_output
 
             ComfyGen.clear_history(prompt_id)
@@ -325,12 +367,32 @@ class ComfyGen(BaseImageGenerator):
                 pass
 
     @staticmethod
-    def get_image(filename, subfolder, folder_type):
+    def get_image(filename, subfolder, folder_type, base_url: Optional[str] = None):
         data = {"filename": filename, "subfolder": subfolder, "type": folder_type}
         url_values = parse.urlencode(data)
-        with request.urlopen("http://{}/view?{}".format(ComfyGen.BASE_URL, url_values)) as response:
+        with request.urlopen("http://{}/view?{}".format(base_url or ComfyGen.BASE_URL, url_values)) as response:
             return response.read()
 
+    @staticmethod
+    def save_downloaded_image(image_data: bytes, save_path: str) -> str:
+        """Write an image from a remote node to *save_path*, or a free variant of it.
+
+        Each node numbers its outputs independently, so another node's image
+        may already hold the name. Returns the path written.
+        """
+        os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+        stem, ext = os.path.splitext(save_path)
+        candidate = save_path
+        i = 2
+        while True:
+            try:
+                with open(candidate, "xb") as f:
+                    f.write(image_data)
+                return candidate
+            except FileExistsError:
+                candidate = f"{stem}_{i}{ext}"
+                i += 1
+
     def simple_image_gen(self, prompt="", resolution=None, model=None, vae=None, n_latents=None, positive=None, negative=None, **kw):
         resolution = resolution.convert_for_model_type(model.architecture_type)
         prompt, model, vae = self.prompt_setup(WorkflowType.SIMPLE_IMAGE_GEN, "Assembling Simple Image Gen prompt", prompt=prompt, model=model, vae=vae, resolution=resolution, n_latents=n_latents, positive=positive, negative=negative, **kw)
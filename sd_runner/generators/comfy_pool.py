@@ -0,0 +1,320 @@
+"""
+Load balancing across several ComfyUI nodes.
+
+ComfyNodePool tracks each node's queue depth and health and hands every
+scheduled workflow to the least-loaded healthy node. A workflow whose node
+fails (connection refused, dropped websocket, server error) is retried on
+another node; workflow errors that would fail on any node are not.
+
+Configured with ``comfyui_nodes`` in config.json, a list of node URLs. The
+node matching ``comfyui_url`` is the local one, whose images ComfyUI already
+writes to ``comfyui_loc``; images from the other nodes are downloaded there.
+
+Workflows reference input images (control net, IP adapter, img2img, inpaint
+and upscale sources) by local path. The local node reads those directly;
+before a workflow goes to another node, each image is uploaded to that
+node's ``/upload/image`` under a content-hash name and the input rewritten.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from http.client import HTTPException
+from typing import Any, Callable, Iterable, Optional
+from urllib import error, request
+
+import websocket
+
+from utils.logging_setup import get_logger
+
+logger = get_logger("comfy_pool")
+
+
+def normalize_node_url(url: str) -> str:
+    """Return *url* as host:port, the form ComfyGen.BASE_URL uses."""
+    return url.strip().replace("http://", "").replace("https://", "").rstrip("/")
+
+
+def is_node_failure(e: Exception) -> bool:
+    """True if *e* means the node itself failed, so the work can go elsewhere."""
+    if isinstance(e, error.HTTPError):
+        return e.code >= 500
+    return isinstance(e, (error.URLError, ConnectionError, TimeoutError, HTTPException, websocket.WebSocketException))
+
+
+class ComfyNode:
+    """One ComfyUI endpoint with its last known queue depth, health and throughput."""
+
+    def __init__(self, url: str, is_local: bool = False):
+        self.url = normalize_node_url(url)
+        self.is_local = is_local
+        self.healthy = True
+        self.queue_depth = 0  # Running + pending prompts at the last poll, from any client
+        self.in_flight = 0  # Prompts this process has running on the node
+        self.polled_in_flight = 0  # in_flight when queue_depth was polled
+        self.checked_at = 0.0  # time.monotonic() of the last poll
+        self.retry_at = 0.0  # When an unhealthy node may be probed again
+        self.last_error: Optional[str] = None
+        self.completed = 0
+        self.failed = 0
+        self.images = 0
+        self.busy_seconds = 0.0
+        self.uploads: dict[str, Future] = {}  # Content hash -> input image name on the node
+
+    @property
+    def load(self) -> int:
+        # The polled depth already counts our prompts sent before the poll;
+        # adjust it by ours sent or finished since.
+        return max(self.in_flight, self.queue_depth + self.in_flight - self.polled_in_flight)
+
+    def __str__(self) -> str:
+        return self.url
+
+
+class ComfyNodePool:
+    QUEUE_POLL_INTERVAL = 2.0  # Seconds a polled queue depth stays fresh
+    RETRY_INTERVAL = 30.0  # Seconds before an unhealthy node is probed again
+    HEALTH_TIMEOUT = 5.0
+    UPLOAD_TIMEOUT = 60.0
+    IMAGE_INPUT_CLASS_TYPES = ("LoadImage", "LoadImageMask")
+
+    def __init__(self, urls: Iterable[str], local_url: Optional[str] = None,
+                 is_node_failure: Callable[[Exception], bool] = is_node_failure):
+        local = normalize_node_url(local_url) if local_url else None
+        self.nodes: list[ComfyNode] = []
+        for url in urls:
+            node = ComfyNode(url, is_local=normalize_node_url(url) == local)
+            if node.url and all(existing.url != node.url for existing in self.nodes):
+                self.nodes.append(node)
+        if not self.nodes:
+            raise ValueError("ComfyNodePool needs at least one node URL")
+        self.is_node_failure = is_node_failure
+        self._lock = threading.Lock()
+        self._first_dispatch: Optional[float] = None
+        self._last_completion: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, config) -> Optional["ComfyNodePool"]:
+        """Return a pool for config.comfyui_nodes, or None to use comfyui_url alone."""
+        urls = [url for url in (config.comfyui_nodes or []) if isinstance(url, str) and url.strip()]
+        if not urls:
+            return None
+        return cls(urls, local_url=config.comfyui_url)
+
+    # ------------------------------------------------------------------
+    # Health and queue depth
+    # ------------------------------------------------------------------
+
+    def _poll_queue_depth(self, node: ComfyNode) -> int:
+        with request.urlopen(f"http://{node.url}/queue", timeout=self.HEALTH_TIMEOUT) as response:
+            queue = json.loads(response.read())
+        return len(queue.get("queue_running", [])) + len(queue.get("queue_pending", []))
+
+    def refresh(self, node: ComfyNode) -> bool:
+        """Poll *node*'s queue; returns whether it is healthy."""
+        try:
+            depth = self._poll_queue_depth(node)
+        except Exception as e:
+            with self._lock:
+                self._mark_unhealthy(node, e)
+            return False
+        with self._lock:
+            if not node.healthy:
+                logger.info(f"ComfyUI node {node} is healthy again")
+                node.uploads.clear()  # It may have restarted without its input folder
+            node.healthy = True
+            node.queue_depth = depth
+            node.polled_in_flight = node.in_flight
+            node.checked_at = time.monotonic()
+            node.last_error = None
+        return True
+
+    def _mark_unhealthy(self, node: ComfyNode, e: Exception) -> None:
+        # Caller holds lock.
+        if node.healthy:
+            logger.warning(f"ComfyUI node {node} is unavailable: {e}")
+        node.healthy = False
+        node.last_error = str(e)
+        node.checked_at = time.monotonic()
+        node.retry_at = node.checked_at + self.RETRY_INTERVAL
+
+    # ------------------------------------------------------------------
+    # Dispatch
+    # ------------------------------------------------------------------
+
+    def acquire(self, exclude: Iterable[str] = ()) -> Optional[ComfyNode]:
+        """Reserve the least-loaded healthy node not in *exclude*, or None."""
+        exclude = set(exclude)
+        now = time.monotonic()
+        with self._lock:
+            stale = [node for node in self.nodes if node.url not in exclude and
+                     (node.healthy and now - node.checked_at > self.QUEUE_POLL_INTERVAL
+                      or not node.healthy and now >= node.retry_at)]
+        for node in stale:
+            self.refresh(node)
+
+        with self._lock:
+            candidates = [node for node in self.nodes if node.healthy and node.url not in exclude]
+            if not candidates:
+                return None
+            # min() keeps configured order among equally loaded nodes
+            node = min(candidates, key=lambda n: n.load)
+            node.in_flight += 1
+            if self._first_dispatch is None:
+                self._first_dispatch = time.monotonic()
+            return node
+
+    def release(self, node: ComfyNode, elapsed: float, images: int = 0, failure: Optional[Exception] = None) -> None:
+        with self._lock:
+            node.in_flight -= 1
+            node.busy_seconds += elapsed
+            if failure is None:
+                node.completed += 1
+                node.images += images
+                self._last_completion = time.monotonic()
+            else:
+                node.failed += 1
+                if self.is_node_failure(failure):
+                    self._mark_unhealthy(node, failure)
+
+    def run(self, task: Callable[[ComfyNode], Any], count_images: Callable[[Any], int] = lambda result: 0) -> Any:
+        """Run *task* on the least-loaded healthy node, moving to another node if it fails.
+
+        Each node is tried at most once. Errors that are not node failures are
+        raised at once. *count_images* reports a result's image count for the
+        throughput stats.
+        """
+        tried = []
+        last_error = None
+        while True:
+            node = self.acquire(exclude=tried)
+            if node is None:
+                message = "No healthy ComfyUI node available"
+                if last_error is not None:
+                    message += f" (last error: {last_error})"
+                raise Exception(message)
+            start = time.monotonic()
+            try:
+                result = task(node)
+            except Exception as e:
+                self.release(node, time.monotonic() - start, failure=e)
+                if not self.is_node_failure(e):
+                    raise
+                logger.warning(f"ComfyUI node {node} failed: {e}; re-queueing on another node")
+                tried.append(node.url)
+                last_error = e
+                continue
+            self.release(node, time.monotonic() - start, images=count_images(result))
+            return result
+
+    # ------------------------------------------------------------------
+    # Input images
+    # ------------------------------------------------------------------
+
+    def prepare_workflow(self, node: ComfyNode, workflow: dict) -> dict:
+        """Upload the local input images of *workflow* to a remote *node* and point its inputs at them.
+
+        *workflow* is the API body ({"prompt": {...}}) and is modified in place.
+        Inputs that are not existing local files (already node-side names) are
+        left alone.
+        """
+        if node.is_local:
+            return workflow
+        for node_data in workflow.get("prompt", {}).values():
+            if node_data.get("class_type") not in self.IMAGE_INPUT_CLASS_TYPES:
+                continue
+            inputs = node_data.get("inputs", {})
+            image = inputs.get("image")
+            if isinstance(image, str) and os.path.isabs(image) and os.path.isfile(image):
+                inputs["image"] = self.upload_image(node, image)
+        return workflow
+
+    def upload_image(self, node: ComfyNode, path: str) -> str:
+        """Return the name of *path*'s content in *node*'s input folder, uploading it once."""
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        with self._lock:
+            future = node.uploads.get(digest)
+            is_uploader = future is None
+            if is_uploader:
+                future = Future()
+                node.uploads[digest] = future
+        if not is_uploader:
+            return future.result()  # Only callers with the same content wait
+        try:
+            name = self._post_image(node, path, data, digest)
+        except Exception as e:
+            with self._lock:
+                node.uploads.pop(digest, None)
+            future.set_exception(e)
+            raise
+        future.set_result(name)
+        return name
+
+    def _post_image(self, node: ComfyNode, path: str, data: bytes, digest: str) -> str:
+        boundary = uuid.uuid4().hex
+        filename = digest + (os.path.splitext(path)[1] or ".png")
+        body = b"".join((
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="image"; filename="{filename}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n".encode(),
+            data,
+            f"\r\n--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="overwrite"\r\n\r\ntrue\r\n'
+            f"--{boundary}--\r\n".encode(),
+        ))
+        req = request.Request(
+            f"http://{node.url}/upload/image", data=body, method="POST",
+            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        )
+        with request.urlopen(req, timeout=self.UPLOAD_TIMEOUT) as response:
+            uploaded = json.loads(response.read())
+        logger.debug(f"Uploaded {path} to ComfyUI node {node} as {uploaded['name']}")
+        subfolder = uploaded.get("subfolder")
+        return f"{subfolder}/{uploaded['name']}" if subfolder else uploaded["name"]
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+
+    def stats(self) -> list[dict]:
+        """Per-node counters, with images per minute over the pool's active window."""
+        with self._lock:
+            window = 0.0
+            if self._first_dispatch is not None and self._last_completion is not None:
+                window = max(0.0, self._last_completion - self._first_dispatch)
+            return [{
+                "url": node.url,
+                "local": node.is_local,
+                "healthy": node.healthy,
+                "queue_depth": node.queue_depth,
+                "in_flight": node.in_flight,
+                "completed": node.completed,
+                "failed": node.failed,
+                "images": node.images,
+                "avg_seconds": node.busy_seconds / node.completed if node.completed else 0.0,
+                "images_per_minute": node.images * 60 / window if window > 0 else 0.0,
+                "last_error": node.last_error,
+            } for node in self.nodes]
+
+    def report(self) -> str:
+        lines = ["ComfyUI node throughput:"]
+        for s in self.stats():
+            state = "healthy" if s["healthy"] else f"unhealthy ({s['last_error']})"
+            lines.append(
+                f"  {s['url']}{' (local)' if s['local'] else ''}: {s['completed']} prompts, "
+                f"{s['images']} images, {s['failed']} failed, {s['avg_seconds']:.1f}s/prompt, "
+                f"{s['images_per_minute']:.1f} images/min, {state}")
+        return "\n".join(lines)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for node in self.nodes:
+                node.completed = node.failed = node.images = 0
+                node.busy_seconds = 0.0
+            self._first_dispatch = self._last_completion = None
@@ -0,0 +1,135 @@
+"""
+Shared cache of base64-encoded input images for the HTTP backends.
+
+SD WebUI, Fooocus and SwarmUI send control net, IP adapter and init images
+inline as base64. A run crossing many models with one input image would
+otherwise read and encode the same file for every job. Entries are keyed by
+(path, size, mtime) so an edited file is encoded again, and the cache is
+bounded by the total length of the encoded strings.
+
+Encoding runs on a small dedicated pool: run_workflow prefetches a job's
+input images on the scheduling thread, and a worker asking for one that is
+still being encoded waits for that encode instead of starting another.
+"""
+
+import base64
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from utils.logging_setup import get_logger
+
+logger = get_logger("encoded_inputs")
+
+
+def _encode_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode("utf-8")
+
+
+class EncodedInputCache:
+    MAX_BYTES = 256 * 1024 * 1024  # Total length of cached encoded strings
+    ENCODE_WORKERS = 2
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = EncodedInputCache.MAX_BYTES if max_bytes is None else max_bytes
+        self._entries: OrderedDict = OrderedDict()  # (path, size, mtime_ns) -> Future[str]
+        self._total_bytes = 0
+        # Reentrant: a done callback runs in the submitting thread if the encode already finished
+        self._lock = threading.RLock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(path: str) -> tuple:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"File does not exist: {path}")
+        stat = os.stat(path)
+        if stat.st_size == 0:
+            raise ValueError(f"File is empty: {path}")
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    def _submit(self, key: tuple) -> Future:
+        # Caller holds lock
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=EncodedInputCache.ENCODE_WORKERS,
+                                                thread_name_prefix="encode_input")
+        future = self._executor.submit(_encode_file, key[0])
+        self._entries[key] = future
+        self.misses += 1
+        future.add_done_callback(lambda f, key=key: self._on_encoded(key, f))
+        return future
+
+    def _on_encoded(self, key: tuple, future: Future) -> None:
+        with self._lock:
+            if self._entries.get(key) is not future:
+                return
+            if future.exception() is not None:
+                logger.debug(f"Failed to encode {key[0]}: {future.exception()}")
+                del self._entries[key]
+                return
+            self._total_bytes += len(future.result())
+            self._evict()
+
+    def _evict(self) -> None:
+        # Caller holds lock. Only finished entries count against the bound.
+        for key in list(self._entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            future = self._entries[key]
+            if future.done():
+                del self._entries[key]
+                self._total_bytes -= len(future.result())
+                self.evictions += 1
+
+    def _lookup(self, path: str, count_hit: bool) -> Future:
+        key = self._key(path)
+        with self._lock:
+            future = self._entries.get(key)
+            if future is None:
+                return self._submit(key)
+            self._entries.move_to_end(key)
+            if count_hit:
+                self.hits += 1
+            return future
+
+    def prefetch(self, paths: Iterable[Optional[str]]) -> None:
+        """Start encoding *paths* in the background; missing files are left for get() to report."""
+        for path in paths:
+            if not path:
+                continue
+            try:
+                self._lookup(path, count_hit=False)
+            except (OSError, ValueError):
+                pass
+
+    def get(self, path: str) -> str:
+        """Return the base64 encoding of the file at *path*.
+
+        A hit is a file already encoded or being encoded, including by prefetch;
+        a miss is every encode started.
+        """
+        return self._lookup(path, count_hit=True).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+
+encoded_inputs = EncodedInputCache()
@@ -9,10 +9,12 @@ from urllib import request as urllib_request, error as urllib_error
 
 from sd_runner.gen_config import GenConfig
 from sd_runner.generators.base import BaseImageGenerator
+from sd_runner.generators.encoded_inputs import encoded_inputs
 from sd_runner.model_adapters import LoraBundle
 from sd_runner.models import Model
 from utils.config import config
 from utils.globals import WorkflowType
+from utils.run_history import run_history
 
 
 def _timestamp_str() -> str:
@@ -39,6 +41,7 @@ class FooocusGen(BaseImageGenerator):
     BASE_URL = config.fooocus_url
     SAVE_PATH = config.fooocus_save_path
     FILE_PREFIX = "Fooocus"
+    ENCODES_INPUT_IMAGES = True
 
     TXT2IMG_ENDPOINT = "v1/generation/text-to-image"
     IMG_PROMPT_ENDPOINT = "v1/generation/image-prompt"
@@ -61,8 +64,7 @@ class FooocusGen(BaseImageGenerator):
 
     @staticmethod
     def _read_image_b64(path: str) -> str:
-        with open(path, "rb") as f:
-            return base64.b64encode(f.read()).decode("utf-8")
+        return encoded_inputs.get(path)
 
     def _loras_payload(self, lora) -> list:
         if lora is None:
@@ -125,6 +127,7 @@ class FooocusGen(BaseImageGenerator):
                 save_path = os.path.join(cls.SAVE_PATH, f"{cls.FILE_PREFIX}_{_timestamp_str()}_{i}.png")
                 with open(save_path, "wb") as fh:
                     fh.write(img_bytes)
+                run_history.record_image(save_path, self.gen_config.history_id)
 
     def queue_prompt(self, endpoint: str, payload: dict) -> None:
         try:
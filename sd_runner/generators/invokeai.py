@@ -1,18 +1,24 @@
 """InvokeAI backend."""
 
+import hashlib
 import json
 import os
 import threading
 import time
-from typing import Optional
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Optional
 from urllib import request as urllib_request, error as urllib_error, parse as urllib_parse
 
+import websocket
+
 from sd_runner.gen_config import GenConfig
 from sd_runner.generators.base import BaseImageGenerator
 from sd_runner.model_adapters import LoraBundle
 from sd_runner.models import Model
 from utils.config import config
 from utils.globals import WorkflowType
+from utils.run_history import run_history
 
 
 def _timestamp_str() -> str:
@@ -29,6 +35,110 @@ def _edge(src_node: str, src_field: str, dst_node: str, dst_field: str) -> dict:
     }
 
 
+class InvokeAIQueueEvents:
+    """Queue item status updates pushed over InvokeAI's Socket.IO endpoint.
+
+    Speaks just enough Engine.IO 4 / Socket.IO 5 over websocket-client to
+    subscribe to one queue and record ``queue_item_status_changed`` events.
+    A background thread reads the socket; waiters block on ``wait``.
+    """
+
+    TERMINAL_STATUSES = ("completed", "failed", "canceled")
+    CONNECT_TIMEOUT = 5.0
+    RETRY_INTERVAL = 30.0  # Seconds before reconnecting after a failure
+    MAX_TRACKED_ITEMS = 10000  # Statuses kept, including other clients' items
+
+    def __init__(self, base_url: str, queue_id: str, on_disconnect=None):
+        ws_base = base_url.rstrip("/").replace("https://", "wss://").replace("http://", "ws://")
+        self.url = f"{ws_base}/ws/socket.io/?EIO=4&transport=websocket"
+        self.queue_id = queue_id
+        self.on_disconnect = on_disconnect
+        self.connected = False
+        self._statuses: OrderedDict = OrderedDict()
+        self._cond = threading.Condition()
+        self._retry_at = 0.0
+
+    def ensure_connected(self) -> bool:
+        """Connect and subscribe if not connected; False if the server has no event socket."""
+        with self._cond:
+            if self.connected:
+                return True
+            if time.monotonic() < self._retry_at:
+                return False
+            try:
+                ws = websocket.create_connection(self.url, timeout=self.CONNECT_TIMEOUT)
+                handshake = ws.recv()  # Engine.IO open packet: 0{"sid":..., "pingInterval":..., ...}
+                if not handshake.startswith("0"):
+                    raise ConnectionError(f"Unexpected Engine.IO handshake: {handshake[:40]}")
+                options = json.loads(handshake[1:])
+                ws.send("40")
+                if not ws.recv().startswith("40"):
+                    raise ConnectionError("Socket.IO namespace connect refused")
+                ws.send("42" + json.dumps(["subscribe_queue", {"queue_id": self.queue_id}]))
+                # A dead connection misses pings; time out a little after one is due
+                ws.settimeout((options.get("pingInterval", 25000) + options.get("pingTimeout", 20000)) / 1000)
+            except Exception as exc:
+                self._retry_at = time.monotonic() + self.RETRY_INTERVAL
+                print(f"[InvokeAI] Queue events unavailable, polling instead: {exc}")
+                return False
+            self.connected = True
+        threading.Thread(target=self._listen, args=(ws,), daemon=True, name="invokeai-queue-events").start()
+        return True
+
+    def _listen(self, ws) -> None:
+        try:
+            while True:
+                packet = ws.recv()
+                if packet == "2":
+                    ws.send("3")  # Engine.IO pong
+                elif packet.startswith("42"):
+                    event = json.loads(packet[2:])
+                    if event and event[0] == "queue_item_status_changed" and len(event) > 1:
+                        self._record(event[1])
+        except Exception:
+            pass
+        finally:
+            try:
+                ws.close()
+            except Exception:
+                pass
+            with self._cond:
+                self.connected = False
+                self._cond.notify_all()
+            if self.on_disconnect is not None:
+                self.on_disconnect()
+
+    def _record(self, payload: dict) -> None:
+        # Newer servers send the item fields flat, older ones nest them in queue_item
+        item = payload.get("queue_item") or payload
+        item_id = item.get("item_id")
+        status = item.get("status") or payload.get("status")
+        if item_id is None or status is None:
+            return
+        with self._cond:
+            self._statuses[item_id] = status
+            self._statuses.move_to_end(item_id)
+            while len(self._statuses) > self.MAX_TRACKED_ITEMS:
+                self._statuses.popitem(last=False)
+            self._cond.notify_all()
+
+    def status(self, item_id) -> Optional[str]:
+        with self._cond:
+            return self._statuses.get(item_id)
+
+    def wait(self, timeout: float) -> bool:
+        """Block until any event arrives or the connection drops; False on timeout."""
+        with self._cond:
+            if not self.connected:
+                return False
+            return self._cond.wait(timeout)
+
+    def forget(self, item_ids: Iterable) -> None:
+        with self._cond:
+            for item_id in item_ids:
+                self._statuses.pop(item_id, None)
+
+
 class InvokeAIGen(BaseImageGenerator):
     """Generator for InvokeAI (invoke-ai/InvokeAI), targeting the v3.x queue API.
 
@@ -38,9 +148,14 @@ class InvokeAIGen(BaseImageGenerator):
     match is found the raw ``model.id`` is passed as-is, which lets users
     configure model keys directly in ``model_tags``.
 
-    Image retrieval after generation relies on listing the most recent
-    non-intermediate images from the InvokeAI gallery.  For best reliability
-    avoid running other generations concurrently while this generator is active.
+    Images are resolved from the session results of the batch's own queue
+    items, so concurrent batches and other users of the server do not mix.
+    Completion is signalled by queue events, with polling as a fallback.
+    Servers that do not return item IDs from ``enqueue_batch`` fall back to
+    the most recent gallery images.
+
+    Uploaded input images are deduplicated by content hash until the event
+    connection drops, which is treated as the end of the server session.
 
     Set ``invokeai_url`` and optionally ``invokeai_save_path`` in
     ``config.json``.
@@ -50,9 +165,17 @@ class InvokeAIGen(BaseImageGenerator):
     SAVE_PATH = config.invokeai_save_path
     FILE_PREFIX = "InvokeAI"
     QUEUE_ID = "default"
+    QUEUE_TIMEOUT = 300.0
+    STATUS_POLL_INTERVAL = 2.0  # Without queue events
+    EVENT_SAFETY_POLL_INTERVAL = 15.0  # With queue events, in case one is missed
+    DOWNLOAD_WORKERS = 4
 
     _model_cache: Optional[dict] = None
     _model_cache_lock = threading.Lock()
+    _uploaded_images: dict[str, Future] = {}  # Content hash -> image_name on the server
+    _upload_lock = threading.Lock()
+    _queue_events: Optional[InvokeAIQueueEvents] = None
+    _queue_events_lock = threading.Lock()
 
     def __init__(self, gen_config=GenConfig(), ui_callbacks=None):
         super().__init__(gen_config, ui_callbacks)
@@ -95,11 +218,43 @@ class InvokeAIGen(BaseImageGenerator):
     # Image upload (for img2img / control_net / ip_adapter inputs)
     # -------------------------------------------------------------------------
 
+    @classmethod
+    def clear_upload_cache(cls) -> None:
+        with cls._upload_lock:
+            cls._uploaded_images = {}
+
     def _upload_image(self, path: str) -> str:
-        """Upload an image to InvokeAI and return its image_name."""
-        url = f"{type(self).BASE_URL}/api/v1/images/upload?is_intermediate=true"
+        """Upload an image to InvokeAI and return its image_name.
+
+        An image with the same content already uploaded this server session
+        is not sent again.
+        """
+        cls = type(self)
         with open(path, "rb") as f:
             data = f.read()
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        with cls._upload_lock:
+            uploads = cls._uploaded_images
+            future = uploads.get(digest)
+            is_uploader = future is None
+            if is_uploader:
+                future = Future()
+                uploads[digest] = future
+        if not is_uploader:
+            return future.result()  # Only callers with the same content wait
+        try:
+            image_name = self._post_upload(path, data)
+        except Exception as e:
+            with cls._upload_lock:
+                if uploads.get(digest) is future:
+                    del uploads[digest]
+            future.set_exception(e)
+            raise
+        future.set_result(image_name)
+        return image_name
+
+    def _post_upload(self, path: str, data: bytes) -> str:
+        url = f"{type(self).BASE_URL}/api/v1/images/upload?is_intermediate=true"
         boundary = "InvokeAIBoundary"
         body = (
             f"--{boundary}\r\n"
@@ -231,7 +386,18 @@ class InvokeAIGen(BaseImageGenerator):
     # Queue management
     # -------------------------------------------------------------------------
 
-    def _enqueue(self, graph: dict, n_runs: int = 1) -> str:
+    @classmethod
+    def _get_queue_events(cls) -> Optional[InvokeAIQueueEvents]:
+        """Return the connected event listener, or None to poll instead."""
+        with cls._queue_events_lock:
+            if cls._queue_events is None:
+                cls._queue_events = InvokeAIQueueEvents(cls.BASE_URL, cls.QUEUE_ID,
+                                                        on_disconnect=cls.clear_upload_cache)
+            events = cls._queue_events
+        return events if events.ensure_connected() else None
+
+    def _enqueue(self, graph: dict, n_runs: int = 1) -> tuple[str, list]:
+        """Enqueue a batch; returns (batch_id, queue item IDs, empty if not reported)."""
         cls = type(self)
         url = f"{cls.BASE_URL}/api/v2/queue/{cls.QUEUE_ID}/enqueue_batch"
         payload = {"batch": {"graph": graph, "runs": n_runs}, "prepend": False}
@@ -240,7 +406,83 @@ class InvokeAIGen(BaseImageGenerator):
             headers={"Content-Type": "application/json"}, method="POST",
         )
         with urllib_request.urlopen(req, timeout=30) as resp:
-            return json.loads(resp.read())["batch"]["batch_id"]
+            result = json.loads(resp.read())
+        return result["batch"]["batch_id"], result.get("item_ids") or []
+
+    def _get_queue_item(self, item_id) -> dict:
+        cls = type(self)
+        url = f"{cls.BASE_URL}/api/v2/queue/{cls.QUEUE_ID}/i/{item_id}"
+        with urllib_request.urlopen(urllib_request.Request(url), timeout=10) as resp:
+            return json.loads(resp.read())
+
+    def _wait_for_items(self, item_ids: list, events: Optional[InvokeAIQueueEvents],
+                        timeout: Optional[float] = None) -> dict:
+        """Wait until every queue item has finished; returns {item_id: queue item}.
+
+        Statuses come from queue events when connected. Items are also polled
+        directly, often when there are no events and occasionally otherwise in
+        case an event was missed.
+        """
+        cls = type(self)
+        timeout = timeout or cls.QUEUE_TIMEOUT
+        deadline = time.monotonic() + timeout
+        finished = {}
+        pending = list(item_ids)
+        poll_due = time.monotonic()
+        try:
+            while True:
+                now = time.monotonic()
+                for item_id in pending:
+                    from_event = events is not None and events.status(item_id) in InvokeAIQueueEvents.TERMINAL_STATUSES
+                    if from_event or now >= poll_due:
+                        item = self._get_queue_item(item_id)
+                        if item.get("status") in InvokeAIQueueEvents.TERMINAL_STATUSES:
+                            finished[item_id] = item
+                if now >= poll_due:
+                    connected = events is not None and events.connected
+                    poll_due = now + (cls.EVENT_SAFETY_POLL_INTERVAL if connected else cls.STATUS_POLL_INTERVAL)
+                pending = [item_id for item_id in pending if item_id not in finished]
+                if not pending:
+                    return finished
+                if now >= deadline:
+                    raise TimeoutError(f"InvokeAI queue items {pending} did not complete within {timeout}s")
+                wait_for = max(0.0, min(poll_due, deadline) - time.monotonic())
+                if events is None or not events.wait(wait_for):
+                    if events is not None and not events.connected:
+                        # Lost the event socket; fall back to regular polling
+                        poll_due = min(poll_due, time.monotonic() + cls.STATUS_POLL_INTERVAL)
+                        wait_for = max(0.0, min(poll_due, deadline) - time.monotonic())
+                    time.sleep(wait_for)
+        finally:
+            if events is not None:
+                events.forget(item_ids)
+
+    @staticmethod
+    def _result_image_names(item: dict) -> list:
+        """Names of the images saved by a finished queue item's session."""
+        session = item.get("session") or {}
+        results = session.get("results") or {}
+        save_ids = (session.get("source_prepared_mapping") or {}).get("save_image")
+        if save_ids is None:
+            save_ids = list(results)
+        names = []
+        for node_id in save_ids:
+            image = (results.get(node_id) or {}).get("image") or {}
+            if image.get("image_name"):
+                names.append(image["image_name"])
+        return names
+
+    def _download_image(self, image_name: str) -> bytes:
+        img_url = f"{type(self).BASE_URL}/api/v1/images/{urllib_parse.quote(image_name)}/full"
+        with urllib_request.urlopen(urllib_request.Request(img_url), timeout=30) as resp:
+            return resp.read()
+
+    def _download_images(self, image_names: list) -> list:
+        """Download images concurrently, returning their bytes in the order given."""
+        if len(image_names) <= 1:
+            return [self._download_image(name) for name in image_names]
+        with ThreadPoolExecutor(max_workers=min(type(self).DOWNLOAD_WORKERS, len(image_names))) as pool:
+            return list(pool.map(self._download_image, image_names))
 
     def _poll_batch(self, batch_id: str, n_runs: int, timeout: float = 300.0) -> None:
         cls = type(self)
@@ -262,27 +504,41 @@ class InvokeAIGen(BaseImageGenerator):
         listing_url = f"{cls.BASE_URL}/api/v1/images/?{params}"
         with urllib_request.urlopen(urllib_request.Request(listing_url), timeout=10) as resp:
             items = json.loads(resp.read()).get("items", [])[:n]
-        result = []
-        for item in items:
-            name = item.get("image_name", "")
-            if not name:
-                continue
-            img_url = f"{cls.BASE_URL}/api/v1/images/{name}/full"
-            with urllib_request.urlopen(urllib_request.Request(img_url), timeout=30) as resp:
-                result.append(resp.read())
-        return result
+        return self._download_images([item["image_name"] for item in items if item.get("image_name")])
+
+    def _run_batch(self, graph: dict, n_runs: int) -> list:
+        """Enqueue a batch and return the bytes of the images it produced."""
+        events = self._get_queue_events()
+        batch_id, item_ids = self._enqueue(graph, n_runs)
+        if not item_ids:
+            print("[InvokeAI] Server did not report queue item IDs; using the most recent gallery images")
+            self._poll_batch(batch_id, n_runs)
+            return self._download_recent_images(n_runs)
+        finished = self._wait_for_items(item_ids, events)
+        failed = [item_id for item_id in item_ids if finished[item_id].get("status") != "completed"]
+        if failed:
+            errors = {finished[item_id].get("error_message") or finished[item_id].get("error_reason")
+                      for item_id in failed} - {None}
+            print(f"[InvokeAI] {len(failed)} of {len(item_ids)} queue items did not complete"
+                  + (f": {'; '.join(sorted(errors))}" if errors else ""))
+        image_names = []
+        for item_id in item_ids:
+            if item_id not in failed:
+                image_names.extend(self._result_image_names(finished[item_id]))
+        return self._download_images(image_names)
 
     def queue_prompt(self, graph: dict, n_runs: int = 1) -> None:
         cls = type(self)
         try:
-            batch_id = self._enqueue(graph, n_runs)
-            self._poll_batch(batch_id, n_runs)
-            images = self._download_recent_images(n_runs)
+            images = self._run_batch(graph, n_runs)
             for i, img_bytes in enumerate(images):
                 save_path = os.path.join(cls.SAVE_PATH, f"{cls.FILE_PREFIX}_{_timestamp_str()}_{i}.png")
                 with open(save_path, "wb") as fh:
                     fh.write(img_bytes)
+                run_history.record_image(save_path, self.gen_config.history_id)
         except urllib_error.URLError as exc:
+            # The server may have restarted, losing earlier uploads
+            cls.clear_upload_cache()
             raise Exception(f"Failed to connect to InvokeAI. Is it running? ({exc})") from exc
         finally:
             with self._lock:
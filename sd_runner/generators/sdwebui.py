@@ -11,10 +11,12 @@ from sd_runner.gen_config import GenConfig
 from utils.globals import Globals, WorkflowType, PromptTypeSDWebUI
 
 from sd_runner.generators.base import BaseImageGenerator
+from sd_runner.generators.encoded_inputs import encoded_inputs
 from sd_runner.models import Model, LoraBundle
 from sd_runner.prompter_configuration import PrompterConfiguration
 from sd_runner.workflow_prompts.sdwebui import WorkflowPromptSDWebUI
 from utils.config import config
+from utils.run_history import run_history
 from utils.utils import Utils
 
 
@@ -26,18 +28,7 @@ def timestamp_str():
 
 def encode_file_to_base64(path):
     try:
-        if not os.path.exists(path):
-            raise FileNotFoundError(f"File does not exist: {path}")
-        
-        file_size = os.path.getsize(path)
-        
-        if file_size == 0:
-            raise ValueError(f"File is empty: {path}")
-        
-        with open(path, 'rb') as file:
-            data = file.read()
-            encoded = base64.b64encode(data).decode('utf-8')
-            return encoded
+        return encoded_inputs.get(path)
     except Exception as e:
         print(f"[CLIENT ERROR] Failed to encode file {path}: {type(e).__name__}: {e}")
         raise
@@ -53,6 +44,7 @@ class SDWebuiGen(BaseImageGenerator):
     BASE_URL = config.sd_webui_url
     SAVE_PATH = config.sd_webui_save_path
     FILE_PREFIX = "SDWebUI"
+    ENCODES_INPUT_IMAGES = True
     TXT_2_IMG = "sdapi/v1/txt2img"
     IMG_2_IMG = "sdapi/v1/img2img"
     _has_run_txt2img = False  # Class-level flag to track if txt2img has been run
@@ -136,11 +128,13 @@ class SDWebuiGen(BaseImageGenerator):
             cls = type(self)
             save_path = os.path.join(cls.SAVE_PATH, f'{cls.FILE_PREFIX}_{timestamp_str()}_{index}.png')
             decode_and_save_base64(image, save_path)
-            if related_image_path is not None:
-                Globals.get_image_data_extractor().add_related_image_path(save_path, related_image_path)
-            # Add original prompt decomposition to EXIF data
-            if prompter_config is not None:
-                Globals.get_image_data_extractor().add_prompt_decomposition_to_exif(save_path, prompter_config.original_positive_tags, original_negative_tags=None)
+            # Add related image path and original prompt decomposition to EXIF data in one write
+            Globals.get_image_data_extractor().add_generation_metadata(
+                save_path,
+                related_image_path=related_image_path,
+                original_positive_tags=prompter_config.original_positive_tags if prompter_config is not None else None,
+            )
+            run_history.record_image(save_path, self.gen_config.history_id)
         with self._lock:
             self.pending_counter -= 1
             self.update_ui_pending()
@@ -10,10 +10,12 @@ from urllib import request as urllib_request, error as urllib_error
 
 from sd_runner.gen_config import GenConfig
 from sd_runner.generators.base import BaseImageGenerator
+from sd_runner.generators.encoded_inputs import encoded_inputs
 from sd_runner.model_adapters import LoraBundle
 from sd_runner.models import Model
 from utils.config import config
 from utils.globals import WorkflowType
+from utils.run_history import run_history
 
 
 def _timestamp_str() -> str:
@@ -39,6 +41,7 @@ class SwarmUIGen(BaseImageGenerator):
     BASE_URL = config.swarmui_url
     SAVE_PATH = config.swarmui_save_path
     FILE_PREFIX = "SwarmUI"
+    ENCODES_INPUT_IMAGES = True
     GENERATE_ENDPOINT = "API/GenerateText2Image"
     SESSION_ENDPOINT = "API/GetNewSession"
 
@@ -94,8 +97,7 @@ class SwarmUIGen(BaseImageGenerator):
 
     @staticmethod
     def _read_image_b64(path: str) -> str:
-        with open(path, "rb") as f:
-            return base64.b64encode(f.read()).decode("utf-8")
+        return encoded_inputs.get(path)
 
     # -------------------------------------------------------------------------
     # Core generation
@@ -114,6 +116,7 @@ class SwarmUIGen(BaseImageGenerator):
                 )
                 with open(save_path, "wb") as fh:
                     fh.write(base64.b64decode(img_data))
+                run_history.record_image(save_path, self.gen_config.history_id)
         except urllib_error.URLError as exc:
             raise Exception(f"Failed to connect to SwarmUI. Is it running? ({exc})") from exc
         finally:
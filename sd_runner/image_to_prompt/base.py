@@ -13,6 +13,11 @@ class ImageToPromptProvider(ABC):
     def name(self) -> str:
         """Human-readable provider name."""
 
+    @property
+    def cache_variant(self) -> str:
+        """Identifies the model and default settings behind this provider's output."""
+        return self.name
+
     @abstractmethod
     def generate(self, request: ImageToPromptRequest) -> ImageToPromptResult:
         """Generate prompt output for a single image request."""
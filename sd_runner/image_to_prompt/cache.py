@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import atexit
+import hashlib
+import os
+import threading
+
+from utils.logging_setup import get_logger
+from utils.pickleable_cache import PicklableCache
+
+logger = get_logger("image_to_prompt.cache")
+
+# Respects SD_RUNNER_CACHE_DIR so tests can redirect it (mirrors the blacklist filter cache).
+_DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "configs")
+
+
+def _resolve_cache_file() -> str:
+    override = os.environ.get("SD_RUNNER_CACHE_DIR")
+    base = override if override else _DEFAULT_CACHE_DIR
+    return os.path.join(base, "image_to_prompt_cache.pkl")
+
+
+class ImageToPromptCache:
+    """Persistent cache of image->prompt outputs keyed by image content.
+
+    Keys combine a hash of the image bytes with a caller-supplied variant
+    (backend, model and generation settings), so a moved or renamed image
+    still hits and a changed image never does. Content hashes are memoized
+    per (path, size, mtime) for the life of the process.
+    """
+
+    MAXSIZE = 50000
+    SAVE_INTERVAL = 25  # Persist after this many new entries
+    HASH_CHUNK_SIZE = 1 << 20
+
+    def __init__(self, filename: str | None = None, maxsize: int = MAXSIZE):
+        self.filename = filename or _resolve_cache_file()
+        self._cache = PicklableCache.load_or_create(self.filename, maxsize=maxsize)
+        self._cache.maxsize = maxsize
+        self._hash_memo: dict[tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+        self._unsaved = 0
+
+    @classmethod
+    def content_hash(cls, image_path: str) -> str:
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(image_path, "rb") as f:
+            for block in iter(lambda: f.read(cls.HASH_CHUNK_SIZE), b""):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    def get_content_hash(self, image_path: str) -> str:
+        stat = os.stat(image_path)
+        memo_key = (os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            content_hash = self._hash_memo.get(memo_key)
+        if content_hash is None:
+            content_hash = ImageToPromptCache.content_hash(image_path)
+            with self._lock:
+                self._hash_memo[memo_key] = content_hash
+        return content_hash
+
+    def _key(self, image_path: str, variant: str) -> str:
+        return f"{self.get_content_hash(image_path)}|{variant}"
+
+    def get(self, image_path: str, variant: str):
+        """Return the cached value for the image, or None. Unreadable images are misses."""
+        try:
+            return self._cache.get(self._key(image_path, variant))
+        except OSError:
+            return None
+
+    def put(self, image_path: str, variant: str, value) -> None:
+        try:
+            key = self._key(image_path, variant)
+        except OSError:
+            return
+        self._cache.put(key, value)
+        with self._lock:
+            self._unsaved += 1
+            should_save = self._unsaved >= ImageToPromptCache.SAVE_INTERVAL
+        if should_save:
+            self.save()
+
+    def save(self) -> None:
+        with self._lock:
+            if self._unsaved == 0:
+                return
+            self._unsaved = 0
+        try:
+            os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+            self._cache.save(self.filename)
+        except Exception as e:
+            logger.warning(f"Failed to save image to prompt cache: {e}")
+
+    def clear(self) -> None:
+        self._cache.clear()
+        with self._lock:
+            self._hash_memo.clear()
+            self._unsaved = 1
+        self.save()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+_shared_cache: ImageToPromptCache | None = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_image_to_prompt_cache() -> ImageToPromptCache:
+    """Return the process-wide cache, loading it on first use."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ImageToPromptCache()
+            atexit.register(_shared_cache.save)
+        return _shared_cache
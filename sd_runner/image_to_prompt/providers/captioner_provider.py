@@ -2,10 +2,12 @@ from __future__ import annotations
 
 import os
 import threading
+from typing import Callable, Optional
 import warnings
 
 from extensions.hf_hub_api import ensure_hf_snapshot
 from sd_runner.image_to_prompt.base import ImageToPromptProvider
+from sd_runner.image_to_prompt.cache import ImageToPromptCache, get_image_to_prompt_cache
 from sd_runner.image_to_prompt.types import (
     ImageToPromptBackend,
     ImageToPromptRequest,
@@ -16,26 +18,48 @@ from sd_runner.image_to_prompt.types import (
 class CaptionerProvider(ImageToPromptProvider):
     """BLIP caption-based provider.
 
-    Uses Transformers BLIP with automatic HF download.
+    Uses Transformers BLIP with automatic HF download. Captions are cached by
+    image content (see ImageToPromptCache), and caption_batch() captions many
+    images per forward pass.
     """
 
     DEFAULT_REPO_ID = "Salesforce/blip-image-captioning-base"
+    DEFAULT_NUM_BEAMS = 4
+    DEFAULT_MAX_NEW_TOKENS = 64
+    DEFAULT_BATCH_SIZE = 8
     _load_lock = threading.Lock()
     _shared_processor = None
     _shared_model = None
     _shared_device = "cpu"
     _shared_repo_id = None
 
-    def __init__(self, repo_id: str | None = None):
+    def __init__(
+        self,
+        repo_id: str | None = None,
+        num_beams: int = DEFAULT_NUM_BEAMS,
+        max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        cache: ImageToPromptCache | None = None,
+        use_cache: bool = True,
+    ):
         self._repo_id = repo_id or self.DEFAULT_REPO_ID
         self._processor = None
         self._model = None
         self._device = "cpu"
+        self.num_beams = max(1, int(num_beams))
+        self.max_new_tokens = max(1, int(max_new_tokens))
+        self.batch_size = max(1, int(batch_size))
+        self._cache = cache
+        self._use_cache = use_cache
 
     @property
     def name(self) -> str:
         return "BLIP Captioner"
 
+    @property
+    def cache_variant(self) -> str:
+        return self._cache_variant(self.num_beams, self.max_new_tokens)
+
     def _ensure_transformers_blip(self) -> None:
         if self._processor is not None and self._model is not None:
             return
@@ -103,21 +127,120 @@ class CaptionerProvider(ImageToPromptProvider):
             self._model = model
             self._device = device
 
-    def _generate_transformers(self, image_path: str) -> str:
+    def _get_cache(self) -> ImageToPromptCache | None:
+        if not self._use_cache:
+            return None
+        if self._cache is None:
+            self._cache = get_image_to_prompt_cache()
+        return self._cache
+
+    def _cache_variant(self, num_beams: int, max_new_tokens: int) -> str:
+        return f"captioner|{self._repo_id}|beams={num_beams}|tokens={max_new_tokens}"
+
+    def _generate_transformers_batch(self, image_paths: list[str], num_beams: int, max_new_tokens: int) -> list[str]:
+        """Caption images in one forward pass.
+
+        The BLIP processor resizes every image to the model's input size, so
+        the pixel tensors stack into a single batch without extra padding.
+        """
         import torch
         from PIL import Image
 
-        image = Image.open(image_path).convert("RGB")
-        inputs = self._processor(images=image, return_tensors="pt")
+        images = []
+        for image_path in image_paths:
+            with Image.open(image_path) as image:
+                images.append(image.convert("RGB"))
+        inputs = self._processor(images=images, return_tensors="pt")
         inputs = {k: v.to(self._device) for k, v in inputs.items()}
         with torch.no_grad():
-            out = self._model.generate(**inputs, max_new_tokens=64, num_beams=4)
-        return self._processor.decode(out[0], skip_special_tokens=True).strip()
+            out = self._model.generate(**inputs, max_new_tokens=max_new_tokens, num_beams=num_beams)
+        return [caption.strip() for caption in self._processor.batch_decode(out, skip_special_tokens=True)]
+
+    def caption_batch(
+        self,
+        image_paths: list[str],
+        batch_size: Optional[int] = None,
+        num_beams: Optional[int] = None,
+        max_new_tokens: Optional[int] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> list[str]:
+        """Caption many images, batching uncached ones through the model.
+
+        Returns captions in the order of *image_paths*. Images that fail to
+        load or caption get an empty caption and are not cached. If a whole
+        batch fails it is retried one image at a time.
+        """
+        batch_size = max(1, int(batch_size or self.batch_size))
+        num_beams = max(1, int(num_beams or self.num_beams))
+        max_new_tokens = max(1, int(max_new_tokens or self.max_new_tokens))
+        cache = self._get_cache()
+        variant = self._cache_variant(num_beams, max_new_tokens)
+
+        captions: list[str] = [""] * len(image_paths)
+        pending: list[int] = []
+        for i, image_path in enumerate(image_paths):
+            cached = cache.get(image_path, variant) if cache is not None else None
+            if cached is not None:
+                captions[i] = cached
+            else:
+                pending.append(i)
+
+        done = len(image_paths) - len(pending)
+        if progress_callback is not None:
+            progress_callback(done, len(image_paths))
+        if pending:
+            self._ensure_transformers_blip()
+        for start in range(0, len(pending), batch_size):
+            indices = pending[start:start + batch_size]
+            paths = [image_paths[i] for i in indices]
+            try:
+                results = self._generate_transformers_batch(paths, num_beams, max_new_tokens)
+            except Exception:
+                if len(paths) == 1:
+                    results = [None]
+                else:
+                    # One unreadable image should not cost the whole batch
+                    results = []
+                    for path in paths:
+                        try:
+                            results.append(self._generate_transformers_batch([path], num_beams, max_new_tokens)[0])
+                        except Exception:
+                            results.append(None)
+            for i, caption in zip(indices, results):
+                if caption is None:
+                    continue
+                captions[i] = caption
+                if cache is not None:
+                    cache.put(image_paths[i], variant, caption)
+            done += len(indices)
+            if progress_callback is not None:
+                progress_callback(done, len(image_paths))
+        if cache is not None and pending:
+            cache.save()
+        return captions
+
+    def caption(self, image_path: str, num_beams: Optional[int] = None, max_new_tokens: Optional[int] = None) -> str:
+        """Caption a single image, raising if it cannot be captioned."""
+        num_beams = max(1, int(num_beams or self.num_beams))
+        max_new_tokens = max(1, int(max_new_tokens or self.max_new_tokens))
+        cache = self._get_cache()
+        variant = self._cache_variant(num_beams, max_new_tokens)
+        cached = cache.get(image_path, variant) if cache is not None else None
+        if cached is not None:
+            return cached
+        self._ensure_transformers_blip()
+        caption = self._generate_transformers_batch([image_path], num_beams, max_new_tokens)[0]
+        if cache is not None:
+            cache.put(image_path, variant, caption)
+        return caption
 
     def generate(self, request: ImageToPromptRequest) -> ImageToPromptResult:
         try:
-            self._ensure_transformers_blip()
-            caption = self._generate_transformers(request.image_path)
+            caption = self.caption(
+                request.image_path,
+                num_beams=request.extra.get("num_beams"),
+                max_new_tokens=request.extra.get("max_new_tokens"),
+            )
             provider_name = f"{self.name} (Transformers)"
         except Exception as e:
             raise RuntimeError(
@@ -16,6 +16,9 @@ class FastTaggerProvider(ImageToPromptProvider):
     DEFAULT_REPO_ID = "SmilingWolf/wd-swinv2-tagger-v3"
     DEFAULT_MODEL_FILE = "model.onnx"
     DEFAULT_TAGS_FILE = "selected_tags.csv"
+    DEFAULT_GENERAL_THRESHOLD = 0.35
+    DEFAULT_CHARACTER_THRESHOLD = 0.85
+    DEFAULT_TOP_K = 80
 
     def __init__(self, tagger_impl=None, repo_id: str | None = None):
         self._tagger_impl = tagger_impl
@@ -27,6 +30,11 @@ class FastTaggerProvider(ImageToPromptProvider):
     def name(self) -> str:
         return "Fast Tagger"
 
+    @property
+    def cache_variant(self) -> str:
+        return (f"fast_tagger|{self._repo_id}|general={self.DEFAULT_GENERAL_THRESHOLD}"
+                f"|character={self.DEFAULT_CHARACTER_THRESHOLD}|top_k={self.DEFAULT_TOP_K}")
+
     def _ensure_assets(self) -> None:
         if self._model_path and self._tags_path:
             return
@@ -44,11 +52,11 @@ class FastTaggerProvider(ImageToPromptProvider):
 
         tags = self._tagger_impl.predict_tags(
             request.image_path,
-            general_threshold=float(request.extra.get("general_threshold", 0.35)),
-            character_threshold=float(request.extra.get("character_threshold", 0.85)),
+            general_threshold=float(request.extra.get("general_threshold", self.DEFAULT_GENERAL_THRESHOLD)),
+            character_threshold=float(request.extra.get("character_threshold", self.DEFAULT_CHARACTER_THRESHOLD)),
             include_ratings=bool(request.extra.get("include_ratings", False)),
             include_characters=bool(request.extra.get("include_characters", True)),
-            top_k=int(request.extra.get("top_k", 80)),
+            top_k=int(request.extra.get("top_k", self.DEFAULT_TOP_K)),
         )
         if not isinstance(tags, list):
             raise ValueError("tagger_impl.predict_tags(image_path) must return list[str]")
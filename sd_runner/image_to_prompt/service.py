@@ -20,6 +20,10 @@ class ImageToPromptService:
         provider = ImageToPromptProviderRegistry.create(backend, **kwargs)
         return cls(provider)
 
+    @property
+    def cache_variant(self) -> str:
+        return self._provider.cache_variant
+
     def generate(
         self,
         image_path: str,
@@ -32,6 +32,8 @@ class Prompter:
     IMAGE_DATA_EXTRACTOR = None
     IMAGE_TO_PROMPT_CAPTIONER = None
     IMAGE_TO_PROMPT_TAGGER = None
+    IMAGE_TO_PROMPT_CACHE = None
+    IMAGE_TO_PROMPT_CACHE_VARIANT = "take_prompt_from_image"
 
     """
     Has various functions for generating stable diffusion image generation prompts.
@@ -402,6 +404,7 @@ class Prompter:
         # Metadata may be absent. Fall back to captioner, then fast tagger.
         try:
             from sd_runner.image_to_prompt import ImageToPromptBackend, ImageToPromptService
+            from sd_runner.image_to_prompt.cache import get_image_to_prompt_cache
 
             if Prompter.IMAGE_TO_PROMPT_CAPTIONER is None:
                 Prompter.IMAGE_TO_PROMPT_CAPTIONER = ImageToPromptService.from_backend(
@@ -411,21 +414,37 @@ class Prompter:
                 Prompter.IMAGE_TO_PROMPT_TAGGER = ImageToPromptService.from_backend(
                     ImageToPromptBackend.FAST_TAGGER
                 )
+            if Prompter.IMAGE_TO_PROMPT_CACHE is None:
+                Prompter.IMAGE_TO_PROMPT_CACHE = get_image_to_prompt_cache()
+            # A different captioner/tagger model or setting must not reuse earlier prompts
+            variant = "|".join([Prompter.IMAGE_TO_PROMPT_CACHE_VARIANT,
+                                Prompter.IMAGE_TO_PROMPT_CAPTIONER.cache_variant,
+                                Prompter.IMAGE_TO_PROMPT_TAGGER.cache_variant])
+            cached = Prompter.IMAGE_TO_PROMPT_CACHE.get(related_image_path, variant)
+            if cached:
+                return cached, ""
 
             caption_prompt = ""
             tagger_prompt = ""
+            captioner_ok = tagger_ok = False
             try:
                 caption_res = Prompter.IMAGE_TO_PROMPT_CAPTIONER.generate(image_path=related_image_path)
                 caption_prompt = str(caption_res.positive_prompt or "").strip()
+                captioner_ok = bool(caption_prompt)
             except Exception as e:
                 logger.debug("Captioner fallback failed for %s: %s", related_image_path, e)
             try:
                 tagger_res = Prompter.IMAGE_TO_PROMPT_TAGGER.generate(image_path=related_image_path)
                 tagger_prompt = str(tagger_res.positive_prompt or "").strip()
+                tagger_ok = True
             except Exception as e:
                 logger.debug("Fast tagger fallback failed for %s: %s", related_image_path, e)
 
             combined = ", ".join([p for p in [caption_prompt, tagger_prompt] if p])
+            # Partial output (e.g. tags only while the captioner deps are missing) is
+            # returned but not cached, so a later call can still produce the full prompt.
+            if captioner_ok and tagger_ok:
+                Prompter.IMAGE_TO_PROMPT_CACHE.put(related_image_path, variant, combined)
             return combined, ""
         except Exception as e:
             logger.debug("Image-to-prompt fallback unavailable for %s: %s", related_image_path, e)
@@ -517,22 +517,30 @@ class Resolution:
             return matching_resolution
         # If not, find the closest resolution that is within the tolerance range
         tolerance_range = Resolution.get_tolerance_range(architecture_type=architecture_type, resolution_group=resolution_group)
-        if width * height < tolerance_range[0]:
-            while width * height < tolerance_range[0]:
-                width *= 1.1
-                height *= 1.1
-        elif width * height > tolerance_range[1]:
-            while width * height > tolerance_range[1]:
-                width *= 0.9
-                height *= 0.9
-        width = int(width)
-        height = int(height)
-        while width % round_to != 0:
-            width += 1
-        while height % round_to != 0:
-            height += 1
+        # Scale by the fewest steps of 1.1 (or 0.9) that bring the area into range
+        area = width * height
+        if area < tolerance_range[0]:
+            steps = Resolution._scale_steps(area, tolerance_range[0], 1.1)
+            width, height = width * 1.1 ** steps, height * 1.1 ** steps
+            if width * height < tolerance_range[0]:  # Guard against rounding in the log
+                width, height = width * 1.1, height * 1.1
+        elif area > tolerance_range[1]:
+            steps = Resolution._scale_steps(area, tolerance_range[1], 0.9)
+            width, height = width * 0.9 ** steps, height * 0.9 ** steps
+            if width * height > tolerance_range[1]:
+                width, height = width * 0.9, height * 0.9
+        # Round each side up to a multiple of round_to
+        width = -(-int(width) // round_to) * round_to
+        height = -(-int(height) // round_to) * round_to
         return Resolution(width, height, resolution_group=resolution_group)
 
+    @staticmethod
+    def _scale_steps(area: float, target_area: float, factor: float) -> int:
+        """Fewest multiplications of both sides by *factor* that take *area* past *target_area*."""
+        if area <= 0:
+            raise ValueError(f"Cannot scale an image of area {area}")
+        return max(0, math.ceil(math.log(target_area / area) / (2 * math.log(factor)) - 1e-9))
+
     def to_aspect_ratio_string(self, ratios: list[str]) -> str:
         """Return the entry from *ratios* whose aspect ratio is closest to this resolution.
 
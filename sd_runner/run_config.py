@@ -1,10 +1,13 @@
+from enum import Enum
+import hashlib
+import json
 import time
 
-from utils.globals import Globals, PromptMode, WorkflowType # must import first
+from utils.globals import Globals, PromptMode, WorkflowType, ResolutionGroup, Sampler, Scheduler # must import first
 
 from sd_runner.models import Model
 from utils.logging_setup import get_logger
-from utils.time_estimator import TimeEstimator
+from utils.time_estimator import JobEstimate, JobPlan, TimeEstimator, generation_timings
 from utils.translations import I18N
 
 _ = I18N._
@@ -48,6 +51,7 @@ class RunConfig:
         self.batch_limit = self.get("batch_limit")
         self.continuous_seed_variation = self.get("continuous_seed_variation")
         self.dimension_variation = self.get("dimension_variation")
+        self.plan: JobPlan | None = None  # Set when the run is queued, for time estimates
 
         if RunConfig.previous_model_tags != self.model_tags:
             RunConfig.model_switch_detected = True
@@ -98,16 +102,79 @@ class RunConfig:
     def __str__(self) -> str:
         return str(self.__dict__)
 
+    def to_dict(self) -> dict:
+        """JSON-safe snapshot of the run settings, for persisting queued runs."""
+        _dict = {}
+        for name, value in self.__dict__.items():
+            if name in ("args", "start_time"):
+                continue
+            if isinstance(value, Enum):
+                value = value.name
+            elif name in ("prompter_config", "plan") and value is not None:
+                value = value.to_dict()
+            _dict[name] = value
+        return json.loads(json.dumps(_dict, default=str))
+
+    @staticmethod
+    def from_dict(_dict: dict) -> "RunConfig":
+        from sd_runner.prompter_configuration import PrompterConfiguration
+        run_config = RunConfig()
+        for name, value in _dict.items():
+            if name == "prompter_config" and isinstance(value, dict):
+                prompter_config = PrompterConfiguration()
+                prompter_config.set_from_dict(value)
+                value = prompter_config
+            elif name == "plan" and isinstance(value, dict):
+                value = JobPlan.from_dict(value)
+            elif name == "sampler" and isinstance(value, str):
+                value = Sampler.get(value)
+            elif name == "scheduler" and isinstance(value, str):
+                value = Scheduler.get(value)
+            setattr(run_config, name, value)
+        return run_config
+
+    def fingerprint(self) -> str:
+        """Identifies runs with the same settings, so a queue can drop duplicate requests."""
+        _dict = self.to_dict()
+        _dict.pop("plan", None)
+        return hashlib.sha1(json.dumps(_dict, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def build_plan(self, total: int | None = None) -> JobPlan:
+        """Plan this run from its model and resolution tags, without adapter iterations."""
+        from sd_runner.gen_config import GenConfig
+        from sd_runner.resolution import Resolution
+        models = Model.get_models(self.model_tags,
+                                  default_tag=Model.get_default_model_tag(self.workflow_tag),
+                                  inpainting=self.inpainting)
+        resolution_group = ResolutionGroup.get(self.resolution_group) if self.resolution_group else ResolutionGroup.TEN_TWENTY_FOUR
+        resolutions = Resolution.get_resolutions(self.res_tags,
+                                                 architecture_type=models[0].architecture_type,
+                                                 resolution_group=resolution_group) if models else []
+        gen_config = GenConfig(workflow_id=self.workflow_tag, models=models, n_latents=self.n_latents,
+                               resolutions=resolutions, run_config=self)
+        return JobPlan.from_gen_config(gen_config, total=self.total if total is None else total)
+
+    def estimate(self, gen_config = None) -> JobEstimate:
+        """Predicted time for this run from its plan, or from gen_config if it was never planned."""
+        if self.plan is not None:
+            return generation_timings.predict(self.plan)
+        seconds = self.estimate_time(gen_config)
+        return JobEstimate(seconds, seconds, seconds)
+
     def estimate_time(self, gen_config = None) -> int:
         """
         Estimate the total time in seconds for this run configuration.
         
         Args:
-            gen_config: Optional GenConfig instance for calculating total jobs
+            gen_config: Optional GenConfig instance for calculating total jobs,
+                only used if the run has no plan
             
         Returns:
             Estimated time in seconds
         """
+        if self.plan is not None:
+            return int(generation_timings.predict(self.plan).seconds)
+
         # Calculate total jobs using gen_config if available
         total_jobs = gen_config.maximum_gens_per_latent() if gen_config else 1
         logger.debug(f"RunConfig.estimate_time - total_jobs: {total_jobs}, total: {self.total}, n_latents: {self.n_latents}")
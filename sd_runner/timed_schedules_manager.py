@@ -1,5 +1,7 @@
 
+from bisect import bisect_right
 import datetime
+from typing import Optional
 
 from sd_runner.timed_schedule import TimedSchedule
 from utils.app_info_cache import app_info_cache
@@ -18,12 +20,132 @@ class ScheduledShutdownException(Exception):
         self.schedule = schedule
 
 
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+OVERNIGHT_SHUTDOWN_END = 6 * 60  # A shutdown request carries over past midnight until 6 AM
+
+
+def _scan_active_schedule(schedules, day_index, current_time, default_schedule):
+    """Precedence rules for the schedule active at a minute of a weekday."""
+    partially_applicable = []
+    no_specific_times = []
+    for schedule in schedules:
+        # Schedules with a shutdown time are assumed to be for shutdown purposes only
+        if not schedule.enabled or schedule.shutdown_time is not None or day_index not in schedule.weekday_options:
+            continue
+        if schedule.start_time is not None and schedule.start_time < current_time:
+            if schedule.end_time is not None and schedule.end_time > current_time:
+                return schedule
+            else:
+                partially_applicable.append(schedule)
+        elif schedule.end_time is not None and schedule.end_time > current_time:
+            partially_applicable.append(schedule)
+        elif (schedule.start_time is None and schedule.end_time is None) or \
+                (schedule.start_time == 0 and schedule.end_time == 0):
+            no_specific_times.append(schedule)
+    # min() keeps the first of equally general schedules, as a stable sort would
+    if len(partially_applicable) >= 1:
+        return min(partially_applicable, key=lambda schedule: schedule.calculate_generality())
+    elif len(no_specific_times) >= 1:
+        return min(no_specific_times, key=lambda schedule: schedule.calculate_generality())
+    return default_schedule
+
+
+def _scan_shutdown_schedule(schedules, day_index, current_time):
+    """The first schedule requesting shutdown at a minute of a weekday, if any."""
+    previous_day_index = (day_index - 1) % 7
+    for schedule in schedules:
+        if not schedule.enabled or schedule.shutdown_time is None:
+            continue
+        # From the shutdown time until midnight
+        if day_index in schedule.weekday_options and schedule.shutdown_time < current_time:
+            return schedule
+        # From midnight until the end of the overnight period after a shutdown day
+        if previous_day_index in schedule.weekday_options and current_time < OVERNIGHT_SHUTDOWN_END:
+            return schedule
+    return None
+
+
+class ScheduleTimeline:
+    """
+    The active and shutdown-requesting schedule for every minute of the week.
+
+    Within a day the result can only change where a start, end or shutdown
+    comparison flips, so each day is evaluated once per such boundary with
+    the same precedence rules as a scan of the schedules, and runs of equal
+    results are merged into intervals. Lookups bisect the interval starts.
+    """
+
+    def __init__(self, schedules: list[TimedSchedule], default_schedule: TimedSchedule):
+        schedules = list(schedules)
+        self._starts: list[int] = []  # Minute of the week each interval starts at
+        self._states: list[tuple] = []  # (active schedule, shutdown schedule or None)
+        boundaries = self._boundaries(schedules)
+        for day_index in range(7):
+            for minute in boundaries:
+                state = (_scan_active_schedule(schedules, day_index, minute, default_schedule),
+                         _scan_shutdown_schedule(schedules, day_index, minute))
+                if self._states and self._same(self._states[-1], state):
+                    continue
+                self._starts.append(day_index * MINUTES_PER_DAY + minute)
+                self._states.append(state)
+
+    @staticmethod
+    def _boundaries(schedules: list[TimedSchedule]) -> list[int]:
+        # "x < t" first holds at t = x + 1 and "x > t" stops holding at t = x
+        minutes = {0, OVERNIGHT_SHUTDOWN_END}
+        for schedule in schedules:
+            if schedule.start_time is not None:
+                minutes.add(schedule.start_time + 1)
+            if schedule.end_time is not None:
+                minutes.add(schedule.end_time)
+            if schedule.shutdown_time is not None:
+                minutes.add(schedule.shutdown_time + 1)
+        return sorted(minute for minute in minutes if 0 <= minute < MINUTES_PER_DAY)
+
+    @staticmethod
+    def _same(state, other) -> bool:
+        # Schedules compare equal by name, so compare identities
+        return state[0] is other[0] and state[1] is other[1]
+
+    @staticmethod
+    def minute_of_week(when: datetime.datetime) -> int:
+        return when.weekday() * MINUTES_PER_DAY + TimedSchedule.get_time(when.hour, when.minute)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def _index(self, minute_of_week: int) -> int:
+        return bisect_right(self._starts, minute_of_week) - 1
+
+    def at(self, when: datetime.datetime) -> tuple[TimedSchedule, Optional[TimedSchedule]]:
+        """The (active schedule, shutdown-requesting schedule or None) at *when*."""
+        return self._states[self._index(self.minute_of_week(when))]
+
+    def next_transition(self, when: datetime.datetime) -> Optional[datetime.datetime]:
+        """The first minute after *when* at which either schedule changes, or None if neither ever does."""
+        current = self.minute_of_week(when)
+        index = self._index(current)
+        state = self._states[index]
+        for step in range(1, len(self._starts) + 1):
+            next_index = (index + step) % len(self._starts)
+            if self._same(self._states[next_index], state):
+                continue  # Only possible across the end of the week
+            minutes = self._starts[next_index] - current
+            if minutes <= 0:
+                minutes += MINUTES_PER_WEEK
+            return when.replace(second=0, microsecond=0) + datetime.timedelta(minutes=minutes)
+        return None
+
+
 class TimedSchedulesManager:
     default_schedule = TimedSchedule(name=_("Default"), enabled=True, weekday_options=[0,1,2,3,4,5,6])
     recent_timed_schedules = []
     last_set_schedule = None
     MAX_PRESETS = 50
     schedule_history = []
+    _timeline: Optional[ScheduleTimeline] = None
+    _timeline_schedules = None  # The schedule list the timeline was compiled from
 
     def __init__(self):
         pass
@@ -53,9 +175,12 @@ class TimedSchedulesManager:
             )
             TimedSchedulesManager.recent_timed_schedules.append(default_shutdown_schedule)
             TimedSchedulesManager.store_schedules()
+        TimedSchedulesManager.invalidate_timeline()
 
     @staticmethod
     def store_schedules():
+        # Every change to the schedules is stored, so this is where the timeline goes stale
+        TimedSchedulesManager.invalidate_timeline()
         schedule_dicts = []
         for schedule in TimedSchedulesManager.recent_timed_schedules:
             schedule_dicts.append(schedule.to_dict())
@@ -95,6 +220,7 @@ class TimedSchedulesManager:
         next_schedule = TimedSchedulesManager.recent_timed_schedules[-1]
         TimedSchedulesManager.recent_timed_schedules.remove(next_schedule)
         TimedSchedulesManager.recent_timed_schedules.insert(0, next_schedule)
+        TimedSchedulesManager.invalidate_timeline()
         return next_schedule
 
     @staticmethod
@@ -116,49 +242,33 @@ class TimedSchedulesManager:
         TimedSchedulesManager.recent_timed_schedules.clear()
         TimedSchedulesManager.store_schedules()
 
+    @staticmethod
+    def get_timeline() -> ScheduleTimeline:
+        """The compiled timeline of the current schedules, rebuilt only after they change."""
+        schedules = TimedSchedulesManager.recent_timed_schedules
+        timeline = TimedSchedulesManager._timeline
+        if timeline is None or TimedSchedulesManager._timeline_schedules is not schedules:
+            timeline = ScheduleTimeline(schedules, TimedSchedulesManager.default_schedule)
+            logger.debug(f"Compiled {len(schedules)} timed schedules into {len(timeline)} weekly intervals")
+            TimedSchedulesManager._timeline = timeline
+            TimedSchedulesManager._timeline_schedules = schedules
+        return timeline
+
+    @staticmethod
+    def invalidate_timeline():
+        """Call after changing schedules without storing them."""
+        TimedSchedulesManager._timeline = None
+
     @staticmethod
     def get_active_schedule(datetime):
         assert datetime is not None
-        day_index = datetime.weekday()
-        current_time = TimedSchedule.get_time(datetime.hour, datetime.minute)
-        partially_applicable = []
-        no_specific_times = []
-        for schedule in TimedSchedulesManager.recent_timed_schedules:
-            skip = False
-            if not schedule.enabled:
-                skip = True
-            if schedule.shutdown_time is not None:
-                logger.debug(f"Skipping schedule {schedule} - a shutdown time is set on this schedule and it is assumed to be for shutdown purposes only.")
-                skip = True
-            if day_index not in schedule.weekday_options:
-                logger.debug(f"Skipping schedule {schedule} - today is index {day_index} - schedule weekday options {schedule.weekday_options}")
-                skip = True
-            if skip:
-                continue
-            if schedule.start_time is not None and schedule.start_time < current_time:
-                if schedule.end_time is not None and schedule.end_time > current_time:
-                    logger.info(f"Schedule {schedule} is applicable")
-                    return schedule
-                else:
-                    partially_applicable.append(schedule)
-            elif schedule.end_time is not None and schedule.end_time > current_time:
-                partially_applicable.append(schedule)
-            elif (schedule.start_time is None and schedule.end_time is None) or \
-                    (schedule.start_time == 0 and schedule.end_time == 0):
-                no_specific_times.append(schedule)
-        if len(partially_applicable) >= 1:
-            partially_applicable.sort(key=lambda schedule: schedule.calculate_generality())
-            schedules_text = "\n".join([str(schedule) for schedule in partially_applicable])
-            logger.info(f"Schedules are partially applicable:\n{schedules_text}")
-            return partially_applicable[0]
-        elif len(no_specific_times) >= 1:
-            no_specific_times.sort(key=lambda schedule: schedule.calculate_generality())
-            schedules_text = "\n".join([str(schedule) for schedule in no_specific_times])
-            logger.info(f"Schedules are applicable to today but have no specific times:\n{schedules_text}")
-            return no_specific_times[0]
-        else:
-            return TimedSchedulesManager.default_schedule
+        return TimedSchedulesManager.get_timeline().at(datetime)[0]
 
+    @staticmethod
+    def next_transition(datetime):
+        """When the active or shutdown-requesting schedule next changes after *datetime*, or None if never."""
+        assert datetime is not None
+        return TimedSchedulesManager.get_timeline().next_transition(datetime)
 
     @staticmethod
     def get_closest_weekday_index_to_datetime(schedule, datetime, total_days=False):
@@ -181,29 +291,12 @@ class TimedSchedulesManager:
     @staticmethod
     def _check_for_shutdown_request(datetime):
         assert datetime is not None
-        day_index = datetime.weekday()
-        current_time = TimedSchedule.get_time(datetime.hour, datetime.minute)
-        
-        for schedule in TimedSchedulesManager.recent_timed_schedules:
-            if not schedule.enabled or schedule.shutdown_time is None:
-                continue
-            
-            # Check if current day is in the schedule's weekday options
-            if day_index in schedule.weekday_options:
-                # Check if current time is past the shutdown time on the same day
-                # This covers the period from shutdown time until midnight
-                if schedule.shutdown_time < current_time:
-                    return schedule
-            
-            # Check if we're in the shutdown period of the previous day
-            # This covers the period from midnight until 6 AM (6 * 60 = 360 minutes)
-            previous_day_index = (day_index - 1) % 7
-            if previous_day_index in schedule.weekday_options:
-                # If current time is before 6 AM (360 minutes), we're still in the shutdown period
-                if current_time < 6 * 60:  # 6 AM = 360 minutes
-                    return schedule
-        
-        return None
+        return TimedSchedulesManager.get_shutdown_schedule(datetime)
+
+    @staticmethod
+    def get_shutdown_schedule(datetime):
+        """The schedule requesting shutdown at *datetime*, or None."""
+        return TimedSchedulesManager.get_timeline().at(datetime)[1]
 
     @staticmethod
     def get_hour():
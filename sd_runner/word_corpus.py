@@ -0,0 +1,262 @@
+"""
+Compiled, memory-mapped word corpora.
+
+The dictionary and urban dictionary corpora are large plain-text word lists
+that are only ever sampled from and tested for membership. :class:`WordCorpus`
+compiles such a list once into a binary file and maps it read-only, so every
+process shares the same pages instead of holding its own list of strings.
+
+File layout (all integers little-endian u32)::
+
+    header   magic "SDWC", version, word count n, hash table size m
+    offsets  n + 1 byte offsets into the string blob
+    slots    m hash table slots holding a word index, or EMPTY_SLOT
+    blob     the sorted words, UTF-8, back to back
+
+Membership is a crc32-keyed open-addressing lookup; indexing decodes a
+single slice of the blob. Duplicate words are kept (only the first copy is
+hashed) so sampling weights match the source lists.
+"""
+
+import bisect
+import hashlib
+import mmap
+import os
+import random
+import struct
+import sys
+import zlib
+from array import array
+from typing import Callable, Iterable, Iterator, Optional, Sequence
+
+from utils.logging_setup import get_logger
+
+logger = get_logger("word_corpus")
+
+# Respects SD_RUNNER_CACHE_DIR so tests can redirect it (mirrors the blacklist filter cache).
+_DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "configs")
+
+
+def _resolve_cache_dir() -> str:
+    return os.path.join(os.environ.get("SD_RUNNER_CACHE_DIR") or _DEFAULT_CACHE_DIR, "word_corpus")
+
+
+class WordCorpus(Sequence[str]):
+    """Read-only sorted string table with O(1) membership tests."""
+
+    MAGIC = b"SDWC"
+    VERSION = 2
+    HEADER = struct.Struct("<4sIII")
+    EMPTY_SLOT = 0xFFFFFFFF
+
+    def __init__(self, buffer, path: Optional[str] = None, mapped: Optional[mmap.mmap] = None):
+        self.path = path
+        self._mmap = mapped
+        view = memoryview(buffer)
+        magic, version, count, table_size = WordCorpus.HEADER.unpack_from(view, 0)
+        if magic != WordCorpus.MAGIC or version != WordCorpus.VERSION:
+            raise ValueError(f"Not a word corpus (version {WordCorpus.VERSION}): {path}")
+        self._count = count
+        self._table_mask = table_size - 1
+        offsets_start = WordCorpus.HEADER.size
+        slots_start = offsets_start + 4 * (count + 1)
+        blob_start = slots_start + 4 * table_size
+        self._offsets = WordCorpus._u32_view(view[offsets_start:slots_start])
+        self._slots = WordCorpus._u32_view(view[slots_start:blob_start])
+        self._blob = view[blob_start:]
+
+    @staticmethod
+    def _u32_view(view: memoryview):
+        if sys.byteorder == "little":
+            return view.cast("I")
+        values = array("I", view.tobytes())
+        values.byteswap()
+        return values
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def compile(words: Iterable[str]) -> bytes:
+        """Return the compiled corpus bytes for *words* (sorted, duplicates kept)."""
+        encoded = [word.encode("utf-8") for word in sorted(words)]
+        table_size = 1
+        while table_size < 2 * max(1, len(encoded)):
+            table_size *= 2
+        mask = table_size - 1
+
+        offsets = array("I", [0])
+        for word in encoded:
+            offsets.append(offsets[-1] + len(word))
+        slots = array("I", [WordCorpus.EMPTY_SLOT]) * table_size
+        for index, word in enumerate(encoded):
+            if index > 0 and word == encoded[index - 1]:
+                continue
+            slot = zlib.crc32(word) & mask
+            while slots[slot] != WordCorpus.EMPTY_SLOT:
+                slot = (slot + 1) & mask
+            slots[slot] = index
+        if sys.byteorder != "little":
+            offsets.byteswap()
+            slots.byteswap()
+        header = WordCorpus.HEADER.pack(WordCorpus.MAGIC, WordCorpus.VERSION, len(encoded), table_size)
+        return b"".join((header, offsets.tobytes(), slots.tobytes(), *encoded))
+
+    @classmethod
+    def from_words(cls, words: Iterable[str]) -> "WordCorpus":
+        """Compile *words* into an in-memory corpus (not shared across processes)."""
+        return cls(WordCorpus.compile(words))
+
+    @classmethod
+    def open(cls, path: str) -> "WordCorpus":
+        """Map a compiled corpus file read-only."""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, path=path, mapped=mapped)
+
+    @classmethod
+    def load_or_build(
+        cls,
+        source_paths: Sequence[str],
+        read_words: Callable[[str], list[str]],
+        name: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+    ) -> "WordCorpus":
+        """Return the compiled corpus of the text files at *source_paths*.
+
+        The compiled file is named after the sources and their size and mtime,
+        so any process reuses it until a source changes. *read_words* parses
+        one text file into words.
+        """
+        cache_dir = cache_dir or _resolve_cache_dir()
+        name = name or os.path.splitext(os.path.basename(source_paths[0]))[0]
+        fingerprint = hashlib.blake2b(digest_size=8)
+        fingerprint.update(str(WordCorpus.VERSION).encode())
+        for source_path in source_paths:
+            try:
+                stat = os.stat(source_path)
+                signature = f"{os.path.abspath(source_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+            except OSError:
+                signature = f"{os.path.abspath(source_path)}|missing"
+            fingerprint.update(signature.encode("utf-8"))
+        corpus_path = os.path.join(cache_dir, f"{name}-{fingerprint.hexdigest()}.bin")
+
+        if os.path.isfile(corpus_path):
+            try:
+                return cls.open(corpus_path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Rebuilding unreadable word corpus {corpus_path}: {e}")
+
+        words = []
+        for source_path in source_paths:
+            words.extend(read_words(source_path))
+        data = WordCorpus.compile(words)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            temp_path = f"{corpus_path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, corpus_path)
+            WordCorpus._remove_stale(cache_dir, name, corpus_path)
+            return cls.open(corpus_path)
+        except OSError as e:
+            logger.warning(f"Failed to save word corpus {corpus_path}: {e}")
+            return cls(data)
+
+    @staticmethod
+    def _remove_stale(cache_dir: str, name: str, keep_path: str) -> None:
+        for entry in os.scandir(cache_dir):
+            if entry.path != keep_path and entry.name.startswith(f"{name}-") and entry.name.endswith(".bin"):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass  # May still be mapped by another process on Windows
+
+    # ------------------------------------------------------------------
+    # Sequence interface
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("word corpus index out of range")
+        return str(self._blob[self._offsets[index]:self._offsets[index + 1]], "utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self._count):
+            yield self[index]
+
+    def __contains__(self, word) -> bool:
+        if not isinstance(word, str) or self._count == 0:
+            return False
+        encoded = word.encode("utf-8")
+        slot = zlib.crc32(encoded) & self._table_mask
+        while True:
+            index = self._slots[slot]
+            if index == WordCorpus.EMPTY_SLOT:
+                return False
+            if self._blob[self._offsets[index]:self._offsets[index + 1]] == encoded:
+                return True
+            slot = (slot + 1) & self._table_mask
+
+    def index(self, word, start: int = 0, stop: Optional[int] = None) -> int:
+        """Return the position of *word* in sorted order (binary search)."""
+        stop = self._count if stop is None else min(stop, self._count)
+        position = bisect.bisect_left(self, word, start, stop)
+        if position < stop and self[position] == word:
+            return position
+        raise ValueError(f"{word!r} is not in word corpus")
+
+    def sample(self, k: int) -> list[str]:
+        """Return words at *k* distinct positions chosen uniformly, decoding only those words."""
+        return [self[i] for i in random.sample(range(self._count), k)]
+
+    def close(self) -> None:
+        self._offsets = self._slots = self._blob = None
+        self._count = 0
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # A caller still holds a view; the mapping is freed with it
+            self._mmap = None
+
+
+class ChainedCorpus(Sequence[str]):
+    """Read-only concatenation of sequences, indexed without copying them."""
+
+    def __init__(self, *parts: Sequence[str]):
+        self._parts = [part for part in parts if len(part) > 0]
+        self._starts = []
+        total = 0
+        for part in self._parts:
+            self._starts.append(total)
+            total += len(part)
+        self._total = total
+
+    def __len__(self) -> int:
+        return self._total
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._total))]
+        if index < 0:
+            index += self._total
+        if not 0 <= index < self._total:
+            raise IndexError("chained corpus index out of range")
+        part = bisect.bisect_right(self._starts, index) - 1
+        return self._parts[part][index - self._starts[part]]
+
+    def __iter__(self) -> Iterator[str]:
+        for part in self._parts:
+            yield from part
+
+    def __contains__(self, word) -> bool:
+        return any(word in part for part in self._parts)
@@ -73,9 +73,11 @@ def _patch_app_info_cache(monkeypatch, cache_instance) -> None:
     for module_name in (
         "ui_qt.app_window.cache_controller",
         "ui_qt.app_window.app_window",
+        "ui_qt.app_window.sidebar_panel",
         "ui_qt.auth.password_core",
         "ui_qt.models.recent_adapters_window",
         "ui_qt.prompts.concept_editor_window",
+        "ui_qt.prompts.frequent_prompt_tags_window",
         "ui_qt.prompts.image_to_prompt_window",
         "ui_qt.prompts.prompt_generator_window",
         "ui_qt.runs.runs_window",
@@ -145,6 +147,16 @@ def _reset_class_state() -> None:
     try:
         from sd_runner.concepts import Concepts
         Concepts.ALL_WORDS_LIST = []
+        Concepts.URBAN_DICTIONARY_CORPUS = []
+        Concepts.clear_preview_cache()
+    except Exception:
+        pass
+
+    try:
+        import sd_runner.image_to_prompt.cache as image_to_prompt_cache
+        from sd_runner.prompter import Prompter
+        image_to_prompt_cache._shared_cache = None
+        Prompter.IMAGE_TO_PROMPT_CACHE = None
     except Exception:
         pass
 
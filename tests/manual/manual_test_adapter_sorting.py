@@ -30,14 +30,14 @@ class TestAdapterSorting(unittest.TestCase):
         """Return a MagicMock standing in for AppActions.
 
         Using MagicMock avoids coupling the test to AppActions.REQUIRED_ACTIONS:
-        any attribute access (e.g. contains_recent_adapter_file) just works, and
+        any attribute access (e.g. rank_recent_adapter_files) just works, and
         tests can configure return_value / assert calls as needed.
         """
         return MagicMock(spec=AppActions)
     
     def _reset_mock_call_count(self):
-        """Reset the mock call count for contains_recent_adapter_file."""
-        self.mock_app_actions.contains_recent_adapter_file.reset_mock()
+        """Reset the mock call count for rank_recent_adapter_files."""
+        self.mock_app_actions.rank_recent_adapter_files.reset_mock()
         
     def tearDown(self):
         """Clean up temporary directories."""
@@ -46,7 +46,7 @@ class TestAdapterSorting(unittest.TestCase):
     def test_no_recent_files_random_sort_false(self):
         """Test sorting when no files are recent and random_sort=False."""
         # Mock: no files are recent (all return -1)
-        self.mock_app_actions.contains_recent_adapter_file.return_value = -1
+        self.mock_app_actions.rank_recent_adapter_files.side_effect = lambda paths: [-1] * len(paths)
         
         control_nets, is_dir = get_control_nets([self.temp_dir], random_sort=False, app_actions=self.mock_app_actions)
         
@@ -58,13 +58,13 @@ class TestAdapterSorting(unittest.TestCase):
         actual_order = [os.path.basename(cn.id) for cn in control_nets]
         self.assertEqual(actual_order, expected_order)
         
-        # Verify contains_recent_adapter_file was called for each file
-        self.assertEqual(self.mock_app_actions.contains_recent_adapter_file.call_count, 10)
+        # Verify rank_recent_adapter_files was called once for all files
+        self.assertEqual(self.mock_app_actions.rank_recent_adapter_files.call_count, 1)
     
     def test_no_recent_files_random_sort_true(self):
         """Test sorting when no files are recent and random_sort=True."""
         # Mock: no files are recent (all return -1)
-        self.mock_app_actions.contains_recent_adapter_file.return_value = -1
+        self.mock_app_actions.rank_recent_adapter_files.side_effect = lambda paths: [-1] * len(paths)
         
         control_nets, is_dir = get_control_nets([self.temp_dir], random_sort=True, app_actions=self.mock_app_actions)
         
@@ -77,8 +77,8 @@ class TestAdapterSorting(unittest.TestCase):
         # Order should be different from alphabetical (with high probability)
         self.assertNotEqual(actual_order, expected_order)
         
-        # Verify contains_recent_adapter_file was called for each file
-        self.assertEqual(self.mock_app_actions.contains_recent_adapter_file.call_count, 10)
+        # Verify rank_recent_adapter_files was called once for all files
+        self.assertEqual(self.mock_app_actions.rank_recent_adapter_files.call_count, 1)
     
     def test_all_files_recent_random_sort_false(self):
         """Test sorting when all files are recent and random_sort=False."""
@@ -91,7 +91,7 @@ class TestAdapterSorting(unittest.TestCase):
             num = int(filename.split('_')[2].split('.')[0])
             return num  # Most recent = 0, least recent = 9
         
-        self.mock_app_actions.contains_recent_adapter_file.side_effect = mock_contains_recent
+        self.mock_app_actions.rank_recent_adapter_files.side_effect = lambda paths: [mock_contains_recent(p) for p in paths]
         
         control_nets, is_dir = get_control_nets([self.temp_dir], random_sort=False, app_actions=self.mock_app_actions)
         
@@ -104,8 +104,8 @@ class TestAdapterSorting(unittest.TestCase):
         expected_order = [f"test_adapter_{i:02d}.safetensors" for i in range(9, -1, -1)]
         self.assertEqual(actual_order, expected_order)
         
-        # Verify contains_recent_adapter_file was called for each file
-        self.assertEqual(self.mock_app_actions.contains_recent_adapter_file.call_count, 10)
+        # Verify rank_recent_adapter_files was called once for all files
+        self.assertEqual(self.mock_app_actions.rank_recent_adapter_files.call_count, 1)
     
     def test_all_files_recent_random_sort_true(self):
         """Test sorting when all files are recent and random_sort=True (with jitter)."""
@@ -117,7 +117,7 @@ class TestAdapterSorting(unittest.TestCase):
             num = int(filename.split('_')[2].split('.')[0])
             return num
         
-        self.mock_app_actions.contains_recent_adapter_file.side_effect = mock_contains_recent
+        self.mock_app_actions.rank_recent_adapter_files.side_effect = lambda paths: [mock_contains_recent(p) for p in paths]
         
         control_nets, is_dir = get_control_nets([self.temp_dir], random_sort=True, app_actions=self.mock_app_actions)
         
@@ -134,8 +134,8 @@ class TestAdapterSorting(unittest.TestCase):
         self.assertIsInstance(actual_order, list)
         self.assertEqual(len(actual_order), 10)
         
-        # Verify contains_recent_adapter_file was called for each file
-        self.assertEqual(self.mock_app_actions.contains_recent_adapter_file.call_count, 10)
+        # Verify rank_recent_adapter_files was called once for all files
+        self.assertEqual(self.mock_app_actions.rank_recent_adapter_files.call_count, 1)
     
     def test_mixed_recent_non_recent_files(self):
         """Test sorting with mix of recent and non-recent files."""
@@ -151,7 +151,7 @@ class TestAdapterSorting(unittest.TestCase):
             else:
                 return -1  # Not recent
         
-        self.mock_app_actions.contains_recent_adapter_file.side_effect = mock_contains_recent
+        self.mock_app_actions.rank_recent_adapter_files.side_effect = lambda paths: [mock_contains_recent(p) for p in paths]
         
         control_nets, is_dir = get_control_nets([self.temp_dir], random_sort=False, app_actions=self.mock_app_actions)
         
@@ -172,8 +172,8 @@ class TestAdapterSorting(unittest.TestCase):
         # All non-recent indices should be less than all recent indices
         self.assertTrue(all(ni < ri for ni in non_recent_indices for ri in recent_indices))
         
-        # Verify contains_recent_adapter_file was called for each file
-        self.assertEqual(self.mock_app_actions.contains_recent_adapter_file.call_count, 10)
+        # Verify rank_recent_adapter_files was called once for all files
+        self.assertEqual(self.mock_app_actions.rank_recent_adapter_files.call_count, 1)
     
     def test_ip_adapters_sorting(self):
         """Test that IP adapters use the same sorting logic."""
@@ -185,7 +185,7 @@ class TestAdapterSorting(unittest.TestCase):
             num = int(filename.split('_')[2].split('.')[0])
             return num
         
-        self.mock_app_actions.contains_recent_adapter_file.side_effect = mock_contains_recent
+        self.mock_app_actions.rank_recent_adapter_files.side_effect = lambda paths: [mock_contains_recent(p) for p in paths]
         
         ip_adapters, is_dir = get_ip_adapters([self.temp_dir], random_sort=False, app_actions=self.mock_app_actions)
         
@@ -197,8 +197,8 @@ class TestAdapterSorting(unittest.TestCase):
         expected_order = [f"test_adapter_{i:02d}.safetensors" for i in range(9, -1, -1)]
         self.assertEqual(actual_order, expected_order)
         
-        # Verify contains_recent_adapter_file was called for each file
-        self.assertEqual(self.mock_app_actions.contains_recent_adapter_file.call_count, 10)
+        # Verify rank_recent_adapter_files was called once for all files
+        self.assertEqual(self.mock_app_actions.rank_recent_adapter_files.call_count, 1)
     
     def test_empty_directory(self):
         """Test behavior with empty directory."""
@@ -210,8 +210,8 @@ class TestAdapterSorting(unittest.TestCase):
             self.assertTrue(is_dir)
             self.assertEqual(len(control_nets), 0)
             
-            # Verify contains_recent_adapter_file was not called (no files)
-            self.assertEqual(self.mock_app_actions.contains_recent_adapter_file.call_count, 0)
+            # Verify rank_recent_adapter_files was not called (no files)
+            self.assertEqual(self.mock_app_actions.rank_recent_adapter_files.call_count, 0)
         finally:
             shutil.rmtree(empty_dir)
     
@@ -226,15 +226,15 @@ class TestAdapterSorting(unittest.TestCase):
         
         try:
             # Mock: file is recent
-            self.mock_app_actions.contains_recent_adapter_file.return_value = 0
+            self.mock_app_actions.rank_recent_adapter_files.side_effect = lambda paths: [0] * len(paths)
             
             control_nets, is_dir = get_control_nets([single_file_dir], random_sort=False, app_actions=self.mock_app_actions)
             self.assertTrue(is_dir)
             self.assertEqual(len(control_nets), 1)
             self.assertEqual(os.path.basename(control_nets[0].id), "single.safetensors")
             
-            # Verify contains_recent_adapter_file was called once
-            self.assertEqual(self.mock_app_actions.contains_recent_adapter_file.call_count, 1)
+            # Verify rank_recent_adapter_files was called once
+            self.assertEqual(self.mock_app_actions.rank_recent_adapter_files.call_count, 1)
         finally:
             shutil.rmtree(single_file_dir)
     
@@ -248,7 +248,7 @@ class TestAdapterSorting(unittest.TestCase):
             num = int(filename.split('_')[2].split('.')[0])
             return num
         
-        self.mock_app_actions.contains_recent_adapter_file.side_effect = mock_contains_recent
+        self.mock_app_actions.rank_recent_adapter_files.side_effect = lambda paths: [mock_contains_recent(p) for p in paths]
         
         print(f"\n=== Testing Jitter Effect ===")
         print(f"Directory: {self.temp_dir}")
@@ -266,9 +266,9 @@ class TestAdapterSorting(unittest.TestCase):
             print(f"\nRun {run_num + 1}:")
             print(f"  Order: {order}")
             
-            # Verify contains_recent_adapter_file was called for each file in each run
-            self.assertEqual(self.mock_app_actions.contains_recent_adapter_file.call_count, 10)
-            print(f"  Call count verified: {self.mock_app_actions.contains_recent_adapter_file.call_count}")
+            # Verify rank_recent_adapter_files was called once per run
+            self.assertEqual(self.mock_app_actions.rank_recent_adapter_files.call_count, 1)
+            print(f"  Call count verified: {self.mock_app_actions.rank_recent_adapter_files.call_count}")
         
         # Analyze results
         print(f"\n=== Jitter Analysis ===")
@@ -342,7 +342,7 @@ class TestAdapterSorting(unittest.TestCase):
             num = int(filename.split('_')[2].split('.')[0])
             return num
         
-        self.mock_app_actions.contains_recent_adapter_file.side_effect = mock_contains_recent
+        self.mock_app_actions.rank_recent_adapter_files.side_effect = lambda paths: [mock_contains_recent(p) for p in paths]
         
         print(f"\n=== Simple Jitter Comparison Test ===")
         
@@ -351,14 +351,14 @@ class TestAdapterSorting(unittest.TestCase):
         control_nets1, _ = get_control_nets([self.temp_dir], random_sort=True, app_actions=self.mock_app_actions)
         order1 = [os.path.basename(cn.id) for cn in control_nets1]
         print(f"Run 1 order: {order1}")
-        print(f"Run 1 call count: {self.mock_app_actions.contains_recent_adapter_file.call_count}")
+        print(f"Run 1 call count: {self.mock_app_actions.rank_recent_adapter_files.call_count}")
         
         # Run 2
         self._reset_mock_call_count()
         control_nets2, _ = get_control_nets([self.temp_dir], random_sort=True, app_actions=self.mock_app_actions)
         order2 = [os.path.basename(cn.id) for cn in control_nets2]
         print(f"Run 2 order: {order2}")
-        print(f"Run 2 call count: {self.mock_app_actions.contains_recent_adapter_file.call_count}")
+        print(f"Run 2 call count: {self.mock_app_actions.rank_recent_adapter_files.call_count}")
         
         # Compare
         same_order = order1 == order2
@@ -380,7 +380,7 @@ class TestAdapterSorting(unittest.TestCase):
             print("Consider running the test again")
         
         # Verify call counts
-        self.assertEqual(self.mock_app_actions.contains_recent_adapter_file.call_count, 10)
+        self.assertEqual(self.mock_app_actions.rank_recent_adapter_files.call_count, 1)
         
         # The assertion is lenient - we just want to verify the function works
         # Jitter effectiveness is probabilistic
@@ -402,7 +402,7 @@ class TestAdapterSorting(unittest.TestCase):
         expected_order = sorted([os.path.basename(f) for f in self.test_files])
         self.assertEqual(actual_order, expected_order)
         
-        # Note: contains_recent_adapter_file should not be called when app_actions is None
+        # Note: rank_recent_adapter_files should not be called when app_actions is None
 
 
 if __name__ == '__main__':
@@ -1,5 +1,9 @@
 import os
+from unittest.mock import MagicMock
+
 import pytest
+
+from sd_runner.adapter_sorting import RecencyIndex, _sort_adapters_by_recency
 from sd_runner.control_nets import get_control_nets
 from sd_runner.ip_adapters import get_ip_adapters
 
@@ -20,7 +24,7 @@ class TestAdapterSorting:
         assert len(control_nets) == 10
 
     def test_alphabetical_order_when_no_recent(self, image_dir, mock_app_actions):
-        mock_app_actions.contains_recent_adapter_file.return_value = -1
+        mock_app_actions.rank_recent_adapter_files.side_effect = lambda paths: [-1] * len(paths)
         control_nets, _ = get_control_nets([image_dir], random_sort=False, app_actions=mock_app_actions)
         names = [os.path.basename(cn.id) for cn in control_nets]
         assert names == sorted(names)
@@ -32,7 +36,7 @@ class TestAdapterSorting:
         def _contains(path):
             return 0 if os.path.basename(path) == recent_name else -1
 
-        mock_app_actions.contains_recent_adapter_file.side_effect = _contains
+        mock_app_actions.rank_recent_adapter_files.side_effect = lambda paths: [_contains(p) for p in paths]
         control_nets, _ = get_control_nets([image_dir], random_sort=False, app_actions=mock_app_actions)
         names = [os.path.basename(cn.id) for cn in control_nets]
         assert names[-1] == recent_name
@@ -43,13 +47,13 @@ class TestAdapterSorting:
             num = int(os.path.basename(path).split('_')[1].split('.')[0])
             return num  # 0 = most recent, 9 = least recent
 
-        mock_app_actions.contains_recent_adapter_file.side_effect = _contains
+        mock_app_actions.rank_recent_adapter_files.side_effect = lambda paths: [_contains(p) for p in paths]
         control_nets, _ = get_control_nets([image_dir], random_sort=False, app_actions=mock_app_actions)
         names = [os.path.basename(cn.id) for cn in control_nets]
         assert names == [f"img_{i:02d}.png" for i in range(9, -1, -1)]
 
     def test_ip_adapters_same_sorting_logic(self, image_dir, mock_app_actions):
-        mock_app_actions.contains_recent_adapter_file.return_value = -1
+        mock_app_actions.rank_recent_adapter_files.side_effect = lambda paths: [-1] * len(paths)
         ip_adapters, is_dir = get_ip_adapters([image_dir], random_sort=False, app_actions=mock_app_actions)
         assert is_dir
         assert len(ip_adapters) == 10
@@ -58,4 +62,54 @@ class TestAdapterSorting:
         control_nets, is_dir = get_control_nets([str(tmp_path)], random_sort=False, app_actions=mock_app_actions)
         assert is_dir
         assert len(control_nets) == 0
-        mock_app_actions.contains_recent_adapter_file.assert_not_called()
+        mock_app_actions.rank_recent_adapter_files.assert_not_called()
+
+
+class TestRecencyIndex:
+    def test_rank_most_recent_first(self):
+        index = RecencyIndex(["/a", "/b", "/c"])
+        assert [index.rank(p) for p in ("/a", "/b", "/c", "/d")] == [0, 1, 2, -1]
+        assert index.to_list() == ["/a", "/b", "/c"]
+
+    def test_add_moves_path_to_front(self):
+        index = RecencyIndex(["/a", "/b", "/c"])
+        index.add("/c")
+        assert index.to_list() == ["/c", "/a", "/b"]
+        assert index.rank("/c") == 0
+        assert index.rank("/b") == 2
+
+    def test_maxsize_drops_least_recent(self):
+        index = RecencyIndex(["/a", "/b", "/c"], maxsize=2)
+        assert index.to_list() == ["/a", "/b"]
+        index.add("/d")
+        assert index.to_list() == ["/d", "/a"]
+        index.set_maxsize(1)
+        assert index.to_list() == ["/d"]
+
+    def test_remove_missing_raises_value_error(self):
+        index = RecencyIndex(["/a"])
+        with pytest.raises(ValueError):
+            index.remove("/b")
+        index.remove("/a")
+        assert len(index) == 0
+
+    def test_rank_many_normalizes_paths(self, tmp_path):
+        recent = os.path.abspath(str(tmp_path / "x.png"))
+        index = RecencyIndex([recent])
+        assert index.rank_many([f"  {recent} ", str(tmp_path / "y.png"), "", "  "]) == [0, -1, -1, -1]
+
+    def test_sort_with_jitter_matches_per_file_lookup(self, image_dir):
+        """Batch ranking must sort exactly like the previous per-file lookups, jitter included."""
+        files = sorted(os.path.join(image_dir, name) for name in os.listdir(image_dir))
+        index = RecencyIndex([files[7], files[2], files[5], files[0]])
+
+        batch_actions = MagicMock()
+        batch_actions.rank_recent_adapter_files.side_effect = index.rank_many
+        per_file_actions = MagicMock()
+        per_file_actions.rank_recent_adapter_files.side_effect = (
+            lambda paths: [index.rank(RecencyIndex.normalize(p)) for p in paths])
+
+        batch = _sort_adapters_by_recency(files, True, batch_actions, lambda p: p)
+        per_file = _sort_adapters_by_recency(files, True, per_file_actions, lambda p: p)
+        assert list(batch) == list(per_file)
+        assert batch_actions.rank_recent_adapter_files.call_count == 1
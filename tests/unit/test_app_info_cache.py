@@ -1,6 +1,7 @@
 import json
 import pytest
 from utils.app_info_cache import AppInfoCache
+from utils.prompt_tag_stats import PromptTagStats
 from utils.runner_app_config import RunnerAppConfig
 
 
@@ -181,6 +182,54 @@ class TestGetPromptTagsByFrequency:
         # new_tag is at index 0 (weight 1.0), old_tag at index 1 (weight < 1.0)
         assert weighted["new_tag"] > weighted["old_tag"]
 
+    def test_weighted_newest_entry_weighs_one(self, app_cache):
+        app_cache.add_prompt_history_entry("old_tag")
+        app_cache.add_prompt_history_entry("new_tag")
+        weighted = app_cache.get_prompt_tags_by_frequency(weighted=True)
+        assert weighted["new_tag"] == pytest.approx(1.0)
+        assert weighted["old_tag"] == pytest.approx(PromptTagStats.DECAY)
+
+    def test_entries_falling_off_history_are_subtracted(self, app_cache, monkeypatch):
+        monkeypatch.setattr(AppInfoCache, "MAX_PROMPT_HISTORY_ENTRIES", 2)
+        app_cache.add_prompt_history_entry("first, shared")
+        app_cache.add_prompt_history_entry("second, shared")
+        app_cache.add_prompt_history_entry("third")
+        counts = app_cache.get_prompt_tags_by_frequency()
+        assert counts == {"second": 1, "shared": 1, "third": 1}
+        assert set(app_cache.get_prompt_tags_by_frequency(weighted=True)) == set(counts)
+
+    def test_incremental_matches_rebuild(self, app_cache, monkeypatch):
+        monkeypatch.setattr(AppInfoCache, "MAX_PROMPT_HISTORY_ENTRIES", 50)
+        monkeypatch.setattr(PromptTagStats, "RESCALE_INTERVAL", 7)
+        for i in range(120):
+            app_cache.add_prompt_history_entry(f"tag{i % 13}, (tag{i % 5}), common")
+        rebuilt = PromptTagStats.from_history(app_cache.get_recent_prompts(limit=50))
+        assert app_cache.get_prompt_tags_by_frequency() == rebuilt.get_frequencies()
+        incremental = app_cache.get_prompt_tags_by_frequency(weighted=True)
+        for tag, value in rebuilt.get_frequencies(weighted=True).items():
+            assert incremental[tag] == pytest.approx(value)
+
+    def test_top_prompt_tags_most_frequent_first(self, app_cache):
+        app_cache.add_prompt_history_entry("a, b, c")
+        app_cache.add_prompt_history_entry("b, c")
+        app_cache.add_prompt_history_entry("c")
+        assert app_cache.get_top_prompt_tags(2) == [("c", 3), ("b", 2)]
+        assert [tag for tag, _ in app_cache.get_top_prompt_tags(3, weighted=True)] == ["c", "b", "a"]
+
+    def test_persisted_stats_restored_without_rebuild(self, app_cache, monkeypatch):
+        app_cache.add_prompt_history_entry("sunset, ocean")
+        persisted = app_cache._get_prompt_tag_stats().to_dict()
+        app_cache._cache[AppInfoCache.PROMPT_TAG_STATS_KEY] = persisted
+        app_cache._prompt_tag_stats = None
+        monkeypatch.setattr(PromptTagStats, "from_history", classmethod(lambda cls, h: pytest.fail("rebuilt")))
+        assert app_cache.get_prompt_tags_by_frequency() == {"sunset": 1, "ocean": 1}
+
+    def test_stale_persisted_stats_are_rebuilt(self, app_cache):
+        app_cache.add_prompt_history_entry("sunset")
+        app_cache._cache[AppInfoCache.PROMPT_TAG_STATS_KEY] = PromptTagStats().to_dict()
+        app_cache._prompt_tag_stats = None
+        assert app_cache.get_prompt_tags_by_frequency() == {"sunset": 1}
+
 
 # ---------------------------------------------------------------------------
 # set_directory / get_directory / normalize_directory_key
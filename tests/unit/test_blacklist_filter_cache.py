@@ -0,0 +1,165 @@
+"""
+Tests for sd_runner/blacklist_filter_cache.py: the columnar filter cache
+entries, their on-disk format, and the cached path in Blacklist.filter_concepts.
+"""
+
+import os
+
+import pytest
+
+from sd_runner.blacklist import Blacklist, BlacklistItem
+from sd_runner.blacklist_filter_cache import BlacklistFilterCache, FilterCacheEntry
+from utils.globals import BlacklistMode
+
+
+CONCEPTS = ("red car", "blue sky", "red hat", "green tree", "red car", "", "tall red tower",
+            "cloud", "river", "bridge", "red")
+
+
+def _hits(concepts, bad="red", cleaned=False):
+    hits = []
+    for i, concept in enumerate(concepts):
+        if bad in concept:
+            hits.append((i, bad, concept.replace(bad, "").strip() if cleaned else None))
+    return hits
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    return str(tmp_path / "filter_cache" / "cache.bin")
+
+
+# ---------------------------------------------------------------------------
+# FilterCacheEntry
+# ---------------------------------------------------------------------------
+
+class TestFilterCacheEntry:
+    def test_remove_entire_tag(self):
+        entry = FilterCacheEntry.build(len(CONCEPTS), BlacklistMode.REMOVE_ENTIRE_TAG, "v1", _hits(CONCEPTS))
+        whitelist, filtered = entry.decode(CONCEPTS)
+        assert whitelist == [c for c in CONCEPTS if "red" not in c]
+        assert filtered == {"red car": "red", "red hat": "red", "tall red tower": "red", "red": "red"}
+        assert entry.filtered_indices() == [0, 2, 4, 6, 10]
+
+    def test_remove_word_keeps_cleaned_concepts(self):
+        entry = FilterCacheEntry.build(len(CONCEPTS), BlacklistMode.REMOVE_WORD_OR_PHRASE, "v1",
+                                       _hits(CONCEPTS, cleaned=True))
+        whitelist, _filtered = entry.decode(CONCEPTS)
+        assert whitelist == ["car", "blue sky", "hat", "green tree", "car", "", "tall  tower",
+                             "cloud", "river", "bridge"]
+
+    def test_log_only_keeps_everything(self):
+        entry = FilterCacheEntry.build(len(CONCEPTS), BlacklistMode.LOG_ONLY, "v1", _hits(CONCEPTS))
+        whitelist, filtered = entry.decode(CONCEPTS)
+        assert whitelist == list(CONCEPTS)
+        assert len(filtered) == 4
+
+    @pytest.mark.parametrize("count", [0, 1, 7, 8, 9, 33])
+    def test_bitmap_boundaries(self, count):
+        concepts = tuple(f"c{i}" for i in range(count))
+        hits = [(i, "item", None) for i in sorted(set(range(0, count, 3)) | set(range(count)[-1:]))]
+        entry = FilterCacheEntry.build(count, BlacklistMode.REMOVE_ENTIRE_TAG, "v1", hits)
+        assert entry.filtered_indices() == [h[0] for h in hits]
+        assert len(entry.decode(concepts)[0]) == count - len(hits)
+
+    def test_size_is_payload_length(self):
+        entry = FilterCacheEntry.build(100, BlacklistMode.REMOVE_ENTIRE_TAG, "v1", [(3, "x", None), (50, "y", None)])
+        assert entry.nbytes == 16 + 2 * 4
+
+    def test_wrong_source_length_is_rejected(self):
+        entry = FilterCacheEntry.build(len(CONCEPTS), BlacklistMode.REMOVE_ENTIRE_TAG, "v1", _hits(CONCEPTS))
+        with pytest.raises(ValueError):
+            entry.decode(CONCEPTS[:-1])
+
+
+# ---------------------------------------------------------------------------
+# BlacklistFilterCache
+# ---------------------------------------------------------------------------
+
+def _entry(concepts=CONCEPTS, mode=BlacklistMode.REMOVE_WORD_OR_PHRASE):
+    return FilterCacheEntry.build(len(concepts), mode, "v1", _hits(concepts, cleaned=True))
+
+
+class TestBlacklistFilterCache:
+    def test_total_size_is_exact(self):
+        cache = BlacklistFilterCache(maxsize=2)
+        entries = [_entry(), _entry(CONCEPTS * 3), _entry(CONCEPTS * 5)]
+        for i, entry in enumerate(entries):
+            cache.put(("fp", i, "m"), entry)
+        assert len(cache) == 2
+        assert cache.total_size == entries[1].nbytes + entries[2].nbytes
+
+    def test_round_trip_maps_payloads_lazily(self, cache_file):
+        cache = BlacklistFilterCache(filename=cache_file)
+        cache.put(("a", len(CONCEPTS), "REMOVE_WORD_OR_PHRASE"), _entry())
+        cache.put(("b", 1, "REMOVE_ENTIRE_TAG"), FilterCacheEntry.build(1, BlacklistMode.REMOVE_ENTIRE_TAG, "v1", []))
+        cache.version_cache = (3, "abc")
+        cache.save()
+
+        loaded = BlacklistFilterCache.load(cache_file)
+        assert list(loaded.cache) == [("a", len(CONCEPTS), "REMOVE_WORD_OR_PHRASE"), ("b", 1, "REMOVE_ENTIRE_TAG")]
+        assert loaded.version_cache == (3, "abc")
+        assert loaded.total_size == cache.total_size
+        entry = loaded.get(("a", len(CONCEPTS), "REMOVE_WORD_OR_PHRASE"))
+        assert isinstance(entry.payload, memoryview)
+        assert entry.decode(CONCEPTS) == _entry().decode(CONCEPTS)
+
+    def test_resave_remaps_entries(self, cache_file):
+        cache = BlacklistFilterCache(filename=cache_file)
+        cache.put(("a", len(CONCEPTS), "m"), _entry())
+        cache.save()
+        loaded = BlacklistFilterCache.load(cache_file)
+        loaded.put(("b", len(CONCEPTS), "m"), _entry())
+        loaded.save()
+        loaded.save()
+        assert BlacklistFilterCache.load(cache_file).get(("a", len(CONCEPTS), "m")).decode(CONCEPTS) \
+            == _entry().decode(CONCEPTS)
+
+    @pytest.mark.parametrize("content", [b"", b"SDBF", b"not a cache at all"])
+    def test_unreadable_file_gives_empty_cache(self, cache_file, content):
+        os.makedirs(os.path.dirname(cache_file))
+        with open(cache_file, "wb") as f:
+            f.write(content)
+        cache = BlacklistFilterCache.load_or_create(cache_file)
+        assert len(cache) == 0
+        assert cache.filename == cache_file
+
+
+# ---------------------------------------------------------------------------
+# Blacklist integration
+# ---------------------------------------------------------------------------
+
+class TestBlacklistFilterCaching:
+    @pytest.fixture(autouse=True)
+    def fresh_cache(self, cache_file, monkeypatch):
+        monkeypatch.setattr(Blacklist, "_filter_cache", BlacklistFilterCache(filename=cache_file))
+        Blacklist.set_blacklist([BlacklistItem("red")])
+
+    def test_cached_result_matches_uncached(self):
+        Blacklist.set_blacklist_mode(BlacklistMode.REMOVE_WORD_OR_PHRASE)
+        uncached = Blacklist.filter_concepts(list(CONCEPTS), do_cache=False)
+        assert Blacklist.filter_concepts(list(CONCEPTS)) == uncached
+        assert Blacklist.filter_concepts(list(CONCEPTS)) == uncached
+
+    def test_hit_survives_reload_without_matching(self, cache_file, monkeypatch):
+        expected = Blacklist.filter_concepts(list(CONCEPTS), user_prompt=False)
+        Blacklist.save_cache()
+        monkeypatch.setattr(Blacklist, "_filter_cache", BlacklistFilterCache.load_or_create(cache_file))
+
+        def fail(self, tag):
+            raise AssertionError("cached result should not be recomputed")
+
+        monkeypatch.setattr(BlacklistItem, "matches_tag", fail)
+        assert Blacklist.filter_concepts(list(CONCEPTS), user_prompt=False) == expected
+
+    def test_mode_is_part_of_key(self):
+        Blacklist.set_blacklist_mode(BlacklistMode.LOG_ONLY)
+        assert Blacklist.filter_concepts(list(CONCEPTS))[0] == list(CONCEPTS)
+        assert "red car" not in Blacklist.filter_concepts(list(CONCEPTS), user_prompt=False)[0]
+
+    def test_changed_blacklist_misses_without_clearing(self):
+        Blacklist.filter_concepts(list(CONCEPTS))
+        Blacklist.set_blacklist([BlacklistItem("cloud")])
+        whitelist, filtered = Blacklist.filter_concepts(list(CONCEPTS))
+        assert "red car" in whitelist
+        assert filtered == {"cloud": "cloud"}
@@ -0,0 +1,374 @@
+"""
+Tests for the ComfyUI node pool in sd_runner/generators/comfy_pool.py and
+ComfyGen's multi-node dispatch.
+
+Each node is a local fake ComfyUI server answering /queue, /prompt, /history,
+/view and /upload/image, plus a bare-bones /ws websocket that reports a prompt
+as finished as soon as it is queued.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import error, parse
+
+import pytest
+
+from sd_runner.gen_config import GenConfig
+from sd_runner.generators.comfy import ComfyGen
+from sd_runner.generators.comfy_pool import ComfyNodePool, is_node_failure
+from utils.config import config
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class _FakeComfyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = parse.urlparse(self.path)
+        if url.path == "/queue":
+            self._send_json({"queue_running": [], "queue_pending": [[i] for i in range(server.queue_depth)]})
+        elif url.path == "/ws":
+            self._serve_websocket(parse.parse_qs(url.query)["clientId"][0])
+        elif url.path.startswith("/history/"):
+            prompt_id = url.path.rsplit("/", 1)[1]
+            images = [{"filename": f"{server.name}_{prompt_id[:4]}.png", "subfolder": "", "type": "output"}]
+            self._send_json({prompt_id: {"outputs": {"9": {"images": images}}}})
+        elif url.path == "/view":
+            body = f"png from {server.name}".encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        server = self.server
+        raw = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path == "/upload/image":
+            match = re.search(rb'filename="([^"]+)"\r\n[^\r]*\r\n\r\n(.*?)\r\n--', raw, re.S)
+            name = match.group(1).decode()
+            with server.lock:
+                server.uploads.append((name, match.group(2)))
+            self._send_json({"name": name, "subfolder": "", "type": "input"})
+            return
+        body = json.loads(raw)
+        if server.fail_prompts:
+            self._send_json({"error": "out of memory"}, status=500)
+            return
+        prompt_id = str(uuid.uuid4())
+        with server.lock:
+            server.prompts.append(body)
+            server.queued[body["client_id"]] = prompt_id
+            server.lock.notify_all()
+        self._send_json({"prompt_id": prompt_id, "number": len(server.prompts)})
+
+    def _serve_websocket(self, client_id):
+        accept = base64.b64encode(hashlib.sha1((self.headers["Sec-WebSocket-Key"] + _WS_GUID).encode()).digest())
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept.decode())
+        self.end_headers()
+        with self.server.lock:
+            self.server.lock.wait_for(lambda: client_id in self.server.queued, timeout=5)
+            prompt_id = self.server.queued.get(client_id)
+        message = json.dumps({"type": "executing", "data": {"node": None, "prompt_id": prompt_id}}).encode()
+        self.wfile.write(bytes([0x81, len(message)]) + message)  # Unmasked text frame, < 126 bytes
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def _start_fake_comfy(name):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeComfyHandler)
+    server.daemon_threads = True
+    server.name = name
+    server.queue_depth = 0
+    server.fail_prompts = False
+    server.prompts = []
+    server.uploads = []
+    server.queued = {}
+    server.lock = threading.Condition()
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    return server
+
+
+def _url(server):
+    host, port = server.server_address
+    return f"http://{host}:{port}"
+
+
+@pytest.fixture
+def fake_nodes():
+    servers = [_start_fake_comfy(f"node{i}") for i in range(3)]
+    yield servers
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def comfy_output(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "comfyui_loc", str(tmp_path / "ComfyUI"))
+    return tmp_path / "ComfyUI" / "output"
+
+
+class _FakePrompt:
+    def __init__(self, *image_paths):
+        self.image_paths = image_paths
+
+    def get_json(self):
+        workflow = {"3": {"class_type": "KSampler", "inputs": {}}}
+        for i, path in enumerate(self.image_paths):
+            class_type = "LoadImageMask" if i % 2 else "LoadImage"
+            workflow[str(10 + i)] = {"class_type": class_type, "inputs": {"image": path}}
+        return json.dumps({"prompt": workflow}).encode()
+
+
+def _sent_images(server, index=-1):
+    workflow = server.prompts[index]["prompt"]
+    return [node["inputs"]["image"] for node in workflow.values() if "image" in node["inputs"]]
+
+
+def _comfy_gen(pool, monkeypatch):
+    monkeypatch.setattr(ComfyGen, "NODE_POOL", pool)
+    gen = ComfyGen(GenConfig())
+    gen.pending_counter = 100  # queue_prompt decrements it
+    return gen
+
+
+def _closed_port_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BaseHTTPRequestHandler)
+    url = _url(server)
+    server.server_close()
+    return url
+
+
+# ---------------------------------------------------------------------------
+# ComfyNodePool
+# ---------------------------------------------------------------------------
+
+class TestComfyNodePool:
+    def test_routes_to_least_loaded_node(self, fake_nodes):
+        fake_nodes[0].queue_depth = 4
+        fake_nodes[1].queue_depth = 1
+        fake_nodes[2].queue_depth = 2
+        pool = ComfyNodePool([_url(s) for s in fake_nodes])
+        first = pool.acquire()
+        assert first.url.endswith(str(fake_nodes[1].server_address[1]))
+        # Our own prompts count against a node until its queue is polled again
+        second = pool.acquire()
+        assert second is first
+        third = pool.acquire()
+        assert third.url.endswith(str(fake_nodes[2].server_address[1]))
+
+    def test_unreachable_node_is_skipped(self, fake_nodes):
+        pool = ComfyNodePool([_closed_port_url(), _url(fake_nodes[0])])
+        node = pool.acquire()
+        assert node is pool.nodes[1]
+        assert not pool.nodes[0].healthy
+
+    def test_failed_work_moves_to_another_node(self, fake_nodes):
+        pool = ComfyNodePool([_url(s) for s in fake_nodes[:2]])
+        attempts = []
+
+        def task(node):
+            attempts.append(node.url)
+            if len(attempts) == 1:
+                raise ConnectionResetError("node went away")
+            return node.url
+
+        assert pool.run(task) == attempts[1] != attempts[0]
+        stats = {s["url"]: s for s in pool.stats()}
+        assert stats[attempts[0]]["failed"] == 1 and not stats[attempts[0]]["healthy"]
+        assert stats[attempts[1]]["completed"] == 1
+
+    def test_workflow_errors_are_not_retried(self, fake_nodes):
+        pool = ComfyNodePool([_url(s) for s in fake_nodes[:2]])
+        calls = []
+
+        def task(node):
+            calls.append(node)
+            raise Exception("ComfyUI execution error: bad node")
+
+        with pytest.raises(Exception, match="execution error"):
+            pool.run(task)
+        assert len(calls) == 1
+        assert all(node.healthy for node in pool.nodes)
+
+    def test_all_nodes_down(self):
+        pool = ComfyNodePool([_closed_port_url()])
+        with pytest.raises(Exception, match="No healthy ComfyUI node"):
+            pool.run(lambda node: None)
+
+    def test_is_node_failure(self):
+        assert is_node_failure(error.URLError("refused"))
+        assert is_node_failure(error.HTTPError("u", 503, "busy", {}, None))
+        assert not is_node_failure(error.HTTPError("u", 400, "bad prompt", {}, None))
+        assert not is_node_failure(ValueError("x"))
+
+    def test_from_config(self, monkeypatch):
+        monkeypatch.setattr(config, "comfyui_nodes", [])
+        assert ComfyNodePool.from_config(config) is None
+        monkeypatch.setattr(config, "comfyui_url", "http://127.0.0.1:8188")
+        monkeypatch.setattr(config, "comfyui_nodes", ["http://127.0.0.1:8188/", "10.0.0.2:8188", "10.0.0.2:8188"])
+        pool = ComfyNodePool.from_config(config)
+        assert [(n.url, n.is_local) for n in pool.nodes] == [("127.0.0.1:8188", True), ("10.0.0.2:8188", False)]
+
+
+# ---------------------------------------------------------------------------
+# ComfyGen dispatch
+# ---------------------------------------------------------------------------
+
+class TestComfyGenMultiNode:
+    def test_prompts_follow_queue_depth(self, fake_nodes, comfy_output, monkeypatch):
+        pool = ComfyNodePool([_url(s) for s in fake_nodes])
+        gen = _comfy_gen(pool, monkeypatch)
+        monkeypatch.setattr(ComfyNodePool, "QUEUE_POLL_INTERVAL", 0)
+        for i in (2, 0, 1):
+            for j, server in enumerate(fake_nodes):
+                server.queue_depth = 0 if j == i else 5
+            gen.queue_prompt(_FakePrompt())
+        assert [len(s.prompts) for s in fake_nodes] == [1, 1, 1]
+        assert len(os.listdir(comfy_output)) == 3
+
+    def test_remote_images_land_in_local_output(self, fake_nodes, comfy_output, monkeypatch):
+        pool = ComfyNodePool([_url(fake_nodes[0])])
+        gen = _comfy_gen(pool, monkeypatch)
+        images = gen.queue_prompt(_FakePrompt())
+        assert images["9"] == [b"png from node0"]
+        saved = os.listdir(comfy_output)
+        assert len(saved) == 1 and saved[0].startswith("node0_")
+        assert pool.stats()[0]["images"] == 1
+
+    def test_local_node_images_are_not_copied(self, fake_nodes, comfy_output, monkeypatch):
+        pool = ComfyNodePool([_url(fake_nodes[0])], local_url=_url(fake_nodes[0]))
+        gen = _comfy_gen(pool, monkeypatch)
+        gen.queue_prompt(_FakePrompt())
+        assert not comfy_output.exists()
+
+    def test_failing_node_work_is_requeued(self, fake_nodes, comfy_output, monkeypatch):
+        fake_nodes[0].fail_prompts = True
+        pool = ComfyNodePool([_url(s) for s in fake_nodes[:2]])
+        gen = _comfy_gen(pool, monkeypatch)
+        images = gen.queue_prompt(_FakePrompt())
+        assert images["9"] == [b"png from node1"]
+        assert [len(s.prompts) for s in fake_nodes[:2]] == [0, 1]
+        assert not pool.nodes[0].healthy
+
+    def test_name_collisions_get_a_suffix(self, tmp_path):
+        path = str(tmp_path / "out" / "ComfyUI_00001_.png")
+        assert ComfyGen.save_downloaded_image(b"a", path) == path
+        second = ComfyGen.save_downloaded_image(b"b", path)
+        assert second == str(tmp_path / "out" / "ComfyUI_00001__2.png")
+        with open(second, "rb") as f:
+            assert f.read() == b"b"
+
+
+# ---------------------------------------------------------------------------
+# Input images
+# ---------------------------------------------------------------------------
+
+class TestInputImageUpload:
+    @pytest.fixture
+    def inputs(self, tmp_path):
+        paths = []
+        for name, content in (("control.png", b"control"), ("mask.png", b"mask"), ("copy.png", b"control")):
+            path = tmp_path / name
+            path.write_bytes(content)
+            paths.append(str(path))
+        return paths
+
+    def test_remote_node_receives_uploaded_inputs(self, fake_nodes, comfy_output, inputs, monkeypatch):
+        pool = ComfyNodePool([_url(fake_nodes[0])])
+        gen = _comfy_gen(pool, monkeypatch)
+        gen.queue_prompt(_FakePrompt(*inputs))
+        digest = hashlib.blake2b(b"control", digest_size=16).hexdigest()
+        sent = _sent_images(fake_nodes[0])
+        assert sent[0] == sent[2] == f"{digest}.png"
+        assert sent[1] == hashlib.blake2b(b"mask", digest_size=16).hexdigest() + ".png"
+        assert sorted(content for _, content in fake_nodes[0].uploads) == [b"control", b"mask"]
+        gen.queue_prompt(_FakePrompt(inputs[0]))
+        assert len(fake_nodes[0].uploads) == 2  # Cached per node and content
+        assert _sent_images(fake_nodes[0]) == [f"{digest}.png"]
+
+    def test_local_node_keeps_paths(self, fake_nodes, comfy_output, inputs, monkeypatch):
+        pool = ComfyNodePool([_url(fake_nodes[0])], local_url=_url(fake_nodes[0]))
+        gen = _comfy_gen(pool, monkeypatch)
+        gen.queue_prompt(_FakePrompt(*inputs))
+        assert _sent_images(fake_nodes[0]) == inputs
+        assert fake_nodes[0].uploads == []
+
+    def test_node_side_names_are_left_alone(self, fake_nodes, comfy_output, monkeypatch):
+        pool = ComfyNodePool([_url(fake_nodes[0])])
+        gen = _comfy_gen(pool, monkeypatch)
+        gen.queue_prompt(_FakePrompt("example.png"))
+        assert _sent_images(fake_nodes[0]) == ["example.png"]
+        assert fake_nodes[0].uploads == []
+
+    def test_each_node_gets_its_own_upload(self, fake_nodes, inputs):
+        pool = ComfyNodePool([_url(s) for s in fake_nodes[:2]])
+        for node in pool.nodes:
+            pool.upload_image(node, inputs[0])
+            pool.upload_image(node, inputs[2])
+        assert [len(s.uploads) for s in fake_nodes[:2]] == [1, 1]
+
+    def test_concurrent_uploads_of_same_content_wait(self, fake_nodes, inputs, monkeypatch):
+        pool = ComfyNodePool([_url(fake_nodes[0])])
+        release = threading.Event()
+        original = ComfyNodePool._post_image
+        posted = []
+
+        def slow_post(self, node, path, data, digest):
+            posted.append(data)
+            if data == b"control":
+                release.wait(5)
+            return original(self, node, path, data, digest)
+
+        monkeypatch.setattr(ComfyNodePool, "_post_image", slow_post)
+        results = []
+        threads = [threading.Thread(target=lambda p=p: results.append(pool.upload_image(pool.nodes[0], p)))
+                   for p in (inputs[0], inputs[2])]
+        for thread in threads:
+            thread.start()
+        # A different image is not held up by the pending one
+        pool.upload_image(pool.nodes[0], inputs[1])
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        assert sorted(posted) == [b"control", b"mask"]
+        assert len(set(results)) == 1
+
+    def test_failed_upload_is_retried_on_another_node(self, fake_nodes, comfy_output, inputs, monkeypatch):
+        pool = ComfyNodePool([_url(s) for s in fake_nodes[:2]])
+        original = ComfyNodePool._post_image
+
+        def flaky_post(self, node, path, data, digest):
+            if node is pool.nodes[0]:
+                raise ConnectionResetError("node went away")
+            return original(self, node, path, data, digest)
+
+        monkeypatch.setattr(ComfyNodePool, "_post_image", flaky_post)
+        gen = _comfy_gen(pool, monkeypatch)
+        gen.queue_prompt(_FakePrompt(inputs[0]))
+        assert [len(s.prompts) for s in fake_nodes[:2]] == [0, 1]
+        assert not pool.nodes[0].healthy and pool.nodes[0].uploads == {}
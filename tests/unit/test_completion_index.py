@@ -0,0 +1,52 @@
+import pytest
+
+from lib.autocomplete_entry_qt import default_matches
+from lib.completion_index import CompletionIndex
+
+
+ITEMS = ["sd_xl_base", "realisticVision", "dreamshaper_8", "SDXL_turbo", "juggernautXL", "xl_lightning"]
+
+
+class TestCompletionIndexMatching:
+    def test_empty_query_returns_nothing(self):
+        assert CompletionIndex(ITEMS).query("") == []
+
+    def test_prefix_matches_case_insensitive(self):
+        idx = CompletionIndex(ITEMS, substring=False)
+        assert idx.query("sd") == ["sd_xl_base", "SDXL_turbo"]
+
+    def test_substring_matches_same_set_as_default_matches(self):
+        idx = CompletionIndex(ITEMS)
+        for term in ["x", "xl", "xl_", "ream", "turbo", "nope", "_"]:
+            expected = {w for w in ITEMS if default_matches(term, w)}
+            assert set(idx.query(term)) == expected, term
+
+    def test_prefix_matches_ranked_before_substring_matches(self):
+        idx = CompletionIndex(ITEMS)
+        assert idx.query("xl")[0] == "xl_lightning"
+
+    def test_duplicates_dropped(self):
+        assert CompletionIndex(["a1", "a1", "a2"]).query("a") == ["a1", "a2"]
+
+
+class TestCompletionIndexRanking:
+    def test_weights_rank_within_prefix_matches(self):
+        idx = CompletionIndex(["cat", "car", "cab"], weights={"CAB": 5.0, "car": 1.0})
+        assert idx.query("ca") == ["cab", "car", "cat"]
+
+    def test_unweighted_keeps_original_order(self):
+        idx = CompletionIndex(["cat", "car", "cab"])
+        assert idx.query("ca") == ["cat", "car", "cab"]
+
+    def test_limit_returns_top_k(self):
+        items = [f"tag{i}" for i in range(100)]
+        idx = CompletionIndex(items, weights={"tag42": 3.0, "tag7": 2.0})
+        assert idx.query("tag", limit=3) == ["tag42", "tag7", "tag0"]
+
+    def test_rebuild_replaces_items(self):
+        idx = CompletionIndex(["alpha"])
+        assert idx.query("al") == ["alpha"]
+        idx.build(["beta"])
+        assert idx.query("al") == []
+        assert idx.query("be") == ["beta"]
+        assert len(idx) == 1
@@ -295,3 +295,61 @@ class TestConceptsFileLoad:
         cf = ConceptsFile(str(f))
         assert "apple" in cf.concept_indices
         assert "banana" in cf.concept_indices
+
+
+# ---------------------------------------------------------------------------
+# Concepts.get_filtered_concepts_for_preview — chunked, cancellable, cached
+# ---------------------------------------------------------------------------
+
+_DICTIONARY_ONLY = {"SFW": False, "NSFW": False, "NSFL": False, "Art Styles": False, "Dictionary": True}
+
+
+class TestGetFilteredConceptsForPreview:
+    @pytest.fixture
+    def concepts_dir(self, tmp_path, monkeypatch):
+        words = [f"word{i}" for i in range(12)] + ["redcar", "bluecar"]
+        (tmp_path / Concepts.ALL_WORDS_LIST_FILENAME).write_text("\n".join(words) + "\n")
+        monkeypatch.setattr(Concepts, "CONCEPTS_DIR", str(tmp_path))
+        monkeypatch.setattr(Concepts, "PREVIEW_CHUNK_SIZE", 5)
+        return tmp_path
+
+    def test_specific_item_matches(self, concepts_dir):
+        item = BlacklistItem("car", use_word_boundary=False)
+        result = Concepts.get_filtered_concepts_for_preview(item, _DICTIONARY_ONLY)
+        assert sorted(result) == ["bluecar", "redcar"]
+
+    def test_all_items_uses_blacklist(self, concepts_dir):
+        Blacklist.add_to_blacklist("redcar")
+        result = Concepts.get_filtered_concepts_for_preview(None, _DICTIONARY_ONLY)
+        assert result == ["redcar"]
+
+    def test_partial_results_and_progress_streamed(self, concepts_dir):
+        partials, progress = [], []
+        result = Concepts.get_filtered_concepts_for_preview(
+            BlacklistItem("word1"), _DICTIONARY_ONLY,
+            partial_callback=partials.append,
+            progress_callback=lambda current, total: progress.append((current, total)),
+        )
+        assert [c for chunk in partials for c in chunk] == result
+        assert progress[0] == (0, 14)
+        assert progress[-1] == (14, 14)
+
+    def test_cancelled_preview_returns_none_and_is_not_cached(self, concepts_dir):
+        import threading
+        cancel_event = threading.Event()
+        cancel_event.set()
+        item = BlacklistItem("car", use_word_boundary=False)
+        assert Concepts.get_filtered_concepts_for_preview(item, _DICTIONARY_ONLY, cancel_event=cancel_event) is None
+        assert len(Concepts._preview_cache) == 0
+
+    def test_repeated_preview_served_from_cache(self, concepts_dir, monkeypatch):
+        item = BlacklistItem("car", use_word_boundary=False)
+        first = Concepts.get_filtered_concepts_for_preview(item, _DICTIONARY_ONLY)
+        monkeypatch.setattr(Concepts, "load", lambda filename: pytest.fail("concepts reloaded"))
+        assert Concepts.get_filtered_concepts_for_preview(item, _DICTIONARY_ONLY) == first
+
+    def test_blacklist_change_invalidates_cache(self, concepts_dir):
+        Blacklist.add_to_blacklist("redcar")
+        assert Concepts.get_filtered_concepts_for_preview(None, _DICTIONARY_ONLY) == ["redcar"]
+        Blacklist.add_to_blacklist("bluecar")
+        assert sorted(Concepts.get_filtered_concepts_for_preview(None, _DICTIONARY_ONLY)) == ["bluecar", "redcar"]
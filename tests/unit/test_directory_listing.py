@@ -0,0 +1,117 @@
+"""
+Tests for utils/directory_listing.py.
+
+Listings are only reused when the directory mtime is older than
+MTIME_RESOLUTION_SECONDS, so tests backdate directory mtimes with os.utime.
+"""
+
+import os
+import time
+
+import pytest
+
+from utils.directory_listing import DirectoryListingCache
+from utils.utils import Utils
+
+
+def _backdate(path, seconds=60):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+@pytest.fixture
+def listing_dir(tmp_path):
+    tmp_path = tmp_path / "listing"
+    tmp_path.mkdir()
+    for name in ("b.png", "a.JPG", "c.txt", ".hidden.png", "noext"):
+        (tmp_path / name).write_bytes(b"x")
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    (sub / "d.png").write_bytes(b"x")
+    _backdate(sub)
+    _backdate(tmp_path)
+    return tmp_path
+
+
+# ---------------------------------------------------------------------------
+# DirectoryListingCache
+# ---------------------------------------------------------------------------
+
+class TestDirectoryListingCache:
+    def test_filters_extensions_case_insensitively(self, listing_dir):
+        cache = DirectoryListingCache()
+        files = cache.list_files(str(listing_dir), allowed_extensions=[".png", ".jpg"])
+        assert [os.path.basename(f) for f in files] == ["a.JPG", "b.png"]
+
+    def test_no_filter_lists_visible_entries(self, listing_dir):
+        cache = DirectoryListingCache()
+        files = cache.list_files(str(listing_dir))
+        assert [os.path.basename(f) for f in files] == ["a.JPG", "b.png", "c.txt", "noext", "sub"]
+
+    def test_recursive_includes_subdirectories(self, listing_dir):
+        cache = DirectoryListingCache()
+        files = cache.list_files(str(listing_dir), recursive=True, allowed_extensions=[".png"])
+        assert files == [str(listing_dir / "b.png"), str(listing_dir / "sub" / "d.png")]
+
+    def test_unchanged_directory_is_served_from_cache(self, listing_dir):
+        cache = DirectoryListingCache()
+        first = cache.list_files(str(listing_dir), allowed_extensions=[".png"])
+        first.append("caller mutation")
+        second = cache.list_files(str(listing_dir), allowed_extensions=[".png"])
+        assert second == [str(listing_dir / "b.png")]
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_added_file_invalidates_listing(self, listing_dir):
+        cache = DirectoryListingCache()
+        cache.list_files(str(listing_dir), allowed_extensions=[".png"])
+        (listing_dir / "e.png").write_bytes(b"x")
+        files = cache.list_files(str(listing_dir), allowed_extensions=[".png"])
+        assert str(listing_dir / "e.png") in files
+        assert cache.misses == 2
+
+    def test_recently_modified_directory_is_not_reused(self, tmp_path):
+        (tmp_path / "a.png").write_bytes(b"x")
+        cache = DirectoryListingCache()
+        cache.list_files(str(tmp_path))
+        cache.list_files(str(tmp_path))
+        assert cache.misses == 2
+
+    def test_lru_eviction(self, tmp_path):
+        cache = DirectoryListingCache(max_entries=1)
+        dirs = []
+        for name in ("one", "two"):
+            d = tmp_path / name
+            d.mkdir()
+            _backdate(d)
+            dirs.append(str(d))
+        cache.list_files(dirs[0])
+        cache.list_files(dirs[1])
+        cache.list_files(dirs[0])
+        assert cache.misses == 3
+
+    def test_scan_and_cached_replay_share_sorted_order(self, tmp_path):
+        names = ["m.png", "z.png", "a.png", "k.png"]
+        dirpath = tmp_path / "unsorted"
+        dirpath.mkdir()
+        for name in names:
+            (dirpath / name).write_bytes(b"x")
+        _backdate(dirpath)
+        cache = DirectoryListingCache()
+        expected = [str(dirpath / name) for name in sorted(names)]
+        assert cache.list_files(str(dirpath)) == expected
+        assert cache.list_files(str(dirpath)) == expected
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_missing_directory_raises(self, tmp_path):
+        with pytest.raises(OSError):
+            DirectoryListingCache().list_files(str(tmp_path / "missing"))
+
+
+class TestGetFilesFromDir:
+    def test_matches_sorted_listing(self, listing_dir):
+        files = Utils.get_files_from_dir(str(listing_dir), allowed_extensions=Utils.IMAGE_EXTENSIONS)
+        assert files == [str(listing_dir / "a.JPG"), str(listing_dir / "b.png")]
+
+    def test_not_a_directory_raises(self, tmp_path):
+        with pytest.raises(Exception, match="Not a directory"):
+            Utils.get_files_from_dir(str(tmp_path / "missing"))
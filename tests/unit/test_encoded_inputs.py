@@ -0,0 +1,124 @@
+"""
+Tests for the shared encoded-input cache in sd_runner/generators/encoded_inputs.py.
+"""
+
+import base64
+import threading
+
+import pytest
+
+from sd_runner.generators import encoded_inputs as encoded_inputs_module
+from sd_runner.generators.encoded_inputs import EncodedInputCache, encoded_inputs
+from sd_runner.generators.fooocus import FooocusGen
+from sd_runner.generators.sdwebui import SDWebuiGen, encode_file_to_base64
+from sd_runner.generators.swarmui import SwarmUIGen
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "control.png"
+    path.write_bytes(b"\x89PNG fake image data")
+    return path
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("utf-8")
+
+
+# ---------------------------------------------------------------------------
+# EncodedInputCache
+# ---------------------------------------------------------------------------
+
+class TestEncodedInputCache:
+    def test_repeat_reads_hit(self, image):
+        cache = EncodedInputCache()
+        assert cache.get(str(image)) == _b64(image.read_bytes())
+        assert cache.get(str(image)) == _b64(image.read_bytes())
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+        assert stats["bytes"] == len(_b64(image.read_bytes()))
+
+    def test_changed_file_is_encoded_again(self, image):
+        cache = EncodedInputCache()
+        cache.get(str(image))
+        image.write_bytes(b"a different, longer image")
+        assert cache.get(str(image)) == _b64(b"a different, longer image")
+        assert cache.stats()["misses"] == 2
+
+    def test_bounded_by_encoded_bytes(self, tmp_path):
+        paths = []
+        for i in range(3):
+            path = tmp_path / f"{i}.png"
+            path.write_bytes(bytes([i]) * 30)  # 40 base64 characters each
+            paths.append(str(path))
+        cache = EncodedInputCache(max_bytes=100)
+        for path in paths:
+            cache.get(path)
+        stats = cache.stats()
+        assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 80, 1)
+        cache.get(paths[0])
+        assert cache.stats()["misses"] == 4
+
+    def test_prefetch_then_get_is_a_hit(self, image):
+        cache = EncodedInputCache()
+        cache.prefetch([str(image), None, str(image.with_name("missing.png"))])
+        assert cache.get(str(image)) == _b64(image.read_bytes())
+        assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+    def test_concurrent_gets_share_one_encode(self, image, monkeypatch):
+        release = threading.Event()
+        calls = []
+        original = encoded_inputs_module._encode_file
+
+        def slow_encode(path):
+            calls.append(path)
+            release.wait(5)
+            return original(path)
+
+        monkeypatch.setattr(encoded_inputs_module, "_encode_file", slow_encode)
+        cache = EncodedInputCache()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get(str(image)))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        assert len(calls) == 1
+        assert results == [_b64(image.read_bytes())] * 4
+
+    def test_missing_and_empty_files(self, tmp_path):
+        cache = EncodedInputCache()
+        with pytest.raises(FileNotFoundError):
+            cache.get(str(tmp_path / "missing.png"))
+        empty = tmp_path / "empty.png"
+        empty.write_bytes(b"")
+        with pytest.raises(ValueError):
+            cache.get(str(empty))
+        assert cache.stats()["entries"] == 0
+
+    def test_failed_encode_is_not_cached(self, image, monkeypatch):
+        def fail(path):
+            raise PermissionError(path)
+
+        cache = EncodedInputCache()
+        monkeypatch.setattr(encoded_inputs_module, "_encode_file", fail)
+        with pytest.raises(PermissionError):
+            cache.get(str(image))
+        monkeypatch.undo()
+        assert cache.get(str(image)) == _b64(image.read_bytes())
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+class TestBackendsShareCache:
+    def test_all_http_backends_use_the_shared_cache(self, image):
+        encoded_inputs.clear()
+        expected = _b64(image.read_bytes())
+        assert encode_file_to_base64(str(image)) == expected
+        assert FooocusGen._read_image_b64(str(image)) == expected
+        assert SwarmUIGen._read_image_b64(str(image)) == expected
+        assert (encoded_inputs.stats()["hits"], encoded_inputs.stats()["misses"]) == (2, 1)
+        assert SDWebuiGen.ENCODES_INPUT_IMAGES and FooocusGen.ENCODES_INPUT_IMAGES and SwarmUIGen.ENCODES_INPUT_IMAGES
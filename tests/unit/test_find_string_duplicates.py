@@ -0,0 +1,171 @@
+"""
+Tests for the near-duplicate search in scripts/find_string_duplicates.py.
+
+The reference implementations below are the plain pairwise scans the script
+used before candidate search; the bounded search must agree with them on
+every threshold.
+"""
+
+import importlib.util
+import os
+import random
+from difflib import SequenceMatcher
+
+import numpy as np
+import pytest
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                           "scripts", "find_string_duplicates.py")
+
+
+@pytest.fixture(scope="module")
+def fsd():
+    cwd = os.getcwd()
+    spec = importlib.util.spec_from_file_location("find_string_duplicates", SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(cwd)  # The script switches to the project root on import
+    return module
+
+
+def _reference_similar(fsd, lines, threshold):
+    normalized_lines = [(idx, fsd.normalize_text(line), line)
+                        for idx, line in enumerate(lines, 1)
+                        if fsd.normalize_text(line)]
+    similar_pairs = []
+    seen = set()
+    for i, (idx1, norm1, orig1) in enumerate(normalized_lines):
+        if norm1 in seen:
+            continue
+        matches = [(idx1, orig1, 1.0)]
+        for idx2, norm2, orig2 in normalized_lines[i + 1:]:
+            if norm2 in seen:
+                continue
+            similarity = SequenceMatcher(None, norm1, norm2).ratio()
+            if similarity >= threshold:
+                matches.append((idx2, orig2, similarity))
+                seen.add(norm2)
+        if len(matches) > 1:
+            matches.sort(key=lambda x: (-x[2], x[0]))
+            similar_pairs.append((norm1, matches))
+            seen.add(norm1)
+    similar_pairs.sort(key=lambda x: -max((m[2] for m in x[1][1:]), default=0))
+    return similar_pairs
+
+
+def _reference_semantic(text_map, embeddings, threshold):
+    similar_pairs = []
+    seen = set()
+    for i, (idx1, orig1, norm1) in enumerate(text_map):
+        if i in seen:
+            continue
+        matches = [(idx1, orig1)]
+        for j in range(i + 1, len(text_map)):
+            if j in seen:
+                continue
+            if float(embeddings[i] @ embeddings[j]) >= threshold:
+                matches.append((text_map[j][0], text_map[j][1]))
+                seen.add(j)
+        if len(matches) > 1:
+            similar_pairs.append((norm1, matches))
+            seen.add(i)
+    return similar_pairs
+
+
+def _corpus(count=300, seed=7):
+    rng = random.Random(seed)
+    words = ["red", "blue", "castle", "forest", "river", "ancient", "ruined", "misty", "tower", "harbor",
+             "desert", "temple", "garden", "market", "bridge", "valley"]
+    lines = []
+    for _ in range(count):
+        if lines and rng.random() < 0.4:
+            base = list(rng.choice(lines))
+            for _ in range(rng.randint(1, 4)):
+                pos = rng.randrange(len(base) + 1)
+                op = rng.random()
+                if op < 0.4 and pos < len(base):
+                    del base[pos]
+                elif op < 0.8:
+                    base.insert(pos, rng.choice("abcdefghij "))
+                elif pos < len(base):
+                    base[pos] = rng.choice("xyz")
+            lines.append("".join(base))
+        else:
+            lines.append(" ".join(rng.choice(words) for _ in range(rng.randint(1, 4))))
+    lines.insert(10, "")
+    lines.insert(20, "Misty (variant) Tower!")
+    return lines
+
+
+THRESHOLDS = (0.6, 0.75, 0.85, 0.95)
+
+
+# ---------------------------------------------------------------------------
+# Text similarity
+# ---------------------------------------------------------------------------
+
+class TestSimilarDuplicates:
+    @pytest.mark.parametrize("threshold", THRESHOLDS)
+    def test_exact_matches_reference(self, fsd, threshold):
+        lines = _corpus()
+        assert fsd.find_similar_duplicates(lines, threshold) == _reference_similar(fsd, lines, threshold)
+
+    def test_sweep_reuses_index(self, fsd):
+        lines = _corpus(seed=3)
+        index = fsd.TextSimilarityIndex(lines)
+        for threshold in sorted(THRESHOLDS):
+            expected = _reference_similar(fsd, lines, threshold)
+            assert fsd.find_similar_duplicates(lines, threshold, index=index) == expected, threshold
+        # Candidates found for the lowest threshold also serve the higher ones
+        assert index._exact_candidates[0] == min(THRESHOLDS)
+
+    def test_bounds_never_exceeded_by_ratio(self, fsd):
+        lines = _corpus(count=120, seed=5)
+        index = fsd.TextSimilarityIndex(lines)
+        for text1 in range(len(index.texts)):
+            for text2 in range(len(index.texts)):
+                if text1 == text2:
+                    continue
+                ratio = SequenceMatcher(None, index.texts[text1], index.texts[text2]).ratio()
+                assert index.similarity(text1, text2, ratio) == ratio
+
+
+# ---------------------------------------------------------------------------
+# Semantic neighbors
+# ---------------------------------------------------------------------------
+
+class TestSemanticNeighbors:
+    @staticmethod
+    def _embeddings(count=200, dim=16, seed=2):
+        rng = np.random.default_rng(seed)
+        centers = rng.normal(size=(6, dim))
+        embeddings = centers[rng.integers(0, len(centers), size=count)] + 0.3 * rng.normal(size=(count, dim))
+        embeddings = embeddings.astype(np.float32)
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    def test_uncapped_matches_brute_force(self, fsd):
+        embeddings = self._embeddings()
+        neighbors = fsd.top_k_cosine_neighbors(embeddings, 0.8)
+        sims = embeddings @ embeddings.T
+        for i, row in enumerate(neighbors):
+            assert [j for j, _ in row] == [j for j in range(len(embeddings)) if j != i and sims[i, j] >= 0.8]
+
+    @pytest.mark.parametrize("threshold", (0.8, 0.9))
+    def test_groups_match_reference(self, fsd, threshold):
+        embeddings = self._embeddings(seed=4)
+        text_map = [(i + 1, f"line {i}", f"line {i}") for i in range(len(embeddings))]
+        neighbors = (text_map, fsd.top_k_cosine_neighbors(embeddings, 0.8))
+        assert (fsd.find_semantic_duplicates(None, threshold, neighbors=neighbors)
+                == _reference_semantic(text_map, embeddings, threshold))
+
+    def test_top_k_caps_and_warns(self, fsd, capsys):
+        embeddings = self._embeddings()
+        capped = fsd.top_k_cosine_neighbors(embeddings, 0.5, top_k=3)
+        assert max(len(row) for row in capped) <= 3
+        assert "Raise --top-k" in capsys.readouterr().out
+        uncapped = fsd.top_k_cosine_neighbors(embeddings, 0.5)
+        for capped_row, full_row in zip(capped, uncapped):
+            best = sorted(full_row, key=lambda x: -x[1])[:len(capped_row)]
+            assert sorted(j for j, _ in capped_row) == sorted(j for j, _ in best)
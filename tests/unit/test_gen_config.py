@@ -1,4 +1,7 @@
+import copy
+
 import pytest
+from sd_runner.adapter_sorting import LazyAdapterList
 from sd_runner.gen_config import GenConfig
 from sd_runner.models import Model
 from sd_runner.resolution import Resolution
@@ -229,3 +232,76 @@ class TestPromptsMatch:
     def test_none_prior_config_returns_false(self):
         cfg = make_gen_config()
         assert cfg.prompts_match(None) is False
+
+
+# ---------------------------------------------------------------------------
+# snapshot / with_overrides — read-only copies used in place of deepcopy
+# ---------------------------------------------------------------------------
+
+class TestSnapshot:
+    def test_snapshot_equals_source(self):
+        cfg = make_gen_config(control_nets=["a.png", "b.png"])
+        snap = cfg.snapshot()
+        assert snap == cfg
+        assert cfg == snap
+        assert hash(snap) == hash(cfg)
+        assert snap.prompts_match(cfg)
+
+    def test_snapshot_shares_adapter_objects(self):
+        model = make_model()
+        cfg = make_gen_config(models=[model])
+        snap = cfg.snapshot()
+        assert snap.models[0] is model
+
+    def test_snapshot_is_read_only(self):
+        snap = make_gen_config().snapshot()
+        assert snap.is_snapshot()
+        with pytest.raises(AttributeError):
+            snap.positive = "changed"
+
+    def test_source_changes_after_snapshot_are_detected(self):
+        cfg = make_gen_config(control_nets=["a.png"])
+        snap = cfg.snapshot()
+        cfg.positive = "a mountain"
+        assert cfg != snap
+        cfg.positive = "a sunset"
+        cfg.control_nets.append("b.png")
+        assert cfg != snap
+        assert snap.control_nets == ("a.png",)
+
+    def test_resolution_mutation_after_snapshot_is_detected(self):
+        cfg = make_gen_config()
+        snap = cfg.snapshot()
+        cfg.resolutions[0].width = 512
+        assert cfg != snap
+        assert snap.resolutions[0].width == 1024
+
+    def test_with_overrides(self):
+        cfg = make_gen_config()
+        snap = cfg.with_overrides(positive="a forest", seed=7)
+        assert snap.positive == "a forest"
+        assert snap.seed == 7
+        assert cfg.positive == "a sunset"
+        with pytest.raises(AttributeError):
+            cfg.with_overrides(not_a_field=1)
+
+    def test_directory_adapters_never_match_like_deepcopy(self):
+        built = []
+        lazy = LazyAdapterList(["a.png", "b.png"], lambda path: built.append(path) or path.upper())
+        cfg = make_gen_config(control_nets=lazy)
+        snap = cfg.snapshot()
+        # The pre-snapshot deepcopy never equalled the live config for lazy lists
+        assert copy.deepcopy(cfg) != cfg
+        assert snap != cfg and cfg != snap
+        assert snap != cfg.snapshot()
+        assert snap == snap
+        assert list(snap.control_nets) == ["A.PNG", "B.PNG"] and len(snap.control_nets) == 2
+        assert snap.control_nets[0] is lazy[0]
+        assert built == ["a.png", "b.png"]  # Shared, not rebuilt
+        assert isinstance(hash(snap), int)
+
+    def test_source_config_stays_mutable(self):
+        cfg = make_gen_config()
+        cfg.snapshot()
+        cfg.positive = "changed"
+        assert not cfg.is_snapshot()
@@ -0,0 +1,134 @@
+"""
+Tests for sd_runner/generation_plan.py.
+
+GenerationPlan must walk combinations in exactly the order of the nested
+loops it replaced in BaseImageGenerator.run, including the ``break`` out of
+the innermost loop, and be resumable from a saved cursor.
+"""
+
+import itertools
+import json
+
+import pytest
+
+from sd_runner.generation_plan import GenerationPlan
+
+
+def _dimensions():
+    return [
+        ("models", ["m1", "m2"]),
+        ("resolutions", ["r1", "r2", "r3"]),
+        ("loras", ["l1", "l2"]),
+    ]
+
+
+def _as_tuples(plan_items):
+    return [tuple(combination.values()) for _index, combination in plan_items]
+
+
+class TestGenerationPlanOrder:
+    def test_matches_nested_loops(self):
+        plan = GenerationPlan(_dimensions())
+        expected = list(itertools.product(*[values for _name, values in _dimensions()]))
+        assert len(plan) == len(expected) == 12
+        assert _as_tuples(plan) == expected
+
+    def test_combination_at_is_random_access(self):
+        plan = GenerationPlan(_dimensions())
+        assert plan.combination_at(7) == {"models": "m2", "resolutions": "r1", "loras": "l2"}
+        with pytest.raises(IndexError):
+            plan.combination_at(12)
+
+    def test_empty_dimension_plans_nothing(self):
+        plan = GenerationPlan([("models", ["m1"]), ("loras", [])])
+        assert len(plan) == 0
+        assert list(plan) == []
+
+    def test_from_config_uses_attribute_order(self):
+        class Config:
+            models = ["m1", "m2"]
+            loras = [None]
+
+        plan = GenerationPlan.from_config(Config(), ["loras", "models"])
+        assert plan.names == ["loras", "models"]
+        assert _as_tuples(plan) == [(None, "m1"), (None, "m2")]
+
+
+class TestGenerationPlanSkipRest:
+    def test_skip_rest_matches_inner_break(self):
+        dims = _dimensions()
+
+        def should_break(combo):
+            return combo[2] == "l1" and combo[1] != "r2"
+
+        expected = []
+        for m in dims[0][1]:
+            for r in dims[1][1]:
+                for l in dims[2][1]:
+                    if should_break((m, r, l)):
+                        break
+                    expected.append((m, r, l))
+
+        actual = []
+        plan = GenerationPlan(dims)
+        for _index, combination in plan:
+            combo = tuple(combination.values())
+            if should_break(combo):
+                plan.skip_rest()
+                continue
+            actual.append(combo)
+        assert actual == expected
+
+    def test_skip_rest_of_outer_dimension(self):
+        plan = GenerationPlan(_dimensions())
+        seen = []
+        for index, combination in plan:
+            seen.append(index)
+            if combination["resolutions"] == "r1":
+                plan.skip_rest("resolutions")
+        assert seen == [0, 6]
+
+
+class TestGenerationPlanResume:
+    def test_cursor_points_at_current_combination(self):
+        plan = GenerationPlan(_dimensions())
+        iterator = iter(plan)
+        next(iterator)
+        index, _ = next(iterator)
+        assert index == 1
+        assert plan.cursor == 1
+        assert plan.remaining == 11
+
+    def test_resume_from_saved_state(self):
+        plan = GenerationPlan(_dimensions())
+        for index, _combination in plan:
+            if index == 5:
+                break
+        state = json.loads(json.dumps(plan.state()))
+        resumed = GenerationPlan.resume(_dimensions(), state)
+        assert [index for index, _ in resumed] == list(range(5, 12))
+        assert resumed.cursor == resumed.total
+
+    def test_resume_rejects_changed_dimensions(self):
+        state = GenerationPlan(_dimensions()).state()
+        with pytest.raises(ValueError):
+            GenerationPlan.resume([("models", ["m1"])], state)
+
+    def test_start_out_of_range(self):
+        with pytest.raises(ValueError):
+            GenerationPlan(_dimensions(), start=13)
+
+
+class TestGenerationPlanGroups:
+    def test_groups_share_outer_values(self):
+        plan = GenerationPlan(_dimensions())
+        groups = list(plan.iter_groups("models", "resolutions"))
+        assert len(groups) == 6
+        assert all(len(group) == 2 for group in groups)
+        assert all(len({(c["models"], c["resolutions"]) for _i, c in group}) == 1 for group in groups)
+
+    def test_groups_by_model(self):
+        plan = GenerationPlan(_dimensions())
+        groups = list(plan.iter_groups("models"))
+        assert [len(group) for group in groups] == [6, 6]
+        assert [index for index, _ in groups[1]] == list(range(6, 12))
@@ -0,0 +1,196 @@
+"""
+Tests for the cached HF Hub search in extensions/hf_hub_api.py, using a stub
+in place of huggingface_hub.HfApi.
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from extensions import hf_hub_api
+from extensions.hf_hub_api import HfHubApiBackend
+from utils.globals import HfHubSortDirection, HfHubSortOption, HfHubVisualMediaTask
+
+
+def _model(repo_id, pipeline_tag="text-to-image", gated=False, downloads=10):
+    return SimpleNamespace(id=repo_id, pipeline_tag=pipeline_tag, gated=gated, downloads=downloads, likes=1,
+                           private=False, tags=["license:mit", pipeline_tag], created_at="", last_modified="")
+
+
+class StubHfApi:
+    """Records list_models calls; rejects kwargs outside ``supported`` like an old hub version."""
+
+    def __init__(self, models, supported=("search", "sort", "direction", "full", "limit", "filter")):
+        self.models = models
+        self.supported = set(supported)
+        self.calls = []
+        self.offline = False
+
+    def list_models(self, **kwargs):
+        for kw in kwargs:
+            if kw not in self.supported:
+                raise TypeError(f"list_models() got an unexpected keyword argument '{kw}'")
+        self.calls.append(kwargs)
+        return self._iterate(kwargs.get("limit"))
+
+    def _iterate(self, limit):
+        # Like the real client, network failures surface while iterating.
+        if self.offline:
+            raise ConnectionError("hub unreachable")
+        yield from self.models[:limit]
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "hf_cache.json")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(hf_hub_api.time, "time", lambda: now[0])
+    return now
+
+
+def _backend(api, cache_path, **kwargs):
+    return HfHubApiBackend(api, cache_path=cache_path, hub_version="0.20.0", **kwargs)
+
+
+MODELS = [_model("a/img"), _model("b/gated", gated=True), _model("c/text", pipeline_tag="text-generation"),
+          _model("d/video", pipeline_tag="text-to-video")]
+
+
+# ---------------------------------------------------------------------------
+# Search cache
+# ---------------------------------------------------------------------------
+
+class TestSearchCache:
+    def test_results_and_client_side_filters(self, cache_path, clock):
+        backend = _backend(StubHfApi(MODELS), cache_path)
+        results = backend.search_models("cat")
+        assert [r.repo_id for r in results] == ["a/img", "b/gated", "d/video"]
+        assert results[0].license == "mit"
+        no_gated = backend.search_models("cat", include_gated=False)
+        assert [r.repo_id for r in no_gated] == ["a/img", "d/video"]
+        assert [r.repo_id for r in backend.search_models("cat", visual_only=False)] == [m.id for m in MODELS]
+
+    def test_repeat_search_hits_cache(self, cache_path, clock):
+        api = StubHfApi(MODELS)
+        backend = _backend(api, cache_path)
+        backend.search_models("Cat  ", sort=HfHubSortOption.DOWNLOADS)
+        backend.search_models("cat", sort=HfHubSortOption.DOWNLOADS, limit=50)
+        assert len(api.calls) == 1
+        assert backend.last_search_cached_at == clock[0] and not backend.last_search_offline
+
+    def test_key_covers_task_sort_and_direction(self, cache_path, clock):
+        api = StubHfApi(MODELS)
+        backend = _backend(api, cache_path)
+        backend.search_models("cat")
+        backend.search_models("cat", task=HfHubVisualMediaTask.TEXT_TO_VIDEO)
+        backend.search_models("cat", sort=HfHubSortOption.LIKES)
+        backend.search_models("cat", direction=HfHubSortDirection.ASCENDING)
+        assert len(api.calls) == 4
+
+    def test_larger_limit_refetches_smaller_reuses(self, cache_path, clock):
+        api = StubHfApi(MODELS)
+        backend = _backend(api, cache_path)
+        backend.search_models("cat", limit=2, visual_only=False)
+        assert len(backend.search_models("cat", limit=4, visual_only=False)) == 4
+        assert len(api.calls) == 2
+        assert [r.repo_id for r in backend.search_models("cat", limit=1, visual_only=False)] == ["a/img"]
+        assert len(api.calls) == 2
+
+    def test_ttl_and_refresh(self, cache_path, clock):
+        api = StubHfApi(MODELS)
+        backend = _backend(api, cache_path, ttl_seconds=60)
+        backend.search_models("cat")
+        clock[0] += 30
+        backend.search_models("cat")
+        backend.search_models("cat", refresh=True)
+        assert len(api.calls) == 2
+        clock[0] += 61
+        backend.search_models("cat")
+        assert len(api.calls) == 3
+
+    def test_cache_persists_across_instances(self, cache_path, clock):
+        _backend(StubHfApi(MODELS), cache_path).search_models("cat")
+        api = StubHfApi(MODELS)
+        assert len(_backend(api, cache_path).search_models("cat")) == 3
+        assert api.calls == []
+
+    def test_eviction_keeps_newest(self, cache_path, clock, monkeypatch):
+        monkeypatch.setattr(HfHubApiBackend, "MAX_CACHED_SEARCHES", 2)
+        backend = _backend(StubHfApi(MODELS), cache_path)
+        for query in ("one", "two", "three"):
+            backend.search_models(query)
+            clock[0] += 1
+        with open(cache_path, encoding="utf-8") as f:
+            assert [json.loads(key)[0] for key in json.load(f)["searches"]] == ["two", "three"]
+
+    def test_unreadable_cache_is_ignored(self, cache_path, clock):
+        with open(cache_path, "w", encoding="utf-8") as f:
+            f.write("{not json")
+        assert len(_backend(StubHfApi(MODELS), cache_path).search_models("cat")) == 3
+
+
+# ---------------------------------------------------------------------------
+# Offline fallback
+# ---------------------------------------------------------------------------
+
+class TestOffline:
+    def test_serves_stale_results_when_offline(self, cache_path, clock):
+        api = StubHfApi(MODELS)
+        backend = _backend(api, cache_path, ttl_seconds=60)
+        backend.search_models("cat")
+        fetched_at = clock[0]
+        clock[0] += 3600
+        api.offline = True
+        results = backend.search_models("cat", include_gated=False)
+        assert [r.repo_id for r in results] == ["a/img", "d/video"]
+        assert backend.last_search_offline and backend.last_search_cached_at == fetched_at
+
+        api.offline = False
+        backend.search_models("cat")
+        assert not backend.last_search_offline and backend.last_search_cached_at == clock[0]
+
+    def test_offline_without_cache_raises(self, cache_path, clock):
+        api = StubHfApi(MODELS)
+        api.offline = True
+        with pytest.raises(ConnectionError):
+            _backend(api, cache_path).search_models("cat")
+
+
+# ---------------------------------------------------------------------------
+# Capabilities probe
+# ---------------------------------------------------------------------------
+
+class TestCapabilities:
+    def test_probe_runs_once_per_hub_version(self, cache_path, clock):
+        old_hub = {"search", "sort", "direction", "limit"}
+        first = _backend(StubHfApi(MODELS, supported=old_hub), cache_path)
+        results = first.search_models("cat", task=HfHubVisualMediaTask.TEXT_TO_IMAGE)
+        assert [r.repo_id for r in results] == ["a/img", "b/gated"]
+        with open(cache_path, encoding="utf-8") as f:
+            assert set(json.load(f)["capabilities"]["0.20.0"]) == {"full", "filter"}
+
+        class StrictApi(StubHfApi):
+            def list_models(self, **kwargs):
+                assert set(kwargs) <= old_hub, kwargs
+                return super().list_models(**kwargs)
+
+        api = StrictApi(MODELS, supported=old_hub)
+        _backend(api, cache_path).search_models("dog", task=HfHubVisualMediaTask.TEXT_TO_IMAGE)
+        assert len(api.calls) == 1
+
+        upgraded = StubHfApi(MODELS)
+        HfHubApiBackend(upgraded, cache_path=cache_path, hub_version="0.30.0").search_models("dog")
+        assert upgraded.calls[0]["full"] is True
+
+    def test_unparseable_type_error_propagates(self, cache_path, clock):
+        class BrokenApi(StubHfApi):
+            def list_models(self, **kwargs):
+                raise TypeError("something else")
+
+        with pytest.raises(TypeError):
+            _backend(BrokenApi(MODELS), cache_path).search_models("cat")
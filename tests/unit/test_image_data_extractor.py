@@ -0,0 +1,153 @@
+"""
+Tests for the PNG text chunk writer in extensions/image_data_extractor.py.
+
+Metadata is written at the chunk level, so pixel data must come through
+byte for byte and the result must stay readable by PIL, extract and
+extract_prompt.
+"""
+
+import json
+import zlib
+
+import pytest
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+from extensions.image_data_extractor import (
+    ImageDataExtractor,
+    PNG_SIGNATURE,
+    write_png_text_chunks,
+)
+
+
+def _chunks(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data[:8] == PNG_SIGNATURE
+    chunks = []
+    pos = 8
+    while pos < len(data):
+        length = int.from_bytes(data[pos:pos + 4], "big")
+        chunk_type = data[pos + 4:pos + 8]
+        body = data[pos + 8:pos + 8 + length]
+        crc = int.from_bytes(data[pos + 8 + length:pos + 12 + length], "big")
+        assert crc == zlib.crc32(chunk_type + body) & 0xFFFFFFFF
+        chunks.append((chunk_type, body))
+        pos += 12 + length
+    return chunks
+
+
+@pytest.fixture
+def comfy_png(tmp_path):
+    prompt = {
+        "1": {"class_type": "CLIPTextEncode", "inputs": {"text": "a cat"}},
+        "2": {"class_type": "CLIPTextEncode", "inputs": {"text": "blurry"}},
+        "3": {"class_type": "KSampler", "inputs": {"positive": ["1", 0], "negative": ["2", 0]}},
+    }
+    info = PngInfo()
+    info.add_text("prompt", json.dumps(prompt))
+    info.add_text("related_image", "old.png")
+    path = tmp_path / "out.png"
+    Image.new("RGB", (16, 8), (10, 20, 30)).save(path, pnginfo=info)
+    return str(path)
+
+
+class TestWritePngTextChunks:
+    def test_adds_text_and_keeps_image_data(self, comfy_png):
+        idat_before = [c for c in _chunks(comfy_png) if c[0] == b"IDAT"]
+        write_png_text_chunks(comfy_png, {"SDR_OriginalPositiveTags": "cat, hat"})
+        chunks = _chunks(comfy_png)
+        assert [c for c in chunks if c[0] == b"IDAT"] == idat_before
+        with Image.open(comfy_png) as image:
+            assert image.info["SDR_OriginalPositiveTags"] == "cat, hat"
+            assert image.size == (16, 8)
+            assert image.getpixel((0, 0)) == (10, 20, 30)
+
+    def test_replaces_existing_keyword(self, comfy_png):
+        write_png_text_chunks(comfy_png, {"related_image": "new.png"})
+        related = [c for c in _chunks(comfy_png) if c[1].startswith(b"related_image\0")]
+        assert len(related) == 1
+        with Image.open(comfy_png) as image:
+            assert image.info["related_image"] == "new.png"
+
+    def test_text_chunks_precede_image_data(self, comfy_png):
+        write_png_text_chunks(comfy_png, {"key": "value"})
+        types = [c[0] for c in _chunks(comfy_png)]
+        assert types.index(b"tEXt") < types.index(b"IDAT")
+        assert types[-1] == b"IEND"
+
+    def test_non_latin1_value_uses_itxt(self, comfy_png):
+        write_png_text_chunks(comfy_png, {"SDR_OriginalPositiveTags": "猫, 帽子"})
+        assert any(c[0] == b"iTXt" for c in _chunks(comfy_png))
+        with Image.open(comfy_png) as image:
+            assert image.info["SDR_OriginalPositiveTags"] == "猫, 帽子"
+
+    def test_non_png_raises_and_leaves_file(self, tmp_path):
+        out_dir = tmp_path / "out"
+        out_dir.mkdir()
+        path = out_dir / "not.png"
+        path.write_bytes(b"not a png")
+        with pytest.raises(ValueError):
+            write_png_text_chunks(str(path), {"k": "v"})
+        assert path.read_bytes() == b"not a png"
+        assert [p.name for p in out_dir.iterdir()] == ["not.png"]
+
+
+class TestAddGenerationMetadata:
+    def test_single_write_readable_by_extract(self, comfy_png):
+        extractor = ImageDataExtractor()
+        extractor.add_generation_metadata(comfy_png, related_image_path="src.png",
+                                          original_positive_tags="cat", original_negative_tags="dog")
+        with Image.open(comfy_png) as image:
+            assert image.info[ImageDataExtractor.RELATED_IMAGE_KEY] == "src.png"
+            assert image.info[ImageDataExtractor.ORIGINAL_POSITIVE_TAGS_KEY] == "cat"
+            assert image.info[ImageDataExtractor.ORIGINAL_NEGATIVE_TAGS_KEY] == "dog"
+        assert extractor.extract(comfy_png) == ("a cat", "blurry")
+        assert "1" in extractor.extract_prompt(comfy_png)
+
+    def test_none_values_are_skipped(self, comfy_png):
+        ImageDataExtractor().add_generation_metadata(comfy_png, original_positive_tags="cat")
+        with Image.open(comfy_png) as image:
+            assert image.info[ImageDataExtractor.RELATED_IMAGE_KEY] == "old.png"
+            assert ImageDataExtractor.ORIGINAL_NEGATIVE_TAGS_KEY not in image.info
+
+    def test_legacy_methods_still_work(self, comfy_png):
+        extractor = ImageDataExtractor()
+        extractor.add_related_image_path(comfy_png, "other.png")
+        extractor.add_prompt_decomposition_to_exif(comfy_png, "cat")
+        with Image.open(comfy_png) as image:
+            assert image.info[ImageDataExtractor.RELATED_IMAGE_KEY] == "other.png"
+            assert image.info[ImageDataExtractor.ORIGINAL_POSITIVE_TAGS_KEY] == "cat"
+
+
+class TestGetImageSize:
+    @pytest.fixture(autouse=True)
+    def empty_cache(self):
+        ImageDataExtractor.clear_image_size_cache()
+        yield
+        ImageDataExtractor.clear_image_size_cache()
+
+    def test_size_is_cached(self, comfy_png, monkeypatch):
+        extractor = ImageDataExtractor()
+        assert extractor.get_image_size(comfy_png) == (16, 8)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("cached size should not reopen the image")
+
+        monkeypatch.setattr(Image, "open", fail)
+        assert ImageDataExtractor().get_image_size(comfy_png) == (16, 8)
+
+    def test_changed_file_is_read_again(self, comfy_png):
+        extractor = ImageDataExtractor()
+        extractor.get_image_size(comfy_png)
+        Image.new("RGB", (40, 30)).save(comfy_png)
+        assert extractor.get_image_size(comfy_png) == (40, 30)
+
+    def test_cache_is_bounded(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(ImageDataExtractor, "SIZE_CACHE_MAX_ENTRIES", 2)
+        extractor = ImageDataExtractor()
+        for i in range(3):
+            path = tmp_path / f"{i}.png"
+            Image.new("RGB", (i + 1, 1)).save(path)
+            extractor.get_image_size(str(path))
+        assert len(ImageDataExtractor._size_cache) == 2
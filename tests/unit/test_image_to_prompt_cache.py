@@ -0,0 +1,199 @@
+"""
+Tests for sd_runner/image_to_prompt/cache.py, batched BLIP captioning in
+CaptionerProvider, and the cached image-to-prompt fallback in Prompter.
+
+The BLIP model itself is never loaded: _ensure_transformers_blip and
+_generate_transformers_batch are replaced with fakes.
+"""
+
+import shutil
+
+import pytest
+
+from sd_runner.image_to_prompt.cache import ImageToPromptCache
+from sd_runner.image_to_prompt.providers.captioner_provider import CaptionerProvider
+from sd_runner.image_to_prompt.types import ImageToPromptBackend, ImageToPromptResult
+from sd_runner.prompter import Prompter
+
+
+@pytest.fixture
+def images(tmp_path):
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    paths = []
+    for i in range(5):
+        path = image_dir / f"img{i}.png"
+        path.write_bytes(f"image-{i}".encode())
+        paths.append(str(path))
+    return paths
+
+
+# ---------------------------------------------------------------------------
+# ImageToPromptCache
+# ---------------------------------------------------------------------------
+
+class TestImageToPromptCache:
+    def test_hit_follows_content_not_path(self, images, tmp_path):
+        cache = ImageToPromptCache(filename=str(tmp_path / "c.pkl"))
+        cache.put(images[0], "v", "a cat")
+        copy = tmp_path / "images" / "copy.png"
+        shutil.copy(images[0], copy)
+        assert cache.get(str(copy), "v") == "a cat"
+        assert cache.get(images[0], "other") is None
+        assert cache.get(images[1], "v") is None
+
+    def test_persists_across_instances(self, images, tmp_path):
+        filename = str(tmp_path / "c.pkl")
+        cache = ImageToPromptCache(filename=filename)
+        cache.put(images[0], "v", "a cat")
+        cache.save()
+        assert ImageToPromptCache(filename=filename).get(images[0], "v") == "a cat"
+
+    def test_changed_content_misses(self, images, tmp_path):
+        cache = ImageToPromptCache(filename=str(tmp_path / "c.pkl"))
+        cache.put(images[0], "v", "a cat")
+        with open(images[0], "wb") as f:
+            f.write(b"something else entirely")
+        assert cache.get(images[0], "v") is None
+
+    def test_missing_file_is_a_miss(self, tmp_path):
+        cache = ImageToPromptCache(filename=str(tmp_path / "c.pkl"))
+        assert cache.get(str(tmp_path / "missing.png"), "v") is None
+        cache.put(str(tmp_path / "missing.png"), "v", "x")
+        assert len(cache) == 0
+
+
+# ---------------------------------------------------------------------------
+# CaptionerProvider.caption_batch
+# ---------------------------------------------------------------------------
+
+def _fake_provider(tmp_path, monkeypatch, fail_on=()):
+    provider = CaptionerProvider(cache=ImageToPromptCache(filename=str(tmp_path / "c.pkl")), batch_size=2)
+    calls = []
+
+    def fake_batch(paths, num_beams, max_new_tokens):
+        calls.append(list(paths))
+        if any(p in fail_on for p in paths):
+            raise OSError("cannot identify image")
+        return [f"caption of {p.rsplit('/', 1)[-1]}" for p in paths]
+
+    monkeypatch.setattr(provider, "_ensure_transformers_blip", lambda: None)
+    monkeypatch.setattr(provider, "_generate_transformers_batch", fake_batch)
+    return provider, calls
+
+
+class TestCaptionBatch:
+    def test_batches_and_preserves_order(self, images, tmp_path, monkeypatch):
+        provider, calls = _fake_provider(tmp_path, monkeypatch)
+        captions = provider.caption_batch(images)
+        assert captions == [f"caption of img{i}.png" for i in range(5)]
+        assert [len(c) for c in calls] == [2, 2, 1]
+
+    def test_cached_images_are_skipped(self, images, tmp_path, monkeypatch):
+        provider, calls = _fake_provider(tmp_path, monkeypatch)
+        provider.caption_batch(images[:3])
+        calls.clear()
+        captions = provider.caption_batch(images)
+        assert captions[4] == "caption of img4.png"
+        assert calls == [images[3:]]
+
+    def test_generation_settings_are_part_of_key(self, images, tmp_path, monkeypatch):
+        provider, calls = _fake_provider(tmp_path, monkeypatch)
+        provider.caption_batch(images[:1])
+        provider.caption_batch(images[:1], num_beams=1)
+        assert len(calls) == 2
+
+    def test_bad_image_does_not_fail_batch(self, images, tmp_path, monkeypatch):
+        provider, calls = _fake_provider(tmp_path, monkeypatch, fail_on={images[1]})
+        captions = provider.caption_batch(images[:2])
+        assert captions == ["caption of img0.png", ""]
+        calls.clear()
+        provider.caption_batch(images[:2])
+        assert calls == [[images[1]]]
+
+    def test_progress_callback(self, images, tmp_path, monkeypatch):
+        provider, _calls = _fake_provider(tmp_path, monkeypatch)
+        progress = []
+        provider.caption_batch(images, progress_callback=lambda done, total: progress.append((done, total)))
+        assert progress == [(0, 5), (2, 5), (4, 5), (5, 5)]
+
+
+# ---------------------------------------------------------------------------
+# Prompter.take_prompt_from_image
+# ---------------------------------------------------------------------------
+
+class _FakeService:
+    def __init__(self, prompt, cache_variant="fake"):
+        self.prompt = prompt
+        self.cache_variant = cache_variant
+        self.error = None
+        self.calls = 0
+
+    def generate(self, image_path):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return ImageToPromptResult(backend=ImageToPromptBackend.CAPTIONER, positive_prompt=self.prompt)
+
+
+class _NoMetadata:
+    def extract(self, image_path):
+        return None, None
+
+
+class TestTakePromptFromImage:
+    @pytest.fixture
+    def services(self, monkeypatch):
+        captioner = _FakeService("a cat")
+        tagger = _FakeService("cat, sofa")
+        monkeypatch.setattr(Prompter, "IMAGE_DATA_EXTRACTOR", _NoMetadata())
+        monkeypatch.setattr(Prompter, "IMAGE_TO_PROMPT_CAPTIONER", captioner)
+        monkeypatch.setattr(Prompter, "IMAGE_TO_PROMPT_TAGGER", tagger)
+        return captioner, tagger
+
+    def test_fallback_result_is_cached(self, images, services):
+        captioner, tagger = services
+        assert Prompter.take_prompt_from_image(images[0]) == ("a cat, cat, sofa", "")
+        assert Prompter.take_prompt_from_image(images[0]) == ("a cat, cat, sofa", "")
+        assert (captioner.calls, tagger.calls) == (1, 1)
+
+    def test_empty_result_is_not_cached(self, images, services):
+        captioner, tagger = services
+        captioner.prompt = tagger.prompt = ""
+        assert Prompter.take_prompt_from_image(images[0]) == ("", "")
+        Prompter.take_prompt_from_image(images[0])
+        assert captioner.calls == 2
+
+    def test_failed_captioner_result_is_not_cached(self, images, services):
+        captioner, tagger = services
+        captioner.error = RuntimeError("captioner deps missing")
+        assert Prompter.take_prompt_from_image(images[0]) == ("cat, sofa", "")
+        captioner.error = None
+        assert Prompter.take_prompt_from_image(images[0]) == ("a cat, cat, sofa", "")
+        assert Prompter.take_prompt_from_image(images[0]) == ("a cat, cat, sofa", "")
+        assert (captioner.calls, tagger.calls) == (2, 2)
+
+    def test_changed_model_or_settings_miss(self, images, services):
+        captioner, tagger = services
+        Prompter.take_prompt_from_image(images[0])
+        captioner.cache_variant = "captioner|other-model|beams=4|tokens=64"
+        captioner.prompt = "a tabby cat"
+        assert Prompter.take_prompt_from_image(images[0]) == ("a tabby cat, cat, sofa", "")
+        tagger.cache_variant = "fast_tagger|other|general=0.5"
+        Prompter.take_prompt_from_image(images[0])
+        assert (captioner.calls, tagger.calls) == (3, 3)
+
+
+class TestProviderCacheVariant:
+    def test_variant_follows_model_and_settings(self):
+        from sd_runner.image_to_prompt.service import ImageToPromptService
+
+        default = ImageToPromptService.from_backend(ImageToPromptBackend.CAPTIONER).cache_variant
+        other_repo = ImageToPromptService.from_backend(ImageToPromptBackend.CAPTIONER,
+                                                       captioner_repo_id="x/blip").cache_variant
+        assert default == CaptionerProvider(num_beams=CaptionerProvider.DEFAULT_NUM_BEAMS).cache_variant
+        assert len({default, other_repo, CaptionerProvider(num_beams=1).cache_variant}) == 3
+        tagger = ImageToPromptService.from_backend(ImageToPromptBackend.FAST_TAGGER).cache_variant
+        other_tagger = ImageToPromptService.from_backend(ImageToPromptBackend.FAST_TAGGER,
+                                                         fast_tagger_repo_id="x/tagger").cache_variant
+        assert tagger != other_tagger
@@ -0,0 +1,200 @@
+"""
+Tests for the state and checkpoint handling in extensions/interrogator.py.
+
+The WAS BLIP loader needs torch and a ComfyUI install, so blip.blip is
+replaced with a stub whose answers are derived from the image file names.
+"""
+
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+
+class StubModelLoader:
+    def blip_model(self, mode):
+        return (("model", mode),)
+
+
+class StubAnalyzeImage:
+    """Answers "yes" when the question's keyword is part of the image file name."""
+
+    def __init__(self):
+        self.calls = []
+
+    def blip_answer_questions(self, image_paths, questions, blip_model):
+        self.calls.append((list(image_paths), list(questions)))
+        results = []
+        for path in image_paths:
+            if "broken" in path:
+                results.append(None)
+            else:
+                results.append(["yes" if question.split()[-1] in path else "no" for question in questions])
+        return results
+
+
+@pytest.fixture
+def interrogator_module(monkeypatch):
+    stub = types.ModuleType("blip.blip")
+    stub.WAS_BLIP_Model_Loader = StubModelLoader
+    stub.WAS_BLIP_Analyze_Image = StubAnalyzeImage
+    monkeypatch.setitem(sys.modules, "blip.blip", stub)
+    monkeypatch.delitem(sys.modules, "extensions.interrogator", raising=False)
+    module = importlib.import_module("extensions.interrogator")
+    yield module
+    sys.modules.pop("extensions.interrogator", None)
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    directory = tmp_path / "images"
+    directory.mkdir()
+    for name in ("a_cat.png", "b_dog.png", "c_cat_dog.png", "d_tree.png", "e_broken.png"):
+        (directory / name).write_bytes(b"png")
+    return directory
+
+
+@pytest.fixture
+def folders(tmp_path, interrogator_module, monkeypatch):
+    temps = tmp_path / "temps"
+    for folder in ("cats", "dogs"):
+        (temps / folder).mkdir(parents=True)
+    monkeypatch.setattr(interrogator_module.Interrogator, "IMG_TEMPS_DIR", str(temps))
+    return temps
+
+
+QUESTIONS = {"cat": "Is there a cat", "dog": "Is there a dog"}
+MAPPINGS = {"cats": ["cat"], "dogs": ["dog"]}
+
+
+def _interrogator(module, directory, questions=QUESTIONS):
+    interrogator = module.Interrogator(str(directory))
+    interrogator.questions = dict(questions)
+    return interrogator
+
+
+def _names(interrogator, state):
+    return sorted(os.path.basename(path) for path in interrogator.image_data[state])
+
+
+# ---------------------------------------------------------------------------
+# Batching and state
+# ---------------------------------------------------------------------------
+
+class TestInterrogateBatch:
+    def test_batches_images_and_moves_state(self, interrogator_module, image_dir, monkeypatch):
+        State = interrogator_module.State
+        monkeypatch.setattr(interrogator_module.Interrogator, "IMAGE_BATCH_SIZE", 2)
+        interrogator = _interrogator(interrogator_module, image_dir)
+        interrogator.gather_images()
+        interrogator.interrogate_batch(max=3)
+
+        calls = interrogator.analyze_image.calls
+        assert [len(paths) for paths, _ in calls] == [2, 1]
+        assert all(questions == list(QUESTIONS.values()) for _, questions in calls)
+        assert _names(interrogator, State.UNSEEN) == ["d_tree.png", "e_broken.png"]
+        assert _names(interrogator, State.REVIEW_BASED_ON_INITIAL_QUESTIONS) == ["a_cat.png", "b_dog.png", "c_cat_dog.png"]
+        reviewed = interrogator.image_data[State.REVIEW_BASED_ON_INITIAL_QUESTIONS]
+        assert [image_data.categories for image_data in reviewed.values()] == [
+            {"cat": True, "dog": False}, {"cat": False, "dog": True}, {"cat": True, "dog": True}]
+        assert all(image_data.state == State.REVIEW_BASED_ON_INITIAL_QUESTIONS for image_data in reviewed.values())
+
+    def test_unloadable_image_still_advances(self, interrogator_module, image_dir):
+        State = interrogator_module.State
+        interrogator = _interrogator(interrogator_module, image_dir)
+        interrogator.gather_images()
+        interrogator.interrogate_batch(max=10)
+        assert not interrogator.state_has_images_remaining(State.UNSEEN)
+        broken = next(d for d in interrogator.image_data[State.REVIEW_BASED_ON_INITIAL_QUESTIONS].values()
+                      if "broken" in d.path)
+        assert broken.categories == {}
+
+    def test_update_state_and_removal(self, interrogator_module, image_dir, folders):
+        State = interrogator_module.State
+        interrogator = _interrogator(interrogator_module, image_dir)
+        interrogator.gather_images()
+        interrogator.interrogate_batch(max=10)
+        cats = interrogator.get_images_yes_for_categories(["cat"])
+        interrogator.move_images(cats, "cats", remove_from_image_data=True)
+        interrogator.update_state()
+        assert _names(interrogator, State.SEEN_AFTER_INITIAL_QUESTIONS) == ["b_dog.png", "d_tree.png", "e_broken.png"]
+        assert sorted(p.name for p in (folders / "cats").iterdir()) == ["a_cat.png", "c_cat_dog.png"]
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint and resume
+# ---------------------------------------------------------------------------
+
+class TestCheckpoint:
+    def _answered_but_not_routed(self, module, image_dir):
+        """Simulate a sort interrupted after interrogate_batch checkpointed, before routing."""
+        State = module.State
+        interrogator = _interrogator(module, image_dir)
+        interrogator.gather_images()
+        interrogator.update_state(old_state=State.UNSEEN, new_state=State.SEEN_AFTER_INITIAL_QUESTIONS)
+        interrogator.interrogate_batch(max=3, state=State.SEEN_AFTER_INITIAL_QUESTIONS,
+                                       new_state=State.REVIEW_BASED_ON_MAIN_QUESTIONS)
+        return interrogator
+
+    def test_resume_restores_states_and_answers(self, interrogator_module, image_dir):
+        State = interrogator_module.State
+        self._answered_but_not_routed(interrogator_module, image_dir)
+
+        resumed = _interrogator(interrogator_module, image_dir)
+        resumed.gather_images()
+        assert _names(resumed, State.REVIEW_BASED_ON_MAIN_QUESTIONS) == ["a_cat.png", "b_dog.png", "c_cat_dog.png"]
+        assert _names(resumed, State.SEEN_AFTER_INITIAL_QUESTIONS) == ["d_tree.png", "e_broken.png"]
+        restored = resumed.image_data[State.REVIEW_BASED_ON_MAIN_QUESTIONS]
+        assert next(iter(restored.values())).categories == {"cat": True, "dog": False}
+        assert all(image_data.state == State.REVIEW_BASED_ON_MAIN_QUESTIONS for image_data in restored.values())
+
+    def test_changed_questions_discard_checkpoint(self, interrogator_module, image_dir):
+        State = interrogator_module.State
+        self._answered_but_not_routed(interrogator_module, image_dir)
+        resumed = _interrogator(interrogator_module, image_dir, questions={"cat": "Is there a kitten cat"})
+        resumed.gather_images()
+        assert len(resumed.image_data[State.UNSEEN]) == 5
+        assert not resumed.image_data[State.REVIEW_BASED_ON_MAIN_QUESTIONS]
+
+    def test_changed_answer_types_discard_checkpoint(self, interrogator_module, image_dir):
+        State = interrogator_module.State
+        self._answered_but_not_routed(interrogator_module, image_dir)
+        resumed = _interrogator(interrogator_module, image_dir)
+        resumed.override_answer_types(interrogator_module.AnswerType.YES_NO_REVERSED, ["cat"])
+        resumed.gather_images()
+        assert len(resumed.image_data[State.UNSEEN]) == 5
+
+    def test_resume_routes_answered_images_first(self, interrogator_module, image_dir, folders):
+        self._answered_but_not_routed(interrogator_module, image_dir)
+        # Interrupted with nothing else pending: only the answered images remain
+        (image_dir / "d_tree.png").unlink()
+        (image_dir / "e_broken.png").unlink()
+
+        resumed = _interrogator(interrogator_module, image_dir)
+        resumed.gather_images()
+        resumed.sort_by_main_questions(MAPPINGS, delay_seconds=0)
+        assert resumed.analyze_image.calls == []
+        assert sorted(p.name for p in (folders / "cats").iterdir()) == ["a_cat.png", "c_cat_dog.png"]
+        assert sorted(p.name for p in (folders / "dogs").iterdir()) == ["b_dog.png"]
+        assert not (image_dir / interrogator_module.Interrogator.CHECKPOINT_FILENAME).exists()
+
+    def test_full_sort_after_resume(self, interrogator_module, image_dir, folders):
+        State = interrogator_module.State
+        self._answered_but_not_routed(interrogator_module, image_dir)
+        resumed = _interrogator(interrogator_module, image_dir)
+        resumed.gather_images()
+        resumed.sort_by_main_questions(MAPPINGS, max=10, delay_seconds=0)
+        assert [paths for paths, _ in resumed.analyze_image.calls] == [
+            [str(image_dir / "d_tree.png"), str(image_dir / "e_broken.png")]]
+        assert _names(resumed, State.SEEN_AFTER_MAIN_QUESTIONS) == [
+            "a_cat.png", "b_dog.png", "c_cat_dog.png", "d_tree.png", "e_broken.png"]
+        assert sorted(p.name for p in image_dir.iterdir()) == ["d_tree.png", "e_broken.png"]
+
+    def test_unreadable_checkpoint_is_ignored(self, interrogator_module, image_dir):
+        State = interrogator_module.State
+        (image_dir / interrogator_module.Interrogator.CHECKPOINT_FILENAME).write_text("{not json")
+        interrogator = _interrogator(interrogator_module, image_dir)
+        interrogator.gather_images()
+        assert len(interrogator.image_data[State.UNSEEN]) == 5
@@ -0,0 +1,333 @@
+"""
+Tests for result retrieval and upload deduplication in
+sd_runner/generators/invokeai.py.
+
+A local fake InvokeAI server answers the upload, enqueue, queue item and
+image endpoints. Its gallery listing always leads with another client's
+image, so a generator that picked "the most recent images" would fail.
+Optionally it serves a bare-bones Socket.IO websocket pushing queue events.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import parse
+
+import pytest
+
+from sd_runner.gen_config import GenConfig
+from sd_runner.generators.invokeai import InvokeAIGen, InvokeAIQueueEvents
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_QUEUE = "/api/v2/queue/default"
+
+
+class _FakeInvokeAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, status=200, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        path = parse.urlparse(self.path).path
+        if path == "/ws/socket.io/" and server.events_enabled:
+            self._serve_socketio()
+        elif path.startswith(f"{_QUEUE}/i/"):
+            item_id = int(path.rsplit("/", 1)[1])
+            with server.lock:
+                server.item_gets += 1
+                self._send(server.items[item_id])
+        elif path.startswith(f"{_QUEUE}/b/"):
+            with server.lock:
+                done = sum(item["status"] == "completed" for item in server.items.values())
+            self._send({"completed": done})
+        elif path == "/api/v1/images/":
+            with server.lock:
+                names = ["someone_else.png"] + [name for item in reversed(list(server.items.values()))
+                                                for name in _saved_names(item)]
+            self._send({"items": [{"image_name": name} for name in names]})
+        elif path.startswith("/api/v1/images/") and path.endswith("/full"):
+            self._send(f"png {path.split('/')[4]}".encode(), content_type="image/png")
+        else:
+            self._send({"detail": "Not Found"}, status=404)
+
+    def do_POST(self):
+        server = self.server
+        path = parse.urlparse(self.path).path
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with server.lock:
+            if path == "/api/v1/images/upload":
+                server.uploads += 1
+                self._send({"image_name": f"upload_{server.uploads}.png"})
+            elif path == f"{_QUEUE}/enqueue_batch":
+                runs = json.loads(body)["batch"]["runs"]
+                item_ids = []
+                for _ in range(runs):
+                    item_id = len(server.items) + 1
+                    server.items[item_id] = {"item_id": item_id, "status": "pending", "session": {}}
+                    item_ids.append(item_id)
+                if server.complete_on_enqueue:
+                    for item_id in item_ids:
+                        server.complete(item_id)
+                response = {"batch": {"batch_id": f"batch{len(server.items)}"}}
+                if not server.legacy:
+                    response["item_ids"] = item_ids
+                self._send(response)
+            else:
+                self._send({"detail": "Not Found"}, status=404)
+
+    def _serve_socketio(self):
+        server = self.server
+        accept = base64.b64encode(hashlib.sha1((self.headers["Sec-WebSocket-Key"] + _WS_GUID).encode()).digest())
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept.decode())
+        self.end_headers()
+        self._send_frame('0{"sid":"s1","pingInterval":25000,"pingTimeout":20000}')
+        assert self._read_frame() == "40"
+        self._send_frame('40{"sid":"n1"}')
+        server.subscriptions.append(json.loads(self._read_frame()[2:]))
+        with server.lock:
+            while not server.closing:
+                while server.events:
+                    self._send_frame("42" + json.dumps(["queue_item_status_changed", server.events.pop(0)]))
+                server.lock.wait(0.1)
+        self.close_connection = True
+
+    def _send_frame(self, text):
+        data = text.encode()
+        header = bytes([0x81, len(data)]) if len(data) < 126 else bytes([0x81, 126]) + struct.pack(">H", len(data))
+        self.wfile.write(header + data)  # Unmasked server frame
+        self.wfile.flush()
+
+    def _read_frame(self):
+        _flags, length = self.rfile.read(2)
+        length &= 0x7F
+        if length == 126:
+            length = struct.unpack(">H", self.rfile.read(2))[0]
+        mask = self.rfile.read(4)
+        payload = self.rfile.read(length)
+        return bytes(b ^ mask[i % 4] for i, b in enumerate(payload)).decode()
+
+
+def _saved_names(item):
+    results = item["session"].get("results", {})
+    return [results[node]["image"]["image_name"] for node in item["session"].get("source_prepared_mapping", {})
+            .get("save_image", [])]
+
+
+def _start_fake_invokeai():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeInvokeAIHandler)
+    server.daemon_threads = True
+    server.lock = threading.Condition()
+    server.items = {}
+    server.uploads = 0
+    server.item_gets = 0
+    server.legacy = False
+    server.complete_on_enqueue = True
+    server.events_enabled = False
+    server.events = []
+    server.subscriptions = []
+    server.closing = False
+
+    def complete(item_id):
+        # Caller holds lock
+        name = f"result_{item_id}.png"
+        server.items[item_id].update(status="completed", session={
+            "results": {
+                "l2i-x": {"type": "image_output", "image": {"image_name": f"intermediate_{item_id}.png"}},
+                f"save-{item_id}": {"type": "image_output", "image": {"image_name": name}},
+            },
+            "source_prepared_mapping": {"l2i": ["l2i-x"], "save_image": [f"save-{item_id}"]},
+        })
+        server.events.append({"queue_id": "default", "item_id": item_id, "status": "completed"})
+        server.lock.notify_all()
+
+    server.complete = complete
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def fake_invokeai(monkeypatch):
+    server = _start_fake_invokeai()
+    host, port = server.server_address
+    monkeypatch.setattr(InvokeAIGen, "BASE_URL", f"http://{host}:{port}")
+    monkeypatch.setattr(InvokeAIGen, "_queue_events", None)
+    monkeypatch.setattr(InvokeAIGen, "_uploaded_images", {})
+    yield server
+    with server.lock:
+        server.closing = True
+        server.lock.notify_all()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def gen(tmp_path, monkeypatch):
+    save_path = tmp_path / "invokeai_output"
+    save_path.mkdir()
+    monkeypatch.setattr(InvokeAIGen, "SAVE_PATH", str(save_path))
+    generator = InvokeAIGen(GenConfig())
+    generator.pending_counter = 100  # queue_prompt decrements it
+    return generator
+
+
+def _saved_files(gen):
+    contents = []
+    for name in sorted(os.listdir(gen.SAVE_PATH)):
+        with open(os.path.join(gen.SAVE_PATH, name), "rb") as f:
+            contents.append(f.read())
+    return contents
+
+
+# ---------------------------------------------------------------------------
+# Result retrieval
+# ---------------------------------------------------------------------------
+
+class TestBatchResults:
+    def test_images_come_from_own_queue_items(self, fake_invokeai, gen):
+        gen.queue_prompt({"nodes": {}, "edges": []}, n_runs=3)
+        assert _saved_files(gen) == [b"png result_1.png", b"png result_2.png", b"png result_3.png"]
+
+    def test_failed_items_are_skipped(self, fake_invokeai, gen, monkeypatch):
+        original = fake_invokeai.complete
+
+        def complete_or_fail(item_id):
+            original(item_id)
+            if item_id == 2:
+                fake_invokeai.items[item_id].update(status="failed", error_message="CUDA out of memory")
+
+        monkeypatch.setattr(fake_invokeai, "complete", complete_or_fail)
+        gen.queue_prompt({"nodes": {}, "edges": []}, n_runs=3)
+        assert _saved_files(gen) == [b"png result_1.png", b"png result_3.png"]
+
+    def test_legacy_server_uses_gallery_listing(self, fake_invokeai, gen):
+        fake_invokeai.legacy = True
+        gen.queue_prompt({"nodes": {}, "edges": []}, n_runs=1)
+        # Without item IDs the newest gallery image is all there is to go on
+        assert _saved_files(gen) == [b"png someone_else.png"]
+
+    def test_result_image_names_without_mapping(self):
+        item = {"session": {"results": {"a": {"image": {"image_name": "x.png"}}, "b": {"value": 3}}}}
+        assert InvokeAIGen._result_image_names(item) == ["x.png"]
+
+    def test_timeout(self, fake_invokeai, gen):
+        fake_invokeai.complete_on_enqueue = False
+        _batch_id, item_ids = gen._enqueue({"nodes": {}, "edges": []}, 1)
+        with pytest.raises(TimeoutError):
+            gen._wait_for_items(item_ids, None, timeout=0.1)
+
+
+class TestQueueEvents:
+    def test_event_completes_wait_without_polling(self, fake_invokeai, gen, monkeypatch):
+        fake_invokeai.events_enabled = True
+        fake_invokeai.complete_on_enqueue = False
+        monkeypatch.setattr(InvokeAIGen, "EVENT_SAFETY_POLL_INTERVAL", 60.0)
+        events = gen._get_queue_events()
+        assert events is not None and events.connected
+        _batch_id, item_ids = gen._enqueue({"nodes": {}, "edges": []}, 2)
+
+        def complete_items():
+            with fake_invokeai.lock:
+                for item_id in item_ids:
+                    fake_invokeai.complete(item_id)
+
+        threading.Timer(0.2, complete_items).start()
+        finished = gen._wait_for_items(item_ids, events, timeout=5)
+        assert [finished[i]["status"] for i in item_ids] == ["completed", "completed"]
+        assert fake_invokeai.subscriptions == [["subscribe_queue", {"queue_id": "default"}]]
+        # One initial poll per item, then one fetch per completion event
+        assert fake_invokeai.item_gets == 4
+
+    def test_nested_queue_item_payload(self):
+        events = InvokeAIQueueEvents("http://localhost:9090", "default")
+        events._record({"queue_item": {"item_id": 7, "status": "failed"}})
+        assert events.status(7) == "failed"
+        assert events.url == "ws://localhost:9090/ws/socket.io/?EIO=4&transport=websocket"
+
+    def test_no_event_socket_falls_back_to_polling(self, fake_invokeai, gen):
+        assert gen._get_queue_events() is None
+        gen.queue_prompt({"nodes": {}, "edges": []}, n_runs=1)
+        assert _saved_files(gen) == [b"png result_1.png"]
+
+
+# ---------------------------------------------------------------------------
+# Upload deduplication
+# ---------------------------------------------------------------------------
+
+class TestUploadDedup:
+    def test_same_content_uploads_once(self, fake_invokeai, gen, tmp_path):
+        first = tmp_path / "a.png"
+        copy = tmp_path / "b.png"
+        other = tmp_path / "c.png"
+        first.write_bytes(b"control image")
+        copy.write_bytes(b"control image")
+        other.write_bytes(b"another image")
+        names = [gen._upload_image(str(p)) for p in (first, copy, first, other)]
+        assert names == ["upload_1.png", "upload_1.png", "upload_1.png", "upload_2.png"]
+        assert fake_invokeai.uploads == 2
+
+    def test_cache_cleared_with_server_session(self, fake_invokeai, gen, tmp_path):
+        path = tmp_path / "a.png"
+        path.write_bytes(b"control image")
+        gen._upload_image(str(path))
+        InvokeAIGen.clear_upload_cache()
+        assert gen._upload_image(str(path)) == "upload_2.png"
+
+    def test_only_same_content_waits_for_an_upload(self, gen, tmp_path, monkeypatch):
+        monkeypatch.setattr(InvokeAIGen, "_uploaded_images", {})
+        slow, fast = tmp_path / "slow.png", tmp_path / "fast.png"
+        slow.write_bytes(b"slow image")
+        fast.write_bytes(b"fast image")
+        release = threading.Event()
+        posted = []
+
+        def post_upload(path, data):
+            posted.append(os.path.basename(path))
+            if data == b"slow image":
+                assert release.wait(5)
+            return os.path.basename(path)
+
+        monkeypatch.setattr(gen, "_post_upload", post_upload)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            first = executor.submit(gen._upload_image, str(slow))
+            while not posted:
+                time.sleep(0.01)
+            same = executor.submit(gen._upload_image, str(slow))
+            assert executor.submit(gen._upload_image, str(fast)).result(timeout=5) == "fast.png"
+            assert not same.done()
+            release.set()
+            assert first.result(timeout=5) == same.result(timeout=5) == "slow.png"
+        assert posted == ["slow.png", "fast.png"]
+
+    def test_failed_upload_is_retried(self, gen, tmp_path, monkeypatch):
+        monkeypatch.setattr(InvokeAIGen, "_uploaded_images", {})
+        path = tmp_path / "a.png"
+        path.write_bytes(b"control image")
+
+        def server_down(path, data):
+            raise OSError("server down")
+
+        monkeypatch.setattr(gen, "_post_upload", server_down)
+        with pytest.raises(OSError):
+            gen._upload_image(str(path))
+        monkeypatch.setattr(gen, "_post_upload", lambda path, data: "a.png")
+        assert gen._upload_image(str(path)) == "a.png"
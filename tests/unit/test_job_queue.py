@@ -1,5 +1,16 @@
 import pytest
-from utils.job_queue import JobQueue, SDRunsQueue, ServerStagingQueue
+from sd_runner.run_config import RunConfig
+from utils.globals import Globals, Sampler
+from utils.job_queue import JobPriority, JobQueue, JobSource, PresetSchedulesQueue, SDRunsQueue, ServerStagingQueue
+from utils.time_estimator import JobPlan, generation_timings
+
+
+class FakeJob:
+    def __init__(self, key):
+        self.key = key
+
+    def fingerprint(self):
+        return str(self.key)
 
 
 class TestJobQueueBasics:
@@ -90,6 +101,101 @@ class TestJobQueuePendingText:
         assert "1" in text
 
 
+class TestJobQueueScheduling:
+    def test_higher_priority_taken_first(self):
+        q = JobQueue()
+        q.add("low", priority=JobPriority.LOW)
+        q.add("normal")
+        q.add("high", priority=JobPriority.HIGH)
+        assert [q.take(), q.take(), q.take()] == ["high", "normal", "low"]
+
+    def test_sources_take_turns_at_same_priority(self):
+        q = JobQueue()
+        for i in range(3):
+            q.add(f"server{i}", source=JobSource.SERVER)
+        q.add("ui0")
+        q.add("ui1")
+        assert q.pending_jobs == ["ui0", "server0", "ui1", "server1", "server2"]
+        assert [q.take() for _ in range(5)] == ["ui0", "server0", "ui1", "server1", "server2"]
+
+    def test_duplicate_pending_job_is_skipped(self):
+        q = JobQueue()
+        assert q.add(FakeJob("a")) is True
+        assert q.add(FakeJob("a")) is False
+        assert q.pending_count() == 1
+        q.take()
+        assert q.add(FakeJob("a")) is True
+
+    def test_job_updated_refreshes_fingerprint(self):
+        q = JobQueue()
+        job = FakeJob("a")
+        q.add(job)
+        job.key = "b"
+        q.job_updated(job)
+        assert q.add(FakeJob("a")) is True
+        assert q.add(FakeJob("b")) is False
+
+    def test_requeue_puts_job_back_in_front(self):
+        q = JobQueue()
+        q.add("first")
+        q.add("second", source=JobSource.SERVER)
+        entry = q.take_entry()
+        q.requeue(entry)
+        assert q.pending_jobs == ["first", "second"]
+
+    def test_on_change_called_for_each_change(self):
+        q = JobQueue()
+        calls = []
+        q.on_change = calls.append
+        q.add("a")
+        q.take()
+        q.cancel()
+        assert calls == [q, q, q]
+
+    def test_stats_per_source(self):
+        q = JobQueue()
+        q.add("a", source=JobSource.SERVER)
+        q.add("b", source=JobSource.SERVER)
+        q.take()
+        stats = q.stats()
+        assert stats[JobSource.SERVER]["depth"] == 1
+        assert stats[JobSource.SERVER]["taken"] == 1
+        assert stats[JobSource.UI]["depth"] == 0
+        assert JobSource.SERVER.display() in q.stats_text()
+        assert JobSource.UI.display() not in q.stats_text()
+
+
+class TestJobQueuePersistence:
+    def test_snapshot_restore_keeps_order_and_lanes(self):
+        q = JobQueue()
+        q.add("a", priority=JobPriority.LOW)
+        q.add("b", source=JobSource.SERVER)
+        q.add("c")
+        restored = JobQueue()
+        assert restored.restore(q.snapshot()) == 3
+        assert restored.pending_jobs == q.pending_jobs
+        assert restored.stats()[JobSource.SERVER]["depth"] == 1
+
+    def test_sd_runs_queue_round_trips_run_configs(self):
+        q = SDRunsQueue()
+        run_config = RunConfig({"model_tags": "modelA", "workflow_tag": "SIMPLE_IMAGE_GEN",
+                                "sampler": Sampler.EULER, "positive_prompt": "a cat", "n_latents": 3})
+        q.add(run_config)
+        restored = SDRunsQueue()
+        assert restored.restore(q.snapshot()) == 1
+        job = restored.take()
+        assert (job.model_tags, job.positive_prompt, job.n_latents) == ("modelA", "a cat", 3)
+        assert job.sampler == run_config.sampler
+        assert job.fingerprint() == run_config.fingerprint()
+
+    def test_restore_skips_duplicates_and_bad_entries(self):
+        q = SDRunsQueue()
+        q.add(RunConfig({"model_tags": "modelA"}))
+        data = q.snapshot()
+        assert q.restore(data + [{"job": None}]) == 0
+        assert q.pending_count() == 1
+
+
 class TestSDRunsQueue:
     def test_has_sd_runs_name(self):
         q = SDRunsQueue()
@@ -110,6 +216,71 @@ class TestSDRunsQueue:
         q.add(FakeRunConfig())
         assert q.estimate_time() == 60
 
+    def test_estimate_uses_each_jobs_plan(self, monkeypatch):
+        monkeypatch.setattr(generation_timings, "_stats", {})
+        monkeypatch.setattr(Globals, "GENERATION_DELAY_TIME_SECONDS", 0)
+        for _ in range(generation_timings.MIN_SAMPLES):
+            generation_timings.record(JobPlan("SIMPLE_IMAGE_GEN", ["fast"], 1_000_000), 2.0)
+            generation_timings.record(JobPlan("SIMPLE_IMAGE_GEN", ["slow"], 1_000_000), 10.0)
+        q = SDRunsQueue()
+        fast, slow = RunConfig({"model_tags": "fast"}), RunConfig({"model_tags": "slow"})
+        fast.plan = JobPlan("SIMPLE_IMAGE_GEN", ["fast"], 1_000_000, n_latents=2, total=3)
+        slow.plan = JobPlan("SIMPLE_IMAGE_GEN", ["slow"], 1_000_000, total=1)
+        q.add(fast)
+        q.add(slow)
+        estimate = q.estimate()
+        assert estimate.seconds == pytest.approx(2.0 * 6 + 10.0)
+        assert estimate.low <= estimate.seconds <= estimate.high
+        q.take()
+        assert q.estimate().seconds == pytest.approx(10.0)
+
+    def test_edited_job_is_replanned(self):
+        q = SDRunsQueue()
+        run_config = RunConfig({"model_tags": "modelA", "total": 2, "n_latents": 1})
+        # Two adapter iterations per requested run
+        run_config.plan = JobPlan("SIMPLE_IMAGE_GEN", ["modelA"], 1_000_000, total=4, images_per_latent=3)
+        q.add(run_config)
+        run_config.total = 5
+        run_config.n_latents = 2
+        q.job_updated(run_config, previous_total=2)
+        plan = q.take_entry().plan
+        assert (plan.total, plan.n_latents, plan.images_per_latent) == (10, 2, 3)
+        assert run_config.plan is plan
+
+    def test_plan_survives_snapshot(self):
+        q = SDRunsQueue()
+        run_config = RunConfig({"model_tags": "modelA"})
+        run_config.plan = JobPlan("SIMPLE_IMAGE_GEN", ["modelA"], 1_000_000, total=4)
+        q.add(run_config)
+        restored = SDRunsQueue()
+        restored.restore(q.snapshot())
+        assert restored.take().plan == run_config.plan
+
+
+class TestPresetSchedulesQueue:
+    def test_plans_entry_when_queued(self):
+        class FakeSchedule:
+            def total_generations(self, starting_total):
+                return starting_total * 2
+
+        class FakeRunConfig:
+            total = 3
+
+            def build_plan(self, total=None):
+                return JobPlan("SIMPLE_IMAGE_GEN", ["modelA"], total=total)
+
+        q = PresetSchedulesQueue(get_run_config_callback=FakeRunConfig,
+                                 get_current_schedule_callback=FakeSchedule)
+        q.add({"control_net": "a.png"})
+        assert q.take_entry().plan.total == 6
+
+    def test_no_plan_without_schedule(self):
+        q = PresetSchedulesQueue(get_run_config_callback=lambda: None,
+                                 get_current_schedule_callback=lambda: None)
+        q.add({"control_net": "a.png"})
+        assert q.estimate_time() == 0
+        assert q.take_entry().plan is None
+
 
 class TestServerStagingQueue:
     def test_empty_on_creation(self):
@@ -138,8 +309,8 @@ class TestServerStagingQueue:
 
     def test_pending_count_tracks_adds_and_takes(self):
         q = ServerStagingQueue()
-        q.add("t", {})
-        q.add("t", {})
+        q.add("t", {"x": 1})
+        q.add("t", {"x": 2})
         assert q.pending_count() == 2
         q.take()
         assert q.pending_count() == 1
@@ -153,10 +324,10 @@ class TestServerStagingQueue:
     def test_max_size_enforced(self):
         q = ServerStagingQueue()
         q.MAX_SIZE = 2
-        q.add("t", {})
-        q.add("t", {})
+        q.add("t", {"x": 1})
+        q.add("t", {"x": 2})
         with pytest.raises(Exception, match="full"):
-            q.add("t", {})
+            q.add("t", {"x": 3})
 
     def test_pending_text_empty_when_no_items(self):
         q = ServerStagingQueue()
@@ -164,6 +335,20 @@ class TestServerStagingQueue:
 
     def test_pending_text_contains_count(self):
         q = ServerStagingQueue()
-        q.add("t", {})
-        q.add("t", {})
+        q.add("t", {"x": 1})
+        q.add("t", {"x": 2})
         assert "2" in q.pending_text()
+
+    def test_identical_request_returns_existing_position(self):
+        q = ServerStagingQueue()
+        q.add("t", {"x": 1})
+        q.add("t", {"x": 2})
+        assert q.add("t", {"x": 1}) == 1
+        assert q.pending_count() == 2
+
+    def test_snapshot_and_pending_requests(self):
+        q = ServerStagingQueue()
+        q.add("t", {"x": 1}, staged_at=100.0)
+        assert q.pending_requests() == [("t", {"x": 1})]
+        assert q.snapshot() == [{"workflow_type": "t", "args": {"x": 1}, "staged_at": 100.0}]
+        assert q.oldest_wait() > 0
@@ -0,0 +1,151 @@
+"""
+Tests for the streaming Ollama client in extensions/llm.py.
+
+A local HTTP/1.1 server stands in for Ollama and answers /api/generate with
+chunked NDJSON, one token per line, like the real streaming API.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from extensions.llm import LLM, LLMResponseException, LLMResult
+
+
+class _FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connection_count += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for token in self.server.tokens:
+                if self.server.token_delay:
+                    time.sleep(self.server.token_delay)
+                line = {"model": body["model"], "response": token, "done": False}
+                self._write_chunk(json.dumps(line).encode() + b"\n")
+            done = {"model": body["model"], "response": "", "done": True, "done_reason": "stop",
+                    "eval_count": len(self.server.tokens), "context": [1, 2, 3]}
+            self._write_chunk(json.dumps(done).encode() + b"\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+@pytest.fixture
+def fake_ollama():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeOllamaHandler)
+    server.daemon_threads = True
+    server.tokens = ["Hello", ",", " wor", "ld", "!"]
+    server.token_delay = 0
+    server.requests = []
+    server.connection_count = 0
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _make_llm(server, **kwargs):
+    host, port = server.server_address
+    return LLM(model_name="test-model", endpoint=f"http://{host}:{port}/api/generate", **kwargs)
+
+
+class TestStreamResponse:
+    def test_yields_tokens_and_records_stats(self, fake_ollama):
+        llm = _make_llm(fake_ollama)
+        tokens = list(llm.stream_response("hi"))
+        assert "".join(tokens) == "Hello, world!"
+        assert len(tokens) == 5
+        stats = llm.last_stream_stats
+        assert stats.stop_reason == "done"
+        assert stats.token_count == 5
+        assert stats.time_to_first_token is not None
+        assert fake_ollama.requests[0]["stream"] is True
+
+    def test_connection_is_reused(self, fake_ollama):
+        llm = _make_llm(fake_ollama)
+        assert llm.generate_response("one").response == "Hello, world!"
+        assert llm.generate_response("two").response == "Hello, world!"
+        assert fake_ollama.connection_count == 1
+
+    def test_stop_string_ends_stream_early(self, fake_ollama):
+        llm = _make_llm(fake_ollama)
+        text = "".join(llm.stream_response("hi", stop=["world"]))
+        assert text == "Hello, "
+        assert llm.last_stream_stats.stop_reason == "stop"
+        assert fake_ollama.requests[0]["options"]["stop"] == ["world"]
+
+    def test_max_tokens_limits_output(self, fake_ollama):
+        llm = _make_llm(fake_ollama)
+        text = "".join(llm.stream_response("hi", max_tokens=2))
+        assert text == "Hello,"
+        assert llm.last_stream_stats.stop_reason == "length"
+        assert fake_ollama.requests[0]["options"]["num_predict"] == 2
+        # The connection was dropped mid-stream; the next request reconnects
+        assert llm.generate_response("again").response == "Hello, world!"
+
+    def test_cancel_event_stops_stream(self, fake_ollama):
+        fake_ollama.token_delay = 0.05
+        llm = _make_llm(fake_ollama)
+        cancel = threading.Event()
+        received = []
+        for token in llm.stream_response("hi", cancel_event=cancel):
+            received.append(token)
+            cancel.set()
+        assert received == ["Hello"]
+        assert llm.last_stream_stats.stop_reason == "cancelled"
+
+    def test_cancel_generation_from_another_thread(self, fake_ollama):
+        fake_ollama.token_delay = 0.5
+        llm = _make_llm(fake_ollama)
+        threading.Timer(0.1, llm.cancel_generation).start()
+        start = time.monotonic()
+        assert llm.generate_response("hi") is None
+        assert time.monotonic() - start < 0.5
+
+    def test_run_context_skip_cancels(self, fake_ollama):
+        fake_ollama.token_delay = 0.5
+
+        class RunContext:
+            def should_skip(self):
+                return True
+
+        llm = _make_llm(fake_ollama, run_context=RunContext())
+        assert llm.generate_response_async("hi") is None
+
+    def test_json_value_extraction(self, fake_ollama):
+        fake_ollama.tokens = ['{"prompt": ', '"a cat"}']
+        llm = _make_llm(fake_ollama)
+        assert llm.ask("hi", json_key="prompt").response == "a cat"
+
+    def test_server_unavailable_raises(self):
+        llm = LLM(model_name="test-model", endpoint="http://127.0.0.1:1/api/generate")
+        with pytest.raises(LLMResponseException):
+            llm.generate_response("hi")
+        assert llm.get_failure_count() == 1
+
+
+class TestJsonAttr:
+    def test_misspelled_key_is_matched(self):
+        result = LLMResult.from_json({"response": json.dumps({"negativ_prompt": "blurry", "seed": 3})})
+        assert result._get_json_attr("negative_prompt").response == "blurry"
@@ -0,0 +1,118 @@
+"""
+Tests for header-based trigger extraction in lib/lora_extract_safetriggers.py
+and the persistent trigger index in lib/lora_trigger_extractor.py.
+
+LoRA files are synthesized: an 8-byte little-endian header length, a JSON
+header with ``__metadata__``, then filler standing in for tensor data.
+"""
+
+import json
+import os
+import struct
+
+import pytest
+
+from lib import lora_extract_safetriggers as safetriggers
+from lib.lora_trigger_extractor import LoRATriggerExtractor, NO_TRIGGERS_MESSAGE
+
+
+def _write_lora(path, tag_frequency=None, tensor_bytes=b"\0" * 64):
+    metadata = {"ss_network_module": "networks.lora"}
+    if tag_frequency is not None:
+        metadata["ss_tag_frequency"] = json.dumps(tag_frequency)
+    header = json.dumps({"__metadata__": metadata, "w": {"dtype": "F16", "shape": [32], "data_offsets": [0, 64]}})
+    with open(path, "wb") as f:
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header.encode("utf-8"))
+        f.write(tensor_bytes)
+    return str(path)
+
+
+class _Args:
+    def __init__(self, combine=True):
+        self.combine = combine
+
+
+@pytest.fixture
+def lora_dir(tmp_path):
+    directory = tmp_path / "loras"
+    directory.mkdir()
+    return directory
+
+
+# ---------------------------------------------------------------------------
+# Header parsing
+# ---------------------------------------------------------------------------
+
+class TestReadTriggersFromHeader:
+    def test_combines_dataset_groups(self, lora_dir):
+        path = _write_lora(lora_dir / "a.safetensors", {"10_cat": {"cat": 5, "sofa": 2}, "5_dog": {"dog": 3}})
+        found, triggers = safetriggers.read_triggers_from_header(path, combine=True)
+        assert found
+        assert triggers == {"cat": 5, "sofa": 2, "dog": 3}
+
+    def test_first_group_without_combine(self, lora_dir):
+        path = _write_lora(lora_dir / "a.safetensors", {"10_cat": {"cat": 5}, "5_dog": {"dog": 3}})
+        assert safetriggers.read_triggers_from_header(path, combine=False) == (True, {"cat": 5})
+
+    def test_no_tags_in_readable_header(self, lora_dir):
+        path = _write_lora(lora_dir / "a.safetensors")
+        assert safetriggers.read_triggers_from_header(path) == (True, None)
+
+    def test_tags_outside_header_are_not_searched(self, lora_dir):
+        # Tag-like bytes in tensor data must not be mistaken for metadata
+        path = _write_lora(lora_dir / "a.safetensors", tensor_bytes=b'"ss_tag_frequency": "{"x": {"bogus": 1}}"')
+        assert safetriggers.read_triggers_from_lora(path, _Args()) is None
+
+    def test_unreadable_header_falls_back_to_byte_search(self, lora_dir):
+        path = lora_dir / "legacy.safetensors"
+        path.write_bytes(b"garbage" + b'"ss_tag_frequency": "{"10_x": {"red hat": 4}}"' + b"\0" * 32)
+        assert safetriggers.read_triggers_from_header(str(path)) == (False, None)
+        assert safetriggers.read_triggers_from_lora(str(path), _Args()) == {"red hat": 4}
+
+
+# ---------------------------------------------------------------------------
+# Persistent index
+# ---------------------------------------------------------------------------
+
+class TestLoRATriggerIndex:
+    def test_index_persists_and_skips_unchanged_files(self, lora_dir, tmp_path, monkeypatch):
+        index_path = str(tmp_path / "index.json")
+        path = _write_lora(lora_dir / "a.safetensors", {"d": {"cat": 1}})
+        assert LoRATriggerExtractor(index_path).get_trigger_info(path).triggers == {"cat": 1}
+
+        def fail(*args, **kwargs):
+            raise AssertionError("file should not be re-read")
+
+        monkeypatch.setattr(LoRATriggerExtractor, "_extract_triggers", fail)
+        info = LoRATriggerExtractor(index_path).get_trigger_info(path)
+        assert info.has_triggers
+        assert info.top_triggers == [("cat", 1)]
+
+    def test_changed_file_is_re_read(self, lora_dir, tmp_path):
+        extractor = LoRATriggerExtractor(str(tmp_path / "index.json"))
+        path = _write_lora(lora_dir / "a.safetensors", {"d": {"cat": 1}})
+        extractor.get_trigger_info(path)
+        _write_lora(lora_dir / "a.safetensors", {"d": {"cat": 1, "hat": 2}})
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert extractor.get_trigger_info(path).triggers == {"cat": 1, "hat": 2}
+
+    def test_no_triggers_is_indexed(self, lora_dir, tmp_path):
+        extractor = LoRATriggerExtractor(str(tmp_path / "index.json"))
+        path = _write_lora(lora_dir / "a.safetensors")
+        info = extractor.get_trigger_info(path)
+        assert info.error_message == NO_TRIGGERS_MESSAGE
+        assert extractor.get_cached_trigger_info(path) is not None
+
+    def test_scan_directory_reports_progress(self, lora_dir, tmp_path):
+        for i in range(5):
+            _write_lora(lora_dir / f"l{i}.safetensors", {"d": {f"tag{i}": i + 1}})
+        (lora_dir / "notes.txt").write_text("x")
+        extractor = LoRATriggerExtractor(str(tmp_path / "index.json"))
+        progress = []
+        results = extractor.scan_directory(str(lora_dir), progress_callback=lambda done, total, _p: progress.append((done, total)))
+        assert [os.path.basename(p) for p in results] == [f"l{i}.safetensors" for i in range(5)]
+        assert results[str(lora_dir / "l3.safetensors")].triggers == {"tag3": 4}
+        assert progress[-1] == (5, 5)
+        assert extractor.get_cache_stats()["cached_items"] == 5
@@ -366,6 +366,53 @@ class TestGetToleranceRange(unittest.TestCase):
         self.assertIs(tr1, tr2)
 
 
+class TestGetClosest(unittest.TestCase):
+
+    @staticmethod
+    def _loop_reference(width, height, round_to, tolerance_range):
+        # The step-by-step scaling get_closest replaced with a closed form
+        if width * height < tolerance_range[0]:
+            while width * height < tolerance_range[0]:
+                width *= 1.1
+                height *= 1.1
+        elif width * height > tolerance_range[1]:
+            while width * height > tolerance_range[1]:
+                width *= 0.9
+                height *= 0.9
+        width, height = int(width), int(height)
+        while width % round_to != 0:
+            width += 1
+        while height % round_to != 0:
+            height += 1
+        return width, height
+
+    def test_matches_iterative_scaling(self):
+        res = Resolution(1024, 1024, resolution_group=ResolutionGroup.TEN_TWENTY_FOUR)
+        tolerance_range = Resolution.get_tolerance_range(ArchitectureType.SDXL, ResolutionGroup.TEN_TWENTY_FOUR)
+        rng = random.Random(7)
+        for _ in range(2000):
+            width, height = rng.randint(1, 8000), rng.randint(1, 8000)
+            round_to = rng.choice([4, 8, 16, 64])
+            closest = res.get_closest(width, height, round_to=round_to, resolution_group=ResolutionGroup.TEN_TWENTY_FOUR)
+            if Resolution.find_matching_aspect_ratio_resolution(ArchitectureType.SDXL, ResolutionGroup.TEN_TWENTY_FOUR, width, height):
+                continue
+            self.assertEqual((closest.width, closest.height),
+                             self._loop_reference(width, height, round_to, tolerance_range), (width, height, round_to))
+
+    def test_in_range_only_rounds_up(self):
+        res = Resolution(1024, 1024, resolution_group=ResolutionGroup.TEN_TWENTY_FOUR)
+        closest = res.get_closest(1001, 999, round_to=16, resolution_group=ResolutionGroup.TEN_TWENTY_FOUR)
+        self.assertEqual((closest.width, closest.height), (1008, 1008))
+
+    def test_scale_steps(self):
+        self.assertEqual(Resolution._scale_steps(100, 100, 1.1), 0)
+        self.assertEqual(Resolution._scale_steps(100, 121, 1.1), 1)
+        self.assertEqual(Resolution._scale_steps(100, 122, 1.1), 2)
+        self.assertEqual(Resolution._scale_steps(100, 81, 0.9), 1)
+        with self.assertRaises(ValueError):
+            Resolution._scale_steps(0, 100, 1.1)
+
+
 class TestUpscaleRounded(unittest.TestCase):
 
     def test_upscale_produces_larger_dimensions(self):
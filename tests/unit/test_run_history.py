@@ -0,0 +1,263 @@
+"""
+Tests for the SQLite run history store in utils/run_history.py.
+"""
+
+import datetime
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+
+import run as run_module
+from run import Run
+from sd_runner.run_config import RunConfig
+from utils import run_history as run_history_module
+from utils.run_history import RunHistory, RunOutcome, config_from_run
+
+
+@pytest.fixture
+def history(tmp_path):
+    store = RunHistory(directory=str(tmp_path / "history"), encrypted=False)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def fake_encryption(monkeypatch):
+    """Reversible stand-in for the keyring-backed encryptor."""
+    def encrypt(data, service_name, app_identifier, path):
+        with open(path, "wb") as f:
+            f.write(b"ENC" + bytes(b ^ 0x5A for b in data))
+
+    def decrypt(path, service_name, app_identifier):
+        with open(path, "rb") as f:
+            raw = f.read()
+        assert raw.startswith(b"ENC")
+        return bytes(b ^ 0x5A for b in raw[3:])
+
+    monkeypatch.setattr(run_history_module, "encrypt_data_to_file", encrypt)
+    monkeypatch.setattr(run_history_module, "decrypt_data_from_file", decrypt)
+
+
+def _config(model_tags="modelA", lora_tags="", workflow="SIMPLE_IMAGE_GEN_LORA", positive="a cat"):
+    return {"model_tags": model_tags, "lora_tags": lora_tags, "workflow_type": workflow,
+            "positive_tags": positive, "n_latents": 1, "total": 2, "software_type": "ComfyUI"}
+
+
+def _run_with_images(store, tmp_path, images=1, outcome=RunOutcome.COMPLETED, started_at=None, **config):
+    run_id = store.start_run(_config(**config), started_at=started_at)
+    for i in range(images):
+        path = tmp_path / f"run{run_id}_{i}.png"
+        path.write_bytes(b"png")
+        assert store.record_image(str(path), run_id)
+    store.finish_run(run_id, outcome)
+    return run_id
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+
+class TestRecording:
+    def test_run_lifecycle(self, history, tmp_path):
+        run_id = history.start_run(_config(model_tags=" modelA , modelB,modelA"), started_at=1000.0)
+        image = tmp_path / "out.png"
+        image.write_bytes(b"png")
+        assert history.record_image(str(image), run_id)
+        history.finish_run(run_id, RunOutcome.FAILED, error="boom", finished_at=1012.5)
+
+        run = history.get_run(run_id)
+        assert run["outcome"] is RunOutcome.FAILED
+        assert (run["duration"], run["error"]) == (12.5, "boom")
+        assert run["model_tags"] == "modelA, modelB"
+        assert run["config"]["positive_tags"] == "a cat"
+        assert history.run_images(run_id)[0]["path"] == str(image)
+
+    def test_images_without_run_are_ignored(self, history, tmp_path):
+        history.start_run(_config())
+        assert not history.record_image(str(tmp_path / "stray.png"), None)
+
+    def test_write_failures_do_not_raise(self, tmp_path):
+        blocker = tmp_path / "not_a_dir"
+        blocker.write_text("")
+        store = RunHistory(directory=str(blocker), encrypted=False)
+        assert store.start_run(_config()) is None
+        store.finish_run(1, RunOutcome.COMPLETED)
+
+    def test_persists_across_instances(self, tmp_path):
+        directory = str(tmp_path / "history")
+        first = RunHistory(directory=directory, encrypted=False)
+        _run_with_images(first, tmp_path)
+        first.close()
+        second = RunHistory(directory=directory, encrypted=False)
+        assert second.count_runs() == 1
+        second.close()
+
+    def test_config_from_run(self):
+        run_config = RunConfig({"model_tags": "modelA", "lora_tags": "loraA", "workflow_tag": "SIMPLE_IMAGE_GEN",
+                                "software_type": "ComfyUI", "positive_prompt": "a dog", "n_latents": 2})
+        config_dict = config_from_run(run_config)
+        assert (config_dict["model_tags"], config_dict["lora_tags"]) == ("modelA", "loraA")
+        assert (config_dict["positive_tags"], config_dict["n_latents"]) == ("a dog", 2)
+        assert isinstance(config_dict["prompter_config"], dict)
+
+
+# ---------------------------------------------------------------------------
+# Queries
+# ---------------------------------------------------------------------------
+
+class TestQueries:
+    def test_filters_and_pages(self, history, tmp_path):
+        for i in range(5):
+            _run_with_images(history, tmp_path, started_at=1000.0 + i, model_tags=f"model{i % 2}",
+                             positive=f"prompt {i}")
+        assert [run["positive_tags"] for run in history.query_runs(limit=2)] == ["prompt 4", "prompt 3"]
+        assert [run["positive_tags"] for run in history.query_runs(limit=2, offset=4)] == ["prompt 0"]
+        assert history.count_runs(model="model1") == 2
+        assert history.count_runs(since=1002.0, until=1004.0) == 2
+        assert history.count_runs(text="PROMPT 3") == 1
+        assert history.count_runs(text="%") == 0
+
+    def test_outcome_and_counts(self, history, tmp_path):
+        _run_with_images(history, tmp_path, images=3)
+        _run_with_images(history, tmp_path, images=0, outcome=RunOutcome.CANCELLED)
+        cancelled = history.query_runs(outcome=RunOutcome.CANCELLED)
+        assert len(cancelled) == 1 and cancelled[0]["images"] == 0
+        completed = history.query_runs(outcome=RunOutcome.COMPLETED)[0]
+        assert (completed["images"], completed["kept"]) == (3, 3)
+
+    def test_top_combinations_rank_by_kept_images(self, history, tmp_path):
+        _run_with_images(history, tmp_path, images=3, model_tags="modelA", lora_tags="loraX")
+        _run_with_images(history, tmp_path, images=2, model_tags="modelB", lora_tags="loraX, loraY")
+        _run_with_images(history, tmp_path, images=1, model_tags="modelB", lora_tags="loraX, loraY")
+        for image in history.run_images(1):
+            (tmp_path / image["path"]).unlink()
+        assert history.refresh_kept() == 3
+
+        top = history.top_combinations()
+        assert [(row["model"], row["lora"], row["runs"], row["images"], row["kept"]) for row in top] == [
+            ("modelB", "loraX, loraY", 2, 3, 3),
+            ("modelA", "loraX", 1, 3, 0),
+        ]
+        by_lora = history.top_combinations(by="lora")
+        assert [(row["lora"], row["kept"]) for row in by_lora] == [("loraX", 3), ("loraY", 3)]
+        assert history.top_combinations(model="modelA")[0]["model"] == "modelA"
+        with pytest.raises(ValueError):
+            history.top_combinations(by="sampler")
+
+    def test_since_accepts_datetimes(self, history, tmp_path):
+        last_month = datetime.datetime.now() - datetime.timedelta(days=30)
+        _run_with_images(history, tmp_path, started_at=last_month - datetime.timedelta(days=1))
+        _run_with_images(history, tmp_path)
+        assert history.count_runs(since=last_month) == 1
+
+
+# ---------------------------------------------------------------------------
+# Legacy import and encryption
+# ---------------------------------------------------------------------------
+
+class TestLegacyImport:
+    def test_imports_once_oldest_first(self, history):
+        entries = [dict(_config(positive="newer"), timestamp="2024-02-01T10:00:00"),
+                   dict(_config(positive="older"), timestamp="2024-01-01T10:00:00")]
+        assert history.import_legacy(entries) == 2
+        assert history.import_legacy(entries) == 0
+        runs = history.query_runs()
+        assert [run["positive_tags"] for run in runs] == ["newer", "older"]
+        assert runs[0]["outcome"] is RunOutcome.IMPORTED
+        assert runs[0]["config"]["timestamp"] == "2024-02-01T10:00:00"
+
+
+class TestEncryption:
+    def test_encrypted_store_round_trips(self, tmp_path, fake_encryption):
+        directory = tmp_path / "history"
+        store = RunHistory(directory=str(directory), encrypted=True)
+        _run_with_images(store, tmp_path, positive="secret prompt")
+        store.close()
+        assert not (directory / RunHistory.DB_FILENAME).exists()
+        assert b"secret prompt" not in (directory / RunHistory.ENCRYPTED_FILENAME).read_bytes()
+
+        reopened = RunHistory(directory=str(directory), encrypted=True)
+        assert reopened.query_runs()[0]["positive_tags"] == "secret prompt"
+        reopened.close()
+
+    def test_switching_setting_migrates(self, tmp_path, fake_encryption):
+        directory = tmp_path / "history"
+        plain = RunHistory(directory=str(directory), encrypted=False)
+        _run_with_images(plain, tmp_path)
+        plain.close()
+
+        encrypted = RunHistory(directory=str(directory), encrypted=True)
+        assert encrypted.count_runs() == 1
+        encrypted.close()
+        assert not (directory / RunHistory.DB_FILENAME).exists()
+
+        plain = RunHistory(directory=str(directory), encrypted=False)
+        assert plain.count_runs() == 1
+        plain.close()
+        assert not (directory / RunHistory.ENCRYPTED_FILENAME).exists()
+
+    def test_encrypted_store_written_after_each_run(self, tmp_path, fake_encryption):
+        directory = tmp_path / "history"
+        store = RunHistory(directory=str(directory), encrypted=True)
+        _run_with_images(store, tmp_path)
+        written = (directory / RunHistory.ENCRYPTED_FILENAME).stat().st_mtime_ns
+        time.sleep(0.01)
+        store.store()  # Nothing changed since the run finished
+        assert (directory / RunHistory.ENCRYPTED_FILENAME).stat().st_mtime_ns == written
+        store.close()
+
+
+# ---------------------------------------------------------------------------
+# Run integration
+# ---------------------------------------------------------------------------
+
+class TestRunRecording:
+    """Run.execute returns once generations are scheduled; they finish on the executor later."""
+
+    @pytest.fixture
+    def scheduled_run(self, history, monkeypatch):
+        monkeypatch.setattr(run_module, "run_history", history)
+
+        def start(futures_count=1):
+            run = Run(RunConfig({"model_tags": "modelA", "workflow_tag": "SIMPLE_IMAGE_GEN"}))
+            futures = [Future() for _ in range(futures_count)]
+
+            def fake_execute():
+                gen_config = SimpleNamespace(history_id=run.history_id)
+                run.generators.append(SimpleNamespace(gen_config=gen_config, futures=futures))
+
+            monkeypatch.setattr(run, "_execute", fake_execute)
+            run.execute()
+            return run, futures
+        return start
+
+    def test_images_saved_after_execute_returns(self, history, tmp_path, scheduled_run):
+        first, first_futures = scheduled_run(futures_count=2)
+        second, second_futures = scheduled_run()
+        assert history.get_run(first.history_id)["outcome"] is RunOutcome.RUNNING
+
+        image = tmp_path / "late.png"
+        image.write_bytes(b"png")
+        assert history.record_image(str(image), first.generators[0].gen_config.history_id)
+        first_futures[0].set_result(None)
+        assert history.get_run(first.history_id)["outcome"] is RunOutcome.RUNNING
+        first_futures[1].set_exception(RuntimeError("backend down"))
+
+        finished = history.get_run(first.history_id)
+        assert finished["outcome"] is RunOutcome.COMPLETED
+        assert finished["error"] == "1 of 2 generations failed"
+        assert [image["path"] for image in history.run_images(first.history_id)] == [str(image)]
+        assert history.run_images(second.history_id) == []
+        assert history.get_run(second.history_id)["outcome"] is RunOutcome.RUNNING
+
+    def test_cancelled_while_generating(self, history, scheduled_run):
+        run, futures = scheduled_run()
+        run.cancel()
+        futures[0].cancel()
+        assert history.get_run(run.history_id)["outcome"] is RunOutcome.CANCELLED
+
+    def test_nothing_scheduled_finishes_immediately(self, history, scheduled_run):
+        run, _ = scheduled_run(futures_count=0)
+        assert history.get_run(run.history_id)["outcome"] is RunOutcome.COMPLETED
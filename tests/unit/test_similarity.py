@@ -0,0 +1,139 @@
+"""
+Tests for utils/similarity.py and the Utils helpers that delegate to it.
+
+The reference implementations below are the plain DP versions Utils used
+before; the fast paths must agree with them exactly.
+"""
+
+import math
+import random
+
+import pytest
+
+from utils import similarity
+from utils.utils import Utils
+
+
+def _reference_distance(s, t):
+    previous = list(range(len(t) + 1))
+    for i, a in enumerate(s):
+        current = [i + 1]
+        for j, b in enumerate(t):
+            current.append(min(previous[j + 1] + 1, current[j] + 1, previous[j] + (a != b)))
+        previous = current
+    return previous[-1]
+
+
+def _reference_lcs(s, t):
+    m = [[0] * (1 + len(t)) for _ in range(1 + len(s))]
+    longest, x_longest = 0, 0
+    for x in range(1, 1 + len(s)):
+        for y in range(1, 1 + len(t)):
+            if s[x - 1] == t[y - 1]:
+                m[x][y] = m[x - 1][y - 1] + 1
+                if m[x][y] > longest:
+                    longest, x_longest = m[x][y], x
+    return s[x_longest - longest:x_longest]
+
+
+def _reference_is_similar(s0, s1):
+    min_len = min(len(s0), len(s1))
+    if min_len == len(s0):
+        weighted_avg_len = (len(s0) + len(s1) / 2) / 2
+    else:
+        weighted_avg_len = (len(s0) / 2 + len(s1)) / 2
+    threshold = int(weighted_avg_len / 2.1) - int(math.log(weighted_avg_len))
+    threshold = min(threshold, int(min_len * 0.8))
+    return _reference_distance(s0, s1) < threshold
+
+
+def _random_pairs(count, max_len, seed=11):
+    rng = random.Random(seed)
+    alphabet = "abcd éx"
+    pairs = []
+    for _ in range(count):
+        s = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len)))
+        if s and rng.random() < 0.5:
+            i, j = sorted(rng.randint(0, len(s)) for _ in range(2))
+            t = s[:i] + "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 3))) + s[j:]
+        else:
+            t = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len)))
+        pairs.append((s, t))
+    return pairs
+
+
+@pytest.fixture(params=[similarity.MYERS_MAX_LENGTH, 0], ids=["myers", "dp"])
+def algorithm(request, monkeypatch):
+    monkeypatch.setattr(similarity, "MYERS_MAX_LENGTH", request.param)
+
+
+# ---------------------------------------------------------------------------
+# Distances
+# ---------------------------------------------------------------------------
+
+class TestLevenshtein:
+    def test_known_values(self, algorithm):
+        assert similarity.levenshtein("kitten", "sitting") == 3
+        assert similarity.levenshtein("", "abc") == 3
+        assert similarity.levenshtein("abc", "") == 3
+        assert similarity.levenshtein("same", "same") == 0
+
+    def test_matches_reference(self, algorithm):
+        for s, t in _random_pairs(400, 40):
+            assert similarity.levenshtein(s, t) == _reference_distance(s, t), (s, t)
+
+    def test_bounded_reports_cap(self, algorithm):
+        for s, t in _random_pairs(400, 40, seed=5):
+            exact = _reference_distance(s, t)
+            for k in (0, 1, 3, 10):
+                assert similarity.levenshtein(s, t, max_distance=k) == min(exact, k + 1), (s, t, k)
+
+    def test_patterns_longer_than_a_word(self):
+        s = "a prompt about a cat on a windowsill at dusk, " * 4
+        t = s.replace("cat", "dog").replace("dusk", "dawn")
+        assert len(s) > 64
+        assert similarity.levenshtein(s, t) == _reference_distance(s, t)
+
+    def test_one_to_many(self, algorithm):
+        candidates = ["kitten", "sitting", "", "mitten", "kitchen"]
+        assert similarity.distances("kitten", candidates) == [_reference_distance("kitten", c) for c in candidates]
+        assert similarity.distances("kitten", candidates, max_distance=1) == [0, 2, 2, 1, 2]
+
+
+class TestLongestCommonSubstring:
+    def test_matches_reference(self):
+        for s, t in _random_pairs(400, 30, seed=3):
+            assert similarity.longest_common_substring(s, t) == _reference_lcs(s, t), (s, t)
+
+    def test_earliest_on_ties(self):
+        assert similarity.longest_common_substring("abxcd", "cdab") == "ab"
+
+
+# ---------------------------------------------------------------------------
+# is_similar
+# ---------------------------------------------------------------------------
+
+class TestIsSimilar:
+    def test_matches_reference(self, algorithm):
+        pairs = [(s, t) for s, t in _random_pairs(600, 60, seed=9) if s or t]
+        for s, t in pairs:
+            assert similarity.is_similar(s, t) == _reference_is_similar(s, t), (s, t)
+
+    def test_both_empty_still_raises(self):
+        with pytest.raises(ValueError):
+            similarity.is_similar("", "")
+
+    def test_find_similar(self, algorithm):
+        keys = ["positive_prompt", "negativ_prompt", "negative_prompts", "seed"]
+        assert similarity.find_similar("negative_prompt", keys) == [
+            i for i, key in enumerate(keys) if _reference_is_similar("negative_prompt", key)]
+        assert similarity.find_similar("negative_prompt", keys)[0] == 1
+
+
+class TestUtilsDelegates:
+    def test_utils_helpers(self):
+        assert Utils.string_distance("kitten", "sitting") == 3
+        assert Utils.string_distance("kitten", "sitting", max_distance=1) == 2
+        assert Utils.longest_common_substring("a red car", "the red cat") == " red ca"
+        assert Utils.is_similar_str("negative_prompt", "negativ_prompt")
+        assert not Utils.is_similar_str("seed", "negative_prompt")
@@ -1,6 +1,11 @@
+import threading
+from types import SimpleNamespace
+
 import pytest
+from sd_runner.resolution import Resolution
+from utils import time_estimator
 from utils.globals import Globals
-from utils.time_estimator import TimeEstimator
+from utils.time_estimator import GenerationTimings, JobEstimate, JobPlan, TimeEstimator
 
 
 class TestEstimateSeconds:
@@ -78,3 +83,149 @@ class TestEstimateQueueTime:
         base = TimeEstimator.estimate_queue_time(queue_size=2, avg_latents_per_job=1.0)
         double = TimeEstimator.estimate_queue_time(queue_size=2, avg_latents_per_job=2.0)
         assert double == base * 2
+
+
+# ---------------------------------------------------------------------------
+# Per-job plans and measured timings
+# ---------------------------------------------------------------------------
+
+def _plan(workflow="SIMPLE_IMAGE_GEN", models=("modelA",), area=1_000_000, n_latents=1, total=1, images_per_latent=1):
+    return JobPlan(workflow, list(models), area, n_latents, total, images_per_latent)
+
+
+@pytest.fixture
+def timings(monkeypatch):
+    # Small pacing delay so the learned generation time dominates
+    monkeypatch.setattr(Globals, "GENERATION_DELAY_TIME_SECONDS", 0.5)
+    return GenerationTimings()
+
+
+class TestJobPlan:
+    def test_image_count(self):
+        assert _plan(n_latents=2, total=3, images_per_latent=4).image_count() == 24
+
+    def test_dict_round_trip(self):
+        plan = _plan(models=("modelA", "modelB"))
+        assert JobPlan.from_dict(plan.to_dict()) == plan
+
+    def test_remaining_keeps_everything_but_total(self):
+        remaining = _plan(total=5).remaining(2)
+        assert remaining.total == 2 and remaining.models == ["modelA"]
+
+
+class TestGenerationTimings:
+    def test_falls_back_to_generation_delay(self, timings):
+        estimate = timings.predict(_plan(total=3))
+        assert estimate.seconds == Globals.GENERATION_DELAY_TIME_SECONDS * 3
+        assert estimate.low < estimate.seconds < estimate.high
+
+    def test_learns_per_model_rates(self, timings):
+        for _ in range(GenerationTimings.MIN_SAMPLES):
+            timings.record(_plan(models=("fast",)), 2.0)
+            timings.record(_plan(models=("slow",)), 8.0)
+        assert timings.predict(_plan(models=("fast",), total=10)).seconds == pytest.approx(20.0)
+        assert timings.predict(_plan(models=("slow",), total=10)).seconds == pytest.approx(80.0)
+        assert timings.predict(_plan(models=("fast", "slow"), total=10)).seconds == pytest.approx(50.0)
+
+    def test_scales_with_resolution_area(self, timings):
+        for _ in range(GenerationTimings.MIN_SAMPLES):
+            timings.record(_plan(area=1_000_000), 4.0)
+        assert timings.predict(_plan(area=2_000_000)).seconds == pytest.approx(8.0)
+
+    def test_unknown_model_uses_workflow_rate(self, timings):
+        for _ in range(GenerationTimings.MIN_SAMPLES):
+            timings.record(_plan(models=("modelA",)), 6.0)
+        assert timings.predict(_plan(models=("modelB",))).seconds == pytest.approx(6.0)
+
+    def test_range_widens_with_variance(self, timings):
+        for seconds in (4.0, 6.0, 4.0, 6.0):
+            timings.record(_plan(), seconds)
+        estimate = timings.predict(_plan())
+        assert estimate.low < estimate.seconds < estimate.high
+
+    def test_recent_samples_dominate(self, timings):
+        for _ in range(50):
+            timings.record(_plan(), 10.0)
+        for _ in range(3 * GenerationTimings.MAX_SAMPLES):
+            timings.record(_plan(), 2.0)
+        assert timings.predict(_plan()).seconds < 3.0
+
+    def test_dict_round_trip(self, timings):
+        for _ in range(GenerationTimings.MIN_SAMPLES):
+            timings.record(_plan(), 3.0)
+        restored = GenerationTimings()
+        restored.load_dict(timings.to_dict())
+        assert restored.predict(_plan()) == timings.predict(_plan())
+
+
+    def test_pacing_is_floor_and_ignores_resolution(self, timings, monkeypatch):
+        monkeypatch.setattr(Globals, "GENERATION_DELAY_TIME_SECONDS", 5)
+        for _ in range(GenerationTimings.MIN_SAMPLES):
+            timings.record(_plan(area=1_000_000), 4.0)
+        # Generations overlap the delay, so the slower of the two bounds the job
+        assert timings.predict(_plan(area=250_000, total=2)).seconds == pytest.approx(10.0)
+        assert timings.predict(_plan(area=1_000_000, total=2)).seconds == pytest.approx(10.0)
+        assert timings.predict(_plan(area=4_000_000, total=2)).seconds == pytest.approx(32.0)
+
+
+class TestGenerationTimingRecording:
+    def test_overlapping_generations_share_busy_time(self, monkeypatch):
+        now = [0.0]
+        monkeypatch.setattr(time_estimator.time, "monotonic", lambda: now[0])
+        timings = GenerationTimings()
+        first = timings.generation_started()
+        now[0] = 2.0
+        second = timings.generation_started()
+        now[0] = 6.0
+        assert timings.generation_finished(first) == pytest.approx(4.0)
+        now[0] = 8.0
+        assert timings.generation_finished(second) == pytest.approx(4.0)
+
+    def test_finished_generation_is_recorded(self, monkeypatch):
+        now = [0.0]
+        monkeypatch.setattr(time_estimator.time, "monotonic", lambda: now[0])
+        monkeypatch.setattr(Globals, "GENERATION_DELAY_TIME_SECONDS", 0)
+        timings = GenerationTimings()
+        gen_config = SimpleNamespace(workflow_id="SIMPLE_IMAGE_GEN")
+        plan = JobPlan.for_generation(gen_config, SimpleNamespace(id="modelA"), Resolution(1000, 1000), n_latents=2)
+        for _ in range(GenerationTimings.MIN_SAMPLES):
+            token = timings.generation_started()
+            now[0] += 6.0
+            timings.generation_finished(token, plan, plan.image_count())
+        assert timings.predict(_plan(models=("modelA",), area=1_000_000)).seconds == pytest.approx(3.0)
+
+    def test_executor_task_records_its_generation(self, monkeypatch):
+        from sd_runner.generators.base import BaseImageGenerator
+
+        recorded = []
+        monkeypatch.setattr(time_estimator.generation_timings, "record",
+                            lambda plan, seconds, images=None: recorded.append((plan, images)))
+
+        class Gen(BaseImageGenerator):
+            pass
+
+        Gen.__abstractmethods__ = frozenset()  # Only the executor wrapper is exercised
+        gen = Gen(SimpleNamespace(workflow_id="SIMPLE_IMAGE_GEN", prompt_image_path=""))
+        done = threading.Event()
+        task = gen._wrap_task(lambda **kw: done.set())
+        task(model=SimpleNamespace(id="modelA"), resolution=Resolution(512, 512), n_latents=3)
+        assert done.is_set()
+        (plan, images), = recorded
+        assert (plan.models, plan.resolution_area, images) == (["modelA"], 512 * 512, 3)
+
+        with pytest.raises(RuntimeError):
+            gen._wrap_task(lambda **kw: (_ for _ in ()).throw(RuntimeError("backend down")))(
+                model=SimpleNamespace(id="modelA"), resolution=Resolution(512, 512))
+        assert len(recorded) == 1
+
+
+class TestFormatEstimate:
+    def test_includes_range(self):
+        text = TimeEstimator.format_estimate(JobEstimate(120, 60, 180))
+        assert TimeEstimator.format_time(60) in text and TimeEstimator.format_time(180) in text
+
+    def test_no_range_when_exact(self):
+        assert TimeEstimator.format_estimate(JobEstimate(90, 90, 90)) == TimeEstimator.format_time(90)
+
+    def test_estimates_add_up(self):
+        assert JobEstimate(1, 0, 2) + JobEstimate(3, 2, 4) == JobEstimate(4, 2, 6)
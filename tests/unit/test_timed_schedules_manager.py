@@ -9,6 +9,7 @@ gives a deterministic weekday without depending on the system clock.
 """
 
 import datetime
+import random
 import pytest
 from sd_runner.timed_schedule import TimedSchedule
 from sd_runner.timed_schedules_manager import (
@@ -39,6 +40,64 @@ def dt(weekday=0, hour=10, minute=0):
     return base + datetime.timedelta(days=weekday, hours=hour, minutes=minute)
 
 
+def _reference_active(schedules, now):
+    """The per-call scan get_active_schedule used before the timeline."""
+    day_index = now.weekday()
+    current_time = TimedSchedule.get_time(now.hour, now.minute)
+    partially_applicable = []
+    no_specific_times = []
+    for schedule in schedules:
+        if not schedule.enabled or schedule.shutdown_time is not None or day_index not in schedule.weekday_options:
+            continue
+        if schedule.start_time is not None and schedule.start_time < current_time:
+            if schedule.end_time is not None and schedule.end_time > current_time:
+                return schedule
+            else:
+                partially_applicable.append(schedule)
+        elif schedule.end_time is not None and schedule.end_time > current_time:
+            partially_applicable.append(schedule)
+        elif (schedule.start_time is None and schedule.end_time is None) or \
+                (schedule.start_time == 0 and schedule.end_time == 0):
+            no_specific_times.append(schedule)
+    if partially_applicable:
+        partially_applicable.sort(key=lambda schedule: schedule.calculate_generality())
+        return partially_applicable[0]
+    elif no_specific_times:
+        no_specific_times.sort(key=lambda schedule: schedule.calculate_generality())
+        return no_specific_times[0]
+    return TimedSchedulesManager.default_schedule
+
+
+def _reference_shutdown(schedules, now):
+    day_index = now.weekday()
+    current_time = TimedSchedule.get_time(now.hour, now.minute)
+    for schedule in schedules:
+        if not schedule.enabled or schedule.shutdown_time is None:
+            continue
+        if day_index in schedule.weekday_options and schedule.shutdown_time < current_time:
+            return schedule
+        if (day_index - 1) % 7 in schedule.weekday_options and current_time < 6 * 60:
+            return schedule
+    return None
+
+
+def _random_schedules(rng, count):
+    def random_time():
+        return rng.choice([None, 0, rng.randrange(24 * 60), rng.randrange(24) * 60])
+
+    schedules = []
+    for i in range(count):
+        schedules.append(make_schedule(
+            f"s{i}",
+            enabled=rng.random() < 0.85,
+            weekday_options=sorted(rng.sample(range(7), rng.randint(1, 7))),
+            start_time=random_time(),
+            end_time=random_time(),
+            shutdown_time=random_time() if rng.random() < 0.25 else None,
+        ))
+    return schedules
+
+
 @pytest.fixture(autouse=True)
 def reset_manager_state():
     TimedSchedulesManager.recent_timed_schedules = []
@@ -306,3 +365,50 @@ class TestCheckForShutdownRequest:
         with pytest.raises(ScheduledShutdownException) as exc_info:
             TimedSchedulesManager.check_for_shutdown_request(dt(0, 23, 30))
         assert exc_info.value.schedule == s
+
+
+# ---------------------------------------------------------------------------
+# Compiled weekly timeline
+# ---------------------------------------------------------------------------
+
+class TestScheduleTimeline:
+    def test_matches_scan_every_minute_of_the_week(self):
+        rng = random.Random(7)
+        for _ in range(12):
+            schedules = _random_schedules(rng, rng.randint(1, 6))
+            TimedSchedulesManager.recent_timed_schedules = schedules
+            for minute in range(0, 7 * 24 * 60):
+                now = dt(0, 0, minute)
+                assert TimedSchedulesManager.get_active_schedule(now) is _reference_active(schedules, now), now
+                assert TimedSchedulesManager._check_for_shutdown_request(now) is _reference_shutdown(schedules, now), now
+
+    def test_rebuilt_only_after_change(self):
+        s = make_schedule("work", start_time=TimedSchedule.get_time(9, 0), end_time=TimedSchedule.get_time(17, 0))
+        TimedSchedulesManager.recent_timed_schedules = [s]
+        timeline = TimedSchedulesManager.get_timeline()
+        assert TimedSchedulesManager.get_timeline() is timeline
+        assert TimedSchedulesManager.get_active_schedule(dt(0, 12)) == s
+
+        s.enabled = False
+        TimedSchedulesManager.store_schedules()
+        assert TimedSchedulesManager.get_timeline() is not timeline
+        assert TimedSchedulesManager.get_active_schedule(dt(0, 12)) == TimedSchedulesManager.default_schedule
+
+    def test_next_transition_within_day(self):
+        s = make_schedule("work", start_time=TimedSchedule.get_time(9, 0), end_time=TimedSchedule.get_time(17, 0))
+        other = make_schedule("evening", start_time=TimedSchedule.get_time(18, 0), end_time=TimedSchedule.get_time(22, 0))
+        TimedSchedulesManager.recent_timed_schedules = [s, other]
+        now = dt(0, 12, 30) + datetime.timedelta(seconds=15)
+        transition = TimedSchedulesManager.next_transition(now)
+        assert transition == dt(0, 17, 0)
+        assert TimedSchedulesManager.get_active_schedule(transition) is other
+
+    def test_next_transition_wraps_around_the_week(self):
+        s = make_schedule("shutdown_sun", weekday_options=[6], shutdown_time=TimedSchedule.get_time(23, 0))
+        TimedSchedulesManager.recent_timed_schedules = [s]
+        assert TimedSchedulesManager.next_transition(dt(0, 7)) == dt(6, 23, 1)
+        assert TimedSchedulesManager.next_transition(dt(6, 23, 30)) == dt(7, 6, 0)
+
+    def test_no_transition_when_nothing_changes(self):
+        TimedSchedulesManager.recent_timed_schedules = [make_schedule("all_day")]
+        assert TimedSchedulesManager.next_transition(dt(3, 12)) is None
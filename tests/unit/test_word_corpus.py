@@ -0,0 +1,153 @@
+"""
+Tests for sd_runner/word_corpus.py and the corpus-backed dictionary in
+Concepts (ensure_dictionary_loaded, sample_whitelisted_by_index).
+"""
+
+import os
+import random
+
+import pytest
+
+from sd_runner.blacklist import Blacklist
+from sd_runner.concepts import Concepts
+from sd_runner.word_corpus import ChainedCorpus, WordCorpus
+from utils.globals import PromptMode
+
+
+WORDS = ["pear", "apple", "café", "zebra", "apple", "naïve", "banana"]
+
+
+# ---------------------------------------------------------------------------
+# WordCorpus
+# ---------------------------------------------------------------------------
+
+class TestWordCorpus:
+    def test_sorted_with_duplicates_kept(self):
+        corpus = WordCorpus.from_words(WORDS)
+        assert list(corpus) == sorted(WORDS)
+        assert len(corpus) == 7
+        assert corpus[-1] == "zebra"
+        assert corpus[2:4] == ["banana", "café"]
+
+    def test_duplicates_keep_sampling_weight(self):
+        corpus = WordCorpus.from_words(["common"] * 3 + ["rare"])
+        assert "common" in corpus and "rare" in corpus
+        assert corpus.index("common") == 0
+        random.seed(1)
+        picks = [corpus[random.randrange(len(corpus))] for _ in range(4000)]
+        assert 0.7 < picks.count("common") / len(picks) < 0.8
+
+    def test_membership(self):
+        corpus = WordCorpus.from_words(WORDS)
+        assert all(word in corpus for word in WORDS)
+        assert "Apple" not in corpus
+        assert "grape" not in corpus
+        assert 3 not in corpus
+
+    def test_index_uses_sorted_order(self):
+        corpus = WordCorpus.from_words(WORDS)
+        assert corpus.index("apple") == 0
+        assert corpus.index("café") == 3
+        with pytest.raises(ValueError):
+            corpus.index("grape")
+
+    def test_sample_is_distinct(self):
+        corpus = WordCorpus.from_words(f"w{i}" for i in range(100))
+        sampled = corpus.sample(20)
+        assert len(set(sampled)) == 20
+        assert all(word in corpus for word in sampled)
+
+    def test_empty_corpus(self):
+        corpus = WordCorpus.from_words([])
+        assert len(corpus) == 0
+        assert "a" not in corpus
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / "bogus.bin"
+        path.write_bytes(b"x" * 64)
+        with pytest.raises(ValueError):
+            WordCorpus.open(str(path))
+
+
+class TestLoadOrBuild:
+    @pytest.fixture
+    def source(self, tmp_path):
+        path = tmp_path / "words.txt"
+        path.write_text("alpha\nbeta\n")
+        return path
+
+    @staticmethod
+    def _read(path):
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+
+    def test_compiled_file_is_reused(self, source, tmp_path, monkeypatch):
+        cache_dir = str(tmp_path / "corpora")
+        first = WordCorpus.load_or_build([str(source)], self._read, cache_dir=cache_dir)
+        assert first.path is not None and list(first) == ["alpha", "beta"]
+
+        def fail(_path):
+            raise AssertionError("source should not be re-read")
+
+        second = WordCorpus.load_or_build([str(source)], fail, cache_dir=cache_dir)
+        assert second.path == first.path
+        assert "beta" in second
+
+    def test_changed_source_rebuilds_and_removes_stale(self, source, tmp_path):
+        cache_dir = str(tmp_path / "corpora")
+        first = WordCorpus.load_or_build([str(source)], self._read, cache_dir=cache_dir)
+        first.close()
+        source.write_text("alpha\nbeta\ngamma\n")
+        stat = os.stat(source)
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        second = WordCorpus.load_or_build([str(source)], self._read, cache_dir=cache_dir)
+        assert "gamma" in second
+        assert os.listdir(cache_dir) == [os.path.basename(second.path)]
+
+
+class TestChainedCorpus:
+    def test_indexes_across_parts(self):
+        chained = ChainedCorpus(WordCorpus.from_words(["a", "b"]), [], ["x", "y", "z"])
+        assert len(chained) == 5
+        assert [chained[i] for i in range(5)] == ["a", "b", "x", "y", "z"]
+        assert chained[-1] == "z"
+        assert "y" in chained and "q" not in chained
+
+
+# ---------------------------------------------------------------------------
+# Concepts integration
+# ---------------------------------------------------------------------------
+
+class TestConceptsDictionary:
+    @pytest.fixture
+    def concepts_dir(self, tmp_path, monkeypatch):
+        words = [f"word{i}" for i in range(50)] + ["redcar"]
+        (tmp_path / Concepts.ALL_WORDS_LIST_FILENAME).write_text("# comment\n" + "\n".join(words) + "\n")
+        monkeypatch.setattr(Concepts, "CONCEPTS_DIR", str(tmp_path))
+        return tmp_path
+
+    def test_dictionary_is_compiled_corpus(self, concepts_dir):
+        Concepts.ensure_dictionary_loaded()
+        assert isinstance(Concepts.ALL_WORDS_LIST, WordCorpus)
+        assert len(Concepts.ALL_WORDS_LIST) == 51
+        assert "redcar" in Concepts.ALL_WORDS_LIST
+        assert "# comment" not in Concepts.ALL_WORDS_LIST
+
+    def test_sample_by_index_skips_blacklisted(self, concepts_dir):
+        Concepts.ensure_dictionary_loaded()
+        Blacklist.add_to_blacklist("word")
+        random.seed(3)
+        sampled = Concepts.sample_whitelisted_by_index(Concepts.ALL_WORDS_LIST, 1, 5, PromptMode.SFW)
+        assert sampled == ["redcar"]
+
+    def test_sample_by_index_size_matches_sample(self, concepts_dir):
+        Concepts.ensure_dictionary_loaded()
+        sampled = Concepts.sample_whitelisted_by_index(Concepts.ALL_WORDS_LIST, 4, 4, PromptMode.SFW)
+        assert len(sampled) == len(set(sampled)) == 4
+
+    def test_sample_by_index_all_blacklisted_raises(self, concepts_dir):
+        Concepts.ensure_dictionary_loaded()
+        Blacklist.add_to_blacklist("word")
+        Blacklist.add_to_blacklist("redcar")
+        with pytest.raises(Exception, match="No non-blacklisted items"):
+            Concepts.sample_whitelisted_by_index(Concepts.ALL_WORDS_LIST, 1, 3, PromptMode.SFW)
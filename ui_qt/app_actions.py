@@ -14,6 +14,7 @@ class AppActions:
         # Unified recent adapter files callbacks
         "add_recent_adapter_file",
         "contains_recent_adapter_file",
+        "rank_recent_adapter_files",
     }
 
     def __init__(self, actions: Dict[str, Callable[..., Any]], master: Optional[object] = None):
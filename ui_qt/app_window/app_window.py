@@ -313,6 +313,7 @@ class AppWindow(FramelessWindowMixin, SmartMainWindow):
             "add_recent_adapter_file": RecentAdaptersWindow.add_recent_adapter_file,
             "add_recent_source_prompt": RecentAdaptersWindow.add_recent_source_prompt,
             "contains_recent_adapter_file": RecentAdaptersWindow.contains_recent_adapter_file,
+            "rank_recent_adapter_files": RecentAdaptersWindow.rank_recent_adapter_files,
             # Notifications (warn/success are AppActions convenience methods)
             "toast": ts(self.notification_ctrl.toast),
             "_alert": ts(self.notification_ctrl.alert),
@@ -704,6 +705,7 @@ class AppWindow(FramelessWindowMixin, SmartMainWindow):
 
         def _store_cache():
             try:
+                self.cache_ctrl.stop_queue_persistence()
                 self.cache_ctrl.store_pending_queues()
                 self.cache_ctrl.store_display_position()
                 self.cache_ctrl.store_info_cache()
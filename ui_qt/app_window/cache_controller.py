@@ -4,18 +4,23 @@ CacheController -- persistence layer for SD Runner.
 Owns loading and storing:
 - ``RunnerAppConfig`` history via ``app_info_cache``
 - Blacklist, presets, schedules, expansions, timed schedules, recent adapters
+- Measured generation timings used for queue time estimates
 - Security config
 - Display position and virtual-screen info
+- Pending run and server staging queues, written shortly after every change
 """
 
 from __future__ import annotations
 
+import threading
 from typing import TYPE_CHECKING, Optional
 
 from PySide6.QtCore import QTimer
 
 from utils.app_info_cache import app_info_cache
 from utils.logging_setup import get_logger
+from utils.run_history import run_history
+from utils.time_estimator import generation_timings
 from utils.translations import I18N
 
 if TYPE_CHECKING:
@@ -34,10 +39,13 @@ class CacheController:
 
     PENDING_SD_RUNS_KEY = "pending_sd_runs"
     PENDING_SERVER_REQUESTS_KEY = "pending_server_requests"
+    QUEUE_STORE_DELAY_SECONDS = 2.0  # Batches the cache writes for a burst of queue changes
 
     def __init__(self, app_window: AppWindow):
         self._app = app_window
         self._store_cache_timer: Optional[QTimer] = None
+        self._queue_store_timer: Optional[threading.Timer] = None
+        self._queue_store_lock = threading.Lock()
 
     # ------------------------------------------------------------------
     # Load
@@ -72,6 +80,7 @@ class CacheController:
             SchedulesWindow.set_schedules()
             _set_expansions()
             timed_schedules_manager.set_schedules()
+            generation_timings.set_timings()
             RecentAdaptersWindow.load_recent_adapters()
             ImageToPromptWindow.load_last_from_cache()
             # Security config is loaded automatically when first accessed
@@ -89,40 +98,49 @@ class CacheController:
             return RunnerAppConfig()
 
     def _restore_pending_queues(self) -> None:
-        """Restore pending SD runs and server staging requests saved at last shutdown."""
+        """Restore pending SD runs and server staging requests saved in the last session.
+
+        Restored runs leave the queue paused until the user resumes it. From
+        here on every queue change is written back to the cache.
+        """
         from copy import deepcopy
         from sd_runner.run_config import RunConfig
+        from utils.globals import WorkflowType
         from utils.runner_app_config import RunnerAppConfig
 
+        job_queue = self._app.job_queue
         runs_data = app_info_cache.get(self.PENDING_SD_RUNS_KEY) or []
         if runs_data:
-            restored = 0
-            for run_dict in runs_data:
+            restored = job_queue.restore([item for item in runs_data if "job" in item])
+            # Saved before queue snapshots: RunnerAppConfig dicts
+            for run_dict in [item for item in runs_data if "job" not in item]:
                 try:
                     runner_cfg = RunnerAppConfig.from_dict(deepcopy(run_dict))
-                    self._app.job_queue.pending_jobs.append(RunConfig(args=runner_cfg))
-                    restored += 1
+                    if job_queue.add(RunConfig(args=runner_cfg)):
+                        restored += 1
                 except Exception as exc:
                     logger.warning(f"Failed to restore pending run: {exc}")
             if restored:
-                self._app.job_queue.paused = True
+                job_queue.paused = True
                 logger.info(f"Restored {restored} pending SD run(s) from previous session")
-            app_info_cache.set(self.PENDING_SD_RUNS_KEY, [])
 
+        staging = self._app.server_staging_queue
         requests_data = app_info_cache.get(self.PENDING_SERVER_REQUESTS_KEY) or []
         if requests_data:
-            from utils.globals import WorkflowType
             restored = 0
             for req in requests_data:
                 try:
                     wf_type = WorkflowType[req["workflow_type"]]
-                    self._app.server_staging_queue._requests.append((wf_type, req.get("args", {})))
+                    staging.add(wf_type, req.get("args", {}), staged_at=req.get("staged_at"))
                     restored += 1
                 except Exception as exc:
                     logger.warning(f"Failed to restore staging request: {exc}")
             if restored:
                 logger.info(f"Restored {restored} server staging request(s) from previous session")
-            app_info_cache.set(self.PENDING_SERVER_REQUESTS_KEY, [])
+
+        job_queue.on_change = self._on_queue_changed
+        staging.on_change = self._on_queue_changed
+        self.store_pending_queues()
 
     # ------------------------------------------------------------------
     # Store
@@ -157,12 +175,16 @@ class CacheController:
             _store_expansions()
             logger.debug("Storing timed schedules...")
             timed_schedules_manager.store_schedules()
+            logger.debug("Storing generation timings...")
+            generation_timings.store_timings()
             logger.debug("Storing recent adapters...")
             RecentAdaptersWindow.save_recent_adapters()
             logger.debug("Storing security config...")
             get_security_config().save_settings()
             logger.debug("Storing app info cache...")
             app_info_cache.store()
+            logger.debug("Storing run history...")
+            run_history.store()
             logger.debug("Info cache stored successfully")
         except Exception as e:
             logger.error(f"Failed to store info cache: {e}")
@@ -173,39 +195,15 @@ class CacheController:
     def store_pending_queues(self) -> None:
         """
         Snapshot pending SD runs and server staging requests into the cache
-        so they can be restored in the next session.  Called once at shutdown,
-        not during periodic saves.
+        so they can be restored in the next session.
         """
         try:
-            from copy import deepcopy
-
             job_queue = getattr(self._app, "job_queue", None)
-            runs_data: list = []
-            if job_queue is not None:
-                for run_config in job_queue.pending_jobs:
-                    try:
-                        args = getattr(run_config, "args", None)
-                        if args is None:
-                            continue
-                        if hasattr(args, "to_dict"):
-                            runs_data.append(args.to_dict())
-                        elif isinstance(args, dict):
-                            runs_data.append(deepcopy(args))
-                    except Exception as exc:
-                        logger.warning(f"Failed to serialize pending run: {exc}")
+            runs_data = job_queue.snapshot() if job_queue is not None else []
             app_info_cache.set(self.PENDING_SD_RUNS_KEY, runs_data)
 
             staging = getattr(self._app, "server_staging_queue", None)
-            requests_data: list = []
-            if staging is not None:
-                for wf_type, args_dict in staging._requests:
-                    try:
-                        requests_data.append({
-                            "workflow_type": wf_type.name if hasattr(wf_type, "name") else str(wf_type),
-                            "args": args_dict,
-                        })
-                    except Exception as exc:
-                        logger.warning(f"Failed to serialize staging request: {exc}")
+            requests_data = staging.snapshot() if staging is not None else []
             app_info_cache.set(self.PENDING_SERVER_REQUESTS_KEY, requests_data)
 
             logger.debug(
@@ -215,6 +213,37 @@ class CacheController:
         except Exception as e:
             logger.error(f"Failed to store pending queues: {e}")
 
+    def _on_queue_changed(self, _queue=None) -> None:
+        """Snapshot the queues and write the cache shortly after, so a crash or
+        forced shutdown does not lose pending work. Called from any thread."""
+        self.store_pending_queues()
+        with self._queue_store_lock:
+            if self._queue_store_timer is not None:
+                return
+            self._queue_store_timer = threading.Timer(self.QUEUE_STORE_DELAY_SECONDS, self._store_queues_now)
+            self._queue_store_timer.daemon = True
+            self._queue_store_timer.start()
+
+    def _store_queues_now(self) -> None:
+        with self._queue_store_lock:
+            if self._queue_store_timer is None:
+                return  # Stopped for shutdown
+            self._queue_store_timer = None
+        try:
+            app_info_cache.store()
+        except Exception as e:
+            logger.warning(f"Failed to store pending queues: {e}")
+
+    def stop_queue_persistence(self) -> None:
+        """Stop writing the cache on queue changes; shutdown stores it once itself."""
+        with self._queue_store_lock:
+            if self._queue_store_timer is not None:
+                self._queue_store_timer.cancel()
+                self._queue_store_timer = None
+        for queue in (getattr(self._app, "job_queue", None), getattr(self._app, "server_staging_queue", None)):
+            if queue is not None:
+                queue.on_change = None
+
     # ------------------------------------------------------------------
     # Display position
     # ------------------------------------------------------------------
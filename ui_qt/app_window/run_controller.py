@@ -16,7 +16,9 @@ from PySide6.QtCore import QTimer
 from PySide6.QtWidgets import QApplication
 
 from ui_qt.sound_player import play_sound
+from utils.job_queue import JobPriority, JobSource
 from utils.logging_setup import get_logger
+from utils.time_estimator import JobPlan, TimeEstimator, generation_timings
 from utils.translations import I18N
 from utils.utils import Utils
 
@@ -128,7 +130,7 @@ class RunController:
         sp.cancel_btn.setVisible(False)
         sp.pause_queue_btn.setVisible(False)
         app.job_queue.job_running = False
-        next_job_args = app.job_queue.take()
+        next_job = app.job_queue.take_entry()
 
         # A slot just opened; promote one staged server request into the main
         # queue now so staging and the main queue drain in parallel (FIFO order).
@@ -147,14 +149,14 @@ class RunController:
                 app.app_actions.server_run_callback(wf_type, staged_args)
                 promoted = True
 
-        if next_job_args:
+        if next_job is not None:
             if app.job_queue.paused:
-                app.job_queue.pending_jobs.insert(0, next_job_args)
+                app.job_queue.requeue(next_job)
                 Utils.prevent_sleep(False)
                 self.clear_progress()
             else:
                 app.current_run.delay_after_last_run = True
-                Utils.start_thread(self._run_async, use_asyncio=False, args=[next_job_args])
+                Utils.start_thread(self._run_async, use_asyncio=False, args=[next_job.job])
         elif not promoted:
             Utils.prevent_sleep(False)
             self.clear_progress()
@@ -162,7 +164,7 @@ class RunController:
     def resume_paused_queue(self) -> None:
         """Start processing a paused/restored queue without adding a new run."""
         app = self._app
-        if not app.job_queue.pending_jobs or app.job_queue.job_running:
+        if not app.job_queue.pending_count() or app.job_queue.job_running:
             return
         app.job_queue.paused = False
         first = app.job_queue.take()
@@ -178,12 +180,13 @@ class RunController:
     # ------------------------------------------------------------------
     # Run
     # ------------------------------------------------------------------
-    def run(self, event=None) -> None:
+    def run(self, event=None, source: JobSource = JobSource.UI, priority: JobPriority = JobPriority.NORMAL) -> None:
         """Start an image generation run (or enqueue it).
 
         The heavy lifting runs on a background
         thread; UI updates are marshalled to the main thread via
-        ``_MainThreadBridge``-wrapped ``AppActions``.
+        ``_MainThreadBridge``-wrapped ``AppActions``. *source* and *priority*
+        place the run in the job queue if one is already running.
         """
         from sd_runner.blacklist import BlacklistException
         from sd_runner.timed_schedules_manager import timed_schedules_manager, ScheduledShutdownException
@@ -191,7 +194,6 @@ class RunController:
         from sd_runner.gen_config import GenConfig
         from sd_runner.resolution import Resolution
         from utils.globals import Globals, ResolutionGroup, WorkflowType
-        from utils.time_estimator import TimeEstimator
 
         app = self._app
         sp = self._sp
@@ -363,10 +365,11 @@ class RunController:
             ip_adapters=estimate_ip_adapters,
             run_config=args,
         )
-        per_iteration_images = max(1, gen_config.maximum_gens_per_latent())
         requested_total = int(args.total) if args.total and args.total > 0 else 1
-        estimated_image_count = per_iteration_images * requested_total * adapter_iterations
-        estimated_seconds = TimeEstimator.estimate_queue_time(estimated_image_count, gen_config.n_latents)
+        # The plan travels with the run so queue estimates use this run's own settings
+        args.plan = JobPlan.from_gen_config(gen_config, total=requested_total * adapter_iterations)
+        estimated_image_count = args.plan.image_count()
+        estimated_seconds = generation_timings.predict(args.plan).seconds
 
         if estimated_seconds > Globals.TIME_ESTIMATION_CONFIRMATION_THRESHOLD_SECONDS:
             formatted_time = TimeEstimator.format_time(estimated_seconds)
@@ -387,12 +390,15 @@ class RunController:
                 return
 
         if app.job_queue.job_running:
-            app.job_queue.add(args)
-        elif app.job_queue.pending_jobs:
-            # Queue has restored/pending jobs but isn't running — add new job at
-            # the end and kick off execution from the first pending job.
+            if not app.job_queue.add(args, source=source, priority=priority):
+                app.notification_ctrl.toast(_("An identical run is already pending"))
+        elif app.job_queue.pending_count():
+            # Queue has restored/pending jobs but isn't running — queue the new
+            # job and kick off execution from the next pending job.
             app.job_queue.paused = False
-            app.job_queue.add(args)
+            if not app.job_queue.add(args, source=source, priority=priority):
+                # The identical pending run still starts with the rest of the queue
+                app.notification_ctrl.toast(_("An identical run is already pending"))
             first = app.job_queue.take()
             Utils.start_thread(self._run_async, use_asyncio=False, args=[first])
         else:
@@ -467,7 +473,7 @@ class RunController:
                 sp.total_combo.setCurrentText(
                     str(preset_task.count_runs if preset_task.count_runs > 0 else starting_total)
                 )
-                self.run()
+                self.run(source=JobSource.PRESET_SCHEDULE)
                 time.sleep(0.1)
                 started_run_id = app.current_run.id
                 while (app.current_run is not None
@@ -580,30 +586,22 @@ class RunController:
     ) -> None:
         """Update the time-estimation label.
 
+        Sums the prediction for the rest of the current run with those of
+        each pending job's own plan, and shows the confidence range.
         """
-        from utils.time_estimator import TimeEstimator
-
         if gen_config is None:
             return
 
-        total_seconds = 0
-        total_jobs = gen_config.maximum_gens_per_latent()
-        current_job_time = TimeEstimator.estimate_queue_time(
-            total_jobs * remaining_count, gen_config.n_latents
-        )
-        total_seconds += current_job_time
+        estimate = generation_timings.predict(JobPlan.from_gen_config(gen_config, total=remaining_count))
 
         if self._app.job_queue.has_pending():
-            queue_time = self._app.job_queue.estimate_time(gen_config)
-            total_seconds += queue_time
+            estimate += self._app.job_queue.estimate(gen_config)
 
         if (self._app.job_queue_preset_schedules is not None
                 and self._app.job_queue_preset_schedules.has_pending()):
-            preset_time = self._app.job_queue_preset_schedules.estimate_time(gen_config)
-            total_seconds += preset_time
+            estimate += self._app.job_queue_preset_schedules.estimate(gen_config)
 
-        current_estimate = TimeEstimator.format_time(total_seconds)
-        self._sp.label_time_est.setText(current_estimate)
+        self._sp.label_time_est.setText(TimeEstimator.format_estimate(estimate))
 
     def clear_progress(self) -> None:
         """Clear all progress / time-estimation labels."""
@@ -620,10 +618,9 @@ class RunController:
     # ------------------------------------------------------------------
     def calculate_current_run_estimated_time(self, workflow_type: str, gen_config) -> int:
         """Calculate estimated seconds for the current run only."""
-        from utils.time_estimator import TimeEstimator
-        total_jobs = gen_config.maximum_gens_per_latent()
-        current_job_time = TimeEstimator.estimate_queue_time(total_jobs, gen_config.n_latents)
-        logger.debug(f"Estimated time: {total_jobs} jobs, {current_job_time}s")
+        plan = JobPlan.from_gen_config(gen_config)
+        current_job_time = int(generation_timings.predict(plan).seconds)
+        logger.debug(f"Estimated time: {plan.image_count()} images, {current_job_time}s")
         return current_job_time
 
     # ------------------------------------------------------------------
@@ -638,7 +635,7 @@ class RunController:
 
         # If the main run queue is at its limit, stage the request rather than reject it.
         staging = getattr(app, "server_staging_queue", None)
-        if staging is not None and len(app.job_queue.pending_jobs) >= app.job_queue.max_size:
+        if staging is not None and app.job_queue.pending_count() >= app.job_queue.max_size:
             try:
                 pos = staging.add(workflow_type, args)
                 logger.info(
@@ -703,7 +700,12 @@ class RunController:
                 else:
                     logger.warning(f"Unhandled workflow type for server connection: {workflow_type}")
 
-        self.run()
+        try:
+            priority = JobPriority.get(args.get("priority", JobPriority.NORMAL.name))
+        except Exception:
+            logger.warning(f"Ignoring invalid server request priority: {args.get('priority')}")
+            priority = JobPriority.NORMAL
+        self.run(source=JobSource.SERVER, priority=priority)
         return {}
 
     # ------------------------------------------------------------------
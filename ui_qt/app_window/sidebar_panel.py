@@ -23,6 +23,7 @@ from lib.autocomplete_entry_qt import AutocompleteEntry, default_matches
 from lib.plain_text_edit_qt import EscapeAwarePlainTextEdit
 from lib.aware_entry_qt import AwareEntry
 from ui_qt.app_style import AppStyle
+from utils.app_info_cache import app_info_cache
 from utils.globals import (
     PromptMode, WorkflowType, SoftwareType, ResolutionGroup,
     Sampler, Scheduler,
@@ -38,15 +39,27 @@ logger = get_logger("ui_qt.sidebar_panel")
 # Tag-splitting helpers
 # ---------------------------------------------------------------------------
 
-def matches_tag(field_value: str, ac_list_entry: str) -> bool:
-    """Match against the rightmost segment after ``+`` or ``,``."""
+def tag_query(field_value: str) -> str:
+    """Return the rightmost segment after ``+`` or ``,``."""
     if field_value and "+" in field_value:
-        pattern_base = field_value.split("+")[-1]
+        return field_value.split("+")[-1]
     elif field_value and "," in field_value:
-        pattern_base = field_value.split(",")[-1]
-    else:
-        pattern_base = field_value
-    return default_matches(pattern_base, ac_list_entry)
+        return field_value.split(",")[-1]
+    return field_value
+
+
+def matches_tag(field_value: str, ac_list_entry: str) -> bool:
+    """Match against the rightmost segment after ``+`` or ``,``."""
+    return default_matches(tag_query(field_value), ac_list_entry)
+
+
+def _autocomplete_weights() -> dict[str, float]:
+    """Recency-weighted prompt tag frequencies used to rank completions."""
+    try:
+        return app_info_cache.get_prompt_tags_by_frequency(weighted=True)
+    except Exception as e:
+        logger.warning(f"Could not load prompt tag frequencies for autocomplete: {e}")
+        return {}
 
 
 def set_tag(current_value: str, new_value: str) -> str:
@@ -221,11 +234,13 @@ class SidebarPanel(QWidget):
         row_m.addWidget(self.model_presets_btn)
         layout.addLayout(row_m)
 
+        autocomplete_weights = _autocomplete_weights()
         self.model_tags_entry = AutocompleteEntry(
             self._local_model_names, parent=self,
             listbox_length=6,
-            matches_function=matches_tag,
+            query_function=tag_query,
             set_function=set_tag,
+            weights=autocomplete_weights,
         )
         self.model_tags_entry.setText(runner_cfg.model_tags)
         self.model_tags_entry.returnPressed.connect(self._on_model_tags_return)
@@ -245,8 +260,9 @@ class SidebarPanel(QWidget):
         self.lora_tags_entry = AutocompleteEntry(
             lora_names, parent=self,
             listbox_length=6,
-            matches_function=matches_tag,
+            query_function=tag_query,
             set_function=set_tag,
+            weights=autocomplete_weights,
         )
         if runner_cfg.lora_tags:
             self.lora_tags_entry.setText(runner_cfg.lora_tags)
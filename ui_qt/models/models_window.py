@@ -353,7 +353,13 @@ class ModelsWindow(SmartDialog):
                         "yes" if r.gated else "no",
                     ],
                 )
-            self._app_actions.toast(_("Found {0} results").format(len(results)))
+            backend = self._hf_api_backend()
+            if backend.last_search_offline:
+                fetched = datetime.fromtimestamp(backend.last_search_cached_at).strftime("%Y-%m-%d %H:%M")
+                self._app_actions.toast(_("HF Hub unreachable, showing {0} cached results from {1}").format(
+                    len(results), fetched))
+            else:
+                self._app_actions.toast(_("Found {0} results").format(len(results)))
         except Exception as e:
             self._app_actions.alert(
                 _("HF Hub Search Error"),
@@ -668,7 +674,7 @@ class LoRAInfoWindow(SmartDialog):
             if not os.path.exists(fp):
                 self._trigger_status.setText(_("LoRA file not found"))
                 return
-            info = get_trigger_info(fp, force_refresh=True)
+            info = get_trigger_info(fp)
             if info.has_triggers and info.triggers:
                 self._display_triggers(info)
             else:
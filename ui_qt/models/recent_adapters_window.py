@@ -23,6 +23,7 @@ from PySide6.QtWidgets import (
 )
 
 from lib.multi_display_qt import SmartDialog
+from sd_runner.adapter_sorting import RecencyIndex
 from utils.app_info_cache import app_info_cache
 from utils.logging_setup import get_logger
 from utils.translations import I18N
@@ -83,7 +84,7 @@ class RecentAdaptersWindow(SmartDialog):
     _recent_controlnets: list[str] = []
     _recent_ipadapters: list[str] = []
     _recent_source_prompts: list[str] = []
-    _recent_adapter_files_split: list[str] = []
+    _recent_adapter_files_split: RecencyIndex = RecencyIndex()
     _favorite_adapters: list[str] = []
     _controlnet_cache = None
     _ipadapter_cache = None
@@ -158,7 +159,10 @@ class RecentAdaptersWindow(SmartDialog):
             RecentAdaptersWindow._recent_controlnets = app_info_cache.get(RecentAdaptersWindow.RECENT_CONTROLNETS_KEY, [])
             RecentAdaptersWindow._recent_ipadapters = app_info_cache.get(RecentAdaptersWindow.RECENT_IPADAPTERS_KEY, [])
             RecentAdaptersWindow._recent_source_prompts = app_info_cache.get(RecentAdaptersWindow.RECENT_SOURCE_PROMPTS_KEY, [])
-            RecentAdaptersWindow._recent_adapter_files_split = app_info_cache.get(RecentAdaptersWindow.RECENT_ADAPTER_FILES_SPLIT_KEY, [])
+            RecentAdaptersWindow._recent_adapter_files_split = RecencyIndex(
+                app_info_cache.get(RecentAdaptersWindow.RECENT_ADAPTER_FILES_SPLIT_KEY, []),
+                maxsize=max_recent_split_items,
+            )
             RecentAdaptersWindow._favorite_adapters = app_info_cache.get(RecentAdaptersWindow.FAVORITE_ADAPTERS_KEY, [])
             if len(RecentAdaptersWindow._recent_controlnets) > max_recent_items:
                 RecentAdaptersWindow._recent_controlnets = RecentAdaptersWindow._recent_controlnets[:max_recent_items]
@@ -166,8 +170,6 @@ class RecentAdaptersWindow(SmartDialog):
                 RecentAdaptersWindow._recent_ipadapters = RecentAdaptersWindow._recent_ipadapters[:max_recent_items]
             if len(RecentAdaptersWindow._recent_source_prompts) > max_recent_items:
                 RecentAdaptersWindow._recent_source_prompts = RecentAdaptersWindow._recent_source_prompts[:max_recent_items]
-            if len(RecentAdaptersWindow._recent_adapter_files_split) > max_recent_split_items:
-                RecentAdaptersWindow._recent_adapter_files_split = RecentAdaptersWindow._recent_adapter_files_split[:max_recent_split_items]
 
             # Keep only valid, normalized favorites and preserve ordering.
             RecentAdaptersWindow._favorite_adapters = RecentAdaptersWindow._sanitize_favorites(
@@ -191,7 +193,7 @@ class RecentAdaptersWindow(SmartDialog):
             RecentAdaptersWindow._recent_controlnets = []
             RecentAdaptersWindow._recent_ipadapters = []
             RecentAdaptersWindow._recent_source_prompts = []
-            RecentAdaptersWindow._recent_adapter_files_split = []
+            RecentAdaptersWindow._recent_adapter_files_split = RecencyIndex()
             RecentAdaptersWindow._favorite_adapters = []
 
     @staticmethod
@@ -205,7 +207,7 @@ class RecentAdaptersWindow(SmartDialog):
             app_info_cache.set(RecentAdaptersWindow.RECENT_CONTROLNETS_KEY, RecentAdaptersWindow._recent_controlnets)
             app_info_cache.set(RecentAdaptersWindow.RECENT_IPADAPTERS_KEY, RecentAdaptersWindow._recent_ipadapters)
             app_info_cache.set(RecentAdaptersWindow.RECENT_SOURCE_PROMPTS_KEY, RecentAdaptersWindow._recent_source_prompts)
-            app_info_cache.set(RecentAdaptersWindow.RECENT_ADAPTER_FILES_SPLIT_KEY, RecentAdaptersWindow._recent_adapter_files_split)
+            app_info_cache.set(RecentAdaptersWindow.RECENT_ADAPTER_FILES_SPLIT_KEY, RecentAdaptersWindow._recent_adapter_files_split.to_list())
             app_info_cache.set(RecentAdaptersWindow.FAVORITE_ADAPTERS_KEY, RecentAdaptersWindow._favorite_adapters)
         except Exception as e:
             import logging
@@ -304,12 +306,8 @@ class RecentAdaptersWindow(SmartDialog):
             norm = os.path.abspath(path)
         except Exception:
             norm = path
-        if norm in RecentAdaptersWindow._recent_adapter_files_split:
-            RecentAdaptersWindow._recent_adapter_files_split.remove(norm)
-        RecentAdaptersWindow._recent_adapter_files_split.insert(0, norm)
-        max_recent_split_items = RecentAdaptersWindow._get_max_recent_split_items()
-        if len(RecentAdaptersWindow._recent_adapter_files_split) > max_recent_split_items:
-            RecentAdaptersWindow._recent_adapter_files_split = RecentAdaptersWindow._recent_adapter_files_split[:max_recent_split_items]
+        RecentAdaptersWindow._recent_adapter_files_split.set_maxsize(RecentAdaptersWindow._get_max_recent_split_items())
+        RecentAdaptersWindow._recent_adapter_files_split.add(norm)
 
     @staticmethod
     def contains_recent_adapter_file(file_path: str) -> int:
@@ -320,10 +318,12 @@ class RecentAdaptersWindow(SmartDialog):
             norm = os.path.abspath(file_path.strip())
         except Exception:
             norm = file_path.strip()
-        try:
-            return RecentAdaptersWindow._recent_adapter_files_split.index(norm)
-        except ValueError:
-            return -1
+        return RecentAdaptersWindow._recent_adapter_files_split.rank(norm)
+
+    @staticmethod
+    def rank_recent_adapter_files(file_paths: list[str]) -> list[int]:
+        """Batch form of contains_recent_adapter_file: recency index per path, -1 if not recent."""
+        return RecentAdaptersWindow._recent_adapter_files_split.rank_many(file_paths)
 
     def __init__(self, parent: QWidget, app_actions: AppActions):
         super().__init__(parent=parent, title=_("Recent Adapters"), geometry="1000x500")
@@ -914,5 +914,4 @@ class RecentAdaptersWindow(SmartDialog):
             RecentAdaptersWindow._recent_ipadapters = RecentAdaptersWindow._recent_ipadapters[:max_items]
         if len(RecentAdaptersWindow._recent_source_prompts) > max_items:
             RecentAdaptersWindow._recent_source_prompts = RecentAdaptersWindow._recent_source_prompts[:max_items]
-        if len(RecentAdaptersWindow._recent_adapter_files_split) > max_split:
-            RecentAdaptersWindow._recent_adapter_files_split = RecentAdaptersWindow._recent_adapter_files_split[:max_split]
+        RecentAdaptersWindow._recent_adapter_files_split.set_maxsize(max_split)
@@ -6,6 +6,7 @@ Backend data lives on the ``timed_schedules_manager`` singleton which is importe
 
 from __future__ import annotations
 
+import datetime
 from typing import TYPE_CHECKING, Optional
 
 from PySide6.QtCore import Qt
@@ -197,6 +198,9 @@ class TimedSchedulesWindow(SmartDialog):
         clear_btn.clicked.connect(self._clear_schedules)
         top_bar.addWidget(clear_btn)
 
+        self._status_label = QLabel("")
+        self._status_label.setWordWrap(True)
+
         # --- Scroll area ---------------------------------------------------
         self._scroll = QScrollArea()
         self._scroll.setWidgetResizable(True)
@@ -207,6 +211,7 @@ class TimedSchedulesWindow(SmartDialog):
 
         root = QVBoxLayout(self)
         root.addLayout(top_bar)
+        root.addWidget(self._status_label)
         root.addWidget(self._scroll)
 
         QShortcut(QKeySequence("Escape"), self, self.close)
@@ -255,10 +260,26 @@ class TimedSchedulesWindow(SmartDialog):
 
             self._rows_layout.addWidget(row)
 
+        self._update_status()
+
+    def _update_status(self) -> None:
+        now = datetime.datetime.now()
+        active = timed_schedules_manager.get_active_schedule(now)
+        shutdown = timed_schedules_manager.get_shutdown_schedule(now)
+        text = _("Active now: {0}").format(active.name)
+        if shutdown is not None:
+            text += " - " + _("Shutdown requested by: {0}").format(shutdown.name)
+        transition = timed_schedules_manager.next_transition(now)
+        if transition is not None:
+            text += " - " + _("Next change: {0} {1}").format(
+                I18N.day_of_the_week(transition.weekday()), transition.strftime("%H:%M"))
+        self._status_label.setText(text)
+
     # ------------------------------------------------------------------
     def _toggle_enabled(self, schedule: TimedSchedule, state: int) -> None:
         schedule.enabled = state == Qt.CheckState.Checked.value
         timed_schedules_manager.store_schedules()
+        self._update_status()
 
     @require_password(ProtectedActions.EDIT_TIMED_SCHEDULES)
     def _open_modify_window(self, schedule: TimedSchedule | None = None) -> None:
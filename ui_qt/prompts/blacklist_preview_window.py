@@ -5,16 +5,18 @@ Two sections:
 1. **Test Text** -- enter arbitrary text and see which blacklist rules
    match, adapted from the muse project's preview window.
 2. **Concept Preview** -- browse predefined concept lists filtered by
-   a specific blacklist item (or all items).
+   a specific blacklist item (or all items).  Filtering runs on a worker
+   thread and streams matches into the list as they are found.
 
 Both sections require ``REVEAL_BLACKLIST_CONCEPTS`` permission.
 """
 
 from __future__ import annotations
 
+import threading
 from typing import TYPE_CHECKING, Optional
 
-from PySide6.QtCore import Qt
+from PySide6.QtCore import QObject, Qt, Signal
 from PySide6.QtGui import QKeySequence, QShortcut
 from PySide6.QtWidgets import (
     QCheckBox, QHBoxLayout, QLabel, QListWidget,
@@ -28,6 +30,7 @@ from sd_runner.concepts import Concepts
 from ui_qt.auth.password_utils import require_password
 from utils.globals import ProtectedActions
 from utils.translations import I18N
+from utils.utils import Utils
 
 if TYPE_CHECKING:
     from ui_qt.app_actions import AppActions
@@ -35,6 +38,18 @@ if TYPE_CHECKING:
 _ = I18N._
 
 
+class _ConceptPreviewSignals(QObject):
+    """Signals for cross-thread delivery of concept preview results.
+
+    Each signal carries the request id so results of a superseded preview
+    can be ignored.
+    """
+    partial = Signal(int, list)           # request_id, filtered concepts chunk
+    progress = Signal(int, int, int)      # request_id, current_index, total
+    finished = Signal(int, object)        # request_id, filtered concepts or None if cancelled
+    failed = Signal(int, str)             # request_id, error message
+
+
 class BlacklistPreviewWindow(SmartDialog):
     """Preview blacklist effects: test arbitrary text **and** browse
     matched concepts from predefined concept lists.
@@ -66,6 +81,15 @@ class BlacklistPreviewWindow(SmartDialog):
         self._app_actions = app_actions
         self._item = blacklist_item
 
+        # Concept preview worker state
+        self._preview_request_id = 0
+        self._preview_cancel_event: Optional[threading.Event] = None
+        self._preview_signals = _ConceptPreviewSignals()
+        self._preview_signals.partial.connect(self._on_preview_partial)
+        self._preview_signals.progress.connect(self._on_preview_progress)
+        self._preview_signals.finished.connect(self._on_preview_finished)
+        self._preview_signals.failed.connect(self._on_preview_failed)
+
         root = QVBoxLayout(self)
 
         # --- Tabs -----------------------------------------------------------
@@ -191,19 +215,77 @@ class BlacklistPreviewWindow(SmartDialog):
         self._load_concepts()
 
     def _load_concepts(self) -> None:
+        """Start filtering concepts on a worker thread, cancelling any
+        preview that is still running."""
+        self._cancel_preview()
+        self._preview_request_id += 1
+        request_id = self._preview_request_id
+        cancel_event = threading.Event()
+        self._preview_cancel_event = cancel_event
+        states = self._get_category_states()
+        item = self._item
+        signals = self._preview_signals
+
+        self._count_label.setText(_("Loading concepts..."))
+        self._list.clear()
+
+        def _run_preview() -> None:
+            try:
+                filtered = Concepts.get_filtered_concepts_for_preview(
+                    item, states,
+                    cancel_event=cancel_event,
+                    partial_callback=lambda chunk: signals.partial.emit(request_id, chunk),
+                    progress_callback=lambda current, total: signals.progress.emit(request_id, current, total),
+                )
+                signals.finished.emit(request_id, filtered)
+            except Exception as e:
+                signals.failed.emit(request_id, str(e))
+
+        Utils.start_thread(_run_preview, use_asyncio=False)
+
+    def _cancel_preview(self) -> None:
+        if self._preview_cancel_event is not None:
+            self._preview_cancel_event.set()
+            self._preview_cancel_event = None
+
+    def _on_preview_partial(self, request_id: int, concepts: list) -> None:
+        if request_id != self._preview_request_id:
+            return
+        self._list.addItems(concepts)
+        self._count_label.setText(
+            _("Found {0} filtered concepts so far...").format(self._list.count())
+        )
+
+    def _on_preview_progress(self, request_id: int, current_index: int, total: int) -> None:
+        if request_id != self._preview_request_id or not self._app_actions:
+            return
         try:
-            states = self._get_category_states()
-            filtered = Concepts.get_filtered_concepts_for_preview(
-                self._item, states,
+            self._app_actions.update_progress(
+                current_index=current_index, total=total,
+                prepend_text=_("Filtering concepts for preview: "),
             )
-            self._count_label.setText(
-                _("Found {0} filtered concepts").format(len(filtered))
-            )
-            self._list.clear()
-            for concept in sorted(set(filtered)):
-                self._list.addItem(concept)
-        except Exception as e:
-            msg = _("Error loading concepts: {0}").format(e)
-            self._count_label.setText(msg)
-            if self._app_actions:
-                self._app_actions.alert(_("Error"), msg, kind="error", master=self)
+        except Exception:
+            pass  # Progress display is best-effort
+
+    def _on_preview_finished(self, request_id: int, filtered: Optional[list]) -> None:
+        if request_id != self._preview_request_id or filtered is None:
+            return
+        self._preview_cancel_event = None
+        self._count_label.setText(
+            _("Found {0} filtered concepts").format(len(filtered))
+        )
+        self._list.clear()
+        self._list.addItems(sorted(set(filtered)))
+
+    def _on_preview_failed(self, request_id: int, error: str) -> None:
+        if request_id != self._preview_request_id:
+            return
+        self._preview_cancel_event = None
+        msg = _("Error loading concepts: {0}").format(error)
+        self._count_label.setText(msg)
+        if self._app_actions:
+            self._app_actions.alert(_("Error"), msg, kind="error", master=self)
+
+    def closeEvent(self, event) -> None:
+        self._cancel_preview()
+        super().closeEvent(event)
@@ -37,6 +37,7 @@ from PySide6.QtWidgets import (
 from lib.multi_display_qt import SmartDialog
 from ui_qt.app_style import AppStyle
 from ui_qt.prompts.frequent_tags import FrequentTags
+from utils.app_info_cache import app_info_cache
 from utils.translations import I18N
 
 if TYPE_CHECKING:
@@ -59,6 +60,12 @@ class FrequentPromptTagsWindow(SmartDialog):
     def set_recent_tags(recent_tags):
         FrequentTags.tags = recent_tags
 
+    @staticmethod
+    def load_tags_from_prompt_history():
+        """Seed the tag list with the most used prompt history tags, most recent weighing most."""
+        top_tags = app_info_cache.get_top_prompt_tags(FrequentPromptTagsWindow.MAX_TAGS, weighted=True)
+        FrequentTags.set_recent_tags([tag for tag, _frequency in top_tags])
+
     @staticmethod
     def get_history_tag(start_index=0):
         for i in range(len(FrequentPromptTagsWindow.tag_history)):
@@ -91,6 +98,8 @@ class FrequentPromptTagsWindow(SmartDialog):
         )
         self.setStyleSheet(AppStyle.get_stylesheet())
         self._app_actions = app_actions
+        if not FrequentTags.tags:
+            FrequentPromptTagsWindow.load_tags_from_prompt_history()
         self._filter_text = ""
         self._filtered_tags: list[str] = FrequentTags.tags[:]
         self._table: Optional[QTableWidget] = None
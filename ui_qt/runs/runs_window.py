@@ -2,11 +2,13 @@
 RunsWindow -- queue and history viewer for image generation runs.
 
 Queue tab: live view of the currently running job and pending jobs.
-History tab: searchable log of past run configurations with restore.
+History tab: searchable, paged log of past runs from the run history store,
+with restore.
 """
 
 from __future__ import annotations
 
+import datetime
 from typing import TYPE_CHECKING
 
 from PySide6.QtCore import Qt, QTimer
@@ -21,7 +23,9 @@ from PySide6.QtWidgets import (
 from lib.multi_display_qt import SmartDialog
 from utils.app_info_cache import app_info_cache
 from utils.logging_setup import get_logger
+from utils.run_history import run_history
 from utils.runner_app_config import RunnerAppConfig
+from utils.time_estimator import TimeEstimator
 from utils.translations import I18N
 
 if TYPE_CHECKING:
@@ -31,6 +35,7 @@ _ = I18N._
 logger = get_logger("ui_qt.runs_window")
 
 _QUEUE_REFRESH_MS = 2000
+_HISTORY_PAGE_SIZE = 200
 
 
 def _fmt_timestamp(ts: str) -> str:
@@ -40,6 +45,13 @@ def _fmt_timestamp(ts: str) -> str:
         return str(ts)
 
 
+def _fmt_epoch(ts: float) -> str:
+    try:
+        return _fmt_timestamp(datetime.datetime.fromtimestamp(ts).isoformat())
+    except Exception:
+        return str(ts)
+
+
 def _short(value: str, max_len: int = 40) -> str:
     s = str(value or "")
     return s if len(s) <= max_len else s[:max_len - 1] + "…"
@@ -106,6 +118,10 @@ class RunsWindow(SmartDialog):
         )
         layout.addWidget(self._pending_tree)
 
+        self._queue_stats_label = QLabel("")
+        self._queue_stats_label.setWordWrap(True)
+        layout.addWidget(self._queue_stats_label)
+
         self._queue_preset_label = QLabel("")
         self._queue_preset_label.setStyleSheet("font-style: italic;")
         layout.addWidget(self._queue_preset_label)
@@ -170,10 +186,10 @@ class RunsWindow(SmartDialog):
             item = QTreeWidgetItem(self._running_tree, [wf, model, n, total, status])
             item.setForeground(4, self.palette().highlight().color())
             self._queue_status_label.setText(_("Status: Running"))
-        elif job_queue is not None and job_queue.paused and job_queue.pending_jobs:
+        elif job_queue is not None and job_queue.paused and job_queue.pending_count():
             self._queue_status_label.setText(
                 _("Status: Paused — {0} restored job(s) from previous session").format(
-                    len(job_queue.pending_jobs)
+                    job_queue.pending_count()
                 )
             )
         else:
@@ -190,6 +206,11 @@ class RunsWindow(SmartDialog):
                 batch = str(getattr(run_config, "batch_limit", "") or "")
                 pos = _short(str(getattr(run_config, "positive_prompt", "") or ""), 40)
                 QTreeWidgetItem(self._pending_tree, [str(idx + 1), wf, model, n, total, batch, pos])
+            stats_text = job_queue.stats_text()
+            if job_queue.pending_count():
+                eta_text = _("Pending jobs ETA: {0}").format(TimeEstimator.format_estimate(job_queue.estimate()))
+                stats_text = eta_text + ("\n" + stats_text if stats_text else "")
+            self._queue_stats_label.setText(stats_text)
 
         # -- preset schedules --
         preset_queue = getattr(app, "job_queue_preset_schedules", None)
@@ -203,7 +224,7 @@ class RunsWindow(SmartDialog):
         self._staging_tree.clear()
         staging = getattr(app, "server_staging_queue", None)
         if staging is not None:
-            for idx, (wf_type, req_args) in enumerate(staging._requests):
+            for idx, (wf_type, req_args) in enumerate(staging.pending_requests()):
                 wf = str(wf_type.name if hasattr(wf_type, "name") else wf_type or "")
                 args_str = _short(str(req_args), 60)
                 QTreeWidgetItem(self._staging_tree, [str(idx + 1), wf, args_str])
@@ -219,10 +240,11 @@ class RunsWindow(SmartDialog):
             return
 
         row = self._pending_tree.indexOfTopLevelItem(selected)
-        if row < 0 or row >= len(job_queue.pending_jobs):
+        pending_jobs = job_queue.pending_jobs
+        if row < 0 or row >= len(pending_jobs):
             return
 
-        run_config = job_queue.pending_jobs[row]
+        run_config = pending_jobs[row]
 
         dialog = QDialog(self)
         dialog.setWindowTitle(_("Edit Pending Job"))
@@ -250,8 +272,10 @@ class RunsWindow(SmartDialog):
         if dialog.exec() != QDialog.DialogCode.Accepted:
             return
 
+        previous_total = int(getattr(run_config, "total", 1) or 1)
         run_config.n_latents = n_spin.value()
         run_config.total = total_spin.value()
+        job_queue.job_updated(run_config, previous_total=previous_total)
         self._refresh_queue()
 
     def _pause_queue(self) -> None:
@@ -308,12 +332,16 @@ class RunsWindow(SmartDialog):
         layout.addLayout(frow)
 
         self._hist_tree = self._make_tree(
-            [_("Time"), _("Workflow"), _("Model"), _("Positive Tags"), _("N"), _("Total")],
+            [_("Time"), _("Workflow"), _("Model"), _("Positive Tags"), _("N"), _("Total"),
+             _("Outcome"), _("Images")],
             page,
         )
         self._hist_tree.itemDoubleClicked.connect(self._restore_selected)
         layout.addWidget(self._hist_tree)
 
+        self._hist_count_label = QLabel("")
+        layout.addWidget(self._hist_count_label)
+
         btn_row = QHBoxLayout()
         restore_btn = QPushButton(_("Restore to Sidebar"))
         restore_btn.clicked.connect(self._restore_selected)
@@ -321,39 +349,49 @@ class RunsWindow(SmartDialog):
         refresh_btn = QPushButton(_("Refresh"))
         refresh_btn.clicked.connect(self._refresh_history)
         btn_row.addWidget(refresh_btn)
+        self._hist_more_btn = QPushButton(_("Load More"))
+        self._hist_more_btn.clicked.connect(self._load_history_page)
+        btn_row.addWidget(self._hist_more_btn)
         close_btn = QPushButton(_("Close"))
         close_btn.clicked.connect(self.close)
         btn_row.addWidget(close_btn)
         btn_row.addStretch()
         layout.addLayout(btn_row)
 
+        try:
+            # Configs recorded before the run history store existed
+            run_history.import_legacy(app_info_cache.get_all_history())
+        except Exception as e:
+            logger.warning(f"Failed to import run history: {e}")
         self._refresh_history()
 
     def _refresh_history(self) -> None:
-        ft = (self._hist_filter.text() or "").lower()
         self._hist_tree.clear()
         self._hist_data: list[dict] = []
+        self._load_history_page()
+
+    def _load_history_page(self) -> None:
+        ft = (self._hist_filter.text() or "").strip()
+        try:
+            runs = run_history.query_runs(limit=_HISTORY_PAGE_SIZE, offset=len(self._hist_data), text=ft or None)
+            matching = run_history.count_runs(text=ft or None)
+        except Exception as e:
+            logger.warning(f"Failed to read run history: {e}")
+            return
 
-        idx = 0
-        while True:
-            try:
-                entry = app_info_cache.get_history(idx)
-            except Exception:
-                break
-            ts = _fmt_timestamp(entry.get("timestamp", ""))
-            wf = str(entry.get("workflow_type", ""))
-            model = _short(str(entry.get("model_tags", "")), 35)
-            tags = _short(str(entry.get("positive_tags", "")), 50)
-            n = str(entry.get("n_latents", ""))
-            total = str(entry.get("total", ""))
-
-            if ft and not any(ft in v.lower() for v in [wf, model, tags]):
-                idx += 1
-                continue
-
-            QTreeWidgetItem(self._hist_tree, [ts, wf, model, tags, n, total])
-            self._hist_data.append(entry)
-            idx += 1
+        for run in runs:
+            ts = _fmt_epoch(run["started_at"])
+            wf = str(run["workflow_type"] or "")
+            model = _short(str(run["model_tags"] or ""), 35)
+            tags = _short(str(run["positive_tags"] or ""), 50)
+            n = str(run["n_latents"] if run["n_latents"] is not None else "")
+            total = str(run["total"] if run["total"] is not None else "")
+            images = f"{run['kept']}/{run['images']}" if run["images"] else ""
+            QTreeWidgetItem(self._hist_tree, [ts, wf, model, tags, n, total, run["outcome"].value, images])
+            self._hist_data.append(run["config"])
+
+        self._hist_count_label.setText(_("Showing {0} of {1} runs").format(len(self._hist_data), matching))
+        self._hist_more_btn.setEnabled(len(self._hist_data) < matching)
 
     def _restore_selected(self) -> None:
         items = self._hist_tree.selectedItems()
@@ -11,6 +11,7 @@ from utils.config import config
 from utils.globals import Globals, PromptMode, BlacklistPromptMode
 from utils.encryptor import encrypt_data_to_file, decrypt_data_from_file
 from utils.logging_setup import get_logger
+from utils.prompt_tag_stats import PromptTagStats
 from utils.runner_app_config import RunnerAppConfig
 
 logger = get_logger("app_info_cache")
@@ -21,6 +22,7 @@ class AppInfoCache:
     INFO_KEY = "info"
     HISTORY_KEY = "run_history"
     PROMPT_HISTORY_KEY = "prompt_history"  # New key for prompt tag history
+    PROMPT_TAG_STATS_KEY = "prompt_tag_stats"  # Tag frequency tables kept in step with prompt history
     MAX_HISTORY_ENTRIES = 1000
     MAX_PROMPT_HISTORY_ENTRIES = 5000  # Larger limit for prompt history
     DIRECTORIES_KEY = "directories"
@@ -36,6 +38,8 @@ class AppInfoCache:
             AppInfoCache.PROMPT_HISTORY_KEY: [],
             AppInfoCache.DIRECTORIES_KEY: {}
         }
+        # Built lazily from the persisted tables (or the prompt history) on first use.
+        self._prompt_tag_stats = None
         # Used to ensure post-init logic that depends on other subsystems
         # (like blacklist configuration) only runs once.
         self._post_init_done = False
@@ -58,6 +62,7 @@ class AppInfoCache:
                 AppInfoCache.HISTORY_PURGE_CACHE_KEY: {},
                 AppInfoCache.EDIT_HISTORY_KEY: {},
             }
+            self._prompt_tag_stats = None
 
     def store(self):
         """Persist cache to encrypted file. Returns True on success, False if encrypted store failed but JSON fallback succeeded. Raises on encoding or JSON fallback failure."""
@@ -70,6 +75,8 @@ class AppInfoCache:
                         self._purge_blacklisted_history()
                     finally:
                         self.purging_history = False
+                if self._prompt_tag_stats is not None:
+                    self._cache[AppInfoCache.PROMPT_TAG_STATS_KEY] = self._prompt_tag_stats.to_dict()
                 cache_data = json.dumps(self._cache).encode('utf-8')
             except Exception as e:
                 raise Exception(f"Error compiling application cache", e)
@@ -105,6 +112,7 @@ class AppInfoCache:
 
     def load(self):
         with self._lock:
+            self._prompt_tag_stats = None
             try:
                 if os.path.exists(self._json_loc):
                     logger.info(f"Detected JSON-format application cache, will attempt migration to encrypted store")
@@ -267,6 +275,29 @@ class AppInfoCache:
             self._cache[AppInfoCache.PROMPT_HISTORY_KEY] = []
         return self._cache[AppInfoCache.PROMPT_HISTORY_KEY]
 
+    def _get_prompt_tag_stats(self) -> PromptTagStats:
+        """Get tag frequency stats matching the prompt history, restoring the
+        persisted tables or rebuilding them if they are missing or stale.
+        Must be called from within a locked context."""
+        if self._prompt_tag_stats is not None:
+            return self._prompt_tag_stats
+        prompt_history = self._get_prompt_history()
+        stats = None
+        persisted = self._cache.get(AppInfoCache.PROMPT_TAG_STATS_KEY)
+        if persisted is not None:
+            try:
+                stats = PromptTagStats.from_dict(persisted)
+                if not stats.matches_history(prompt_history):
+                    logger.info("Prompt tag stats out of date with prompt history, rebuilding")
+                    stats = None
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                logger.warning(f"Invalid prompt tag stats in cache, rebuilding: {e}")
+                stats = None
+        if stats is None:
+            stats = PromptTagStats.from_history(prompt_history)
+        self._prompt_tag_stats = stats
+        return stats
+
     def _get_directory_info(self):
         """Get directory info dict. Must be called from within a locked context."""
         if AppInfoCache.DIRECTORIES_KEY not in self._cache:
@@ -364,8 +395,11 @@ class AppInfoCache:
             if len(prompt_history) > 0 and prompt_history[0] == entry:
                 logger.debug("Prompt history already contains this prompt at top")
                 return False
+            stats = self._get_prompt_tag_stats()
             prompt_history.insert(0, entry)
+            stats.add_entry(entry)
             while len(prompt_history) > AppInfoCache.MAX_PROMPT_HISTORY_ENTRIES:
+                stats.remove_entry(prompt_history[-1], len(prompt_history) - 1)
                 prompt_history.pop()
             return True
 
@@ -396,6 +430,11 @@ class AppInfoCache:
                 raise Exception("Invalid history index " + str(_idx))
             return history[_idx]
 
+    def get_all_history(self) -> list[dict]:
+        """Copy of the full run config history, newest first."""
+        with self._lock:
+            return list(self._get_history())
+
     def get_prompt_tags_by_frequency(self, weighted=False) -> dict[str, int]:
         """Get frequency of prompt tags from the prompt history.
         
@@ -406,37 +445,20 @@ class AppInfoCache:
             dict: Mapping of tags to their frequency counts
         """
         with self._lock:
-            prompt_history = self._get_prompt_history()
-            prompt_tags = {}
-            
-            for idx, entry in enumerate(prompt_history):
-                if not entry.get("positive_tags"):
-                    continue
-                    
-                # Calculate weight based on position if weighted
-                weight = 1.0
-                if weighted:
-                    # Newer entries get higher weights, decreasing exponentially
-                    weight = 1.0 / (1.0 + idx * 0.1)
-                    
-                tags = entry["positive_tags"].split(",")
-                for tag in tags:
-                    tag = tag.strip()
-                    if not tag:
-                        continue
-                        
-                    # Clean the tag by removing parentheses
-                    while tag.startswith('(') or tag.startswith('['):
-                        tag = tag[1:].strip()
-                    while tag.endswith(')') or tag.endswith(']'):
-                        tag = tag[:-1].strip()
-                        
-                    if tag not in prompt_tags:
-                        prompt_tags[tag] = weight
-                    else:
-                        prompt_tags[tag] += weight
-                        
-            return prompt_tags
+            return self._get_prompt_tag_stats().get_frequencies(weighted)
+
+    def get_top_prompt_tags(self, limit: int, weighted=False) -> list[tuple[str, float]]:
+        """Get the most frequent prompt tags from the prompt history.
+
+        Args:
+            limit: Maximum number of tags to return
+            weighted: If True, weight tags by recency (newer tags count more)
+
+        Returns:
+            list: (tag, frequency) pairs, most frequent first
+        """
+        with self._lock:
+            return self._get_prompt_tag_stats().get_top(limit, weighted)
 
     def get_recent_prompts(self, limit=10) -> list[dict]:
         """Get the most recent prompts from the prompt history.
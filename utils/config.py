@@ -33,6 +33,7 @@ class Config:
         self.foreground_color = None
         self.background_color = None
         self.comfyui_url = None
+        self.comfyui_nodes = []  # ComfyUI URLs to load balance across, see comfy_pool.py
         self.sd_webui_url = None
         self.sd_webui_save_path = "."
         self.forge_url = None
@@ -57,6 +58,7 @@ class Config:
         self.image_searcher_dir2 = None
         self.blacklist_prevent_execution = False  # Whether blacklisted items should prevent prompt execution
         self.purge_blacklisted_prompt_history = True  # Whether to purge blacklisted prompts from history on cache write
+        self.run_history_encrypted = False  # Whether the run history database is kept encrypted at rest
         self.save_last_prompt = False
 
         self.gen_order = ["control_nets", "ip_adapters", "resolutions", "models", "vaes", "loras"]
@@ -104,6 +106,7 @@ class Config:
                         "override_dictionary_append",
                         "blacklist_prevent_execution",
                         "purge_blacklisted_prompt_history",
+                        "run_history_encrypted",
         )
         self.set_values(str,
                         "locale",
@@ -122,6 +125,7 @@ class Config:
         self.set_values(list,
                         "gen_order",
                         "redo_parameters",
+                        "comfyui_nodes",
                         "model_presets",
                         "prompt_presets",
         )
@@ -0,0 +1,181 @@
+"""
+Cached directory enumeration for adapter and source prompt directories.
+
+Control net, IP adapter and source prompt directories are listed on every
+``Run.execute``.  :class:`DirectoryListingCache` lists them with
+``os.scandir`` (one syscall stream, no per-file ``stat`` on most platforms)
+and keeps the result keyed by the directory modification time, so repeat
+runs against an unchanged directory skip the scan entirely.  Recursive
+listings scan subdirectories on a thread pool, which mostly helps on
+network drives where each directory read is a round trip.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
+from typing import Iterable, Optional
+
+from utils.logging_setup import get_logger
+
+logger = get_logger("directory_listing")
+
+
+class _Listing:
+    __slots__ = ("dir_mtimes", "files", "racy")
+
+    def __init__(self, dir_mtimes: dict[str, int], files: list[str], racy: bool):
+        # mtime_ns of every directory read, used to validate the listing
+        self.dir_mtimes = dir_mtimes
+        self.files = files
+        # True if a directory was modified too close to the scan to trust its mtime
+        self.racy = racy
+
+
+class DirectoryListingCache:
+    """LRU cache of directory listings validated by directory mtimes.
+
+    A directory's mtime changes when entries are added, removed or renamed
+    in it, which is exactly what invalidates a listing.  Listings taken
+    within ``MTIME_RESOLUTION_SECONDS`` of a directory change are not reused,
+    since a second change in the same mtime tick would go unnoticed.
+    """
+
+    MAX_ENTRIES = 32
+    MTIME_RESOLUTION_SECONDS = 2.0
+    SCAN_WORKERS = 8
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._listings: OrderedDict[tuple, _Listing] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize_extensions(allowed_extensions: Optional[Iterable[str]]) -> Optional[frozenset[str]]:
+        if not allowed_extensions:
+            return None
+        return frozenset(ext.lower() for ext in allowed_extensions)
+
+    @staticmethod
+    def _has_allowed_extension(name: str, extensions: Optional[frozenset[str]]) -> bool:
+        if extensions is None:
+            return True
+        dot = name.rfind(".")
+        return dot > 0 and name[dot:].lower() in extensions
+
+    @staticmethod
+    def _scan_dir(dirpath: str, extensions: Optional[frozenset[str]], recursive: bool) -> tuple[list[str], list[str]]:
+        """Return (matching entries, subdirectories) of one directory.
+
+        Like glob, hidden entries are skipped and directories whose names
+        pass the filter are listed alongside files.
+        """
+        paths = []
+        subdirs = []
+        with os.scandir(dirpath) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                if DirectoryListingCache._has_allowed_extension(entry.name, extensions):
+                    paths.append(entry.path)
+                if recursive:
+                    try:
+                        if entry.is_dir():
+                            subdirs.append(entry.path)
+                    except OSError:
+                        pass
+        return paths, subdirs
+
+    @staticmethod
+    def _mtime_ns(dirpath: str) -> int:
+        return os.stat(dirpath).st_mtime_ns
+
+    def _is_valid(self, listing: _Listing) -> bool:
+        if listing.racy:
+            return False
+        try:
+            for dirpath, mtime_ns in listing.dir_mtimes.items():
+                if DirectoryListingCache._mtime_ns(dirpath) != mtime_ns:
+                    return False
+        except OSError:
+            return False
+        return True
+
+    def _scan(self, dirpath: str, recursive: bool, extensions: Optional[frozenset[str]]) -> _Listing:
+        scan_start = time.time()
+        dir_mtimes = {dirpath: DirectoryListingCache._mtime_ns(dirpath)}
+        files, pending = DirectoryListingCache._scan_dir(dirpath, extensions, recursive)
+        if pending:
+            with ThreadPoolExecutor(max_workers=DirectoryListingCache.SCAN_WORKERS) as executor:
+                while pending:
+                    level = pending
+                    pending = []
+                    mtimes = list(executor.map(self._safe_mtime_ns, level))
+                    results = list(executor.map(
+                        lambda d: self._safe_scan_dir(d, extensions), level))
+                    for subdir, mtime_ns, (sub_files, sub_dirs) in zip(level, mtimes, results):
+                        if mtime_ns is not None:
+                            dir_mtimes[subdir] = mtime_ns
+                        files.extend(sub_files)
+                        pending.extend(sub_dirs)
+        cutoff_ns = int((scan_start - DirectoryListingCache.MTIME_RESOLUTION_SECONDS) * 1e9)
+        racy = any(mtime_ns >= cutoff_ns for mtime_ns in dir_mtimes.values())
+        return _Listing(dir_mtimes, files, racy)
+
+    @staticmethod
+    def _safe_mtime_ns(dirpath: str) -> Optional[int]:
+        try:
+            return DirectoryListingCache._mtime_ns(dirpath)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _safe_scan_dir(dirpath: str, extensions: Optional[frozenset[str]]) -> tuple[list[str], list[str]]:
+        try:
+            return DirectoryListingCache._scan_dir(dirpath, extensions, True)
+        except OSError as e:
+            logger.warning(f"Failed to list directory {dirpath}: {e}")
+            return [], []
+
+    def list_files(self, dirpath: str, recursive: bool = False, allowed_extensions=None) -> list[str]:
+        """Return the sorted file paths in *dirpath*, filtered by extension.
+
+        The returned list is a copy and may be modified by the caller.
+        Raises NotADirectoryError / FileNotFoundError if *dirpath* cannot be listed.
+        """
+        extensions = DirectoryListingCache.normalize_extensions(allowed_extensions)
+        key = (os.path.abspath(dirpath), recursive, extensions)
+        with self._lock:
+            listing = self._listings.get(key)
+        if listing is not None and self._is_valid(listing):
+            with self._lock:
+                self.hits += 1
+                if key in self._listings:
+                    self._listings.move_to_end(key)
+            return list(listing.files)
+
+        listing = self._scan(dirpath, recursive, extensions)
+        listing.files.sort()
+        with self._lock:
+            self.misses += 1
+            self._listings[key] = listing
+            self._listings.move_to_end(key)
+            while len(self._listings) > self.max_entries:
+                self._listings.popitem(last=False)
+        return list(listing.files)
+
+    def invalidate(self, dirpath: Optional[str] = None) -> None:
+        """Drop cached listings for *dirpath*, or all listings if not given."""
+        with self._lock:
+            if dirpath is None:
+                self._listings.clear()
+                return
+            abs_dirpath = os.path.abspath(dirpath)
+            for key in [k for k in self._listings if k[0] == abs_dirpath]:
+                del self._listings[key]
+
+
+directory_listing_cache = DirectoryListingCache()
@@ -1,51 +1,352 @@
+from collections import deque
+from enum import Enum, IntEnum
+import hashlib
+import json
+import threading
+import time
+from typing import Callable, Optional
+
 from utils.config import config
 from utils.logging_setup import get_logger
-from utils.time_estimator import TimeEstimator
+from utils.time_estimator import JobEstimate, JobPlan, TimeEstimator, generation_timings
 from utils.translations import I18N
 
 _ = I18N._
 
 logger = get_logger("job_queue")
 
+class JobSource(Enum):
+    UI = "ui"
+    PRESET_SCHEDULE = "preset_schedule"
+    SERVER = "server"
+
+    def display(self) -> str:
+        return {
+            JobSource.UI: _("UI"),
+            JobSource.PRESET_SCHEDULE: _("Preset schedules"),
+            JobSource.SERVER: _("Server"),
+        }[self]
+
+
+class JobPriority(IntEnum):
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+    @staticmethod
+    def get(name):
+        for key, value in JobPriority.__members__.items():
+            if key == str(name).upper() or value == name:
+                return value
+        raise Exception(f"Not a valid job priority: {name}")
+
+
+_SOURCES = list(JobSource)  # Round-robin order at each priority
+
+
+class QueuedJob:
+    __slots__ = ("job", "source", "priority", "fingerprint", "enqueued_at", "plan")
+
+    def __init__(self, job, source: JobSource, priority: JobPriority, fingerprint: Optional[str], enqueued_at: float,
+                 plan: Optional[JobPlan] = None):
+        self.job = job
+        self.source = source
+        self.priority = priority
+        self.fingerprint = fingerprint
+        self.enqueued_at = enqueued_at
+        self.plan = plan
+
+
+def job_fingerprint(job) -> Optional[str]:
+    """Fingerprint of a job that defines one (e.g. RunConfig), or None to never deduplicate it."""
+    fingerprint = getattr(job, "fingerprint", None)
+    return fingerprint() if callable(fingerprint) else None
+
+
 class JobQueue:
+    """Pending jobs by priority, then round-robin across sources.
+
+    Each (priority, source) pair has its own deque, so add and take are O(1)
+    for the fixed set of priorities and sources. take() serves the highest
+    priority with work, rotating through the sources at that priority so a
+    burst from one source (e.g. server requests) cannot starve the others.
+
+    A job with a fingerprint is not queued again while an identical one is
+    pending. on_change, if set, is called after every change so the owner
+    can persist the queue; snapshot() and restore() convert it to and from
+    JSON-safe data.
+
+    Each entry may carry a JobPlan, captured when it is queued; estimate()
+    sums the per-job predictions for the pending entries.
+    """
     JOB_QUEUE_SD_RUNS_KEY = "Stable Diffusion Runs"
     JOB_QUEUE_PRESETS_KEY = "Preset Schedules"
 
     def __init__(self, name="JobQueue", max_size=50):
         self.name = name
         self.max_size = max_size
-        self.pending_jobs = []
         self.job_running = False
         self.paused = False
+        self.on_change: Optional[Callable[["JobQueue"], None]] = None
+        self._lock = threading.RLock()
+        self._lanes = {priority: {source: deque() for source in JobSource} for priority in JobPriority}
+        self._next_source = {priority: 0 for priority in JobPriority}
+        self._fingerprints: dict[str, QueuedJob] = {}
+        self._count = 0
+        self._waited = {source: [0, 0.0] for source in JobSource}  # Jobs taken and their total wait
+
+    # ------------------------------------------------------------------
+    # Queue operations
+    # ------------------------------------------------------------------
+
+    def _changed(self) -> None:
+        if self.on_change is not None:
+            try:
+                self.on_change(self)
+            except Exception as e:
+                logger.warning(f"JobQueue {self.name} - failed to persist queue: {e}")
+
+    def _push(self, entry: QueuedJob, front: bool = False) -> None:
+        # Caller holds lock
+        lane = self._lanes[entry.priority][entry.source]
+        if front:
+            lane.appendleft(entry)
+        else:
+            lane.append(entry)
+        if entry.fingerprint is not None:
+            self._fingerprints[entry.fingerprint] = entry
+        self._count += 1
 
     def has_pending(self):
-        return self.job_running or len(self.pending_jobs) > 0
+        return self.job_running or self._count > 0
 
-    def take(self):
-        if len(self.pending_jobs) == 0:
-            return None
-        job_args = self.pending_jobs[0]
-        del self.pending_jobs[0]
-        return job_args
+    def pending_count(self) -> int:
+        return self._count
+
+    def plan_for(self, job_args) -> Optional[JobPlan]:
+        """The plan to estimate a newly queued job with, if add() was not given one."""
+        return getattr(job_args, "plan", None)
 
-    def add(self, job_args):
-        if len(self.pending_jobs) > self.max_size:
-            raise Exception(f"Reached limit of pending runs: {self.max_size} - wait until current run has completed.")
-        self.pending_jobs.append(job_args)
+    def add(self, job_args, source: JobSource = JobSource.UI, priority: JobPriority = JobPriority.NORMAL,
+            plan: Optional[JobPlan] = None) -> bool:
+        """Queue a job. Returns False if an identical job is already pending."""
+        fingerprint = job_fingerprint(job_args)
+        if plan is None:
+            plan = self.plan_for(job_args)
+        with self._lock:
+            if self._count > self.max_size:
+                raise Exception(f"Reached limit of pending runs: {self.max_size} - wait until current run has completed.")
+            if fingerprint is not None and fingerprint in self._fingerprints:
+                logger.info(f"JobQueue {self.name} - skipped duplicate of a pending job")
+                return False
+            self._push(QueuedJob(job_args, source, priority, fingerprint, time.time(), plan))
         if config.debug:
             print(f"JobQueue {self.name} - Added pending job: {job_args}")
+        self._changed()
+        return True
+
+    def _pop_next(self) -> Optional[QueuedJob]:
+        # Caller holds lock
+        for priority in JobPriority:
+            start = self._next_source[priority]
+            for offset in range(len(_SOURCES)):
+                index = (start + offset) % len(_SOURCES)
+                lane = self._lanes[priority][_SOURCES[index]]
+                if lane:
+                    self._next_source[priority] = (index + 1) % len(_SOURCES)
+                    return lane.popleft()
+        return None
+
+    def take_entry(self) -> Optional[QueuedJob]:
+        with self._lock:
+            entry = self._pop_next()
+            if entry is None:
+                return None
+            self._count -= 1
+            if entry.fingerprint is not None:
+                self._fingerprints.pop(entry.fingerprint, None)
+            waited = self._waited[entry.source]
+            waited[0] += 1
+            waited[1] += max(0.0, time.time() - entry.enqueued_at)
+        self._changed()
+        return entry
+
+    def take(self):
+        entry = self.take_entry()
+        return entry.job if entry is not None else None
+
+    def requeue(self, entry: QueuedJob) -> None:
+        """Put a taken job back at the front of its lane, e.g. when the queue was paused meanwhile."""
+        with self._lock:
+            self._push(entry, front=True)
+            self._next_source[entry.priority] = _SOURCES.index(entry.source)
+        self._changed()
+
+    def job_updated(self, job_args, previous_total: Optional[int] = None) -> None:
+        """Refresh the fingerprint and plan of a pending job edited in place.
+
+        A plan counts every iteration of the job, adapter iterations included,
+        so pass the job's ``total`` from before the edit if it may have changed.
+        """
+        with self._lock:
+            for entry in self._entries():
+                if entry.job is job_args:
+                    if entry.fingerprint is not None:
+                        self._fingerprints.pop(entry.fingerprint, None)
+                    entry.fingerprint = job_fingerprint(job_args)
+                    if entry.fingerprint is not None:
+                        self._fingerprints[entry.fingerprint] = entry
+                    if entry.plan is not None:
+                        entry.plan = JobQueue._replan(entry.plan, job_args, previous_total)
+                        if getattr(job_args, "plan", None) is not None:
+                            job_args.plan = entry.plan
+        self._changed()
+
+    @staticmethod
+    def _replan(plan: JobPlan, job_args, previous_total: Optional[int]) -> JobPlan:
+        """The plan of an edited job, scaled to its current n_latents and total."""
+        total = plan.total
+        new_total = getattr(job_args, "total", None)
+        if previous_total and new_total and new_total != previous_total:
+            iterations_per_run = max(1, round(plan.total / previous_total))
+            total = int(new_total) * iterations_per_run
+        return plan.remaining(total, n_latents=getattr(job_args, "n_latents", None))
 
     def cancel(self):
-        self.pending_jobs = []
-        self.job_running = False
+        with self._lock:
+            for lanes in self._lanes.values():
+                for lane in lanes.values():
+                    lane.clear()
+            self._fingerprints.clear()
+            self._count = 0
+            self.job_running = False
+        self._changed()
+
+    # ------------------------------------------------------------------
+    # Inspection
+    # ------------------------------------------------------------------
+
+    def _entries(self) -> list[QueuedJob]:
+        """Pending entries in the order take() would return them."""
+        with self._lock:
+            entries = []
+            for priority in JobPriority:
+                lanes = [list(self._lanes[priority][source]) for source in _SOURCES]
+                positions = [0] * len(_SOURCES)
+                index = self._next_source[priority]
+                remaining = sum(len(lane) for lane in lanes)
+                while remaining:
+                    if positions[index] < len(lanes[index]):
+                        entries.append(lanes[index][positions[index]])
+                        positions[index] += 1
+                        remaining -= 1
+                    index = (index + 1) % len(_SOURCES)
+            return entries
+
+    @property
+    def pending_jobs(self) -> list:
+        """Pending jobs in dispatch order. A snapshot: change the queue through its methods."""
+        return [entry.job for entry in self._entries()]
+
+    def stats(self) -> dict:
+        """Per source: pending depth, oldest pending wait and mean wait of jobs taken so far, in seconds."""
+        now = time.time()
+        with self._lock:
+            stats = {}
+            for source in JobSource:
+                pending = [entry for lanes in self._lanes.values() for entry in lanes[source]]
+                taken, total_wait = self._waited[source]
+                stats[source] = {
+                    "depth": len(pending),
+                    "oldest_wait": max((now - entry.enqueued_at for entry in pending), default=0.0),
+                    "mean_wait": total_wait / taken if taken else 0.0,
+                    "taken": taken,
+                }
+            return stats
+
+    def stats_text(self) -> str:
+        parts = []
+        for source, source_stats in self.stats().items():
+            if source_stats["depth"] == 0 and source_stats["taken"] == 0:
+                continue
+            parts.append(_("{0}: {1} pending, oldest {2}, mean wait {3}").format(
+                source.display(), source_stats["depth"],
+                TimeEstimator.format_time(source_stats["oldest_wait"]),
+                TimeEstimator.format_time(source_stats["mean_wait"])))
+        return "; ".join(parts)
 
     def pending_text(self):
-        if len(self.pending_jobs) == 0:
+        if self._count == 0:
             return ""
         if self.name == JobQueue.JOB_QUEUE_SD_RUNS_KEY:
-            return _(" (Pending runs: {0})").format(len(self.pending_jobs))
+            return _(" (Pending runs: {0})").format(self._count)
         elif self.name == JobQueue.JOB_QUEUE_PRESETS_KEY:
-            return _("Pending schedules: {0}").format(len(self.pending_jobs))
+            return _("Pending schedules: {0}").format(self._count)
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def serialize_job(self, job_args):
+        return job_args
+
+    def deserialize_job(self, data):
+        return data
+
+    def snapshot(self) -> list[dict]:
+        data = []
+        for entry in self._entries():
+            try:
+                data.append({
+                    "job": self.serialize_job(entry.job),
+                    "source": entry.source.name,
+                    "priority": entry.priority.name,
+                    "enqueued_at": entry.enqueued_at,
+                    "plan": entry.plan.to_dict() if entry.plan is not None else None,
+                })
+            except Exception as e:
+                logger.warning(f"JobQueue {self.name} - failed to serialize pending job: {e}")
+        return data
+
+    def restore(self, data: list[dict]) -> int:
+        """Queue jobs from snapshot() behind any pending ones, keeping their order and wait times."""
+        restored = 0
+        with self._lock:
+            for item in data:
+                try:
+                    job_args = self.deserialize_job(item["job"])
+                    fingerprint = job_fingerprint(job_args)
+                    if fingerprint is not None and fingerprint in self._fingerprints:
+                        continue
+                    plan = JobPlan.from_dict(item["plan"]) if item.get("plan") else getattr(job_args, "plan", None)
+                    self._push(QueuedJob(job_args, JobSource[item.get("source", JobSource.UI.name)],
+                                         JobPriority[item.get("priority", JobPriority.NORMAL.name)],
+                                         fingerprint, float(item.get("enqueued_at") or time.time()), plan))
+                    restored += 1
+                except Exception as e:
+                    logger.warning(f"JobQueue {self.name} - failed to restore pending job: {e}")
+        if restored:
+            self._changed()
+        return restored
+
+    def estimate(self, gen_config=None) -> JobEstimate:
+        """
+        Predicted time for all pending jobs, with a confidence range.
+
+        Jobs with a plan are predicted from measured generation timings;
+        others fall back to estimate_job().
+        """
+        total = JobEstimate()
+        for entry in self._entries():
+            if entry.plan is not None:
+                total += generation_timings.predict(entry.plan)
+            else:
+                total += self.estimate_job(entry.job, gen_config)
+        return total
+
+    def estimate_job(self, job_args, gen_config=None) -> JobEstimate:
+        """Estimate a pending job that has no plan. Must be overridden by queues that can hold such jobs."""
+        raise NotImplementedError("estimate_job() must be implemented by specific queue implementations")
 
     def estimate_time(self, gen_config=None) -> int:
         """
@@ -69,76 +370,87 @@ class SDRunsQueue(JobQueue):
     
     def __init__(self, max_size=50):
         super().__init__(JobQueue.JOB_QUEUE_SD_RUNS_KEY, max_size)
+
+    def serialize_job(self, job_args):
+        return job_args.to_dict()
+
+    def deserialize_job(self, data):
+        from sd_runner.run_config import RunConfig
+        return RunConfig.from_dict(data)
     
+    def estimate_job(self, job_args, gen_config=None) -> JobEstimate:
+        seconds = job_args.estimate_time(gen_config)
+        return JobEstimate(seconds, seconds, seconds)
+
     def estimate_time(self, gen_config=None) -> int:
         """
         Estimate the total time in seconds for all pending SD runs.
         
         Args:
-            gen_config: Optional GenConfig instance for calculating total jobs
+            gen_config: Optional GenConfig instance, only used for runs queued without a plan
             
         Returns:
             Estimated time in seconds
         """
-        total_time = 0
-        logger.debug(f"SDRunsQueue.estimate_time - pending jobs: {len(self.pending_jobs)}")
-        for run_config in self.pending_jobs:
-            job_time = run_config.estimate_time(gen_config)
-            total_time += job_time
-            logger.debug(f"SDRunsQueue.estimate_time - job time: {job_time}s, total so far: {total_time}s")
-        return total_time
+        estimate = self.estimate(gen_config)
+        logger.debug(f"SDRunsQueue.estimate_time - pending jobs: {self.pending_count()}, estimate: {estimate}")
+        return int(estimate.seconds)
 
 
 class PresetSchedulesQueue(JobQueue):
-    """Queue for managing preset schedules."""
+    """Queue for managing preset schedules.
+
+    Each pending entry reruns the current schedule, so its plan is the run
+    config at the time it was queued with the schedule's total generations.
+    """
     
     def __init__(self, max_size=50, get_run_config_callback=None, get_current_schedule_callback=None):
         super().__init__(JobQueue.JOB_QUEUE_PRESETS_KEY, max_size)
         self.get_run_config_callback = get_run_config_callback
         self.get_current_schedule_callback = get_current_schedule_callback
+
+    def plan_for(self, job_args) -> Optional[JobPlan]:
+        if not self.get_run_config_callback or not self.get_current_schedule_callback:
+            return None
+        try:
+            schedule = self.get_current_schedule_callback()
+            if schedule is None:
+                return None
+            run_config = self.get_run_config_callback()
+            return run_config.build_plan(total=schedule.total_generations(run_config.total))
+        except Exception as e:
+            logger.warning(f"PresetSchedulesQueue - failed to plan pending schedule {job_args}: {e}")
+            return None
+
+    def estimate_job(self, job_args, gen_config=None) -> JobEstimate:
+        if not self.get_run_config_callback or not self.get_current_schedule_callback:
+            return JobEstimate()
+        try:
+            schedule = self.get_current_schedule_callback()
+            if schedule is None:
+                return JobEstimate()
+            run_config = self.get_run_config_callback()
+            total_generations = schedule.total_generations(run_config.total)
+            total_jobs = gen_config.maximum_gens_per_latent() if gen_config else 1
+            seconds = TimeEstimator.estimate_queue_time(total_jobs * total_generations, run_config.n_latents)
+            return JobEstimate(seconds, seconds, seconds)
+        except Exception as e:
+            logger.warning(f"Error estimating time for schedule {job_args}: {e}")
+            return JobEstimate()
     
     def estimate_time(self, gen_config=None) -> int:
         """
         Estimate the total time in seconds for all pending preset schedules.
         
         Args:
-            gen_config: Optional GenConfig instance for calculating total jobs
+            gen_config: Optional GenConfig instance, only used for schedules queued without a plan
             
         Returns:
             Estimated time in seconds
         """
-        if not self.get_run_config_callback or not self.get_current_schedule_callback:
-            return 0
-            
-        total_time = 0
-        run_config = self.get_run_config_callback()
-        logger.debug(f"PresetSchedulesQueue.estimate_time - pending schedules: {len(self.pending_jobs)}")
-        
-        for schedule_args in self.pending_jobs:
-            try:
-                schedule = self.get_current_schedule_callback()
-                if schedule is None:
-                    continue
-                    
-                # Get total generations for this schedule
-                total_generations = schedule.total_generations(run_config.total)
-                logger.debug(f"PresetSchedulesQueue.estimate_time - schedule total_generations: {total_generations}")
-                
-                # Calculate total jobs by dividing maximum_gens by n_latents
-                total_jobs = gen_config.maximum_gens_per_latent() if gen_config else 1
-                logger.debug(f"PresetSchedulesQueue.estimate_time - total_jobs: {total_jobs}, n_latents: {run_config.n_latents}")
-                
-                # Get time estimate for all jobs
-                schedule_time = TimeEstimator.estimate_queue_time(total_jobs * total_generations, run_config.n_latents)
-                total_time += schedule_time
-                print(f"PresetSchedulesQueue.estimate_time - schedule time: {schedule_time}s, total so far: {total_time}s")
-                
-            except Exception as e:
-                print(f"Error estimating time for schedule: {schedule_args}")
-                print(f"Error details: {str(e)}")
-                continue
-
-        return total_time
+        estimate = self.estimate(gen_config)
+        logger.debug(f"PresetSchedulesQueue.estimate_time - pending schedules: {self.pending_count()}, estimate: {estimate}")
+        return int(estimate.seconds)
 
 
 class ServerStagingQueue:
@@ -147,27 +459,67 @@ class ServerStagingQueue:
     Stores raw (workflow_type, args) pairs so they can be replayed through
     server_run_callback when the main queue drains.  The limit is intentionally
     high — the objects stored here are lightweight dicts, not full Run objects.
+    A request identical to one already staged is not staged again.
     """
 
     MAX_SIZE = 1000
 
     def __init__(self):
-        self._requests: list[tuple] = []
-
-    def add(self, workflow_type, args: dict) -> int:
-        """Stage a request. Returns the 1-based queue position."""
-        if len(self._requests) >= self.MAX_SIZE:
-            raise Exception(
-                f"Server staging queue full ({self.MAX_SIZE} pending requests) - request rejected"
-            )
-        self._requests.append((workflow_type, args))
-        return len(self._requests)
+        self._requests: deque = deque()  # (workflow_type, args, fingerprint, staged_at)
+        self._fingerprints: set[str] = set()
+        self._lock = threading.Lock()
+        self.on_change: Optional[Callable[["ServerStagingQueue"], None]] = None
+
+    @staticmethod
+    def fingerprint(workflow_type, args: dict) -> str:
+        name = workflow_type.name if hasattr(workflow_type, "name") else str(workflow_type)
+        payload = json.dumps([name, args], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _changed(self) -> None:
+        if self.on_change is not None:
+            try:
+                self.on_change(self)
+            except Exception as e:
+                logger.warning(f"Failed to persist server staging queue: {e}")
+
+    def add(self, workflow_type, args: dict, staged_at: Optional[float] = None) -> int:
+        """Stage a request. Returns the 1-based queue position, that of the identical staged request if any."""
+        fingerprint = self.fingerprint(workflow_type, args)
+        with self._lock:
+            if fingerprint in self._fingerprints:
+                for position, request in enumerate(self._requests, start=1):
+                    if request[2] == fingerprint:
+                        logger.info(f"Server request already staged at position {position}")
+                        return position
+            if len(self._requests) >= self.MAX_SIZE:
+                raise Exception(
+                    f"Server staging queue full ({self.MAX_SIZE} pending requests) - request rejected"
+                )
+            self._requests.append((workflow_type, args, fingerprint, staged_at or time.time()))
+            self._fingerprints.add(fingerprint)
+            position = len(self._requests)
+        self._changed()
+        return position
 
     def take(self):
         """Pop and return the next (workflow_type, args) tuple, or None if empty."""
-        if not self._requests:
-            return None
-        return self._requests.pop(0)
+        with self._lock:
+            if not self._requests:
+                return None
+            workflow_type, args, fingerprint, _staged_at = self._requests.popleft()
+            self._fingerprints.discard(fingerprint)
+        self._changed()
+        return workflow_type, args
+
+    def pending_requests(self) -> list[tuple]:
+        """Snapshot of the staged (workflow_type, args) pairs, oldest first."""
+        with self._lock:
+            return [(workflow_type, args) for workflow_type, args, _fingerprint, _staged_at in self._requests]
+
+    def oldest_wait(self) -> float:
+        with self._lock:
+            return time.time() - self._requests[0][3] if self._requests else 0.0
 
     def has_pending(self) -> bool:
         return len(self._requests) > 0
@@ -176,10 +528,21 @@ class ServerStagingQueue:
         return len(self._requests)
 
     def cancel(self) -> None:
-        self._requests = []
+        with self._lock:
+            self._requests.clear()
+            self._fingerprints.clear()
+        self._changed()
 
     def pending_text(self) -> str:
         n = self.pending_count()
         if n == 0:
             return ""
-        return _("Server staging: {0} pending").format(n)
\ No newline at end of file
+        return _("Server staging: {0} pending").format(n)
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            return [{
+                "workflow_type": workflow_type.name if hasattr(workflow_type, "name") else str(workflow_type),
+                "args": args,
+                "staged_at": staged_at,
+            } for workflow_type, args, _fingerprint, staged_at in self._requests]
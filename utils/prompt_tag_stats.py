@@ -0,0 +1,149 @@
+import hashlib
+import heapq
+import math
+
+
+class PromptTagStats:
+    """Incrementally maintained prompt tag frequency tables.
+
+    Kept in step with the prompt history in AppInfoCache: ``add_entry`` is
+    called for every entry inserted at the front of the history and
+    ``remove_entry`` for every entry dropped from the back, so frequency
+    queries never have to walk the history.
+
+    Every entry gets a sequence number, newest highest. The recency-weighted
+    table decays a tag occurrence by ``DECAY`` per newer entry. To avoid
+    touching every tag on insert, weighted sums are stored relative to
+    ``base_seq`` and scaled to the newest entry at query time.
+    """
+    VERSION = 1
+    # Weight halves every 10 entries, like the previous 1 / (1 + 0.1 * idx) weighting.
+    DECAY = 0.5 ** 0.1
+    # Rescale stored weighted sums before DECAY ** -(head_seq - base_seq) gets too large.
+    RESCALE_INTERVAL = 500
+
+    def __init__(self):
+        self.head_seq = -1
+        self.base_seq = 0
+        self.entry_count = 0
+        self.newest_key = None
+        self.counts: dict[str, int] = {}
+        self.weighted: dict[str, float] = {}
+
+    @staticmethod
+    def split_tags(positive_tags: str) -> list[str]:
+        """Split a prompt into cleaned tags, stripping outer parentheses and brackets."""
+        tags = []
+        for tag in positive_tags.split(","):
+            tag = tag.strip()
+            if not tag:
+                continue
+            while tag.startswith('(') or tag.startswith('['):
+                tag = tag[1:].strip()
+            while tag.endswith(')') or tag.endswith(']'):
+                tag = tag[:-1].strip()
+            tags.append(tag)
+        return tags
+
+    @staticmethod
+    def entry_key(entry: dict) -> str:
+        """Compact identity of a prompt history entry, used to validate persisted stats."""
+        content = f"{entry.get('positive_tags', '')}\x1f{entry.get('timestamp', '')}"
+        return hashlib.md5(content.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def from_history(cls, prompt_history: list[dict]) -> "PromptTagStats":
+        """Build stats from a prompt history list ordered newest first."""
+        stats = cls()
+        for entry in reversed(prompt_history):
+            stats.add_entry(entry)
+        return stats
+
+    def matches_history(self, prompt_history: list[dict]) -> bool:
+        """Check whether these stats were built from *prompt_history*."""
+        if self.entry_count != len(prompt_history):
+            return False
+        if not prompt_history:
+            return self.newest_key is None
+        return self.newest_key == PromptTagStats.entry_key(prompt_history[0])
+
+    def add_entry(self, entry: dict) -> None:
+        """Count a new entry that became the newest in the history."""
+        self.head_seq += 1
+        self.entry_count += 1
+        self.newest_key = PromptTagStats.entry_key(entry)
+        if self.head_seq - self.base_seq >= PromptTagStats.RESCALE_INTERVAL:
+            self._rescale()
+        positive_tags = entry.get("positive_tags")
+        if not positive_tags:
+            return
+        weight = PromptTagStats.DECAY ** (self.base_seq - self.head_seq)
+        for tag in PromptTagStats.split_tags(positive_tags):
+            self.counts[tag] = self.counts.get(tag, 0) + 1
+            self.weighted[tag] = self.weighted.get(tag, 0.0) + weight
+
+    def remove_entry(self, entry: dict, index: int) -> None:
+        """Uncount an entry dropped from the history at position *index* (0 = newest)."""
+        self.entry_count -= 1
+        if self.entry_count == 0:
+            self.newest_key = None
+        positive_tags = entry.get("positive_tags")
+        if not positive_tags:
+            return
+        weight = PromptTagStats.DECAY ** (self.base_seq - (self.head_seq - index))
+        for tag in PromptTagStats.split_tags(positive_tags):
+            count = self.counts.get(tag, 0) - 1
+            if count <= 0:
+                self.counts.pop(tag, None)
+                self.weighted.pop(tag, None)
+            else:
+                self.counts[tag] = count
+                self.weighted[tag] = self.weighted.get(tag, 0.0) - weight
+
+    def _rescale(self) -> None:
+        factor = PromptTagStats.DECAY ** (self.head_seq - self.base_seq)
+        for tag in self.weighted:
+            self.weighted[tag] *= factor
+        self.base_seq = self.head_seq
+
+    def get_frequencies(self, weighted: bool = False) -> dict:
+        """Return tag -> count, or tag -> recency-weighted count (newest entry weighs 1.0)."""
+        if not weighted:
+            return dict(self.counts)
+        scale = PromptTagStats.DECAY ** (self.head_seq - self.base_seq)
+        return {tag: value * scale for tag, value in self.weighted.items()}
+
+    def get_top(self, limit: int, weighted: bool = False) -> list[tuple[str, float]]:
+        """Return the *limit* most frequent (tag, frequency) pairs, most frequent first."""
+        if weighted:
+            scale = PromptTagStats.DECAY ** (self.head_seq - self.base_seq)
+            top = heapq.nlargest(limit, self.weighted.items(), key=lambda item: item[1])
+            return [(tag, value * scale) for tag, value in top]
+        return heapq.nlargest(limit, self.counts.items(), key=lambda item: item[1])
+
+    def to_dict(self) -> dict:
+        return {
+            "version": PromptTagStats.VERSION,
+            "head_seq": self.head_seq,
+            "base_seq": self.base_seq,
+            "entry_count": self.entry_count,
+            "newest_key": self.newest_key,
+            "counts": self.counts,
+            "weighted": self.weighted,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PromptTagStats":
+        """Restore persisted stats. Raises ValueError if the data is unusable."""
+        if not isinstance(data, dict) or data.get("version") != PromptTagStats.VERSION:
+            raise ValueError("Unsupported prompt tag stats data")
+        stats = cls()
+        stats.head_seq = int(data["head_seq"])
+        stats.base_seq = int(data["base_seq"])
+        stats.entry_count = int(data["entry_count"])
+        stats.newest_key = data.get("newest_key")
+        stats.counts = {str(tag): int(count) for tag, count in data["counts"].items()}
+        stats.weighted = {str(tag): float(value) for tag, value in data["weighted"].items()}
+        if any(math.isinf(value) or math.isnan(value) for value in stats.weighted.values()):
+            raise ValueError("Invalid weighted prompt tag frequencies")
+        return stats
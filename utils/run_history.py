@@ -0,0 +1,490 @@
+"""
+Persistent, queryable run history.
+
+Each run is recorded in an embedded SQLite database with its full config,
+start and finish times, outcome and the paths of the images it produced,
+so history can be filtered, paged and aggregated without loading all of it.
+AppInfoCache still keeps the recent configs used for sidebar navigation.
+
+Model and LoRA tags are also stored one per row in run_tags, indexed, so a
+filter on a single tag or an aggregate per tag does not scan every config.
+An image counts as kept while its file still exists; refresh_kept() updates
+that flag before kept-image aggregates.
+
+With config.run_history_encrypted the database is held in memory and written
+to disk encrypted with the same keyring-backed encryptor as the app info
+cache, after each finished run and on store(). Otherwise it is a plain
+database file committed on every write. Switching the setting migrates the
+existing history on next open.
+"""
+
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+from enum import Enum
+from typing import Iterable, Optional
+
+from utils.config import config
+from utils.encryptor import encrypt_data_to_file, decrypt_data_from_file
+from utils.globals import Globals
+from utils.logging_setup import get_logger
+
+logger = get_logger("run_history")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    duration REAL,
+    outcome TEXT NOT NULL,
+    error TEXT,
+    software_type TEXT,
+    workflow_type TEXT,
+    model_tags TEXT,
+    lora_tags TEXT,
+    positive_tags TEXT,
+    n_latents INTEGER,
+    total INTEGER,
+    config TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+CREATE INDEX IF NOT EXISTS runs_workflow ON runs (workflow_type, started_at);
+CREATE INDEX IF NOT EXISTS runs_outcome ON runs (outcome, started_at);
+CREATE TABLE IF NOT EXISTS run_tags (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (run_id, kind, tag)
+);
+CREATE INDEX IF NOT EXISTS run_tags_tag ON run_tags (kind, tag);
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    kept INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS images_run ON images (run_id);
+CREATE INDEX IF NOT EXISTS images_path ON images (path);
+"""
+
+
+class RunOutcome(Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+    FAILED = "failed"
+    IMPORTED = "imported"  # Migrated from the app info cache; outcome and timings unknown
+
+
+def _split_tags(value) -> list[str]:
+    tags = []
+    for tag in str(value or "").split(","):
+        tag = tag.strip()
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def _to_epoch(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.timestamp()
+    if isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time()).timestamp()
+    return float(value)
+
+
+def _parse_timestamp(value) -> Optional[float]:
+    try:
+        return datetime.datetime.fromisoformat(str(value)).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+# RunnerAppConfig attribute -> RunConfig attribute, as in RunnerAppConfig.set_from_run_config
+_RUN_CONFIG_FIELDS = (
+    ("software_type", "software_type"),
+    ("workflow_type", "workflow_tag"),
+    ("resolutions", "res_tags"),
+    ("resolution_group", "resolution_group"),
+    ("seed", "seed"),
+    ("steps", "steps"),
+    ("cfg", "cfg"),
+    ("denoise", "denoise"),
+    ("model_tags", "model_tags"),
+    ("lora_tags", "lora_tags"),
+    ("positive_tags", "positive_prompt"),
+    ("negative_tags", "negative_prompt"),
+    ("control_net_file", "control_nets"),
+    ("ip_adapter_file", "ip_adapters"),
+    ("source_prompt_file", "source_prompts"),
+    ("source_prompt_add_user_prompt", "source_prompts_add_user_prompt"),
+    ("sampler", "sampler"),
+    ("scheduler", "scheduler"),
+    ("n_latents", "n_latents"),
+    ("total", "total"),
+    ("batch_limit", "batch_limit"),
+    ("auto_run", "auto_run"),
+    ("override_resolution", "override_resolution"),
+    ("inpainting", "inpainting"),
+    ("continuous_seed_variation", "continuous_seed_variation"),
+    ("dimension_variation", "dimension_variation"),
+    ("prompter_config", "prompter_config"),
+)
+
+
+def config_from_run(run_config) -> dict:
+    """The RunnerAppConfig dict for a RunConfig, so a recorded run can be restored to the sidebar.
+
+    Fields the RunConfig leaves unset keep their RunnerAppConfig defaults.
+    """
+    from utils.runner_app_config import RunnerAppConfig
+    app_config = RunnerAppConfig()
+    for name, attr in _RUN_CONFIG_FIELDS:
+        value = getattr(run_config, attr, None)
+        if value is not None:
+            setattr(app_config, name, value)
+    start_time = getattr(run_config, "start_time", None)
+    if start_time is not None:
+        app_config.timestamp = datetime.datetime.fromtimestamp(time.mktime(start_time)).isoformat()
+    return json.loads(json.dumps(app_config.to_dict(), default=str))
+
+
+class RunHistory:
+    DB_FILENAME = "run_history.db"
+    ENCRYPTED_FILENAME = "run_history.enc"
+    SCHEMA_VERSION = 1
+    LEGACY_IMPORTED_KEY = "legacy_history_imported"
+    TOP_GROUPINGS = ("combo", "model", "lora")
+
+    def __init__(self, directory: Optional[str] = None, encrypted: Optional[bool] = None):
+        self._directory = directory
+        self._encrypted = encrypted
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._dirty = False
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    @property
+    def directory(self) -> str:
+        if self._directory:
+            return self._directory
+        # Resolved on first use so tests and tools can redirect the cache dir
+        override = os.environ.get("SD_RUNNER_CACHE_DIR")
+        return override or os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+
+    @property
+    def encrypted(self) -> bool:
+        return config.run_history_encrypted if self._encrypted is None else self._encrypted
+
+    @property
+    def db_path(self) -> str:
+        return os.path.join(self.directory, RunHistory.DB_FILENAME)
+
+    @property
+    def encrypted_path(self) -> str:
+        return os.path.join(self.directory, RunHistory.ENCRYPTED_FILENAME)
+
+    @staticmethod
+    def _decrypt_into(conn: sqlite3.Connection, path: str) -> None:
+        conn.deserialize(decrypt_data_from_file(path, Globals.SERVICE_NAME, Globals.APP_IDENTIFIER))
+
+    @staticmethod
+    def _remove_db_files(path: str) -> None:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    def _open(self) -> sqlite3.Connection:
+        # Caller holds lock
+        os.makedirs(self.directory, exist_ok=True)
+        migrate_from = None
+        if self.encrypted:
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            if os.path.exists(self.encrypted_path):
+                self._decrypt_into(conn, self.encrypted_path)
+            elif os.path.exists(self.db_path):
+                logger.info(f"Migrating run history from {self.db_path} to encrypted store")
+                source = sqlite3.connect(self.db_path)
+                # A WAL database image cannot be reopened from memory
+                source.execute("PRAGMA journal_mode=DELETE")
+                source.backup(conn)
+                source.close()
+                migrate_from = self.db_path
+        else:
+            if not os.path.exists(self.db_path) and os.path.exists(self.encrypted_path):
+                logger.info(f"Migrating run history from {self.encrypted_path} to {self.db_path}")
+                memory = sqlite3.connect(":memory:")
+                self._decrypt_into(memory, self.encrypted_path)
+                target = sqlite3.connect(self.db_path)
+                memory.backup(target)
+                target.close()
+                memory.close()
+                os.remove(self.encrypted_path)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(_SCHEMA)
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)",
+                     (str(RunHistory.SCHEMA_VERSION),))
+        conn.commit()
+        self._conn = conn
+        if migrate_from is not None:
+            self._dirty = True
+            self._persist()
+            self._remove_db_files(migrate_from)
+        return conn
+
+    def _connection(self) -> sqlite3.Connection:
+        # Caller holds lock
+        return self._conn if self._conn is not None else self._open()
+
+    def _commit(self) -> None:
+        # Caller holds lock
+        self._conn.commit()
+        self._dirty = True
+
+    def _persist(self) -> None:
+        # Caller holds lock
+        if not self.encrypted or not self._dirty or self._conn is None:
+            return
+        encrypt_data_to_file(self._conn.serialize(), Globals.SERVICE_NAME, Globals.APP_IDENTIFIER,
+                             self.encrypted_path)
+        self._dirty = False
+
+    def store(self) -> None:
+        """Write an encrypted store to disk if it changed. Plain stores are committed on every write."""
+        with self._lock:
+            self._persist()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._persist()
+            finally:
+                self._conn.close()
+                self._conn = None
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def _insert_run(self, conn: sqlite3.Connection, config_dict: dict, started_at: float,
+                    outcome: RunOutcome) -> int:
+        model_tags = _split_tags(config_dict.get("model_tags"))
+        lora_tags = _split_tags(config_dict.get("lora_tags"))
+        cursor = conn.execute(
+            "INSERT INTO runs (started_at, outcome, software_type, workflow_type, model_tags, lora_tags,"
+            " positive_tags, n_latents, total, config) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (started_at, outcome.value,
+             str(config_dict.get("software_type") or ""), str(config_dict.get("workflow_type") or ""),
+             ", ".join(model_tags), ", ".join(lora_tags), str(config_dict.get("positive_tags") or ""),
+             config_dict.get("n_latents"), config_dict.get("total"),
+             json.dumps(config_dict, default=str)))
+        run_id = cursor.lastrowid
+        conn.executemany("INSERT OR IGNORE INTO run_tags (run_id, kind, tag) VALUES (?, ?, ?)",
+                         [(run_id, "model", tag) for tag in model_tags]
+                         + [(run_id, "lora", tag) for tag in lora_tags])
+        return run_id
+
+    def start_run(self, config_dict: dict, started_at=None) -> Optional[int]:
+        """Record a run starting now (or at *started_at*).
+
+        Returns the run id, or None if the history could not be written;
+        history failures never interrupt a run. Generations carry the id so
+        images saved after the run's scheduling loop returns, possibly while
+        another run has started, are still attributed to it.
+        """
+        with self._lock:
+            try:
+                conn = self._connection()
+                started = _to_epoch(started_at) if started_at is not None else time.time()
+                run_id = self._insert_run(conn, config_dict, started, RunOutcome.RUNNING)
+                self._commit()
+            except Exception as e:
+                logger.warning(f"Failed to record run start: {e}")
+                return None
+            return run_id
+
+    def finish_run(self, run_id: Optional[int], outcome: RunOutcome, error: Optional[str] = None,
+                   finished_at=None) -> None:
+        if run_id is None:
+            return
+        with self._lock:
+            try:
+                conn = self._connection()
+                finished = _to_epoch(finished_at) if finished_at is not None else time.time()
+                conn.execute("UPDATE runs SET finished_at = ?, duration = ? - started_at, outcome = ?, error = ?"
+                             " WHERE id = ?", (finished, finished, outcome.value, error, run_id))
+                self._commit()
+                self._persist()
+            except Exception as e:
+                logger.warning(f"Failed to record run finish: {e}")
+
+    def record_image(self, path: str, run_id: Optional[int]) -> bool:
+        """Attach a saved image to *run_id*. Returns False if there is no run to attach it to."""
+        with self._lock:
+            if run_id is None or not path:
+                return False
+            try:
+                self._connection().execute("INSERT INTO images (run_id, path, created_at) VALUES (?, ?, ?)",
+                                           (run_id, os.path.abspath(path), time.time()))
+                self._commit()
+            except Exception as e:
+                logger.warning(f"Failed to record image {path}: {e}")
+                return False
+            return True
+
+    def import_legacy(self, entries: Iterable[dict]) -> int:
+        """Import run configs kept by AppInfoCache (newest first), once per store."""
+        with self._lock:
+            conn = self._connection()
+            if conn.execute("SELECT 1 FROM meta WHERE key = ?", (RunHistory.LEGACY_IMPORTED_KEY,)).fetchone():
+                return 0
+            count = 0
+            for entry in reversed(list(entries)):
+                started = _parse_timestamp(entry.get("timestamp")) or 0.0
+                self._insert_run(conn, entry, started, RunOutcome.IMPORTED)
+                count += 1
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)",
+                         (RunHistory.LEGACY_IMPORTED_KEY, str(count)))
+            self._commit()
+            self._persist()
+            if count:
+                logger.info(f"Imported {count} run(s) from the app info cache history")
+            return count
+
+    def refresh_kept(self, since=None) -> int:
+        """Mark images whose files were deleted as not kept. Returns how many changed."""
+        with self._lock:
+            conn = self._connection()
+            sql = "SELECT id, path FROM images WHERE kept = 1"
+            params = []
+            if since is not None:
+                sql += " AND created_at >= ?"
+                params.append(_to_epoch(since))
+            gone = [(row["id"],) for row in conn.execute(sql, params) if not os.path.exists(row["path"])]
+            if gone:
+                conn.executemany("UPDATE images SET kept = 0 WHERE id = ?", gone)
+                self._commit()
+            return len(gone)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _where(workflow: Optional[str] = None, model: Optional[str] = None, lora: Optional[str] = None,
+               outcome: Optional[RunOutcome] = None, since=None, until=None,
+               text: Optional[str] = None) -> tuple[str, list]:
+        clauses = []
+        params = []
+        if workflow:
+            clauses.append("r.workflow_type = ?")
+            params.append(workflow)
+        for kind, tag in (("model", model), ("lora", lora)):
+            if tag:
+                clauses.append("EXISTS (SELECT 1 FROM run_tags t WHERE t.run_id = r.id AND t.kind = ? AND t.tag = ?)")
+                params.extend((kind, tag))
+        if outcome is not None:
+            clauses.append("r.outcome = ?")
+            params.append(outcome.value)
+        if since is not None:
+            clauses.append("r.started_at >= ?")
+            params.append(_to_epoch(since))
+        if until is not None:
+            clauses.append("r.started_at < ?")
+            params.append(_to_epoch(until))
+        if text:
+            pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            clauses.append("(" + " OR ".join(f"r.{column} LIKE ? ESCAPE '\\'" for column in
+                                             ("workflow_type", "model_tags", "lora_tags", "positive_tags")) + ")")
+            params.extend([pattern] * 4)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    @staticmethod
+    def _run_dict(row: sqlite3.Row) -> dict:
+        run = dict(row)
+        run["outcome"] = RunOutcome(run["outcome"])
+        run["config"] = json.loads(run["config"])
+        return run
+
+    def query_runs(self, limit: int = 50, offset: int = 0, **filters) -> list[dict]:
+        """Runs matching *filters*, newest first, one page at a time.
+
+        Filters: workflow (exact), model and lora (one exact tag each),
+        outcome, since and until (datetime or epoch seconds, on start time)
+        and text (substring of workflow, tags or positive prompt). Each run
+        carries its config dict and image and kept image counts.
+        """
+        where, params = self._where(**filters)
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT r.*,"
+                " (SELECT COUNT(*) FROM images i WHERE i.run_id = r.id) AS images,"
+                " (SELECT COALESCE(SUM(i.kept), 0) FROM images i WHERE i.run_id = r.id) AS kept"
+                f" FROM runs r{where} ORDER BY r.started_at DESC, r.id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]).fetchall()
+        return [self._run_dict(row) for row in rows]
+
+    def count_runs(self, **filters) -> int:
+        where, params = self._where(**filters)
+        with self._lock:
+            return self._connection().execute(f"SELECT COUNT(*) FROM runs r{where}", params).fetchone()[0]
+
+    def get_run(self, run_id: int) -> Optional[dict]:
+        with self._lock:
+            row = self._connection().execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return self._run_dict(row) if row is not None else None
+
+    def run_images(self, run_id: int) -> list[dict]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT path, created_at, kept FROM images WHERE run_id = ? ORDER BY id", (run_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def top_combinations(self, by: str = "combo", limit: int = 10, **filters) -> list[dict]:
+        """Model/LoRA usage ranked by kept images, then images, then runs.
+
+        *by* groups on the run's full model and LoRA tags ("combo"), or on
+        each model or LoRA tag alone ("model", "lora"). Takes the same
+        filters as query_runs; call refresh_kept() first for current kept counts.
+        """
+        if by not in RunHistory.TOP_GROUPINGS:
+            raise ValueError(f"Invalid grouping: {by}")
+        where, params = self._where(**filters)
+        if by == "combo":
+            select = "r.model_tags AS model, r.lora_tags AS lora"
+            source = "runs r"
+            group = "r.model_tags, r.lora_tags"
+        else:
+            select = f"t.tag AS {by}"
+            source = "runs r JOIN run_tags t ON t.run_id = r.id AND t.kind = ?"
+            params = [by] + params
+            group = "t.tag"
+        sql = (f"SELECT {select}, COUNT(DISTINCT r.id) AS runs, COUNT(i.id) AS images,"
+               " COALESCE(SUM(i.kept), 0) AS kept"
+               f" FROM {source} LEFT JOIN images i ON i.run_id = r.id{where}"
+               f" GROUP BY {group} ORDER BY kept DESC, images DESC, runs DESC LIMIT ?")
+        with self._lock:
+            rows = self._connection().execute(sql, params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+
+run_history = RunHistory()
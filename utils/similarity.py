@@ -0,0 +1,169 @@
+"""
+String similarity helpers: Levenshtein distance, longest common substring
+and the fuzzy string match behind Utils.is_similar_str.
+
+Patterns up to MYERS_MAX_LENGTH use Myers' bit-parallel algorithm (Hyyrö's
+formulation for edit distance), which advances a whole column of the DP
+table per text character using integer bit operations. Python integers are
+arbitrary precision, so a column may be longer than a machine word and the
+bit-parallel path stays far faster than the DP for any prompt-sized string.
+Longer patterns fall back to the row-by-row DP, restricted to a diagonal
+band when a maximum distance is given. Both stop early once the distance is
+known to exceed that maximum.
+
+The one-to-many functions build a query's pattern once and score it
+against every candidate.
+"""
+
+import math
+from difflib import SequenceMatcher
+from typing import Iterable, Optional, Sequence
+
+MYERS_MAX_LENGTH = 1024  # Longest pattern handled bit-parallel
+
+
+class _MyersPattern:
+    """A pattern prepared for bit-parallel edit distance against many texts."""
+
+    __slots__ = ("pattern", "length", "peq", "full", "last_bit")
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.length = len(pattern)
+        peq = {}
+        for i, char in enumerate(pattern):
+            peq[char] = peq.get(char, 0) | (1 << i)
+        self.peq = peq
+        self.full = (1 << self.length) - 1
+        self.last_bit = 1 << (self.length - 1) if self.length else 0
+
+    def distance(self, text: str, max_distance: Optional[int] = None) -> int:
+        """Edit distance to *text*; above *max_distance*, returns max_distance + 1."""
+        m = self.length
+        n = len(text)
+        if max_distance is not None and abs(m - n) > max_distance:
+            return max_distance + 1
+        if m == 0:
+            return n
+        peq = self.peq
+        full = self.full
+        last_bit = self.last_bit
+        pv = full
+        mv = 0
+        score = m
+        for j, char in enumerate(text):
+            eq = peq.get(char, 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | (~(xh | pv) & full)
+            mh = pv & xh
+            if ph & last_bit:
+                score += 1
+            elif mh & last_bit:
+                score -= 1
+            # The score can fall by at most one per remaining text character
+            if max_distance is not None and score - (n - j - 1) > max_distance:
+                return max_distance + 1
+            ph = ((ph << 1) | 1) & full
+            mh = (mh << 1) & full
+            pv = mh | (~(xv | ph) & full)
+            mv = ph & xv
+        if max_distance is not None and score > max_distance:
+            return max_distance + 1
+        return score
+
+
+def _dp_distance(s: str, t: str, max_distance: Optional[int] = None) -> int:
+    """Row-by-row Levenshtein DP, limited to the diagonal band |i - j| <= max_distance."""
+    n = len(t)
+    if max_distance is None:
+        cap = len(s) + n + 1
+        band = cap
+    else:
+        if abs(len(s) - n) > max_distance:
+            return max_distance + 1
+        cap = max_distance + 1
+        band = max_distance
+    previous = [min(j, cap) for j in range(n + 1)]
+    for i in range(1, len(s) + 1):
+        current = [cap] * (n + 1)
+        current[0] = min(i, cap)
+        row_min = current[0]
+        char = s[i - 1]
+        for j in range(max(1, i - band), min(n, i + band) + 1):
+            value = previous[j - 1] + (char != t[j - 1])
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if value > cap:
+                value = cap
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if max_distance is not None and row_min > max_distance:
+            return cap
+        previous = current
+    return previous[n]
+
+
+def levenshtein(s: str, t: str, max_distance: Optional[int] = None) -> int:
+    """Levenshtein distance between *s* and *t*.
+
+    With *max_distance*, stops as soon as the distance must exceed it and
+    returns max_distance + 1 in that case.
+    """
+    if len(s) > len(t):
+        s, t = t, s
+    if len(s) <= MYERS_MAX_LENGTH:
+        return _MyersPattern(s).distance(t, max_distance)
+    return _dp_distance(s, t, max_distance)
+
+
+def distances(query: str, candidates: Iterable[str], max_distance: Optional[int] = None) -> list[int]:
+    """Levenshtein distance from *query* to each candidate, in order."""
+    if len(query) > MYERS_MAX_LENGTH:
+        return [_dp_distance(query, candidate, max_distance) for candidate in candidates]
+    pattern = _MyersPattern(query)
+    return [pattern.distance(candidate, max_distance) for candidate in candidates]
+
+
+def longest_common_substring(s: str, t: str) -> str:
+    """The longest substring of *s* also in *t*; the earliest in *s* on ties."""
+    match = SequenceMatcher(None, s, t, autojunk=False).find_longest_match(0, len(s), 0, len(t))
+    return s[match.a:match.a + match.size]
+
+
+def similarity_threshold(s0: str, s1: str) -> int:
+    """Distance below which *s0* and *s1* count as similar."""
+    min_len = min(len(s0), len(s1))
+    if min_len == len(s0):
+        weighted_avg_len = (len(s0) + len(s1) / 2) / 2
+    else:
+        weighted_avg_len = (len(s0) / 2 + len(s1)) / 2
+    threshold = int(weighted_avg_len / 2.1) - int(math.log(weighted_avg_len))
+    return min(threshold, int(min_len * 0.8))
+
+
+def is_similar(s0: str, s1: str) -> bool:
+    threshold = similarity_threshold(s0, s1)
+    if threshold <= 0:
+        return False
+    return levenshtein(s0, s1, max_distance=threshold - 1) < threshold
+
+
+def find_similar(query: str, candidates: Sequence[str]) -> list[int]:
+    """Indices of the candidates similar to *query* by is_similar, in order."""
+    pattern = _MyersPattern(query) if len(query) <= MYERS_MAX_LENGTH else None
+    matches = []
+    for i, candidate in enumerate(candidates):
+        threshold = similarity_threshold(query, candidate)
+        if threshold <= 0:
+            continue
+        if pattern is not None:
+            distance = pattern.distance(candidate, threshold - 1)
+        else:
+            distance = _dp_distance(query, candidate, threshold - 1)
+        if distance < threshold:
+            matches.append(i)
+    return matches
@@ -1,15 +1,281 @@
-from typing import Optional
+import math
+import threading
+import time
+from typing import NamedTuple, Optional
+
 from utils.globals import Globals
+from utils.logging_setup import get_logger
 from utils.translations import I18N
 
 _ = I18N._
 
+logger = get_logger("time_estimator")
+
+
+class JobEstimate(NamedTuple):
+    """Predicted seconds for one or more jobs, with a confidence range."""
+    seconds: float = 0.0
+    low: float = 0.0
+    high: float = 0.0
+
+    def __add__(self, other):
+        return JobEstimate(self.seconds + other[0], self.low + other[1], self.high + other[2])
+
+    def scaled(self, factor: float) -> "JobEstimate":
+        return JobEstimate(self.seconds * factor, self.low * factor, self.high * factor)
+
+
+class JobPlan:
+    """
+    What a queued job will generate, captured when it is queued so the
+    queue ETA does not depend on whatever the UI is set to later.
+
+    ``images_per_latent`` is the number of model/resolution/LoRA/adapter
+    combinations per iteration and ``total`` the number of iterations, so
+    the job generates ``images_per_latent * total * n_latents`` images.
+    """
+
+    def __init__(self, workflow: str = "", models: Optional[list[str]] = None, resolution_area: int = 0,
+                 n_latents: int = 1, total: int = 1, images_per_latent: int = 1):
+        self.workflow = workflow or ""
+        self.models = list(models or [])
+        self.resolution_area = int(resolution_area or 0)
+        self.n_latents = max(1, int(n_latents or 1))
+        self.total = max(0, int(total or 0))
+        self.images_per_latent = max(1, int(images_per_latent or 1))
+
+    @staticmethod
+    def from_gen_config(gen_config, total: int = 1) -> "JobPlan":
+        workflow = gen_config.workflow_id
+        resolutions = [r for r in gen_config.resolutions if r is not None]
+        area = sum(r.width * r.height for r in resolutions) / len(resolutions) if resolutions else 0
+        return JobPlan(
+            workflow=workflow.name if hasattr(workflow, "name") else str(workflow or ""),
+            models=[str(getattr(model, "id", model)) for model in gen_config.models],
+            resolution_area=int(area),
+            n_latents=gen_config.n_latents,
+            total=total,
+            images_per_latent=gen_config.maximum_gens_per_latent(),
+        )
+
+    def image_count(self) -> int:
+        return self.images_per_latent * self.total * self.n_latents
+
+    @staticmethod
+    def for_generation(gen_config, model, resolution, n_latents: int = 1) -> "JobPlan":
+        """The plan of a single scheduled generation (one model and resolution)."""
+        workflow = gen_config.workflow_id
+        return JobPlan(
+            workflow=workflow.name if hasattr(workflow, "name") else str(workflow or ""),
+            models=[str(getattr(model, "id", model))],
+            resolution_area=resolution.width * resolution.height,
+            n_latents=n_latents,
+        )
+
+    def remaining(self, total: int, n_latents: Optional[int] = None) -> "JobPlan":
+        """The same plan with only *total* iterations left, and *n_latents* if given."""
+        return JobPlan(self.workflow, self.models, self.resolution_area,
+                       self.n_latents if n_latents is None else n_latents, total, self.images_per_latent)
+
+    def to_dict(self) -> dict:
+        return {
+            "workflow": self.workflow,
+            "models": self.models,
+            "resolution_area": self.resolution_area,
+            "n_latents": self.n_latents,
+            "total": self.total,
+            "images_per_latent": self.images_per_latent,
+        }
+
+    @staticmethod
+    def from_dict(_dict: dict) -> "JobPlan":
+        return JobPlan(**_dict)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, JobPlan) and self.to_dict() == other.to_dict()
+
+    def __str__(self) -> str:
+        return str(self.to_dict())
+
+
+class _RateStats:
+    """Exponentially weighted mean and variance of seconds per megapixel image."""
+
+    __slots__ = ("count", "mean", "variance")
+
+    def __init__(self, count: int = 0, mean: float = 0.0, variance: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.variance = variance
+
+    def add(self, rate: float, max_samples: int) -> None:
+        self.count += 1
+        weight = 1.0 / min(self.count, max_samples)
+        delta = rate - self.mean
+        self.mean += weight * delta
+        self.variance = (1.0 - weight) * (self.variance + weight * delta * delta)
+
+
+class _BusyClock:
+    """
+    Splits wall time between generations running at the same time.
+
+    Generations share the executor and usually one backend, so a task's own
+    elapsed time includes waiting behind the others. Each task is instead
+    charged dt / n for every interval it ran alongside n - 1 others, so the
+    charges add up to the time any generation was running.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._charged: dict[int, float] = {}
+        self._last = 0.0
+        self._next_token = 0
+
+    def _advance(self, now: float) -> None:
+        if self._charged:
+            share = (now - self._last) / len(self._charged)
+            for token in self._charged:
+                self._charged[token] += share
+        self._last = now
+
+    def start(self) -> int:
+        with self._lock:
+            self._advance(time.monotonic())
+            token = self._next_token
+            self._next_token += 1
+            self._charged[token] = 0.0
+            return token
+
+    def stop(self, token: int) -> float:
+        with self._lock:
+            self._advance(time.monotonic())
+            return self._charged.pop(token, 0.0)
+
+
+class GenerationTimings:
+    """
+    Learned generation speed, used to predict how long a JobPlan will take.
+
+    Every generation that completes on the executor adds its share of the
+    executor's busy time (see _BusyClock) as seconds per megapixel image,
+    under the workflow and each of its models, the workflow alone, and
+    overall. Predictions use the most specific of these with enough samples,
+    scaled by the plan's resolution area and image count.
+
+    Runs also pace themselves with the configured generation delay per
+    image, whatever the resolution. Generations overlap with that delay, so
+    a job takes the longer of the pacing and the generation time; until
+    anything has been measured the pacing alone is the estimate.
+
+    Recent samples weigh more (up to MAX_SAMPLES), so the estimate follows
+    changes in hardware or backend load.
+    """
+
+    CACHE_KEY = "generation_timings_v2"  # v1 learned the pacing delay, not generation time
+    MAX_SAMPLES = 20
+    MIN_SAMPLES = 3
+    REFERENCE_AREA = 1024 * 1024
+    CONFIDENCE_Z = 1.645  # ~90% range if per-image times are roughly normal
+    UNMEASURED_SPREAD = 0.5  # +/- range while falling back to the generation delay
+    _ALL = "*"
+
+    def __init__(self):
+        self._stats: dict[str, _RateStats] = {}
+        self._lock = threading.Lock()
+        self._busy_clock = _BusyClock()
+
+    @staticmethod
+    def _keys(workflow: str, models: list[str]) -> list[str]:
+        return [f"{workflow}|{model}" for model in models] + [workflow, GenerationTimings._ALL]
+
+    def _megapixels(self, area: int) -> float:
+        return (area or self.REFERENCE_AREA) / 1_000_000
+
+    def record(self, plan: JobPlan, seconds: float, images: Optional[int] = None) -> None:
+        """Record that generating *images* (default: all of *plan*) took *seconds*."""
+        images = plan.image_count() if images is None else images
+        if images <= 0 or seconds <= 0:
+            return
+        rate = seconds / images / self._megapixels(plan.resolution_area)
+        with self._lock:
+            for key in self._keys(plan.workflow, plan.models):
+                self._stats.setdefault(key, _RateStats()).add(rate, self.MAX_SAMPLES)
+
+    def generation_started(self) -> int:
+        """Start charging busy time to a generation; returns its token."""
+        return self._busy_clock.start()
+
+    def generation_finished(self, token: int, plan: Optional[JobPlan] = None, images: int = 0) -> float:
+        """Stop charging the generation, recording its time under *plan* if given."""
+        seconds = self._busy_clock.stop(token)
+        if plan is not None:
+            self.record(plan, seconds, images)
+        return seconds
+
+    @staticmethod
+    def pacing_seconds(plan: JobPlan) -> float:
+        """The generation delay a run sleeps for the plan, independent of resolution."""
+        return float(Globals.GENERATION_DELAY_TIME_SECONDS * plan.image_count())
+
+    def _rate(self, key: str) -> Optional[_RateStats]:
+        stats = self._stats.get(key)
+        return stats if stats is not None and stats.count >= self.MIN_SAMPLES else None
+
+    def predict(self, plan: JobPlan) -> JobEstimate:
+        images = plan.image_count()
+        if images == 0:
+            return JobEstimate()
+        megapixels = self._megapixels(plan.resolution_area)
+        pacing = self.pacing_seconds(plan)
+        with self._lock:
+            # Models share the iterations equally, so average their rates
+            model_rates = [self._rate(f"{plan.workflow}|{model}") for model in plan.models]
+            if model_rates and all(model_rates):
+                mean = sum(rate.mean for rate in model_rates) / len(model_rates)
+                std = sum(math.sqrt(rate.variance) for rate in model_rates) / len(model_rates)
+            else:
+                rate = self._rate(plan.workflow) or self._rate(self._ALL)
+                if rate is None:
+                    spread = pacing * self.UNMEASURED_SPREAD
+                    return JobEstimate(pacing, pacing - spread, pacing + spread)
+                mean, std = rate.mean, math.sqrt(rate.variance)
+        scale = megapixels * images
+        return JobEstimate(max(pacing, mean * scale),
+                           max(pacing, max(0.0, mean - self.CONFIDENCE_Z * std) * scale),
+                           max(pacing, (mean + self.CONFIDENCE_Z * std) * scale))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {key: [stats.count, stats.mean, stats.variance] for key, stats in self._stats.items()}
+
+    def load_dict(self, _dict: dict) -> None:
+        with self._lock:
+            self._stats = {key: _RateStats(*values) for key, values in (_dict or {}).items()}
+
+    def set_timings(self) -> None:
+        from utils.app_info_cache import app_info_cache
+        try:
+            self.load_dict(app_info_cache.get(self.CACHE_KEY, default_val={}))
+        except Exception as e:
+            logger.warning(f"Failed to load generation timings: {e}")
+
+    def store_timings(self) -> None:
+        from utils.app_info_cache import app_info_cache
+        app_info_cache.set(self.CACHE_KEY, self.to_dict())
+
 
 class TimeEstimator:
     """
     Provides time estimation functionality for image generation jobs.
     
-    Current implementation uses DELAY_SECONDS as a baseline for estimation.
+    The static methods use DELAY_SECONDS as a baseline for estimation. Queue
+    ETAs instead sum per-job predictions from the measured timings in
+    ``generation_timings`` (see GenerationTimings and JobPlan).
     
     Future improvements could include:
     1. Statistical Analysis:
@@ -124,4 +390,16 @@ class TimeEstimator:
         Returns:
             Estimated time in seconds
         """
-        return int(Globals.GENERATION_DELAY_TIME_SECONDS * queue_size * avg_latents_per_job) 
\ No newline at end of file
+        return int(Globals.GENERATION_DELAY_TIME_SECONDS * queue_size * avg_latents_per_job)
+
+    @staticmethod
+    def format_estimate(estimate: JobEstimate) -> str:
+        """Format an estimate with its range, e.g. "~1h 5m 0s (50m 0s - 1h 20m 0s)"."""
+        text = TimeEstimator.format_time(estimate.seconds)
+        if estimate.high - estimate.low < 1:
+            return text
+        return _("{0} ({1} - {2})").format(
+            text, TimeEstimator.format_time(estimate.low), TimeEstimator.format_time(estimate.high))
+
+
+generation_timings = GenerationTimings()
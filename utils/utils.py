@@ -1,5 +1,4 @@
 import asyncio
-import glob
 import subprocess
 import math
 import random
@@ -12,6 +11,8 @@ from utils.config import config
 
 from lib.sleep_prevention import WakeLevel, acquire_wake, release_wake
 
+from utils import similarity
+from utils.directory_listing import directory_listing_cache
 from utils.logging_setup import get_logger
 
 RESET = "\033[m"
@@ -130,61 +131,16 @@ class Utils:
                 raise Exception("Unsupported distribution for opening file location.")
 
     @staticmethod
-    def string_distance(s, t):
-        # create two work vectors of integer distances
-        v0 = [0] * (len(t) + 1)
-        v1 = [0] * (len(t) + 1)
-
-        # initialize v0 (the previous row of distances)
-        # this row is A[0][i]: edit distance from an empty s to t;
-        # that distance is the number of characters to append to  s to make t.
-        for i in range(len(t) + 1):
-            v0[i] = i
-
-        for i in range(len(s)):
-            # calculate v1 (current row distances) from the previous row v0
-
-            # first element of v1 is A[i + 1][0]
-            # edit distance is delete (i + 1) chars from s to match empty t
-            v1[0] = i + 1
-
-            for j in range(len(t)):
-                # calculating costs for A[i + 1][j + 1]
-                deletion_cost = v0[j + 1] + 1
-                insertion_cost = v1[j] + 1
-                substitution_cost = v0[j] if s[i] == t[j] else v0[j] + 1
-                v1[j + 1] = min(deletion_cost, insertion_cost, substitution_cost)
-            # copy v1 (current row) to v0 (previous row) for next iteration
-            v0,v1 = v1,v0
-        # after the last swap, the results of v1 are now in v0
-        return v0[len(t)]
+    def string_distance(s, t, max_distance=None):
+        return similarity.levenshtein(s, t, max_distance)
 
     @staticmethod
     def longest_common_substring(str1, str2):
-        m = [[0] * (1 + len(str2)) for _ in range(1 + len(str1))]
-        longest, x_longest = 0, 0
-        for x in range(1, 1 + len(str1)):
-            for y in range(1, 1 + len(str2)):
-                if str1[x - 1] == str2[y - 1]:
-                    m[x][y] = m[x - 1][y - 1] + 1
-                    if m[x][y] > longest:
-                        longest = m[x][y]
-                        x_longest = x
-                else:
-                    m[x][y] = 0
-        return str1[x_longest - longest: x_longest]
+        return similarity.longest_common_substring(str1, str2)
 
     @staticmethod
     def is_similar_str(s0, s1):
-        l_distance = Utils.string_distance(s0, s1)
-        min_len = min(len(s0), len(s1))
-        if min_len == len(s0):
-            weighted_avg_len = (len(s0) + len(s1) / 2) / 2
-        else:
-            weighted_avg_len = (len(s0) / 2 + len(s1)) / 2
-        threshold = int(weighted_avg_len / 2.1) - int(math.log(weighted_avg_len))
-        threshold = min(threshold, int(min_len * 0.8))
-        return l_distance < threshold
+        return similarity.is_similar(s0, s1)
 
     @staticmethod
     def remove_substring_by_indices(string, start_index, end_index):
@@ -274,28 +230,20 @@ class Utils:
     ]
 
     @staticmethod
-    def get_files_from_dir(dirpath, recursive=False, random_sort=False, allowed_extensions=None):
+    def get_files_from_dir(dirpath, recursive=False, random_sort=False, allowed_extensions=None, use_cache=True):
+        """List files in a directory, optionally filtered by extension.
+
+        Listings are cached by directory mtime (see utils.directory_listing), so
+        repeated calls for an unchanged directory do not rescan it.
+        """
         if not os.path.isdir(dirpath):
             raise Exception(f"Not a directory: {dirpath}")
-        glob_pattern = "**/*" if recursive else "*"
-        files = glob.glob(os.path.join(dirpath, glob_pattern), recursive=recursive)
-
-        # Filter by file extensions if provided
-        if allowed_extensions:
-            # Convert extensions to lowercase for case-insensitive comparison
-            allowed_ext_lower = [ext.lower() for ext in allowed_extensions]
-            filtered_files = []
-            for file in files:
-                # Get file extension (including the dot) and convert to lowercase
-                file_ext = os.path.splitext(file)[1].lower()
-                if file_ext in allowed_ext_lower:
-                    filtered_files.append(file)
-            files = filtered_files
+        if not use_cache:
+            directory_listing_cache.invalidate(dirpath)
+        files = directory_listing_cache.list_files(dirpath, recursive=recursive, allowed_extensions=allowed_extensions)
 
         if random_sort:
             random.shuffle(files)
-        else:
-            files.sort()
         return files
 
     @staticmethod